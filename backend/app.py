@@ -1,17 +1,44 @@
 import os
 import numpy as np
-import tensorflow as tf
 from flask import Flask, request, jsonify
 from flask_cors import CORS
 from flask_socketio import SocketIO, emit
 import eventlet
 
+from batch_api import batch_response, batch_results, parse_batch_request, predict_probs, static_batch
+from capture_log import install_capture
+from cpu_config import configure_cpu
+from metrics import install_metrics
+from profiler import install_profiler
+from socket_auth import install_socket_auth
+from structured_logging import SOCKETIO_LOGGING
+from tracing import install_tracing
+
 # Patch for eventlet
 eventlet.monkey_patch()
 
+# Per-server TensorFlow/oneDNN thread budget and optional CPU pinning (see cpu_config.py)
+configure_cpu('alphabet_landmarks')
+import tensorflow as tf
+
 app = Flask(__name__)
 CORS(app, resources={r"/*": {"origins": "*"}})
-socketio = SocketIO(app, cors_allowed_origins="*", async_mode='eventlet', logger=True, engineio_logger=True)
+socketio = SocketIO(app, cors_allowed_origins="*", async_mode='eventlet', logger=SOCKETIO_LOGGING, engineio_logger=SOCKETIO_LOGGING)
+
+# Opt-in traffic capture (set EDUSIGN_CAPTURE_DIR, see capture_log.py)
+install_capture(app, socketio, 'alphabet_landmarks')  # not 'alphabet', that is realtime_wrapper.py's
+
+# Prometheus /metrics: outcomes, per-stage latency, sessions (see metrics.py)
+METRICS = install_metrics(app, socketio, 'alphabet_landmarks', ready=lambda: model is not None)
+
+# End-to-end tracing of frames sent with frame_id/capture_ts (see tracing.py)
+install_tracing(app, socketio, METRICS, event='predict_landmarks')
+
+# Admin-only sampling/cProfile endpoints, off unless EDUSIGN_ADMIN_TOKEN is set (see profiler.py)
+install_profiler(app, socketio, 'alphabet_landmarks')
+
+# Optional Firebase token check at connect, off unless EDUSIGN_SOCKET_AUTH is set (see socket_auth.py)
+install_socket_auth(socketio, 'alphabet_landmarks')
 
 # Paths
 MODEL_PATH = './models/static_isl_model'
@@ -57,7 +84,9 @@ def predict_from_landmarks(landmarks_array):
 
         # Reshape and predict
         x = np.expand_dims(arr, axis=0)
+        METRICS.lap('preprocess')
         pred = model.predict(x, verbose=0)
+        METRICS.lap('forward')
         idx = int(np.argmax(pred))
         lbl = str(label_encoder[idx]).upper()
         conf = float(np.max(pred))
@@ -90,6 +119,24 @@ def predict():
     except Exception as e:
         return jsonify({'success': False, 'error': str(e)}), 500
 
+@app.route('/predict_batch', methods=['POST'])
+def predict_batch():
+    """Score many landmark vectors in one batched forward pass (see batch_api.py)"""
+    try:
+        if model is None:
+            return jsonify({'success': False, 'error': 'Model not loaded'}), 500
+        items, top_k, _ = parse_batch_request(request)
+        batch = static_batch(items, feature_size)
+        METRICS.observe_batch(len(batch))
+        probs = predict_probs(model, batch)
+        print(f"REST batch received {len(batch)} items")
+        labels = [str(c).upper() for c in label_encoder]
+        return jsonify(batch_response(batch_results(probs, labels, top_k, valid=np.count_nonzero(batch, axis=1) > 0)))
+    except ValueError as e:
+        return jsonify({'success': False, 'error': str(e)}), 400
+    except Exception as e:
+        return jsonify({'success': False, 'error': str(e)}), 500
+
 @socketio.on('connect')
 def on_connect():
     print('✓ Client connected')
@@ -101,13 +148,16 @@ def on_disconnect():
 
 @socketio.on('predict_landmarks')
 def on_predict_landmarks(data):
+    METRICS.start()
     try:
         landmarks = data.get('landmarks', [])
+        METRICS.lap('decode')
         print(f"WS received landmarks len={len(landmarks)}")
         result = predict_from_landmarks(landmarks)
         emit('prediction_result', result)
     except Exception as e:
         print(f"WS error: {e}")
+        METRICS.outcome('error')
         emit('prediction_error', {'error': str(e)})
 
 if __name__ == '__main__':
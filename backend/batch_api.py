@@ -0,0 +1,132 @@
+"""
+Batch REST prediction (POST /predict_batch) shared by all recognizers.
+
+Grading a quiz or assignment scores many recorded attempts at once, so the
+request carries all of them and the server runs them through the model in
+one batched forward pass (two for the general words server, one per model).
+
+Request, either
+    JSON    {"items": [...], "top_k": 3, "targets": [...]}
+            items are landmark vectors (static models) or (T, F) frame
+            sequences (motion models; lengths may differ, they are padded
+            or trimmed like live traffic)
+    binary  Content-Type: application/x-npy, body written by numpy.save:
+            an (N, F) or (N, T, F) array; top_k/targets as query args
+            (targets comma separated)
+
+Response
+    {"success": true, "count": N, "results": [
+        {"index": 0, "success": true, "label": ..., "confidence": ...,
+         "top_k": [{"label": ..., "confidence": ...}, ...]}, ...]}
+
+Items that cannot be scored (e.g. all landmarks zero) come back with
+"success": false and an "error"; the rest of the batch is unaffected.
+"""
+
+import io
+
+import numpy as np
+
+from motion_preprocessing import preprocess_batch_into
+from response_modes import DEFAULT_TOP_K, top_k_indices
+
+NPY_CONTENT_TYPES = ('application/x-npy', 'application/octet-stream')
+MAX_BATCH_ITEMS = 256
+PREDICT_BATCH_SIZE = 64
+
+
+def parse_batch_request(req):
+    """Return (items, top_k, targets) from a JSON or .npy request; raises ValueError"""
+    if req.mimetype in NPY_CONTENT_TYPES:
+        try:
+            items = np.load(io.BytesIO(req.get_data()), allow_pickle=False)
+        except Exception as e:
+            raise ValueError(f"Invalid .npy body: {e}")
+        if items.ndim not in (2, 3):
+            raise ValueError(f"Expected an (N, F) or (N, T, F) array, got shape {items.shape}")
+        items = items.astype(np.float32, copy=False)
+        top_k = req.args.get('top_k', DEFAULT_TOP_K)
+        targets = req.args.get('targets')
+        targets = targets.split(',') if targets else None
+    else:
+        data = req.get_json(force=True, silent=True)
+        if not isinstance(data, dict) or not isinstance(data.get('items'), list):
+            raise ValueError("Expected a JSON object with an 'items' list")
+        items = data['items']
+        top_k = data.get('top_k', DEFAULT_TOP_K)
+        targets = data.get('targets')
+
+    if len(items) == 0:
+        raise ValueError("No items provided")
+    if len(items) > MAX_BATCH_ITEMS:
+        raise ValueError(f"Too many items: {len(items)} > {MAX_BATCH_ITEMS}")
+    if targets is not None and len(targets) != len(items):
+        raise ValueError(f"Got {len(targets)} targets for {len(items)} items")
+    try:
+        top_k = max(int(top_k), 1)
+    except (TypeError, ValueError):
+        raise ValueError(f"Invalid top_k: {top_k}")
+    return items, top_k, targets
+
+
+def static_batch(items, feature_size=None):
+    """Stack static landmark vectors into an (N, F) float32 array"""
+    try:
+        batch = np.asarray(items, dtype=np.float32)
+    except ValueError:
+        raise ValueError("All items must have the same number of features")
+    if batch.ndim != 2:
+        raise ValueError(f"Expected landmark vectors, got shape {batch.shape}")
+    if feature_size is not None and batch.shape[1] != feature_size:
+        raise ValueError(f"Expected {feature_size} features per item, got {batch.shape[1]}")
+    return batch
+
+
+def sequence_list(items, feature_size):
+    """Validate motion items as a list of (T, F) float32 sequences"""
+    sequences = [np.asarray(item, dtype=np.float32) for item in items]
+    for i, seq in enumerate(sequences):
+        if seq.ndim != 2 or seq.shape[0] == 0 or seq.shape[1] != feature_size:
+            raise ValueError(f"Item {i}: expected a (T, {feature_size}) sequence, got shape {seq.shape}")
+    return sequences
+
+
+def motion_batch(items, seq_len, feature_size):
+    """Pad/trim + normalize motion items into one (N, seq_len, F) model batch"""
+    sequences = sequence_list(items, feature_size)
+    out = np.empty((len(sequences), seq_len, feature_size), dtype=np.float32)
+    return preprocess_batch_into(sequences, out)
+
+
+def predict_probs(model, batch):
+    """One batched forward pass (chunked only for very large batches)"""
+    return model.predict(batch, batch_size=min(len(batch), PREDICT_BATCH_SIZE), verbose=0)
+
+
+def item_result(index, probs, labels, top_k, **extra):
+    """Result entry for one scored item"""
+    best = top_k_indices(probs, top_k)
+    return {
+        'index': index,
+        'success': True,
+        'label': labels[best[0]],
+        'confidence': float(probs[best[0]]),
+        'top_k': [{'label': labels[i], 'confidence': float(probs[i])} for i in best],
+        **extra,
+    }
+
+
+def error_result(index, error):
+    return {'index': index, 'success': False, 'error': error}
+
+
+def batch_results(probs, labels, top_k, valid=None, error='Insufficient landmark data'):
+    """Per-item results for an (N, C) probability batch; rows with valid False get error"""
+    return [
+        item_result(i, row, labels, top_k) if valid is None or valid[i] else error_result(i, error)
+        for i, row in enumerate(probs)
+    ]
+
+
+def batch_response(results):
+    return {'success': True, 'count': len(results), 'results': results}
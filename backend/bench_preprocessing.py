@@ -0,0 +1,112 @@
+"""
+bench_preprocessing.py - Reference vs fused sequence preprocessing
+
+Times prepare_sequence (pad/trim + robust_normalize, allocating) against
+preprocess_into (fused, writing into a reused InputBufferPool buffer) for
+the motion model shapes, checks that both produce the same input, and with
+--check verifies the fused path does not allocate once warmed up (the same
+checks run in tests/test_motion_preprocessing.py).
+
+Usage:
+    python bench_preprocessing.py --iterations 2000 --check
+"""
+
+import argparse
+import sys
+import time
+import tracemalloc
+
+import numpy as np
+
+from motion_preprocessing import InputBufferPool, prepare_sequence, preprocess_into
+
+FEATURES = 1629
+# (model seq_len, client frame counts: short prefix, exact, long)
+CASES = ((30, (10, 30, 45)), (60, (20, 60, 90)))
+
+# Allowed tracemalloc figures for the fused path after warmup
+MAX_NET_BYTES = 1024
+MAX_PEAK_BYTES = 16 * 1024
+
+
+def time_calls(fn, iterations):
+    start = time.perf_counter()
+    for _ in range(iterations):
+        fn()
+    return time.perf_counter() - start
+
+
+def measure_allocations(fn, iterations):
+    """Return (net, peak) bytes traced while calling fn after a warmup"""
+    for _ in range(10):
+        fn()
+    tracemalloc.start()
+    before, _ = tracemalloc.get_traced_memory()
+    for _ in range(iterations):
+        fn()
+    after, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return after - before, peak - before
+
+
+def run_case(seq_len, frames, args, rng):
+    seq = rng.normal(size=(frames, FEATURES)).astype(np.float32)
+    pool = InputBufferPool(seq_len, FEATURES)
+
+    def fused():
+        with pool.acquire() as batch:
+            preprocess_into(seq, batch[0])
+
+    def reference():
+        prepare_sequence(seq, seq_len)
+
+    with pool.acquire() as batch:
+        max_diff = float(np.max(np.abs(preprocess_into(seq, batch[0]) - prepare_sequence(seq, seq_len)[0])))
+
+    ref_s = time_calls(reference, args.iterations)
+    fused_s = time_calls(fused, args.iterations)
+    result = {
+        'seq_len': seq_len,
+        'frames': frames,
+        'reference_us': ref_s / args.iterations * 1e6,
+        'fused_us': fused_s / args.iterations * 1e6,
+        'speedup': ref_s / fused_s,
+        'max_diff': max_diff,
+    }
+    if args.check:
+        result['net_bytes'], result['peak_bytes'] = measure_allocations(fused, args.iterations // 10 or 1)
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Sequence preprocessing benchmark")
+    parser.add_argument('--iterations', type=int, default=1000)
+    parser.add_argument('--check', action='store_true', help="Fail on parity or allocation regressions")
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(0)
+    results = [run_case(seq_len, frames, args, rng) for seq_len, counts in CASES for frames in counts]
+
+    print(f"{'seq_len':>8}{'frames':>8}{'ref us':>10}{'fused us':>10}{'speedup':>9}{'max diff':>11}"
+          + (f"{'net B':>8}{'peak B':>8}" if args.check else ""))
+    failures = []
+    for r in results:
+        line = (f"{r['seq_len']:>8}{r['frames']:>8}{r['reference_us']:>10.1f}{r['fused_us']:>10.1f}"
+                f"{r['speedup']:>8.1f}x{r['max_diff']:>11.1e}")
+        if args.check:
+            line += f"{r['net_bytes']:>8}{r['peak_bytes']:>8}"
+            if r['max_diff'] > 1e-5:
+                failures.append(f"{r['seq_len']}x{r['frames']}: output differs by {r['max_diff']:.2e}")
+            if r['net_bytes'] > MAX_NET_BYTES or r['peak_bytes'] > MAX_PEAK_BYTES:
+                failures.append(f"{r['seq_len']}x{r['frames']}: allocates {r['net_bytes']} B net, {r['peak_bytes']} B peak")
+        print(line)
+
+    if failures:
+        print("\n❌ " + "\n❌ ".join(failures))
+        sys.exit(1)
+    if args.check:
+        print("\n✅ Fused preprocessing matches the reference and does not allocate after warmup")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,136 @@
+"""
+bench_static_preprocessing.py - Per-sample vs batched static preprocessing
+
+Runs the per-frame preprocessing the static servers used before
+static_preprocessing.py (copied below as legacy_*) over a batch of random
+hand vectors, one row at a time, and compares it with the batched
+functions: outputs must match and the batched path should be much faster.
+
+Rows include missing hands (all zeros) and sparse rows so the best-hand
+choice and non-zero gating are exercised. tests/test_static_preprocessing.py
+checks the same parity on one-hand, two-hand and all-zero rows.
+
+Usage:
+    python bench_static_preprocessing.py --samples 4096 --check
+"""
+
+import argparse
+import sys
+import time
+
+import numpy as np
+
+from static_preprocessing import (HAND_FEATURES, MIN_NONZERO_RATIO, TWO_HAND_FEATURES, bbox_normalize,
+                                  best_hand, fit_length, has_enough_data, standardize)
+
+
+# ---------------------------------------------------------------------------
+# Previous per-sample implementations (recognize_gen_2/numbers/days)
+# ---------------------------------------------------------------------------
+
+def legacy_normalize_landmarks(landmarks_array):
+    landmarks_array = landmarks_array.copy()
+    hands_count = len(landmarks_array) // 63
+    normalized = []
+    for hand_idx in range(hands_count):
+        hand_data = landmarks_array[hand_idx * 63:hand_idx * 63 + 63].reshape(21, 3)
+        hand_data[:, 0] -= np.min(hand_data[:, 0])
+        hand_data[:, 1] -= np.min(hand_data[:, 1])
+        normalized.append(hand_data.flatten())
+    return np.concatenate(normalized).astype(np.float32)
+
+
+def legacy_extract_single_hand(features, target_size):
+    feats = np.array(features, dtype=np.float32)
+    if len(feats) == target_size:
+        return feats
+    left, right = feats[:63], feats[63:126]
+    return right if np.count_nonzero(right) >= np.count_nonzero(left) else left
+
+
+def legacy_normalize_features(features, mean, std):
+    return (features - mean) / np.maximum(std, 1e-8)
+
+
+def legacy_pad_or_truncate(landmarks_flat, size):
+    if landmarks_flat.size < size:
+        padded = np.zeros(size, dtype=np.float32)
+        padded[:landmarks_flat.size] = landmarks_flat
+        return padded
+    return landmarks_flat[:size]
+
+
+def legacy_enough_data(landmarks):
+    return np.count_nonzero(landmarks) / len(landmarks) >= MIN_NONZERO_RATIO
+
+
+# ---------------------------------------------------------------------------
+
+def make_batch(n, rng):
+    """Random two-hand rows with some missing hands and sparse rows"""
+    x = rng.uniform(0.0, 1.0, size=(n, TWO_HAND_FEATURES)).astype(np.float32)
+    x[rng.random(n) < 0.3, :HAND_FEATURES] = 0.0
+    x[rng.random(n) < 0.3, HAND_FEATURES:] = 0.0
+    sparse = rng.random(n) < 0.1
+    x[sparse] *= rng.random((int(sparse.sum()), TWO_HAND_FEATURES)) < 0.2
+    return x
+
+
+def timed(fn):
+    start = time.perf_counter()
+    result = fn()
+    return result, time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Static preprocessing parity + benchmark")
+    parser.add_argument('--samples', type=int, default=4096)
+    parser.add_argument('--check', action='store_true', help="Exit non-zero if outputs differ")
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(0)
+    x = make_batch(args.samples, rng)
+    mean = rng.normal(size=HAND_FEATURES)
+    std = rng.uniform(0.0, 2.0, size=HAND_FEATURES)
+    short = x[:, :100]
+
+    cases = {
+        'bbox_normalize': (
+            lambda: np.stack([legacy_normalize_landmarks(row) for row in x]),
+            lambda: bbox_normalize(x)),
+        'best_hand': (
+            lambda: np.stack([legacy_extract_single_hand(row, HAND_FEATURES) for row in x]),
+            lambda: best_hand(x, HAND_FEATURES)),
+        'standardize': (
+            lambda: np.stack([legacy_normalize_features(row, mean, std) for row in x[:, :HAND_FEATURES]]),
+            lambda: standardize(x[:, :HAND_FEATURES], mean, std)),
+        'fit_length': (
+            lambda: np.stack([legacy_pad_or_truncate(row, TWO_HAND_FEATURES) for row in short]),
+            lambda: fit_length(short, TWO_HAND_FEATURES)),
+        'nonzero_gate': (
+            lambda: np.array([legacy_enough_data(row) for row in x]),
+            lambda: has_enough_data(x)),
+    }
+
+    print(f"{'function':<16}{'per-sample ms':>15}{'batched ms':>12}{'speedup':>9}{'max diff':>11}")
+    failures = []
+    for name, (legacy, batched) in cases.items():
+        expected, legacy_s = timed(legacy)
+        got, batched_s = timed(batched)
+        if got.shape != expected.shape:
+            failures.append(f"{name}: shape {got.shape} != {expected.shape}")
+            continue
+        diff = float(np.max(np.abs(got.astype(np.float64) - expected.astype(np.float64))))
+        print(f"{name:<16}{legacy_s * 1e3:>15.2f}{batched_s * 1e3:>12.2f}{legacy_s / batched_s:>8.1f}x{diff:>11.1e}")
+        if diff > 1e-5:
+            failures.append(f"{name}: outputs differ by {diff:.2e}")
+
+    if args.check and failures:
+        print("\n❌ " + "\n❌ ".join(failures))
+        sys.exit(1)
+    if args.check:
+        print(f"\n✅ Batched preprocessing matches the per-sample functions on {args.samples} rows")
+
+
+if __name__ == '__main__':
+    main()
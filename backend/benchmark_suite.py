@@ -0,0 +1,449 @@
+"""
+benchmark_suite.py - Microbenchmarks for the recognition hot path
+
+Times every function a prediction goes through, on deterministic synthetic
+inputs with the real shapes (30/60 x 1629 holistic sequences, 126-float
+hand vectors):
+
+    preprocessing   pad_or_trim, robust_normalize, prepare_sequence,
+                    preprocess_into, bbox_normalize (gen_2's former
+                    normalize_landmarks), best_hand (numbers' former
+                    extract_single_hand), fit_length, standardize
+    logging         a prediction's log lines: f-strings through a stream
+                    handler (before) vs log_event / sampled diagnostics
+                    through the queued handler (structured_logging.py)
+    auth            token verification without and with the verified-token
+                    cache (token_cache.py, HS256 FakeTokens stand in for
+                    Firebase's RS256 tokens)
+    <server>        the server's handle_predict invoked in-process through
+                    Flask-SocketIO's test client, plus its check_stability /
+                    get_smooth_prediction (days, gen_2) or
+                    predict_from_landmarks (app.py)
+    models          each registered model's forward pass at --batch-sizes
+
+Each server group runs in its own process (the servers load TensorFlow and
+mix eventlet and threading modes, so they cannot share one interpreter).
+Groups that cannot run here (missing model files, TensorFlow not installed)
+are reported as skipped with the reason.
+
+Results are written as JSON; --compare flags every benchmark whose median
+got slower than the baseline by more than --tolerance and exits 1.
+
+Usage:
+    python benchmark_suite.py --json bench_baseline.json
+    python benchmark_suite.py --groups preprocessing,recognize_days --compare bench_baseline.json --tolerance 0.15
+"""
+
+import argparse
+import json
+import logging
+import os
+import platform
+import subprocess
+import sys
+import time
+from collections import deque
+
+import numpy as np
+
+from model_registry import BASE_DIR, HAND_FEATURES, HOLISTIC_FEATURES, MODELS, get_entry
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+SEED = 1234
+MIN_REPEAT_SECONDS = 0.05
+DEFAULT_REPEATS = 7
+DEFAULT_BATCH_SIZES = (1, 8, 32, 64)
+
+# Server module -> (registry model, socket event) for the handler benchmarks
+SERVERS = {
+    'app': ('alphabet', 'predict_landmarks'),
+    'realtime_wrapper': ('alphabet', 'predict'),
+    'recognize_numbers': ('numbers', 'predict'),
+    'recognize_days': ('days', 'predict'),
+    'recognize_gen_2': ('static_words', 'predict'),
+    'recognize_colours': ('colours', 'predict'),
+    'recognize_a_z_words': ('a_z_words', 'predict'),
+    'recognize_gen_1': ('gen_1', 'predict'),
+    'recognize_general_words': ('general_words', 'predict'),
+    'recognize_sentences': ('sentences', 'predict'),
+}
+GROUPS = ('preprocessing', 'logging', 'auth') + tuple(SERVERS) + ('models',)
+
+
+# ---------------------------------------------------------------------------
+# Synthetic inputs
+# ---------------------------------------------------------------------------
+
+def holistic_sequence(rng, frames):
+    """Landmark-like (frames, 1629) sequence: a slowly drifting pose with small jitter"""
+    base = rng.uniform(0.2, 0.8, size=HOLISTIC_FEATURES).astype(np.float32)
+    drift = np.linspace(0.0, 0.05, frames, dtype=np.float32)[:, None]
+    return base + drift + rng.normal(scale=0.002, size=(frames, HOLISTIC_FEATURES)).astype(np.float32)
+
+
+def hand_vector(rng, features=HAND_FEATURES, hands=2):
+    """Two (or one) hands of 21 (x, y, z) landmarks in image coordinates, zero padded"""
+    vec = np.zeros(features, dtype=np.float32)
+    filled = min(features, hands * 63)
+    vec[:filled] = rng.uniform(0.3, 0.7, size=filled)
+    return vec
+
+
+def hand_frames(rng, frames, features=HAND_FEATURES):
+    """A near-still hand over several frames (passes the stability checks)"""
+    base = hand_vector(rng, features)
+    return [base + rng.normal(scale=1e-3, size=features).astype(np.float32) * (base != 0) for _ in range(frames)]
+
+
+# ---------------------------------------------------------------------------
+# Timing
+# ---------------------------------------------------------------------------
+
+def measure(fn, repeats=DEFAULT_REPEATS, min_seconds=MIN_REPEAT_SECONDS):
+    """Per-call timings (microseconds) over `repeats` runs of an auto-ranged loop"""
+    fn()  # warm up (lazy imports, first-call tracing)
+    number = 1
+    while True:
+        start = time.perf_counter()
+        for _ in range(number):
+            fn()
+        elapsed = time.perf_counter() - start
+        if elapsed >= min_seconds or number >= 1 << 20:
+            break
+        number *= 2 if elapsed == 0 else max(2, int(min_seconds / elapsed * 1.2))
+    per_call = [elapsed / number]
+    for _ in range(repeats - 1):
+        start = time.perf_counter()
+        for _ in range(number):
+            fn()
+        per_call.append((time.perf_counter() - start) / number)
+    us = np.array(per_call) * 1e6
+    return {
+        'median_us': float(np.median(us)),
+        'mean_us': float(us.mean()),
+        'min_us': float(us.min()),
+        'max_us': float(us.max()),
+        'loops': number,
+        'repeats': repeats,
+    }
+
+
+# ---------------------------------------------------------------------------
+# Groups
+# ---------------------------------------------------------------------------
+
+def bench_preprocessing(args):
+    from motion_preprocessing import InputBufferPool, pad_or_trim, prepare_sequence, preprocess_into, robust_normalize
+    from static_preprocessing import HAND_FEATURES as ONE_HAND, bbox_normalize, best_hand, fit_length, standardize
+
+    rng = np.random.default_rng(SEED)
+    cases = {}
+    for seq_len, frames in ((30, 45), (30, 20), (60, 90)):
+        seq = holistic_sequence(rng, frames)
+        window = pad_or_trim(seq, seq_len)
+        pool = InputBufferPool(seq_len, HOLISTIC_FEATURES)
+
+        def fused(seq=seq, pool=pool):
+            with pool.acquire() as batch:
+                preprocess_into(seq, batch[0])
+
+        tag = f'[{frames}->{seq_len}]'
+        cases[f'pad_or_trim{tag}'] = lambda seq=seq, n=seq_len: pad_or_trim(seq, n)
+        cases[f'robust_normalize{tag}'] = lambda w=window: robust_normalize(w)
+        cases[f'prepare_sequence{tag}'] = lambda seq=seq, n=seq_len: prepare_sequence(seq, n)
+        cases[f'preprocess_into{tag}'] = fused
+
+    one = hand_vector(rng).reshape(1, -1)
+    batch = np.stack([hand_vector(rng, hands=int(rng.integers(1, 3))) for _ in range(64)])
+    mean, std = rng.normal(size=ONE_HAND).astype(np.float32), rng.uniform(0.5, 1.5, size=ONE_HAND).astype(np.float32)
+    for tag, x in (('[1]', one), ('[64]', batch)):
+        cases[f'bbox_normalize{tag}'] = lambda x=x: bbox_normalize(x)
+        cases[f'best_hand{tag}'] = lambda x=x: best_hand(x, ONE_HAND)
+        cases[f'fit_length{tag}'] = lambda x=x: fit_length(x[:, :100], HAND_FEATURES)
+        cases[f'standardize{tag}'] = lambda x=x: standardize(x[:, :ONE_HAND], mean, std)
+    return {name: measure(fn, args.repeats) for name, fn in cases.items()}
+
+
+def bench_logging(args):
+    from structured_logging import BackgroundHandler, JsonFormatter, log_event, sampled
+
+    rng = np.random.default_rng(SEED)
+    probs = rng.dirichlet(np.ones(35)).astype(np.float32)
+    labels = [chr(ord('A') + i % 26) + str(i) for i in range(len(probs))]
+    landmarks = hand_vector(rng).reshape(1, -1)
+    idx = int(np.argmax(probs))
+    logging.disable(logging.NOTSET)  # workers disable logging, this group measures it
+    log = logging.getLogger('bench.hot_path')
+    log.propagate = False
+    log.setLevel(logging.INFO)
+    devnull = open(os.devnull, 'w')
+
+    def before():
+        # realtime_wrapper.py's per-frame lines before structured_logging
+        top5 = [(labels[i], float(probs[i])) for i in np.argsort(probs)[-5:][::-1]]
+        log.info(f"🎯 {labels[idx]} ({probs[idx]:.2%}) target=- stable=True stableCount=3/3 confirmed=True")
+        log.info(f"   📊 Top 5: {', '.join([f'{letter}({prob:.1%})' for letter, prob in top5])}")
+        log.info(f"   🖐️ Landmarks non-zero: {np.count_nonzero(landmarks)}/{landmarks.size} "
+                 f"({np.count_nonzero(landmarks)/landmarks.size:.1%})")
+
+    def after():
+        log_event(log, 'prediction', "🎯 %s (%.2f%%) target=%s stable=%s stableCount=%d/%d confirmed=%s",
+                  labels[idx], probs[idx] * 100, '-', True, 3, 3, True, label=labels[idx], confidence=float(probs[idx]))
+        if sampled('frame'):
+            log.info("   📊 Top 5: %s", [labels[i] for i in np.argsort(probs)[-5:]])
+
+    results = {}
+    stream = logging.StreamHandler(devnull)
+    log.addHandler(stream)
+    results['log_prediction.stream_fstrings'] = measure(before, args.repeats)
+    log.removeHandler(stream)
+
+    queued = BackgroundHandler(devnull)
+    queued.setFormatter(JsonFormatter('bench'))
+    log.addHandler(queued)
+    results['log_prediction.queued_sampled'] = measure(after, args.repeats)
+    queued.close()
+    log.removeHandler(queued)
+    return results
+
+
+def bench_auth(args):
+    from token_cache import FakeTokens, TokenCache
+
+    tokens = FakeTokens()
+    cache = TokenCache(tokens)
+    token = tokens.sign('bench-user')
+    cache.verify(token)
+    return {
+        'verify_token.uncached': measure(lambda: tokens.verify(token), args.repeats),
+        'verify_token.cached': measure(lambda: cache.verify(token), args.repeats),
+    }
+
+
+def handler_payload(rng, name):
+    """Inbound event payload for a registered model (free practice, no target)"""
+    entry = get_entry(name)
+    if entry['kind'] == 'sequence':
+        return {'sequence': holistic_sequence(rng, entry['seq_len']).tolist(), 'target': ''}
+    return {'landmarks': hand_vector(rng, entry['feature_size']).tolist(), 'target': ''}
+
+
+def bench_server(module_name, args):
+    """Import one server in-process and time its handler and state functions"""
+    import importlib
+
+    name, event = SERVERS[module_name]
+    server = importlib.import_module(module_name)
+    rng = np.random.default_rng(SEED)
+    results = {}
+
+    # The handler as Socket.IO would call it, with a real request context and sid
+    client = server.socketio.test_client(server.app)
+    if not client.is_connected():
+        raise RuntimeError("test client could not connect")
+    client.get_received()
+    payload = handler_payload(rng, name)
+    if get_entry(name)['kind'] == 'static':
+        # Cycle through a still hand so stateful servers exercise the full path
+        frames = [{'landmarks': f.tolist(), 'target': ''} for f in hand_frames(rng, 16, len(payload['landmarks']))]
+        counter = iter(range(1 << 62))
+
+        def handle():
+            client.emit(event, frames[next(counter) % len(frames)])
+            client.get_received()
+    else:
+        def handle():
+            client.emit(event, payload)
+            client.get_received()
+    results[f'{module_name}.handle_{event}'] = measure(handle, args.repeats)
+    client.disconnect()
+
+    if module_name == 'app':
+        vec = payload['landmarks']
+        results['app.predict_from_landmarks'] = measure(lambda: server.predict_from_landmarks(vec), args.repeats)
+
+    if module_name == 'recognize_days':
+        frames = hand_frames(rng, 5)
+        labels = list(server.LABELS)
+        buffer = deque(frames, maxlen=5)
+        history = deque(maxlen=10)
+        results['recognize_days.check_stability'] = measure(lambda: server.check_stability(frames[0], buffer), args.repeats)
+        results['recognize_days.get_smooth_prediction'] = measure(
+            lambda: server.get_smooth_prediction(history, labels[0], 0.9), args.repeats)
+
+    if module_name == 'recognize_gen_2':
+        frames = hand_frames(rng, 5)
+        state = server.get_client_state('benchmark')
+        state['frame_buffer'].extend(frames)
+        label = server.labels[0]
+        results['recognize_gen_2.check_hand_stability'] = measure(
+            lambda: server.check_hand_stability(state, frames[0]), args.repeats)
+        results['recognize_gen_2.get_smooth_prediction'] = measure(
+            lambda: server.get_smooth_prediction(state, label, 0.9), args.repeats)
+    return results
+
+
+def bench_models(args):
+    from model_registry import load_model
+
+    rng = np.random.default_rng(SEED)
+    results, skipped = {}, {}
+    for name, entry in MODELS.items():
+        if name == 'general_words':
+            continue  # same artifact as gen_1
+        try:
+            model = load_model(name)
+        except Exception as e:
+            skipped[f'{name}.forward'] = str(e)
+            continue
+        shape = (entry['seq_len'], entry['feature_size']) if entry['kind'] == 'sequence' else (entry['feature_size'],)
+        for batch_size in args.batch_sizes:
+            x = rng.normal(size=(batch_size,) + shape).astype(np.float32)
+            results[f'{name}.forward[{batch_size}]'] = measure(lambda x=x: model(x, training=False), args.repeats)
+            results[f'{name}.forward[{batch_size}]']['per_item_us'] = results[f'{name}.forward[{batch_size}]']['median_us'] / batch_size
+    return results, skipped
+
+
+def run_group(group, args):
+    """Run a group in this process; returns (results, skipped)"""
+    if group == 'preprocessing':
+        return bench_preprocessing(args), {}
+    if group == 'logging':
+        return bench_logging(args), {}
+    if group == 'auth':
+        return bench_auth(args), {}
+    if group == 'models':
+        return bench_models(args)
+    return bench_server(group, args), {}
+
+
+def run_isolated(group, args):
+    """Run a group in a fresh interpreter (cwd = backend, like the servers)"""
+    cmd = [sys.executable, os.path.abspath(__file__), '--worker', group,
+           '--repeats', str(args.repeats), '--batch-sizes', ','.join(map(str, args.batch_sizes))]
+    proc = subprocess.run(cmd, cwd=BASE_DIR, capture_output=True, text=True)
+    try:
+        # The worker prints its JSON as the last stdout line; servers print banners before it
+        out = json.loads(proc.stdout.strip().splitlines()[-1])
+    except (IndexError, ValueError):
+        reason = (proc.stderr.strip().splitlines() or ['no output'])[-1]
+        return {}, {group: reason}
+    return out['results'], out['skipped']
+
+
+# ---------------------------------------------------------------------------
+# Baseline comparison
+# ---------------------------------------------------------------------------
+
+def compare(results, baseline, tolerance):
+    """Rows (name, baseline_us, current_us, ratio, status) for benchmarks in both runs"""
+    rows = []
+    for name, current in sorted(results.items()):
+        base = baseline.get(name)
+        if base is None:
+            rows.append((name, None, current['median_us'], None, 'new'))
+            continue
+        ratio = current['median_us'] / base['median_us'] if base['median_us'] else float('inf')
+        status = 'REGRESSION' if ratio > 1.0 + tolerance else 'faster' if ratio < 1.0 - tolerance else 'ok'
+        rows.append((name, base['median_us'], current['median_us'], ratio, status))
+    return rows
+
+
+def environment():
+    info = {
+        'python': platform.python_version(),
+        'numpy': np.__version__,
+        'platform': platform.platform(),
+        'processor': platform.processor() or platform.machine(),
+        'cpu_count': os.cpu_count(),
+        'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S'),
+    }
+    try:
+        import tensorflow as tf
+        info['tensorflow'] = tf.__version__
+    except ImportError:
+        info['tensorflow'] = None
+    return info
+
+
+def parse_batch_sizes(text):
+    return tuple(int(v) for v in text.split(','))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Microbenchmarks for the recognition hot path")
+    parser.add_argument('--groups', default=','.join(GROUPS), help=f"Comma separated subset of: {', '.join(GROUPS)}")
+    parser.add_argument('--repeats', type=int, default=DEFAULT_REPEATS)
+    parser.add_argument('--batch-sizes', type=parse_batch_sizes, default=DEFAULT_BATCH_SIZES)
+    parser.add_argument('--json', help="Write results to this file")
+    parser.add_argument('--compare', help="Baseline JSON from an earlier run")
+    parser.add_argument('--tolerance', type=float, default=0.10, help="Allowed slowdown of the median (0.10 = 10%%)")
+    parser.add_argument('--worker', help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.worker:
+        logging.disable(logging.CRITICAL)
+        results, skipped = run_group(args.worker, args)
+        print(json.dumps({'results': results, 'skipped': skipped}))
+        return
+
+    groups = [g for g in args.groups.split(',') if g]
+    unknown = set(groups) - set(GROUPS)
+    if unknown:
+        parser.error(f"Unknown groups: {', '.join(sorted(unknown))}")
+
+    results, skipped = {}, {}
+    for group in groups:
+        logger.info(f"⏱️ {group}")
+        if group == 'preprocessing':
+            group_results, group_skipped = run_group(group, args)
+        else:
+            group_results, group_skipped = run_isolated(group, args)
+        results.update(group_results)
+        skipped.update(group_skipped)
+        for name, reason in group_skipped.items():
+            logger.warning(f"⚠️ Skipped {name}: {reason}")
+
+    width = max((len(name) for name in results), default=10) + 2
+    print(f"\n{'benchmark':<{width}}{'median us':>12}{'min us':>12}{'loops':>9}")
+    for name, r in results.items():
+        print(f"{name:<{width}}{r['median_us']:>12.1f}{r['min_us']:>12.1f}{r['loops']:>9}")
+
+    report = {'environment': environment(), 'tolerance': args.tolerance, 'results': results, 'skipped': skipped}
+
+    regressions = []
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)
+        rows = compare(results, baseline['results'], args.tolerance)
+        print(f"\nCompared with {args.compare} (tolerance {args.tolerance:.0%})")
+        print(f"{'benchmark':<{width}}{'baseline us':>12}{'current us':>12}{'ratio':>8}  status")
+        for name, base, current, ratio, status in rows:
+            base_text = f"{base:>12.1f}" if base is not None else f"{'-':>12}"
+            ratio_text = f"{ratio:>8.2f}" if ratio is not None else f"{'-':>8}"
+            print(f"{name:<{width}}{base_text}{current:>12.1f}{ratio_text}  {status}")
+        regressions = [row[0] for row in rows if row[4] == 'REGRESSION']
+        missing = sorted(set(baseline['results']) - set(results))
+        report['comparison'] = {
+            'baseline': args.compare,
+            'regressions': regressions,
+            'missing': missing,
+            'rows': [dict(zip(('name', 'baseline_us', 'current_us', 'ratio', 'status'), row)) for row in rows],
+        }
+        if missing:
+            logger.warning(f"⚠️ {len(missing)} baseline benchmarks did not run: {', '.join(missing)}")
+
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump(report, f, indent=2)
+        logger.info(f"✅ Results written to {args.json}")
+
+    if regressions:
+        logger.error(f"❌ {len(regressions)} regressions beyond {args.tolerance:.0%}: {', '.join(regressions)}")
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
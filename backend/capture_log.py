@@ -0,0 +1,320 @@
+"""
+Opt-in capture of live recognizer traffic to a compact landmark log.
+
+Set EDUSIGN_CAPTURE_DIR before starting a recognizer and every inbound
+prediction event is appended to <dir>/<category>/:
+
+    chunk-00000.f32 ...  append-only float32 streams holding the received
+                         landmark vector / frame sequence of each record
+                         (a new chunk starts every CHUNK_BYTES)
+    index.bin            fixed-size INDEX_DTYPE records (timestamp, sid
+                         hash, event, target, where the landmarks live,
+                         the emitted result and the client's response and
+                         event modes) - np.memmap-able
+    meta.json            category and record layout
+
+Records are queued in memory and a real OS thread writes them in batches
+(as structured_logging.py does), so a request never waits for the disk; if
+more than MAX_PENDING records are waiting, new ones are dropped and the
+writer reports how many. Landmarks are written before their index record,
+so a reader never sees a record whose data is missing; a torn trailing
+record is simply ignored.
+
+Hooking is done once per server with install_capture(app, socketio,
+category): it wraps socketio.emit to remember the first result emitted while
+handling an event and writes the record when the event's request context
+is torn down, so the handlers themselves are unchanged. Events that emit
+nothing (e.g. frames suppressed in 'changes' event mode) are recorded with
+status 'silent'. The client's modes come from its connect query args and
+the last accepted 'configure' (see response_modes.py), so a replay can put
+its session in the same modes.
+
+CaptureReader gives memory-mapped access for replay_capture.py and the
+offline tools.
+"""
+
+import atexit
+import hashlib
+import json
+import logging
+import os
+import time
+from collections import deque
+
+import numpy as np
+from flask import g, has_request_context, request
+
+from response_modes import DEFAULT_OPTIONS, parse_response_options
+from startup import real_threading
+
+logger = logging.getLogger(__name__)
+
+CAPTURE_DIR_ENV = 'EDUSIGN_CAPTURE_DIR'
+FORMAT_VERSION = 2
+CHUNK_BYTES = 256 * 1024 * 1024
+MAX_PENDING = 10000
+FLUSH_INTERVAL = 0.5  # seconds between writer batches
+
+# Inbound events that are captured, and the outbound events taken as their result
+CAPTURE_EVENTS = ('predict', 'predict_landmarks')
+RESULT_EVENTS = ('prediction', 'prediction_result', 'keepalive')
+INPUT_KEYS = ('sequence', 'landmarks')
+
+INDEX_DTYPE = np.dtype([
+    ('ts', '<f8'),            # unix time the event was handled
+    ('sid_hash', '<u8'),      # blake2b of the Socket.IO sid
+    ('event', 'S20'),         # inbound event name
+    ('input', 'S12'),         # payload key holding the landmarks
+    ('target', 'S32'),
+    ('chunk', '<u4'),         # chunk-<n>.f32 holding the landmarks
+    ('offset', '<u8'),        # float32 offset of the landmarks in the chunk
+    ('frames', '<u4'),        # 1 for a single landmark vector
+    ('features', '<u4'),
+    ('label', 'S32'),         # emitted result
+    ('confidence', '<f4'),
+    ('status', 'S8'),         # ok / pending / error / silent
+    ('response_mode', 'S10'),  # client modes when the event was handled
+    ('event_mode', 'S8'),
+])
+
+
+def sid_hash(sid):
+    """Stable 64-bit hash of a client sid (sids themselves are not stored)"""
+    return int.from_bytes(hashlib.blake2b(str(sid).encode(), digest_size=8).digest(), 'little')
+
+
+def chunk_path(path, chunk):
+    return os.path.join(path, f'chunk-{chunk:05d}.f32')
+
+
+def result_fields(event, payload):
+    """(label, confidence, status) summary of an emitted result"""
+    if payload is None:
+        return '', 0.0, 'silent'
+    label = payload.get('label') or payload.get('word') or payload.get('sentence') or ''
+    confidence = float(payload.get('confidence') or 0.0)
+    if payload.get('pending'):
+        status = 'pending'
+    elif event == 'keepalive' or payload.get('success', True):
+        status = 'ok'
+    else:
+        status = 'error'
+    return str(label), confidence, status
+
+
+class CaptureLog:
+    """Append-only writer for one category"""
+
+    def __init__(self, root, category, chunk_bytes=CHUNK_BYTES):
+        self.path = os.path.join(root, category)
+        self.category = category
+        self.chunk_bytes = chunk_bytes
+        os.makedirs(self.path, exist_ok=True)
+
+        meta_path = os.path.join(self.path, 'meta.json')
+        if os.path.exists(meta_path):
+            with open(meta_path) as f:
+                version = json.load(f).get('format_version')
+            if version != FORMAT_VERSION:
+                raise RuntimeError(f"{self.path} holds capture format v{version}, this is v{FORMAT_VERSION}: "
+                                   f"use a new {CAPTURE_DIR_ENV}")
+        else:
+            with open(meta_path, 'w') as f:
+                json.dump({
+                    'category': category,
+                    'format_version': FORMAT_VERSION,
+                    'index_dtype': INDEX_DTYPE.descr,
+                }, f, indent=2)
+
+        # Continue the last chunk after a restart
+        self.chunk = 0
+        while os.path.exists(chunk_path(self.path, self.chunk + 1)):
+            self.chunk += 1
+        self.data = open(chunk_path(self.path, self.chunk), 'ab')
+        self.index = open(os.path.join(self.path, 'index.bin'), 'ab')
+        self.records = os.path.getsize(os.path.join(self.path, 'index.bin')) // INDEX_DTYPE.itemsize
+
+        self.pending = deque()  # (index record, landmarks) waiting for the writer
+        self.dropped = 0
+        threading = real_threading()
+        self.lock = threading.Lock()
+        self.wake = threading.Event()
+        self.closed = False
+        self.thread = threading.Thread(target=self.run, daemon=True, name='capture-writer')
+        self.thread.start()
+        atexit.register(self.close)
+
+    def append(self, event, input_key, landmarks, sid, target='', result_event=None, result=None, ts=None,
+               options=DEFAULT_OPTIONS):
+        """Queue one captured event; landmarks is a (F,) vector or (T, F) sequence"""
+        if len(self.pending) >= MAX_PENDING:
+            self.dropped += 1
+            return
+        # A private float32 copy: the writer runs after the request is gone
+        landmarks = np.array(landmarks, dtype=np.float32, order='C')
+        frames, features = (1, landmarks.shape[0]) if landmarks.ndim == 1 else landmarks.shape
+        label, confidence, status = result_fields(result_event, result)
+
+        record = np.zeros(1, dtype=INDEX_DTYPE)
+        record['ts'] = time.time() if ts is None else ts
+        record['sid_hash'] = sid_hash(sid)
+        record['event'] = event.encode()[:20]
+        record['input'] = input_key.encode()[:12]
+        record['target'] = str(target or '').encode()[:32]
+        record['frames'] = frames
+        record['features'] = features
+        record['label'] = label.encode()[:32]
+        record['confidence'] = confidence
+        record['status'] = status.encode()
+        record['response_mode'] = options['response_mode'].encode()[:10]
+        record['event_mode'] = options['event_mode'].encode()[:8]
+        # deque appends are atomic; callers may be green threads or tpool workers
+        self.pending.append((record, landmarks))
+
+    def drain(self):
+        """Write everything queued: the landmarks first, then their index records"""
+        with self.lock:
+            if self.data.closed:
+                return
+            index = []
+            while self.pending:
+                record, landmarks = self.pending.popleft()
+                if self.data.tell() + landmarks.nbytes > self.chunk_bytes and self.data.tell() > 0:
+                    self.data.close()
+                    self.chunk += 1
+                    self.data = open(chunk_path(self.path, self.chunk), 'ab')
+                record['chunk'] = self.chunk
+                record['offset'] = self.data.tell() // 4
+                self.data.write(landmarks.tobytes())
+                index.append(record.tobytes())
+            if index:
+                self.data.flush()
+                self.index.write(b''.join(index))
+                self.index.flush()
+                self.records += len(index)
+            if self.dropped:
+                dropped, self.dropped = self.dropped, 0
+                logger.warning(f"⚠️ Capture queue full, dropped {dropped} records")
+
+    def run(self):
+        while not self.closed:
+            self.wake.wait(FLUSH_INTERVAL)
+            try:
+                self.drain()
+            except Exception as e:
+                logger.warning(f"⚠️ Capture write failed: {e}")
+
+    def flush(self):
+        self.drain()
+
+    def close(self):
+        self.closed = True
+        self.wake.set()
+        self.drain()
+        with self.lock:
+            self.data.close()
+            self.index.close()
+
+
+class CaptureReader:
+    """Memory-mapped access to a captured category"""
+
+    def __init__(self, path):
+        self.path = path
+        with open(os.path.join(path, 'meta.json')) as f:
+            self.meta = json.load(f)
+        # Layout as written (v1 captures have no mode fields)
+        dtype = np.dtype([tuple(field) for field in self.meta['index_dtype']])
+        index_path = os.path.join(path, 'index.bin')
+        n = os.path.getsize(index_path) // dtype.itemsize
+        self.index = np.memmap(index_path, dtype=dtype, mode='r', shape=(n,)) if n else np.zeros(0, dtype=dtype)
+        self._chunks = {}
+
+    @property
+    def category(self):
+        return self.meta['category']
+
+    def __len__(self):
+        return len(self.index)
+
+    def _chunk(self, chunk):
+        data = self._chunks.get(chunk)
+        if data is None:
+            data = self._chunks[chunk] = np.memmap(chunk_path(self.path, chunk), dtype=np.float32, mode='r')
+        return data
+
+    def landmarks(self, i):
+        """Landmarks of record i as stored: (F,) vector or (T, F) sequence (read-only view)"""
+        rec = self.index[i]
+        frames, features = int(rec['frames']), int(rec['features'])
+        start = int(rec['offset'])
+        flat = self._chunk(int(rec['chunk']))[start:start + frames * features]
+        return flat if rec['input'] == b'landmarks' else flat.reshape(frames, features)
+
+    def payload(self, i):
+        """Re-create the inbound event payload of record i"""
+        rec = self.index[i]
+        data = {rec['input'].decode(): np.asarray(self.landmarks(i)).tolist()}
+        target = rec['target'].decode()
+        if target:
+            data['target'] = target
+        return data
+
+    def options(self, i):
+        """Response/event modes of the client when record i was captured"""
+        if 'event_mode' not in self.index.dtype.names:
+            return dict(DEFAULT_OPTIONS)
+        rec = self.index[i]
+        return {**DEFAULT_OPTIONS, 'response_mode': rec['response_mode'].decode(),
+                'event_mode': rec['event_mode'].decode()}
+
+
+def install_capture(app, socketio, category, root=None):
+    """Capture this server's prediction traffic if EDUSIGN_CAPTURE_DIR (or root) is set"""
+    root = root or os.environ.get(CAPTURE_DIR_ENV)
+    if not root:
+        return None
+    log = CaptureLog(root, category)
+    emit = socketio.emit
+    client_modes = {}  # sid -> options of the last accepted 'configure'
+
+    def capturing_emit(event, *args, **kwargs):
+        if event in RESULT_EVENTS and args and has_request_context() and 'capture_result' not in g:
+            g.capture_result = (event, args[0])
+        elif event == 'configured' and args and args[0].get('success') and has_request_context():
+            client_modes[request.sid] = {key: args[0][key] for key in DEFAULT_OPTIONS}
+        return emit(event, *args, **kwargs)
+
+    def options_of(sid):
+        if sid in client_modes:
+            return client_modes[sid]
+        try:
+            # Options picked on the connect URL
+            return parse_response_options(request.args)
+        except ValueError:
+            return DEFAULT_OPTIONS
+
+    @app.teardown_request
+    def write_capture(exc=None):
+        result_event, result = g.pop('capture_result', (None, None))
+        inbound = getattr(request, 'event', None)
+        if inbound and inbound['message'] == 'disconnect':
+            client_modes.pop(request.sid, None)
+        if not inbound or inbound['message'] not in CAPTURE_EVENTS or not inbound['args']:
+            return
+        data = inbound['args'][0]
+        if not isinstance(data, dict):
+            return
+        input_key = next((key for key in INPUT_KEYS if key in data), None)
+        if input_key is None:
+            return
+        try:
+            log.append(inbound['message'], input_key, data[input_key], request.sid,
+                       target=data.get('target', ''), result_event=result_event, result=result,
+                       options=options_of(request.sid))
+        except Exception as e:
+            logger.warning(f"⚠️ Capture failed: {e}")
+
+    socketio.emit = capturing_emit
+    logger.info(f"📼 Capturing {category} traffic to {log.path} ({log.records} records so far)")
+    return log
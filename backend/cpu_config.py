@@ -0,0 +1,160 @@
+"""
+CPU thread budgets and core pinning for the recognizers.
+
+Left alone, every recognizer's TensorFlow sizes its intra-op and inter-op
+pools (and oneDNN/OpenMP its own) to all cores of the box, so nine servers
+on one machine run ~9x more compute threads than cores and p99 latency
+follows the scheduler. configure_cpu(server), called before TensorFlow is
+imported, gives each server a budget instead:
+
+    intra_op   threads one op may use (TF_NUM_INTRAOP_THREADS, and
+               OMP_NUM_THREADS for oneDNN)
+    inter_op   ops run concurrently (TF_NUM_INTEROP_THREADS)
+    cpus       optional CPU affinity of the whole process, e.g. "0-3,8";
+               threads created later (TF pools, tpool workers) inherit it
+
+Defaults are THREAD_BUDGETS (small MLP static models barely use a second
+thread, the LSTM sequence models scale to about two), capped at the CPUs
+this process may run on; 0 leaves the TensorFlow default. They are
+overridden, in order, by the server's entry in the JSON file named by
+EDUSIGN_CPU_CONFIG
+
+    {"colours": {"intra_op": 2, "inter_op": 1, "cpus": "0-1"}, ...}
+
+(thread_sweep.py --write-config writes one) and by EDUSIGN_INTRA_OP_THREADS,
+EDUSIGN_INTER_OP_THREADS and EDUSIGN_CPU_AFFINITY. Thread variables the
+environment already sets (OMP_NUM_THREADS, ...) are left as they are.
+"""
+
+import json
+import logging
+import os
+import sys
+
+logger = logging.getLogger(__name__)
+
+CPU_CONFIG_ENV = 'EDUSIGN_CPU_CONFIG'
+INTRA_OP_ENV = 'EDUSIGN_INTRA_OP_THREADS'
+INTER_OP_ENV = 'EDUSIGN_INTER_OP_THREADS'
+AFFINITY_ENV = 'EDUSIGN_CPU_AFFINITY'
+
+# server -> (intra_op, inter_op)
+THREAD_BUDGETS = {
+    'alphabet': (1, 1),
+    'alphabet_landmarks': (1, 1),  # app.py
+    'numbers': (1, 1),
+    'days': (1, 1),
+    'static_words': (1, 1),
+    'colours': (2, 1),
+    'a_z_words': (2, 1),
+    'gen_1': (2, 1),
+    'general_words': (2, 2),  # motion + static model may run in parallel
+    'sentences': (2, 1),
+}
+DEFAULT_BUDGET = (0, 0)
+
+
+def parse_cpus(text):
+    """'0-3,8' -> [0, 1, 2, 3, 8]"""
+    cpus = set()
+    for part in filter(None, (p.strip() for p in str(text).split(','))):
+        low, _, high = part.partition('-')
+        cpus.update(range(int(low), int(high or low) + 1))
+    return sorted(cpus)
+
+
+def format_cpus(cpus):
+    """[0, 1, 2, 3, 8] -> '0-3,8'"""
+    ranges = []
+    for cpu in sorted(cpus):
+        if ranges and cpu == ranges[-1][1] + 1:
+            ranges[-1][1] = cpu
+        else:
+            ranges.append([cpu, cpu])
+    return ','.join(str(a) if a == b else f'{a}-{b}' for a, b in ranges)
+
+
+def available_cpus():
+    try:
+        return sorted(os.sched_getaffinity(0))
+    except AttributeError:  # not Linux
+        return list(range(os.cpu_count() or 1))
+
+
+def cpu_slices(cpus, sizes):
+    """Give each of len(sizes) processes `size` CPUs, disjoint while they fit, wrapping around after"""
+    slices, start = [], 0
+    for size in sizes:
+        size = max(1, min(size or 1, len(cpus)))
+        slices.append([cpus[(start + i) % len(cpus)] for i in range(size)])
+        start += size
+    return slices
+
+
+def cpu_settings(server):
+    """Effective {'intra_op', 'inter_op', 'cpus'} of a server (defaults < config file < env)"""
+    intra, inter = THREAD_BUDGETS.get(server, DEFAULT_BUDGET)
+    settings = {'intra_op': intra, 'inter_op': inter, 'cpus': None}
+    path = os.environ.get(CPU_CONFIG_ENV)
+    if path:
+        try:
+            with open(path) as f:
+                settings.update(json.load(f).get(server, {}))
+        except (OSError, ValueError) as e:
+            logger.warning(f"⚠️ Could not read {CPU_CONFIG_ENV}={path}: {e}")
+    for key, env in (('intra_op', INTRA_OP_ENV), ('inter_op', INTER_OP_ENV), ('cpus', AFFINITY_ENV)):
+        if os.environ.get(env):
+            settings[key] = os.environ[env]
+    try:
+        settings['intra_op'] = int(settings['intra_op'] or 0)
+        settings['inter_op'] = int(settings['inter_op'] or 0)
+        settings['cpus'] = parse_cpus(settings['cpus']) if settings['cpus'] not in (None, '') else None
+    except ValueError as e:
+        logger.warning(f"⚠️ Invalid CPU settings for {server}: {e}, using TensorFlow defaults")
+        return {'intra_op': 0, 'inter_op': 0, 'cpus': None}
+    limit = len(settings['cpus'] or available_cpus())
+    settings['intra_op'] = min(settings['intra_op'], limit)
+    settings['inter_op'] = min(settings['inter_op'], limit)
+    return settings
+
+
+def thread_env(intra_op, inter_op):
+    """Environment variables that size TensorFlow's and oneDNN's pools (0 = leave default)"""
+    env = {}
+    if intra_op:
+        env.update({'TF_NUM_INTRAOP_THREADS': str(intra_op), 'OMP_NUM_THREADS': str(intra_op)})
+    if inter_op:
+        env['TF_NUM_INTEROP_THREADS'] = str(inter_op)
+    return env
+
+
+def pin_process(cpus):
+    """Set the affinity of every thread of this process (sched_setaffinity(0) only pins the caller)"""
+    try:
+        threads = [int(tid) for tid in os.listdir('/proc/self/task')]
+    except OSError:
+        threads = [0]
+    for tid in threads:
+        try:
+            os.sched_setaffinity(tid, cpus)
+        except ProcessLookupError:
+            pass  # thread exited meanwhile
+
+
+def configure_cpu(server):
+    """Apply the server's thread budget and affinity; call before TensorFlow is imported"""
+    settings = cpu_settings(server)
+    if 'tensorflow' in sys.modules:
+        logger.warning("⚠️ TensorFlow already imported, thread budget only applies to new processes")
+    for key, value in thread_env(settings['intra_op'], settings['inter_op']).items():
+        os.environ.setdefault(key, value)
+    if settings['cpus']:
+        try:
+            pin_process(settings['cpus'])
+        except (AttributeError, OSError) as e:
+            logger.warning(f"⚠️ Could not pin to CPUs {format_cpus(settings['cpus'])}: {e}")
+            settings['cpus'] = None
+    logger.info(f"🧵 CPU budget: intra_op={settings['intra_op'] or 'default'} "
+                f"inter_op={settings['inter_op'] or 'default'} "
+                f"cpus={format_cpus(settings['cpus']) if settings['cpus'] else 'all'}")
+    return settings
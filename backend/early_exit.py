@@ -0,0 +1,120 @@
+"""
+Early-exit prediction for the motion recognizers.
+
+Instead of waiting for a full SEQ_LEN window, a client in early-exit mode
+sends the frames it has so far (e.g. 10, 15, 20 frames). The prefix is
+padded exactly like a short window (last frame repeated) and run through
+the model; if the top probability and the top-1/top-2 margin both clear
+the policy thresholds the server emits a provisional result straight away.
+"""
+
+import numpy as np
+
+
+def top2(probs):
+    """Return (top index, top probability, margin over the runner-up)"""
+    probs = np.asarray(probs, dtype=np.float32).ravel()
+    if probs.size == 1:
+        return 0, float(probs[0]), float(probs[0])
+    best_two = np.argpartition(probs, -2)[-2:]
+    if probs[best_two[0]] > probs[best_two[1]]:
+        best_two = best_two[::-1]
+    idx = int(best_two[1])
+    confidence = float(probs[idx])
+    return idx, confidence, confidence - float(probs[best_two[0]])
+
+
+class EarlyExitPolicy:
+    """Thresholds deciding when a partial sequence is confident enough"""
+
+    def __init__(self, seq_len, prefixes=(10, 15, 20), min_confidence=0.85,
+                 min_margin=0.50, require_full_confirmation=True):
+        self.seq_len = seq_len
+        self.prefixes = tuple(sorted(p for p in prefixes if 0 < p < seq_len))
+        self.min_confidence = min_confidence
+        self.min_margin = min_margin
+        self.require_full_confirmation = require_full_confirmation
+
+    @property
+    def min_frames(self):
+        return self.prefixes[0] if self.prefixes else self.seq_len
+
+    def is_partial(self, n_frames):
+        return n_frames < self.seq_len
+
+    def passes(self, confidence, margin):
+        return confidence >= self.min_confidence and margin >= self.min_margin
+
+    def to_dict(self):
+        return {
+            'seq_len': self.seq_len,
+            'prefixes': list(self.prefixes),
+            'min_confidence': self.min_confidence,
+            'min_margin': self.min_margin,
+            'require_full_confirmation': self.require_full_confirmation,
+        }
+
+
+def assess(policy, probs, frames):
+    """Return (margin, exit_ok) for the probabilities of a (possibly partial) sequence"""
+    _, confidence, margin = top2(probs)
+    return margin, policy.is_partial(frames) and policy.passes(confidence, margin)
+
+
+def early_exit_fields(policy, frames, margin, exit_ok, stable):
+    """Extra response fields added for clients that opted into early exit"""
+    partial = policy.is_partial(frames)
+    if partial:
+        confirmed = exit_ok and not policy.require_full_confirmation
+    else:
+        confirmed = stable
+    return {
+        'early_exit': True,
+        'provisional': partial and exit_ok,
+        'frames_used': int(frames),
+        'margin': margin,
+        'confirmed': bool(confirmed),
+    }
+
+
+def pending_response(policy, frames, confidence=0.0, margin=0.0):
+    """Response for a prefix that is too short or not yet confident"""
+    return {
+        'success': False,
+        'pending': True,
+        'early_exit': True,
+        'provisional': False,
+        'frames_used': int(frames),
+        'frames_required': policy.seq_len,
+        'confidence': confidence,
+        'margin': margin,
+        'error': 'Waiting for more frames',
+    }
+
+
+def simulate(probs_by_prefix, policy):
+    """
+    Replay the early-exit policy over precomputed probabilities.
+
+    probs_by_prefix maps prefix length -> (N, C) probabilities, and must
+    contain policy.seq_len. Returns (pred, frames_used) arrays of shape (N,):
+    each sample exits at the first prefix that passes the thresholds,
+    otherwise at full length.
+    """
+    full = np.asarray(probs_by_prefix[policy.seq_len])
+    n = full.shape[0]
+    pred = np.argmax(full, axis=1)
+    frames_used = np.full(n, policy.seq_len, dtype=np.int32)
+    undecided = np.ones(n, dtype=bool)
+
+    for prefix in policy.prefixes:
+        probs = np.asarray(probs_by_prefix[prefix])
+        top_two = np.sort(np.partition(probs, -2, axis=1)[:, -2:], axis=1)
+        confidence = top_two[:, 1]
+        margin = top_two[:, 1] - top_two[:, 0]
+        exits = undecided & (confidence >= policy.min_confidence) & (margin >= policy.min_margin)
+        pred[exits] = np.argmax(probs[exits], axis=1)
+        frames_used[exits] = prefix
+        undecided &= ~exits
+
+    return pred, frames_used
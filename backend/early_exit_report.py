@@ -0,0 +1,136 @@
+"""
+early_exit_report.py - Replay recorded sequences through the early-exit policy
+
+For each model, every recorded full-length sequence is cut into the policy
+prefixes (padded the same way the servers pad them), run through the model
+in batches, and the policy is replayed to report latency saved against
+accuracy lost.
+
+Usage:
+    python early_exit_report.py colours=recordings/colours.npz \
+        sentences=recordings/sentences.npz --fps 30 --json report.json
+
+Each .npz holds X (N, T, 1629) - or an object array of (T, 1629) sequences -
+and y (N,) labels, either label strings or class indices.
+"""
+
+import argparse
+import json
+import logging
+
+import numpy as np
+
+from early_exit import EarlyExitPolicy, simulate
+from model_registry import get_entry, load_labels, load_model
+from motion_preprocessing import preprocess_batch_into
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+
+def load_recordings(path, labels):
+    """Load sequences and integer targets from an .npz recording"""
+    data = np.load(path, allow_pickle=True)
+    sequences = list(data['X'])
+    y = data['y']
+    if y.dtype.kind in ('U', 'S', 'O'):
+        index = {label: i for i, label in enumerate(labels)}
+        y = np.array([index[str(label)] for label in y], dtype=np.int64)
+    return sequences, y.astype(np.int64)
+
+
+def batch_probs(model, sequences, prefix, seq_len, batch_size):
+    """Model probabilities for every sequence cut to `prefix` frames"""
+    out = []
+    buf = np.empty((batch_size, seq_len, np.asarray(sequences[0]).shape[1]), dtype=np.float32)
+    for start in range(0, len(sequences), batch_size):
+        chunk = sequences[start:start + batch_size]
+        batch = preprocess_batch_into((np.asarray(s)[:prefix] for s in chunk), buf[:len(chunk)])
+        out.append(model.predict(batch, verbose=0))
+    return np.concatenate(out)
+
+
+def report_model(name, data_path, args):
+    entry = get_entry(name)
+    seq_len = entry['seq_len']
+    policy = EarlyExitPolicy(
+        seq_len,
+        prefixes=args.prefixes or (seq_len // 3, seq_len // 2, (2 * seq_len) // 3),
+        min_confidence=args.min_confidence,
+        min_margin=args.min_margin,
+    )
+
+    labels = load_labels(name)
+    sequences, y = load_recordings(data_path, labels)
+    logger.info(f"📂 {name}: {len(sequences)} recordings from {data_path}")
+
+    model = load_model(name)
+    probs_by_prefix = {
+        prefix: batch_probs(model, sequences, prefix, seq_len, args.batch_size)
+        for prefix in policy.prefixes + (seq_len,)
+    }
+
+    full_pred = np.argmax(probs_by_prefix[seq_len], axis=1)
+    pred, frames_used = simulate(probs_by_prefix, policy)
+
+    full_accuracy = float(np.mean(full_pred == y))
+    early_accuracy = float(np.mean(pred == y))
+    frames_saved = seq_len - frames_used
+    exits = frames_used < seq_len
+
+    per_prefix = {}
+    for prefix in policy.prefixes:
+        taken = frames_used == prefix
+        per_prefix[str(prefix)] = {
+            'exit_rate': float(np.mean(taken)),
+            'accuracy': float(np.mean(pred[taken] == y[taken])) if taken.any() else None,
+        }
+
+    return {
+        'model': name,
+        'samples': int(len(y)),
+        'policy': policy.to_dict(),
+        'full_accuracy': full_accuracy,
+        'early_exit_accuracy': early_accuracy,
+        'accuracy_lost': full_accuracy - early_accuracy,
+        'exit_rate': float(np.mean(exits)),
+        'mean_frames_used': float(np.mean(frames_used)),
+        'mean_latency_saved_ms': float(np.mean(frames_saved) / args.fps * 1000.0),
+        'median_latency_saved_ms': float(np.median(frames_saved) / args.fps * 1000.0),
+        'changed_by_early_exit': int(np.sum(exits & (pred != full_pred))),
+        'per_prefix': per_prefix,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Early-exit latency/accuracy report")
+    parser.add_argument('runs', nargs='+', help="model=recording.npz pairs")
+    parser.add_argument('--prefixes', type=int, nargs='+', help="Prefix lengths (default: 1/3, 1/2, 2/3 of SEQ_LEN)")
+    parser.add_argument('--min-confidence', type=float, default=0.85)
+    parser.add_argument('--min-margin', type=float, default=0.50)
+    parser.add_argument('--fps', type=float, default=30.0, help="Client capture rate used to convert frames to ms")
+    parser.add_argument('--batch-size', type=int, default=32)
+    parser.add_argument('--json', help="Write the report to this file")
+    args = parser.parse_args()
+
+    reports = []
+    for run in args.runs:
+        name, _, data_path = run.partition('=')
+        if not data_path:
+            parser.error(f"Expected model=recording.npz, got '{run}'")
+        reports.append(report_model(name, data_path, args))
+
+    print(f"\n{'model':<15}{'n':>6}{'full acc':>10}{'early acc':>11}{'lost':>8}{'exit %':>8}{'frames':>8}{'saved ms':>10}")
+    for r in reports:
+        print(f"{r['model']:<15}{r['samples']:>6}{r['full_accuracy']:>10.2%}{r['early_exit_accuracy']:>11.2%}"
+              f"{r['accuracy_lost']:>8.2%}{r['exit_rate']:>8.1%}{r['mean_frames_used']:>8.1f}"
+              f"{r['mean_latency_saved_ms']:>10.0f}")
+
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump(reports, f, indent=2)
+        logger.info(f"✅ Report written to {args.json}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,205 @@
+"""
+evaluate_models.py - Evaluate a registered model over labelled landmark shards
+
+Runs the serving preprocessing (model_registry.prepare_batch) and the model
+over every shard in a directory, spread over a process pool, and reports
+accuracy, per-class precision/recall/F1, the confusion matrix and
+throughput. Use it to check every model conversion before it ships.
+
+Shards (any mix, any number):
+    <name>.X.npy + <name>.y.npy   memory-mapped and read in --chunk-size
+                                  slices, so datasets larger than RAM stream
+    <name>.npz with X and y       loaded one shard at a time (npz members
+                                  cannot be memory-mapped)
+X is (N, F) landmark vectors for static models or (N, T, F) sequences for
+motion models; y holds label strings or class indices.
+
+Usage:
+    python evaluate_models.py days data/days --workers 4
+    python evaluate_models.py numbers data/numbers --artifact folded_model_path \
+        --json numbers_eval.json --confusion-csv numbers_confusion.csv
+"""
+
+import argparse
+import glob
+import json
+import logging
+import multiprocessing as mp
+import os
+import time
+
+import numpy as np
+
+from model_registry import get_entry, load_labels, load_model, prepare_batch
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+_worker = {}
+
+
+def find_shards(data_dir):
+    """Return [(x_path, y_path_or_None)] for every shard in data_dir"""
+    shards = []
+    for x_path in sorted(glob.glob(os.path.join(data_dir, '*.X.npy'))):
+        y_path = x_path[:-len('.X.npy')] + '.y.npy'
+        if not os.path.exists(y_path):
+            raise FileNotFoundError(f"Missing labels for {x_path}: expected {y_path}")
+        shards.append((x_path, y_path))
+    shards.extend((path, None) for path in sorted(glob.glob(os.path.join(data_dir, '*.npz'))))
+    if not shards:
+        raise FileNotFoundError(f"No *.X.npy/*.y.npy or *.npz shards in {data_dir}")
+    return shards
+
+
+def plan_tasks(shards, chunk_size):
+    """Split memory-mapped shards into (x_path, y_path, start, stop) slices"""
+    tasks = []
+    for x_path, y_path in shards:
+        if y_path is None:
+            tasks.append((x_path, None, 0, None))
+            continue
+        n = np.load(x_path, mmap_mode='r').shape[0]
+        tasks.extend((x_path, y_path, start, min(start + chunk_size, n)) for start in range(0, n, chunk_size))
+    return tasks
+
+
+def label_indices(y, labels):
+    """Map label strings (case-insensitive) or indices to class indices"""
+    y = np.asarray(y)
+    if y.dtype.kind in ('U', 'S', 'O'):
+        index = {label.lower(): i for i, label in enumerate(labels)}
+        return np.array([index.get(str(label).strip().lower(), -1) for label in y], dtype=np.int64)
+    return y.astype(np.int64)
+
+
+def init_worker(name, path_key, batch_size):
+    _worker['name'] = name
+    _worker['path_key'] = path_key
+    _worker['batch_size'] = batch_size
+    _worker['model'] = load_model(name, path_key)
+    _worker['labels'] = load_labels(name)
+
+
+def run_task(task):
+    """Predict one slice; returns (y_true, y_pred, seconds spent in preprocessing + model)"""
+    x_path, y_path, start, stop = task
+    if y_path is None:
+        with np.load(x_path, allow_pickle=True) as data:
+            x, y = data['X'], data['y']
+    else:
+        x = np.load(x_path, mmap_mode='r')[start:stop]
+        y = np.load(y_path, mmap_mode='r')[start:stop]
+
+    began = time.perf_counter()
+    model = _worker['model']
+    batch_size = _worker['batch_size']
+    preds = []
+    for i in range(0, len(x), batch_size):
+        batch = prepare_batch(_worker['name'], x[i:i + batch_size], _worker['path_key'])
+        preds.append(np.argmax(model.predict(batch, batch_size=len(batch), verbose=0), axis=1))
+    elapsed = time.perf_counter() - began
+    y_pred = np.concatenate(preds) if preds else np.zeros(0, dtype=np.int64)
+    return label_indices(y, _worker['labels']), y_pred, elapsed
+
+
+def classification_report(confusion, labels):
+    """Per-class precision/recall/F1 from a confusion matrix (rows = true class)"""
+    tp = np.diag(confusion).astype(np.float64)
+    support = confusion.sum(axis=1)
+    predicted = confusion.sum(axis=0)
+    precision = np.divide(tp, predicted, out=np.zeros_like(tp), where=predicted > 0)
+    recall = np.divide(tp, support, out=np.zeros_like(tp), where=support > 0)
+    f1 = np.divide(2 * precision * recall, precision + recall, out=np.zeros_like(tp), where=(precision + recall) > 0)
+    return {
+        label: {'precision': float(precision[i]), 'recall': float(recall[i]), 'f1': float(f1[i]), 'support': int(support[i])}
+        for i, label in enumerate(labels)
+    }
+
+
+def format_report(per_class, accuracy, total):
+    """Text report in the same layout as the classification_report_*.txt files"""
+    width = max(12, max(len(label) for label in per_class) + 2)
+    lines = [f"{'':>{width}}{'precision':>10}{'recall':>10}{'f1-score':>10}{'support':>10}", ""]
+    for label, m in per_class.items():
+        lines.append(f"{label:>{width}}{m['precision']:>10.2f}{m['recall']:>10.2f}{m['f1']:>10.2f}{m['support']:>10}")
+    lines.append("")
+    lines.append(f"{'accuracy':>{width}}{'':>20}{accuracy:>10.2f}{total:>10}")
+    rows = list(per_class.values())
+    supports = np.array([m['support'] for m in rows], dtype=np.float64)
+    for name, weights in (('macro avg', np.ones_like(supports)), ('weighted avg', supports)):
+        w = weights / weights.sum() if weights.sum() else weights
+        avg = [float(np.dot(w, [m[k] for m in rows])) for k in ('precision', 'recall', 'f1')]
+        lines.append(f"{name:>{width}}{avg[0]:>10.2f}{avg[1]:>10.2f}{avg[2]:>10.2f}{total:>10}")
+    return "\n".join(lines)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Evaluate a registered model over labelled landmark shards")
+    parser.add_argument('model', help="Registered model name (see model_registry.py)")
+    parser.add_argument('data_dir', help="Directory of *.X.npy/*.y.npy or *.npz shards")
+    parser.add_argument('--artifact', default='model_path', help="Registry key of the artifact to evaluate (e.g. folded_model_path)")
+    parser.add_argument('--workers', type=int, default=max(1, min(4, os.cpu_count() or 1)))
+    parser.add_argument('--chunk-size', type=int, default=2048, help="Rows per task for memory-mapped shards")
+    parser.add_argument('--batch-size', type=int, default=256, help="Rows per forward pass")
+    parser.add_argument('--json', help="Write metrics to this file")
+    parser.add_argument('--confusion-csv', help="Write the confusion matrix to this CSV file")
+    args = parser.parse_args()
+
+    entry = get_entry(args.model)
+    if args.artifact not in entry:
+        parser.error(f"{args.model} has no '{args.artifact}' in the registry")
+    labels = load_labels(args.model)
+    tasks = plan_tasks(find_shards(args.data_dir), args.chunk_size)
+    logger.info(f"📂 {args.model}: {len(tasks)} tasks from {args.data_dir}, {args.workers} workers")
+
+    confusion = np.zeros((len(labels), len(labels)), dtype=np.int64)
+    unknown = 0
+    busy = 0.0
+    ctx = mp.get_context('spawn')  # TensorFlow does not survive fork
+    with ctx.Pool(args.workers, initializer=init_worker, initargs=(args.model, args.artifact, args.batch_size)) as pool:
+        started = time.perf_counter()
+        for y_true, y_pred, elapsed in pool.imap_unordered(run_task, tasks):
+            known = y_true >= 0
+            unknown += int((~known).sum())
+            np.add.at(confusion, (y_true[known], y_pred[known]), 1)
+            busy += elapsed
+        wall = time.perf_counter() - started
+
+    total = int(confusion.sum())
+    accuracy = float(np.trace(confusion) / total) if total else 0.0
+    per_class = classification_report(confusion, labels)
+    print(format_report(per_class, accuracy, total))
+    # Wall time includes the workers loading their models; busy time does not
+    print(f"\n⚡ {total / wall:.1f} samples/s wall ({args.workers} workers, incl. model load), "
+          f"{total / busy if busy else 0.0:.1f} samples/s per busy worker")
+    if unknown:
+        logger.warning(f"⚠️ {unknown} samples had labels the model does not know and were skipped")
+
+    if args.confusion_csv:
+        with open(args.confusion_csv, 'w') as f:
+            f.write('true\\pred,' + ','.join(labels) + '\n')
+            for label, row in zip(labels, confusion):
+                f.write(label + ',' + ','.join(str(v) for v in row) + '\n')
+        logger.info(f"✅ Confusion matrix written to {args.confusion_csv}")
+
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump({
+                'model': args.model,
+                'artifact': entry[args.artifact],
+                'samples': total,
+                'skipped_unknown_labels': unknown,
+                'accuracy': accuracy,
+                'per_class': per_class,
+                'confusion_matrix': confusion.tolist(),
+                'labels': labels,
+                'samples_per_second': total / wall if wall else 0.0,
+                'samples_per_second_per_worker': total / busy if busy else 0.0,
+                'workers': args.workers,
+            }, f, indent=2)
+        logger.info(f"✅ Metrics written to {args.json}")
+
+
+if __name__ == '__main__':
+    main()
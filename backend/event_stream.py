@@ -0,0 +1,73 @@
+"""
+Change-only prediction event stream.
+
+Clients that configure event_mode='changes' no longer receive a 'prediction'
+event per inbound frame. The server emits only on state transitions:
+
+    prediction  status change (cooldown start/end, stable/unstable flips,
+                building/ready...), label change or confirmation change
+    confirmed   once per confirmed label (a cooldown in between does not
+                count as a new confirmation)
+    keepalive   at most every KEEPALIVE_INTERVAL seconds while nothing
+                changes, summarizing the current state and how many
+                frames were suppressed since the last event
+"""
+
+import time
+
+KEEPALIVE_INTERVAL = 2.0  # seconds
+
+
+class EventStream:
+    """Per-client filter that lets only state transitions through"""
+
+    def __init__(self, keepalive_interval=KEEPALIVE_INTERVAL, clock=time.monotonic):
+        self.keepalive_interval = keepalive_interval
+        self.clock = clock
+        self.state = None
+        self.confirmed_label = None
+        self.suppressed = 0
+        self.last_emit = clock()
+
+    def filter(self, payload, status):
+        """Return the (event, payload) pairs to emit for this frame's result"""
+        now = self.clock()
+        label = payload.get('label')
+        state = (status, label, bool(payload.get('stable')), bool(payload.get('confirmed')))
+
+        if state == self.state:
+            self.suppressed += 1
+            if now - self.last_emit < self.keepalive_interval:
+                return []
+            events = [('keepalive', {
+                'status': status,
+                'label': label,
+                'stable': state[2],
+                'confirmed': state[3],
+                'confidence': payload.get('confidence', 0.0),
+                'suppressed': self.suppressed,
+            })]
+        else:
+            events = [('prediction', dict(payload, status=status, suppressed=self.suppressed))]
+            if state[3]:
+                # Re-confirming the same label after a cooldown is not a new confirmation
+                if label != self.confirmed_label:
+                    events.append(('confirmed', dict(payload, status=status)))
+                    self.confirmed_label = label
+            elif status == 'prediction':
+                self.confirmed_label = None
+            self.state = state
+
+        self.suppressed = 0
+        self.last_emit = now
+        return events
+
+
+def events_for(streams, sid, options, payload, status):
+    """Events to emit for sid: the payload itself, or only its transitions"""
+    if options.get('event_mode') != 'changes':
+        return [('prediction', payload)]
+    stream = streams.get(sid)
+    if stream is None:
+        stream = streams[sid] = EventStream()
+    return stream.filter(payload, status)
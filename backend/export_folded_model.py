@@ -0,0 +1,107 @@
+"""
+export_folded_model.py - Fold feature standardization into the model graph
+
+A static model trained on standardized features computes
+    dense((x - mean) / std) = (W / std[:, None])^T x + (b - (mean / std) @ W)
+so the stats can live in the first Dense layer instead of being applied in
+Python on every request. This writes a copy of the model with the folded
+kernel/bias, checks that it predicts the same as model + stats on random
+inputs, and saves it next to the original (registry 'folded_model_path')
+with a <folded>.source.json recording the hashes of the model and stats it
+was built from; recognize_numbers.py ignores a folded model whose source
+no longer matches.
+
+Usage:
+    python export_folded_model.py numbers
+    python export_folded_model.py numbers --samples 2048 --out /tmp/folded.keras
+"""
+
+import argparse
+import logging
+import sys
+
+import numpy as np
+
+from model_registry import get_entry, load_model, load_stats, resolve_path, write_folded_source
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+TOLERANCE = 1e-4
+
+
+def first_dense(model):
+    """Return the Dense layer that directly consumes the model input"""
+    from tensorflow import keras
+
+    layers = [layer for layer in model.layers if not isinstance(layer, keras.layers.InputLayer)]
+    if not layers or not isinstance(layers[0], keras.layers.Dense):
+        first = type(layers[0]).__name__ if layers else 'nothing'
+        raise ValueError(f"Cannot fold stats: first layer is {first}, expected Dense")
+    return layers[0]
+
+
+def fold_stats(kernel, bias, mean, std):
+    """Fold (x - mean) / std into a Dense kernel (F, U) and bias (U,)"""
+    scale = 1.0 / np.maximum(np.asarray(std, np.float64).reshape(-1), 1e-8)
+    shift = np.asarray(mean, np.float64).reshape(-1) * scale
+    kernel = np.asarray(kernel, np.float64)
+    folded_kernel = kernel * scale[:, None]
+    folded_bias = np.asarray(bias, np.float64) - shift @ kernel
+    return folded_kernel.astype(np.float32), folded_bias.astype(np.float32)
+
+
+def build_folded(model, mean, std):
+    """Clone model and replace the first Dense weights with the folded ones"""
+    from tensorflow import keras
+
+    folded = keras.models.clone_model(model)
+    folded.set_weights(model.get_weights())
+    dense = first_dense(folded)
+    if not dense.use_bias:
+        raise ValueError("Cannot fold stats: first Dense layer has no bias")
+    kernel, bias = dense.get_weights()
+    dense.set_weights(list(fold_stats(kernel, bias, mean, std)))
+    return folded
+
+
+def max_prediction_diff(model, folded, mean, std, samples, seed=0):
+    """Largest |p_model(standardized x) - p_folded(x)| over random raw inputs"""
+    rng = np.random.default_rng(seed)
+    features = int(model.input_shape[-1])
+    x = (rng.normal(size=(samples, features)) * np.reshape(std, -1) + np.reshape(mean, -1)).astype(np.float32)
+    expected = model.predict((x - mean) / np.maximum(std, 1e-8), verbose=0)
+    got = folded.predict(x, verbose=0)
+    return float(np.max(np.abs(expected - got)))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Fold standardization stats into a static model")
+    parser.add_argument('model', help="Registered model name (see model_registry.py)")
+    parser.add_argument('--out', help="Output path (default: the registry folded_model_path)")
+    parser.add_argument('--samples', type=int, default=1024, help="Random inputs used for the parity check")
+    args = parser.parse_args()
+
+    entry = get_entry(args.model)
+    mean, std = load_stats(args.model)
+    if mean is None:
+        logger.error(f"❌ {args.model} has no stats_path in the registry, nothing to fold")
+        sys.exit(1)
+
+    out = resolve_path(args.out or entry.get('folded_model_path') or entry['model_path'].replace('.keras', '_folded.keras'))
+
+    model = load_model(args.model)
+    folded = build_folded(model, mean, std)
+    diff = max_prediction_diff(model, folded, mean, std, args.samples)
+    logger.info(f"📊 Max prediction difference over {args.samples} samples: {diff:.2e}")
+    if diff > TOLERANCE:
+        logger.error(f"❌ Folded model differs by more than {TOLERANCE}, not saving")
+        sys.exit(1)
+
+    folded.save(out)
+    write_folded_source(out, resolve_path(entry['model_path']), resolve_path(entry['stats_path']))
+    logger.info(f"✅ Folded model written to {out}")
+
+
+if __name__ == '__main__':
+    main()
@@ -1,10 +1,23 @@
 import firebase_admin
-from firebase_admin import credentials, auth, firestore
+from firebase_admin import credentials, firestore
 import os
 import logging
 
+from profile_cache import ProfileCache
+from progress_writer import ProgressWriter
+from token_cache import FirebaseVerifier, TokenCache
+
 logger = logging.getLogger(__name__)
 
+_db = None
+_token_cache = None
+
+# Profiles are cached per process (see profile_cache.py); written progress invalidates them
+profile_cache = ProfileCache()
+
+# Progress updates are queued per user and written in batches (see progress_writer.py)
+progress_writer = ProgressWriter(db=lambda: get_db(), on_written=profile_cache.invalidate_many)
+
 # Initialize Firebase Admin SDK
 def initialize_firebase():
     if not firebase_admin._apps:
@@ -17,12 +30,36 @@ def initialize_firebase():
             logger.error(f"❌ Failed to initialize Firebase Admin: {e}")
             raise
     
-    return firestore.client()
+    # Fetch the token signing certificates now, not on the first protected request
+    get_token_cache()
+    return get_db()
+
+# Firestore client, created once and shared by every call
+def get_db():
+    global _db
+    if _db is None:
+        _db = firestore.client()
+    return _db
+
+# Verified tokens are cached until they expire (see token_cache.py)
+def get_token_cache():
+    global _token_cache
+    if _token_cache is None:
+        if not firebase_admin._apps:
+            initialize_firebase()
+        if _token_cache is None:
+            _token_cache = TokenCache(FirebaseVerifier(firebase_admin.get_app().project_id))
+    return _token_cache
+
+# Replace the token verifier, e.g. with token_cache.FakeTokens in tests
+def set_token_verifier(verifier):
+    global _token_cache
+    _token_cache = TokenCache(verifier)
 
 # Verify Firebase ID token from frontend
 def verify_token(id_token):
     try:
-        decoded_token = auth.verify_id_token(id_token)
+        decoded_token = get_token_cache().verify(id_token)
         uid = decoded_token['uid']
         return {'success': True, 'uid': uid, 'user': decoded_token}
     except Exception as e:
@@ -32,12 +69,19 @@ def verify_token(id_token):
 # Get or create user profile in Firestore
 def get_user_profile(uid):
     try:
-        db = firestore.client()
-        user_ref = db.collection('users').document(uid)
+        cached = profile_cache.get(uid)
+        if cached is not None:
+            # Include this process's progress updates that are not written yet
+            return progress_writer.overlay(uid, cached)
+
+        version = profile_cache.version(uid)
+        user_ref = get_db().collection('users').document(uid)
         user_doc = user_ref.get()
         
         if user_doc.exists:
-            return user_doc.to_dict()
+            profile = user_doc.to_dict()
+            profile_cache.put(uid, profile, version)
+            return progress_writer.overlay(uid, profile)
         else:
             # Create default profile for new user
             default_profile = {
@@ -51,45 +95,26 @@ def get_user_profile(uid):
                 'lastActive': firestore.SERVER_TIMESTAMP
             }
             user_ref.set(default_profile)
+            profile_cache.put(uid, default_profile, version)
             logger.info(f"✅ Created new user profile: {uid}")
-            return default_profile
+            return progress_writer.overlay(uid, default_profile)
     except Exception as e:
         logger.error(f"❌ Error getting user profile: {e}")
         return None
 
-# Update user progress
+# Update user progress (queued, written by progress_writer within a flush interval)
 def update_user_progress(uid, data):
     try:
-        db = firestore.client()
-        user_ref = db.collection('users').document(uid)
-        data['lastActive'] = firestore.SERVER_TIMESTAMP
-        user_ref.update(data)
-        logger.info(f"✅ Updated user progress: {uid}")
+        progress_writer.set_fields(uid, data)
         return {'success': True}
     except Exception as e:
         logger.error(f"❌ Error updating progress: {e}")
         return {'success': False, 'error': str(e)}
 
-# Complete a letter
+# Complete a letter (ArrayUnion instead of rewriting the list; totalLessons follows its length)
 def complete_letter(uid, letter):
     try:
-        db = firestore.client()
-        user_ref = db.collection('users').document(uid)
-        user_doc = user_ref.get()
-        
-        if user_doc.exists:
-            data = user_doc.to_dict()
-            completed = data.get('completedLetters', [])
-            
-            if letter not in completed:
-                completed.append(letter)
-                user_ref.update({
-                    'completedLetters': completed,
-                    'totalLessons': len(completed),
-                    'lastActive': firestore.SERVER_TIMESTAMP
-                })
-                logger.info(f"✅ User {uid} completed letter: {letter}")
-        
+        progress_writer.array_union(uid, 'completedLetters', [letter], count_field='totalLessons')
         return {'success': True}
     except Exception as e:
         logger.error(f"❌ Error completing letter: {e}")
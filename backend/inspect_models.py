@@ -0,0 +1,374 @@
+"""
+inspect_models.py - Size, cost and latency report for every shipped model
+
+Discovers every model artifact under the model directories (MODEL_DIRS:
+.keras / .h5 files and SavedModel directories) plus the paths registered in
+model_registry.py, and reports for each one:
+
+    size            bytes on disk (whole directory for a SavedModel)
+    params          trainable / non-trainable parameters, per layer too
+    flops           estimated FLOPs of one item's forward pass, per layer
+                    (a multiply-add counts 2; Dense, Conv, LSTM/GRU/RNN,
+                    Bidirectional, TimeDistributed, attention, norms,
+                    pooling and activations are counted, other layers as 0)
+    activations     bytes of each layer's float32 output per item, and the
+                    peak of one layer's input + output (layer-by-layer
+                    execution, no fusion: an upper bound for TF's planner)
+    latency         measured model(x) CPU time at every --batch-sizes, for
+                    each --threads setting (TensorFlow intra-op threads,
+                    0 = TF default)
+
+TensorFlow fixes its thread pools at start-up, so each thread setting runs
+in its own process. Artifacts that cannot be loaded are reported with the
+error instead of stopping the run.
+
+Results go to --json; the table lists one row per artifact (--layers adds
+the per-layer breakdown). Use it to pick what to quantize, batch or replace.
+
+Usage:
+    python inspect_models.py --json model_costs.json
+    python inspect_models.py --models models/static_isl_model.keras --layers --threads 1,4
+"""
+
+import argparse
+import json
+import logging
+import os
+import subprocess
+import sys
+
+import numpy as np
+
+from model_registry import BASE_DIR, MODELS, resolve_path
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+MODEL_DIRS = ('models', 'models_days', 'model_number', 'model_colour', 'models_words', 'model_words',
+              'models_a-z', 'models_sentence')
+MODEL_EXTENSIONS = ('.keras', '.h5')
+SAVED_MODEL_MARKERS = ('saved_model.pb', 'keras_metadata.pb')
+DEFAULT_BATCH_SIZES = (1, 2, 4, 8, 16, 32, 64)
+DEFAULT_THREADS = (1, 2, 4, 0)
+DEFAULT_SEQ_LEN = 30  # time steps for sequence models without a registered length
+BYTES_PER_VALUE = 4  # float32
+SEED = 1234
+
+
+# ---------------------------------------------------------------------------
+# Discovery
+# ---------------------------------------------------------------------------
+
+def disk_size(path):
+    if os.path.isfile(path):
+        return os.path.getsize(path)
+    return sum(os.path.getsize(os.path.join(root, name)) for root, _, names in os.walk(path) for name in names)
+
+
+def registered_names(path):
+    """Registry entries (name.path_key) that serve this artifact"""
+    names = []
+    for name, entry in MODELS.items():
+        for key in ('model_path', 'folded_model_path'):
+            if key in entry and resolve_path(entry[key]) == path:
+                names.append(name if key == 'model_path' else f'{name}.{key}')
+    return names
+
+
+def discover_artifacts():
+    """Every model artifact on disk or in the registry: [{'artifact', 'path', 'format', ...}]"""
+    paths = set()
+    for directory in MODEL_DIRS:
+        for root, dirs, files in os.walk(os.path.join(BASE_DIR, directory)):
+            if any(marker in files for marker in SAVED_MODEL_MARKERS):
+                paths.add(root)
+                dirs[:] = []
+                continue
+            paths.update(os.path.join(root, f) for f in files if f.endswith(MODEL_EXTENSIONS))
+    for entry in MODELS.values():
+        for key in ('model_path', 'folded_model_path'):
+            if key in entry:
+                paths.add(resolve_path(entry[key]))
+
+    artifacts = []
+    for path in sorted(paths):
+        exists = os.path.exists(path)
+        artifacts.append({
+            'artifact': os.path.relpath(path, BASE_DIR),
+            'path': path,
+            'format': 'saved_model' if os.path.isdir(path) else os.path.splitext(path)[1].lstrip('.'),
+            'registered': registered_names(path),
+            'size_bytes': disk_size(path) if exists else None,
+            'error': None if exists else 'not found',
+        })
+    return artifacts
+
+
+# ---------------------------------------------------------------------------
+# Static analysis (needs TensorFlow)
+# ---------------------------------------------------------------------------
+
+def shape_of(tensor_or_shape):
+    shape = getattr(tensor_or_shape, 'shape', tensor_or_shape)
+    return [None if d is None else int(d) for d in shape]
+
+
+def layer_shapes(layer, attr):
+    """Input or output shapes of a layer as lists (one per tensor), batch dim dropped"""
+    try:
+        value = getattr(layer, attr)
+    except (AttributeError, ValueError):
+        value = getattr(layer, f'{attr}_shape', None)
+    if value is None:
+        return []
+    values = value if isinstance(value, (list, tuple)) and value and not isinstance(value[0], (int, type(None))) \
+        else [value]
+    return [shape_of(v)[1:] for v in values]
+
+
+def elements(shape, seq_len):
+    return int(np.prod([seq_len if d is None else d for d in shape])) if shape else 1
+
+
+def layer_flops(layer, inputs, outputs, seq_len):
+    """Estimated FLOPs for one item (None when the layer type is not modelled)"""
+    kind = type(layer).__name__
+    cfg = layer.get_config()
+    out = outputs[0] if outputs else []
+    x = inputs[0] if inputs else []
+    out_elems = elements(out, seq_len)
+
+    if kind == 'Dense':
+        return 2 * elements(x, seq_len) * cfg['units']
+    if kind.startswith('Conv') and 'kernel_size' in cfg:
+        kernel = int(np.prod(cfg['kernel_size']))
+        channels_in = x[-1] // cfg.get('groups', 1)
+        return 2 * kernel * channels_in * out_elems
+    if kind in ('LSTM', 'GRU', 'SimpleRNN'):
+        gates = {'LSTM': 4, 'GRU': 3, 'SimpleRNN': 1}[kind]
+        steps = x[0] if x[0] is not None else seq_len
+        units = cfg['units']
+        return steps * (gates * 2 * (x[-1] + units) * units + gates * units * 4)
+    if kind == 'Bidirectional':
+        half = layer_flops(layer.forward_layer, inputs, outputs, seq_len)
+        return None if half is None else 2 * half
+    if kind == 'TimeDistributed':
+        inner = layer_flops(layer.layer, [x[1:]], [out[1:]], seq_len)
+        steps = x[0] if x[0] is not None else seq_len
+        return None if inner is None else steps * inner
+    if kind == 'MultiHeadAttention':
+        steps = x[0] if x[0] is not None else seq_len
+        heads, key_dim = cfg['num_heads'], cfg['key_dim']
+        return 2 * layer.count_params() * steps + 4 * steps * steps * heads * key_dim
+    if kind in ('BatchNormalization', 'LayerNormalization'):
+        return (2 if kind == 'BatchNormalization' else 8) * out_elems
+    if kind in ('MaxPooling1D', 'AveragePooling1D', 'MaxPooling2D', 'AveragePooling2D'):
+        return int(np.prod(cfg['pool_size'])) * out_elems
+    if kind.startswith('Global') and 'Pooling' in kind:
+        return elements(x, seq_len)
+    if kind in ('Activation', 'ReLU', 'LeakyReLU', 'Softmax', 'PReLU', 'ELU'):
+        return (5 if kind == 'Softmax' or cfg.get('activation') == 'softmax' else 1) * out_elems
+    if kind in ('Add', 'Multiply', 'Subtract', 'Average', 'Maximum', 'Minimum'):
+        return (len(inputs) - 1) * out_elems
+    if kind in ('InputLayer', 'Dropout', 'SpatialDropout1D', 'GaussianNoise', 'Flatten', 'Reshape', 'Permute',
+                'Concatenate', 'Masking', 'RepeatVector', 'Lambda'):
+        return 0
+    return None
+
+
+def analyze(model, seq_len):
+    """Per-layer params, FLOPs and activation sizes, plus model totals"""
+    layers = []
+    for layer in model.layers:
+        inputs, outputs = layer_shapes(layer, 'input'), layer_shapes(layer, 'output')
+        flops = layer_flops(layer, inputs, outputs, seq_len)
+        # Activation functions fused into Dense/Conv/RNN layers
+        activation = layer.get_config().get('activation')
+        if flops and activation not in (None, 'linear') and type(layer).__name__ != 'Activation':
+            flops += (5 if activation == 'softmax' else 1) * sum(elements(s, seq_len) for s in outputs)
+        in_bytes = sum(elements(s, seq_len) for s in inputs) * BYTES_PER_VALUE
+        out_bytes = sum(elements(s, seq_len) for s in outputs) * BYTES_PER_VALUE
+        trainable = int(sum(np.prod(w.shape) for w in layer.trainable_weights))
+        layers.append({
+            'name': layer.name,
+            'type': type(layer).__name__,
+            'output_shape': outputs[0] if len(outputs) == 1 else outputs,
+            'params': int(layer.count_params()),
+            'trainable_params': trainable,
+            'flops': flops,
+            'output_bytes': out_bytes,
+            'working_bytes': in_bytes + out_bytes,
+        })
+    params = sum(l['params'] for l in layers)
+    trainable = sum(l['trainable_params'] for l in layers)
+    return {
+        'input_shape': shape_of(model.inputs[0])[1:] if getattr(model, 'inputs', None) else None,
+        'params': params,
+        'trainable_params': trainable,
+        'non_trainable_params': params - trainable,
+        'weights_bytes': params * BYTES_PER_VALUE,
+        'flops': sum(l['flops'] or 0 for l in layers),
+        'unmodelled_layers': sorted({l['type'] for l in layers if l['flops'] is None}),
+        'peak_activation_bytes': max((l['working_bytes'] for l in layers), default=0),
+        'layers': layers,
+    }
+
+
+def input_shape(model, artifact):
+    """Per-item input shape: the registered one, else the model's with DEFAULT_SEQ_LEN for open time axes"""
+    for name in artifact['registered']:
+        entry = MODELS[name.split('.')[0]]
+        if entry['kind'] == 'sequence':
+            return (entry['seq_len'], entry['feature_size']), entry['seq_len']
+        return (entry['feature_size'],), DEFAULT_SEQ_LEN
+    shape = tuple(DEFAULT_SEQ_LEN if d is None else d for d in shape_of(model.inputs[0])[1:])
+    return shape, DEFAULT_SEQ_LEN
+
+
+# ---------------------------------------------------------------------------
+# Worker: one TensorFlow thread setting per process
+# ---------------------------------------------------------------------------
+
+def run_worker(args):
+    import tensorflow as tf
+    from tensorflow import keras
+
+    from benchmark_suite import measure
+
+    if args.threads:
+        tf.config.threading.set_intra_op_parallelism_threads(args.threads)
+    rng = np.random.default_rng(SEED)
+    report = {}
+    for artifact in json.loads(args.artifacts):
+        try:
+            model = keras.models.load_model(artifact['path'], compile=False)
+            shape, seq_len = input_shape(model, artifact)
+            result = {'analysis': analyze(model, seq_len)} if args.analyze else {}
+            latency = {}
+            for batch_size in args.batch_sizes:
+                x = rng.normal(size=(batch_size,) + tuple(shape)).astype(np.float32)
+                timing = measure(lambda x=x: model(x, training=False), args.repeats)
+                timing['per_item_us'] = timing['median_us'] / batch_size
+                latency[str(batch_size)] = timing
+            result['latency'] = latency
+        except Exception as e:
+            result = {'error': f'{type(e).__name__}: {e}'}
+        report[artifact['artifact']] = result
+    print(json.dumps(report))
+
+
+def run_isolated(artifacts, threads, args, analyze_models):
+    """Run the worker for one thread setting in a fresh interpreter"""
+    cmd = [sys.executable, os.path.abspath(__file__), '--worker', '--threads', str(threads),
+           '--artifacts', json.dumps(artifacts), '--repeats', str(args.repeats),
+           '--batch-sizes', ','.join(map(str, args.batch_sizes))]
+    if analyze_models:
+        cmd.append('--analyze')
+    proc = subprocess.run(cmd, cwd=BASE_DIR, capture_output=True, text=True)
+    try:
+        return json.loads(proc.stdout.strip().splitlines()[-1]), None
+    except (IndexError, ValueError):
+        return {}, (proc.stderr.strip().splitlines() or ['no output'])[-1]
+
+
+# ---------------------------------------------------------------------------
+# Report
+# ---------------------------------------------------------------------------
+
+def human(n, unit=''):
+    if n is None:
+        return '-'
+    for suffix in ('', 'K', 'M', 'G'):
+        if abs(n) < 1000 or suffix == 'G':
+            return f'{n:.0f}{suffix}{unit}' if suffix == '' else f'{n:.1f}{suffix}{unit}'
+        n /= 1000.0
+
+
+def print_table(artifacts, threads, batch_sizes, show_layers):
+    width = max((len(a['artifact']) for a in artifacts), default=10) + 2
+    latency_cols = [(t, b) for t in threads for b in (batch_sizes[0], batch_sizes[-1])]
+    header = f"{'artifact':<{width}}{'size':>8}{'params':>9}{'flops':>9}{'peak act':>10}"
+    header += ''.join(f"{'t%s b%d' % (t or 'def', b):>13}" for t, b in latency_cols)
+    print('\n' + header)
+    for a in artifacts:
+        analysis = a.get('analysis') or {}
+        row = (f"{a['artifact']:<{width}}{human(a['size_bytes'], 'B'):>8}{human(analysis.get('params')):>9}"
+               f"{human(analysis.get('flops')):>9}{human(analysis.get('peak_activation_bytes'), 'B'):>10}")
+        for t, b in latency_cols:
+            timing = a.get('latency', {}).get(str(t), {}).get(str(b))
+            row += f"{timing['per_item_us']:>10.0f}us/i" if timing else f"{'-':>13}"
+        if a.get('error'):
+            row += f"  ({a['error']})"
+        print(row)
+        if show_layers and analysis:
+            for layer in analysis['layers']:
+                print(f"    {layer['name'][:28]:<30}{layer['type'][:22]:<24}{str(layer['output_shape']):<18}"
+                      f"{human(layer['params']):>9}{human(layer['flops']):>9}{human(layer['output_bytes'], 'B'):>9}")
+    print(f"\nLatency columns: t<intra-op threads> b<batch size>, median per item; full curves in --json")
+
+
+def parse_ints(text):
+    return tuple(int(v) for v in text.split(','))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Size, cost and latency report for every shipped model")
+    parser.add_argument('--models', help="Comma separated artifact paths (relative to backend/) to inspect; default all")
+    parser.add_argument('--batch-sizes', type=parse_ints, default=DEFAULT_BATCH_SIZES)
+    parser.add_argument('--threads', type=parse_ints, default=DEFAULT_THREADS,
+                        help="TensorFlow intra-op thread settings to measure, 0 = TF default")
+    parser.add_argument('--repeats', type=int, default=5)
+    parser.add_argument('--layers', action='store_true', help="Print the per-layer breakdown")
+    parser.add_argument('--json', help="Write the full report to this file")
+    parser.add_argument('--worker', action='store_true', help=argparse.SUPPRESS)
+    parser.add_argument('--artifacts', help=argparse.SUPPRESS)
+    parser.add_argument('--analyze', action='store_true', help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.worker:
+        logging.disable(logging.CRITICAL)
+        args.threads = args.threads[0]
+        run_worker(args)
+        return
+
+    artifacts = discover_artifacts()
+    if args.models:
+        wanted = {os.path.normpath(m) for m in args.models.split(',')}
+        artifacts = [a for a in artifacts if a['artifact'] in wanted]
+        if not artifacts:
+            parser.error(f"No artifacts match {args.models}")
+    loadable = [{k: a[k] for k in ('artifact', 'path', 'registered')} for a in artifacts if not a['error']]
+    logger.info(f"🔎 {len(artifacts)} artifacts, {len(loadable)} on disk")
+
+    by_name = {a['artifact']: a for a in artifacts}
+    for i, threads in enumerate(args.threads):
+        logger.info(f"⏱️ Intra-op threads: {threads or 'TF default'}")
+        report, error = run_isolated(loadable, threads, args, analyze_models=(i == 0))
+        if error:
+            logger.error(f"❌ Worker failed: {error}")
+            for a in loadable:
+                by_name[a['artifact']]['error'] = by_name[a['artifact']]['error'] or error
+            break
+        for name, result in report.items():
+            a = by_name[name]
+            if 'error' in result:
+                a['error'] = result['error']
+                continue
+            if 'analysis' in result:
+                a['analysis'] = result['analysis']
+            a.setdefault('latency', {})[str(threads)] = result['latency']
+
+    print_table(artifacts, args.threads, args.batch_sizes, args.layers)
+    if args.json:
+        from benchmark_suite import environment
+
+        for a in artifacts:
+            a.pop('path')
+        with open(args.json, 'w') as f:
+            json.dump({'environment': environment(), 'batch_sizes': args.batch_sizes, 'threads': args.threads,
+                       'artifacts': artifacts}, f, indent=2)
+        logger.info(f"✅ Report written to {args.json}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,417 @@
+"""
+load_test.py - Socket.IO load generator for the recognizers (localhost only)
+
+Spawns N simulated learners, each an asyncio Socket.IO client that streams
+'predict' events at --fps with the payload shape of its category (63/126
+landmarks for static models, 30/60 x 1629 sequences for motion models) and
+waits for the result events. Inputs are synthetic (seeded, per learner) or
+taken round-robin from a capture directory (see capture_log.py).
+
+Reported:
+    latency_ms          round trip per event: p50/p95/p99/max
+    errors              replies with success false
+    dropped             events without a reply within --timeout
+    throttled           frames not sent because the learner already had
+                        --max-in-flight events waiting (the server is
+                        behind; a real client would skip these frames too)
+    server              CPU % and RSS over time, read from /proc/<pid>
+                        (--pid, or the server started with --spawn)
+    timeline            per-second sent/replies/p95/cpu/rss
+
+Learners are spread over --processes client processes: encoding a motion
+payload (30 x 1629 floats as JSON) takes tens of milliseconds, so a single
+client process would become the bottleneck long before the server does.
+Requires the asyncio client of python-socketio (pip install aiohttp).
+
+Usage:
+    python load_test.py --model colours --spawn --learners 50 --fps 10 --duration 60
+    python load_test.py --model days --learners 500 --ramp 20 --pid 12345 --json days_load.json
+    python load_test.py --model colours --capture captures/colours --learners 20
+"""
+
+import argparse
+import asyncio
+import json
+import logging
+import multiprocessing as mp
+import os
+import subprocess
+import sys
+import threading
+import time
+from urllib.parse import urlparse
+from urllib.request import urlopen
+
+import numpy as np
+
+from benchmark_suite import hand_frames, holistic_sequence
+from capture_log import RESULT_EVENTS, CaptureReader, result_fields
+from model_registry import BASE_DIR, get_entry
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+LOCAL_HOSTS = ('localhost', '127.0.0.1', '::1')
+SPAWN_TIMEOUT = 180.0  # model loading can take a while
+SAMPLE_INTERVAL = 1.0
+SYNTHETIC_FRAMES = 16  # distinct payloads cycled by each synthetic learner
+
+
+# ---------------------------------------------------------------------------
+# Payloads
+# ---------------------------------------------------------------------------
+
+def synthetic_payloads(entry, features, learner, target=''):
+    """Seeded payloads for one learner, in the category's inbound format"""
+    rng = np.random.default_rng(learner)
+    if entry['kind'] == 'sequence':
+        return [{'sequence': holistic_sequence(rng, entry['seq_len']).tolist(), 'target': target}
+                for _ in range(SYNTHETIC_FRAMES)]
+    return [{'landmarks': frame.tolist(), 'target': target} for frame in hand_frames(rng, SYNTHETIC_FRAMES, features)]
+
+
+def capture_payloads(path, limit=None):
+    reader = CaptureReader(path)
+    if not len(reader):
+        raise ValueError(f"No records in {path}")
+    n = min(len(reader), limit) if limit else len(reader)
+    return [reader.payload(i) for i in range(n)], reader.index['event'][0].decode()
+
+
+# ---------------------------------------------------------------------------
+# Server process stats (Linux /proc, no extra dependency)
+# ---------------------------------------------------------------------------
+
+class ProcSampler:
+    """CPU % and RSS of one process from /proc/<pid>"""
+
+    def __init__(self, pid):
+        self.pid = pid
+        self.ticks = os.sysconf('SC_CLK_TCK')
+        self.last = None
+
+    def cpu_seconds(self):
+        with open(f'/proc/{self.pid}/stat') as f:
+            fields = f.read().rsplit(')', 1)[1].split()
+        return (int(fields[11]) + int(fields[12])) / self.ticks  # utime + stime
+
+    def rss_mb(self):
+        with open(f'/proc/{self.pid}/status') as f:
+            for line in f:
+                if line.startswith('VmRSS:'):
+                    return int(line.split()[1]) / 1024.0
+        return None
+
+    def sample(self):
+        """(cpu_percent since last sample or None, rss_mb); None if the process is gone"""
+        try:
+            now, cpu = time.monotonic(), self.cpu_seconds()
+            rss = self.rss_mb()
+        except (FileNotFoundError, ProcessLookupError):
+            return None
+        percent = None
+        if self.last is not None:
+            percent = (cpu - self.last[1]) / max(now - self.last[0], 1e-9) * 100.0
+        self.last = (now, cpu)
+        return percent, rss
+
+
+def spawn_server(entry, port):
+    """Start the category's server on localhost and wait for /health"""
+    env = dict(os.environ, PYTHONUNBUFFERED='1')
+    proc = subprocess.Popen([sys.executable, entry['server']], cwd=BASE_DIR, env=env,
+                            stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    deadline = time.monotonic() + SPAWN_TIMEOUT
+    while time.monotonic() < deadline:
+        if proc.poll() is not None:
+            raise RuntimeError(f"{entry['server']} exited with code {proc.returncode}")
+        try:
+            with urlopen(f'http://127.0.0.1:{port}/health', timeout=1.0):
+                return proc
+        except OSError:
+            time.sleep(0.5)
+    proc.terminate()
+    raise RuntimeError(f"{entry['server']} did not answer /health within {SPAWN_TIMEOUT:.0f}s")
+
+
+# ---------------------------------------------------------------------------
+# Learners
+# ---------------------------------------------------------------------------
+
+class Stats:
+    def __init__(self, start):
+        self.start = start
+        self.latencies = []        # (second, latency_s)
+        self.sent = []             # second of each sent event
+        self.errors = 0
+        self.dropped = 0
+        self.throttled = 0
+        self.connect_failures = 0
+        self.connected = 0
+
+    def second(self):
+        return int(time.monotonic() - self.start)
+
+    def merge(self, other):
+        self.latencies.extend(other.latencies)
+        self.sent.extend(other.sent)
+        for name in ('errors', 'dropped', 'throttled', 'connect_failures', 'connected'):
+            setattr(self, name, getattr(self, name) + getattr(other, name))
+
+
+async def learner(index, url, namespace, event, payloads, args, stats, stop_at):
+    import socketio
+
+    client = socketio.AsyncClient(reconnection=False)
+    pending = []  # send times, replies are matched in order
+
+    def result_handler(kind):
+        async def on_result(data=None):
+            if not pending:
+                return  # e.g. a reply that arrived after its event was counted as dropped
+            sent = pending.pop(0)
+            stats.latencies.append((stats.second(), time.monotonic() - sent))
+            if result_fields(kind, data)[2] == 'error':
+                stats.errors += 1
+        return on_result
+
+    for kind in RESULT_EVENTS:
+        client.on(kind, result_handler(kind), namespace=namespace)
+
+    try:
+        await client.connect(url, namespaces=[namespace], wait_timeout=args.timeout)
+    except Exception as e:
+        stats.connect_failures += 1
+        logger.debug(f"learner {index}: connect failed: {e}")
+        return
+    stats.connected += 1
+
+    interval = 1.0 / args.fps
+    next_frame = time.monotonic()
+    frame = index  # stagger captured payloads between learners
+    try:
+        while time.monotonic() < stop_at:
+            now = time.monotonic()
+            while pending and now - pending[0] > args.timeout:
+                pending.pop(0)
+                stats.dropped += 1
+            if len(pending) >= args.max_in_flight:
+                stats.throttled += 1
+            else:
+                pending.append(now)
+                stats.sent.append(stats.second())
+                await client.emit(event, payloads[frame % len(payloads)], namespace=namespace)
+                frame += 1
+            next_frame += interval
+            await asyncio.sleep(max(0.0, next_frame - time.monotonic()))
+
+        # Give outstanding events their timeout to come back
+        deadline = time.monotonic() + args.timeout
+        while pending and time.monotonic() < deadline:
+            await asyncio.sleep(0.05)
+        stats.dropped += len(pending)
+    finally:
+        await client.disconnect()
+
+
+async def start_learner(delay, *learner_args):
+    await asyncio.sleep(delay)
+    await learner(*learner_args)
+
+
+async def run_learners(args, event, indices, start):
+    """All learners of one client process, sharing one event loop"""
+    entry = get_entry(args.model)
+    stats = Stats(start)
+    stop_at = start + args.ramp + args.duration
+    if args.capture:
+        payloads, _ = capture_payloads(args.capture)
+        payload_for = lambda i: payloads
+    else:
+        features = args.features or entry['feature_size']
+        cache = {}
+        payload_for = lambda i: cache.setdefault(i % 64, synthetic_payloads(entry, features, i % 64))
+
+    await asyncio.sleep(max(0.0, start - time.monotonic()))
+    tasks = []
+    for i in indices:
+        # Spread connections over the ramp-up period
+        delay = args.ramp * i / args.learners if args.ramp else 0.0
+        tasks.append(asyncio.create_task(
+            start_learner(delay, i, args.url, args.namespace, event, payload_for(i), args, stats, stop_at)))
+    await asyncio.gather(*tasks)
+    return stats
+
+
+def client_process(job):
+    """Pool entry point: run a share of the learners, return their Stats"""
+    args, event, indices, start = job
+    return asyncio.run(run_learners(args, event, indices, start))
+
+
+def sample_server(sampler, start, stop, samples):
+    """Sample the server once per SAMPLE_INTERVAL until stop is set"""
+    sampler.sample()
+    while not stop.wait(SAMPLE_INTERVAL):
+        sample = sampler.sample()
+        if sample is None:
+            logger.error("❌ Server process exited during the test")
+            return
+        samples.append((int(time.monotonic() - start), *sample))
+
+
+def run(args, event, sampler):
+    """Spread learners over --processes client processes (JSON encoding of
+    motion payloads is CPU bound, one event loop cannot saturate a server)"""
+    processes = args.processes
+    start = time.monotonic() + 1.0 + 0.5 * processes  # let every process start first
+    stats = Stats(start)
+    samples = []
+    stop = threading.Event()
+    sampler_thread = None
+    if sampler:
+        sampler_thread = threading.Thread(target=sample_server, args=(sampler, start, stop, samples), daemon=True)
+        sampler_thread.start()
+
+    jobs = [(args, event, list(range(p, args.learners, processes)), start) for p in range(processes)]
+    try:
+        if processes == 1:
+            stats.merge(client_process(jobs[0]))
+        else:
+            with mp.get_context('spawn').Pool(processes) as pool:
+                for part in pool.imap_unordered(client_process, jobs):
+                    stats.merge(part)
+    finally:
+        stop.set()
+        if sampler_thread:
+            sampler_thread.join()
+    return stats, samples, time.monotonic() - start
+
+
+# ---------------------------------------------------------------------------
+# Report
+# ---------------------------------------------------------------------------
+
+def percentiles(values_ms):
+    if not len(values_ms):
+        return {'p50': None, 'p95': None, 'p99': None, 'max': None}
+    values_ms = np.asarray(values_ms)
+    return {
+        'p50': float(np.percentile(values_ms, 50)),
+        'p95': float(np.percentile(values_ms, 95)),
+        'p99': float(np.percentile(values_ms, 99)),
+        'max': float(values_ms.max()),
+    }
+
+
+def summarize(args, stats, samples, elapsed):
+    reply_seconds = np.array([s for s, _ in stats.latencies], dtype=np.int64)
+    latencies = np.array([lat for _, lat in stats.latencies]) * 1000.0
+    sent_per_second = np.bincount(np.array(stats.sent, dtype=np.int64), minlength=int(elapsed) + 1)
+    sent = len(stats.sent)
+    timeline = []
+    for second in range(int(elapsed) + 1):
+        window = latencies[reply_seconds == second]
+        cpu_rss = [(cpu, rss) for s, cpu, rss in samples if s == second]
+        timeline.append({
+            'second': second,
+            'sent': int(sent_per_second[second]) if second < len(sent_per_second) else 0,
+            'replies': len(window),
+            'p95_ms': float(np.percentile(window, 95)) if len(window) else None,
+            'cpu_percent': cpu_rss[-1][0] if cpu_rss else None,
+            'rss_mb': cpu_rss[-1][1] if cpu_rss else None,
+        })
+    cpu = [c for _, c, _ in samples if c is not None]
+    rss = [r for _, _, r in samples if r is not None]
+    return {
+        'target': args.url,
+        'namespace': args.namespace,
+        'model': args.model,
+        'learners': args.learners,
+        'client_processes': args.processes,
+        'connected': stats.connected,
+        'connect_failures': stats.connect_failures,
+        'fps': args.fps,
+        'duration_s': elapsed,
+        'events_sent': sent,
+        'replies': len(latencies),
+        'events_per_second': len(latencies) / elapsed if elapsed else 0.0,
+        'latency_ms': percentiles(latencies),
+        'error_rate': stats.errors / sent if sent else 0.0,
+        'drop_rate': stats.dropped / sent if sent else 0.0,
+        'throttled_frames': stats.throttled,
+        'server': {
+            'cpu_percent_mean': float(np.mean(cpu)) if cpu else None,
+            'cpu_percent_max': float(np.max(cpu)) if cpu else None,
+            'rss_mb_start': rss[0] if rss else None,
+            'rss_mb_max': float(np.max(rss)) if rss else None,
+        },
+        'timeline': timeline,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Socket.IO load generator for the recognizers (localhost only)")
+    parser.add_argument('--model', required=True, help="Registered model name; sets the payload shape and default port")
+    parser.add_argument('--url', help="Server URL (default http://127.0.0.1:<registry port>)")
+    parser.add_argument('--namespace', default='/')
+    parser.add_argument('--event', default='predict')
+    parser.add_argument('--learners', type=int, default=10)
+    parser.add_argument('--fps', type=float, default=10.0, help="Events per second per learner")
+    parser.add_argument('--duration', type=float, default=30.0, help="Seconds of full load after the ramp")
+    parser.add_argument('--ramp', type=float, default=5.0, help="Seconds over which learners connect")
+    parser.add_argument('--features', type=int, help="Static payload size (63 or 126; default from the registry)")
+    parser.add_argument('--capture', help="Replay payloads from this capture directory instead of synthetic ones")
+    parser.add_argument('--timeout', type=float, default=5.0, help="Seconds before an unanswered event counts as dropped")
+    parser.add_argument('--max-in-flight', type=int, default=1, help="Unanswered events a learner allows before skipping frames")
+    parser.add_argument('--processes', type=int, default=max(1, (os.cpu_count() or 2) // 2),
+                        help="Client processes the learners are spread over")
+    parser.add_argument('--pid', type=int, help="Server process to sample CPU/RSS from")
+    parser.add_argument('--spawn', action='store_true', help="Start the model's server on its registry port for the test")
+    parser.add_argument('--json', help="Write the report to this file")
+    args = parser.parse_args()
+
+    entry = get_entry(args.model)
+    args.url = args.url or f"http://127.0.0.1:{entry['port']}"
+    host = urlparse(args.url).hostname
+    if host not in LOCAL_HOSTS:
+        parser.error(f"Refusing to load-test {host}: only localhost targets are allowed")
+
+    args.processes = max(1, min(args.processes, args.learners))
+    event = args.event
+    if args.capture:
+        payloads, event = capture_payloads(args.capture)
+        logger.info(f"📼 {len(payloads)} captured payloads from {args.capture}")
+
+    server = None
+    try:
+        if args.spawn:
+            logger.info(f"🚀 Starting {entry['server']}")
+            server = spawn_server(entry, urlparse(args.url).port or entry['port'])
+            args.pid = server.pid
+        sampler = ProcSampler(args.pid) if args.pid else None
+
+        logger.info(f"🏋️ {args.learners} learners x {args.fps:g} fps -> {args.url} ({args.model}), "
+                    f"{args.ramp:g}s ramp + {args.duration:g}s, {args.processes} client processes")
+        stats, samples, elapsed = run(args, event, sampler)
+    finally:
+        if server:
+            server.terminate()
+            server.wait(timeout=10)
+
+    report = summarize(args, stats, samples, elapsed)
+    lat = report['latency_ms']
+    print(json.dumps({k: v for k, v in report.items() if k != 'timeline'}, indent=2))
+    if lat['p50'] is not None:
+        logger.info(f"⚡ p50 {lat['p50']:.1f}ms  p95 {lat['p95']:.1f}ms  p99 {lat['p99']:.1f}ms, "
+                    f"{report['events_per_second']:.1f} replies/s, drop {report['drop_rate']:.1%}, "
+                    f"error {report['error_rate']:.1%}")
+
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump(report, f, indent=2)
+        logger.info(f"✅ Report written to {args.json}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,293 @@
+"""
+Prometheus metrics for the recognizers (GET /metrics, text format 0.0.4).
+
+install_metrics() adds /metrics to a server and returns its ServerMetrics.
+A prediction handler calls METRICS.start() first and METRICS.lap(stage)
+after each stage it wants timed; the result emit is timed automatically.
+A request is broken down into
+
+    decode        inbound JSON lists -> numpy arrays
+    preprocess    validation, normalization, padding
+    queue_wait    waiting for a worker thread (only where the forward pass
+                  is handed to a pool, see recognize_general_words.py)
+    forward       model forward pass
+    postprocess   last lap -> result emit (argmax, smoothing, payload)
+    emit          the emit call(s)
+
+and counted by outcome (OUTCOMES), set by METRICS.outcome() or else read
+from the emitted payload. Laps accumulate in a per-request RequestTimer and
+are committed under one short lock hold when the request ends, so
+concurrent handlers never contend on individual counters.
+
+Also exported: /predict_batch sizes, connected Socket.IO sessions, model
+load state (from the StartupTimeline, or a ready() callable for servers
+that load at import), GC
+collections and process CPU, RSS, threads and open file descriptors.
+"""
+
+import gc
+import logging
+import os
+import threading
+import time
+from bisect import bisect_left
+
+from flask import Response, g, has_request_context
+
+from capture_log import RESULT_EVENTS
+from startup import process_start_time
+
+logger = logging.getLogger(__name__)
+
+CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+STAGES = ('decode', 'preprocess', 'queue_wait', 'forward', 'postprocess', 'emit')
+OUTCOMES = ('success', 'invalid', 'cooldown', 'unstable', 'building', 'not_ready', 'error')
+STATUS_OUTCOMES = {'prediction': 'success'}  # event_stream.py statuses that are named differently
+LATENCY_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0)
+BATCH_BUCKETS = (1, 2, 4, 8, 16, 32, 64, 128, 256)
+
+
+class Histogram:
+    """Fixed-bucket histogram (not thread-safe, ServerMetrics holds the lock)"""
+
+    def __init__(self, bounds):
+        self.bounds = bounds
+        self.counts = [0] * (len(bounds) + 1)
+        self.sum = 0.0
+
+    def observe(self, value):
+        self.counts[bisect_left(self.bounds, value)] += 1
+        self.sum += value
+
+    def snapshot(self):
+        return list(self.counts), self.sum
+
+    @staticmethod
+    def lines(name, labels, bounds, snapshot):
+        counts, total = snapshot
+        cumulative = 0
+        for bound, count in zip(bounds, counts):
+            cumulative += count
+            yield f'{name}_bucket{{{labels},le="{bound:g}"}} {cumulative}'
+        cumulative += counts[-1]
+        yield f'{name}_bucket{{{labels},le="+Inf"}} {cumulative}'
+        yield f'{name}_sum{{{labels}}} {total:.6f}'
+        yield f'{name}_count{{{labels}}} {cumulative}'
+
+
+class RequestTimer:
+    """Stage timings of one prediction request"""
+
+    __slots__ = ('start', 'last', 'carved', 'stages', 'marks', 'outcome')
+
+    def __init__(self):
+        self.start = self.last = time.perf_counter()
+        self.carved = 0.0
+        self.stages = {}
+        self.marks = {}  # stage -> (start, end) perf_counter of its latest lap
+        self.outcome = None
+
+    def add(self, stage, seconds):
+        self.stages[stage] = self.stages.get(stage, 0.0) + seconds
+
+    def lap(self, stage):
+        """Charge the time since the previous lap to stage"""
+        now = time.perf_counter()
+        self.add(stage, max(now - self.last - self.carved, 0.0))
+        self.marks[stage] = (self.last, now)
+        self.last = now
+        self.carved = 0.0
+
+    def carve(self, stage, seconds):
+        """Charge part of the current lap to stage (e.g. queue wait inside the forward lap)"""
+        self.add(stage, seconds)
+        self.carved += seconds
+
+
+def classify(payload):
+    """Outcome of a request from its emitted payload"""
+    if payload.get('ready') is False:
+        return 'not_ready'
+    if payload.get('pending') or payload.get('building_consensus'):
+        return 'building'
+    if payload.get('cooldown'):
+        return 'cooldown'
+    if not payload.get('success', True):
+        return 'error'
+    if payload.get('stable') is False:
+        return 'unstable'
+    return 'success'
+
+
+def process_stats():
+    """CPU seconds, RSS bytes, threads and open fds of this process (Linux /proc)"""
+    with open('/proc/self/stat') as f:
+        fields = f.read().rsplit(')', 1)[1].split()
+    ticks = os.sysconf('SC_CLK_TCK')
+    return {
+        'cpu_seconds': (int(fields[11]) + int(fields[12])) / ticks,
+        'rss_bytes': int(fields[21]) * os.sysconf('SC_PAGE_SIZE'),
+        'threads': int(fields[17]),
+        'open_fds': len(os.listdir('/proc/self/fd')),
+    }
+
+
+class ServerMetrics:
+    """Request, stage latency and batch metrics of one recognizer"""
+
+    def __init__(self, server, socketio=None, startup=None, ready=None):
+        self.server = server
+        self.socketio = socketio
+        self.startup = startup
+        self.ready = ready
+        self.started = process_start_time()
+        self.lock = threading.Lock()
+        self.outcomes = dict.fromkeys(OUTCOMES, 0)
+        self.stages = {stage: Histogram(LATENCY_BUCKETS) for stage in STAGES}
+        self.latency = Histogram(LATENCY_BUCKETS)
+        self.batches = Histogram(BATCH_BUCKETS)
+        self.collectors = []  # callables returning extra exposition lines (e.g. tracing.py)
+
+    # Called from handlers (no-ops outside a started request)
+
+    def start(self):
+        g.metrics_timer = RequestTimer()
+        return g.metrics_timer
+
+    def current(self):
+        return g.get('metrics_timer') if has_request_context() else None
+
+    def lap(self, stage):
+        timer = self.current()
+        if timer is not None:
+            timer.lap(stage)
+
+    def carve(self, stage, seconds):
+        timer = self.current()
+        if timer is not None:
+            timer.carve(stage, seconds)
+
+    def outcome(self, name):
+        """Set the request outcome: an OUTCOMES name or an event_stream.py status"""
+        timer = self.current()
+        if timer is not None:
+            timer.outcome = STATUS_OUTCOMES.get(name, name)
+
+    def observe_batch(self, size):
+        with self.lock:
+            self.batches.observe(size)
+
+    def finish(self, timer, outcome):
+        total = time.perf_counter() - timer.start
+        with self.lock:
+            self.outcomes[outcome] = self.outcomes.get(outcome, 0) + 1
+            for stage, seconds in timer.stages.items():
+                self.stages.setdefault(stage, Histogram(LATENCY_BUCKETS)).observe(seconds)
+            self.latency.observe(total)
+
+    # Exposition
+
+    def sessions(self):
+        """Sessions connected to the default namespace"""
+        try:
+            return len(self.socketio.server.manager.rooms.get('/', {}).get(None, {}))
+        except AttributeError:
+            return 0
+
+    def model_state(self):
+        if self.startup is not None:
+            return self.startup.status
+        return 'healthy' if self.ready is None or self.ready() else 'failed'
+
+    def render(self):
+        labels = f'server="{self.server}"'
+        with self.lock:
+            outcomes = dict(self.outcomes)
+            stages = {stage: hist.snapshot() for stage, hist in self.stages.items()}
+            latency = self.latency.snapshot()
+            batches = self.batches.snapshot()
+
+        out = ['# HELP edusign_requests_total Prediction requests by outcome',
+               '# TYPE edusign_requests_total counter']
+        out += [f'edusign_requests_total{{{labels},outcome="{name}"}} {count}' for name, count in outcomes.items()]
+        out += ['# HELP edusign_request_seconds Prediction request latency (handler start to end)',
+                '# TYPE edusign_request_seconds histogram']
+        out += Histogram.lines('edusign_request_seconds', labels, LATENCY_BUCKETS, latency)
+        out += ['# HELP edusign_stage_seconds Prediction latency by stage',
+                '# TYPE edusign_stage_seconds histogram']
+        for stage, snapshot in stages.items():
+            out += Histogram.lines('edusign_stage_seconds', f'{labels},stage="{stage}"', LATENCY_BUCKETS, snapshot)
+        out += ['# HELP edusign_batch_size Items per /predict_batch request',
+                '# TYPE edusign_batch_size histogram']
+        out += Histogram.lines('edusign_batch_size', labels, BATCH_BUCKETS, batches)
+
+        state = self.model_state()
+        out += ['# HELP edusign_connected_sessions Connected Socket.IO sessions',
+                '# TYPE edusign_connected_sessions gauge',
+                f'edusign_connected_sessions{{{labels}}} {self.sessions()}',
+                '# HELP edusign_model_loaded 1 once the model is loaded and warmed up',
+                '# TYPE edusign_model_loaded gauge',
+                f'edusign_model_loaded{{{labels}}} {int(state == "healthy")}',
+                '# HELP edusign_model_state Model load state',
+                '# TYPE edusign_model_state gauge']
+        out += [f'edusign_model_state{{{labels},state="{name}"}} {int(state == name)}'
+                for name in ('starting', 'healthy', 'failed')]
+
+        out += ['# HELP python_gc_collections_total Garbage collections by generation',
+                '# TYPE python_gc_collections_total counter']
+        out += [f'python_gc_collections_total{{generation="{generation}"}} {stats["collections"]}'
+                for generation, stats in enumerate(gc.get_stats())]
+        try:
+            stats = process_stats()
+        except (OSError, ValueError, IndexError):
+            stats = None
+        if stats:
+            out += ['# HELP process_cpu_seconds_total User and system CPU time',
+                    '# TYPE process_cpu_seconds_total counter',
+                    f'process_cpu_seconds_total {stats["cpu_seconds"]:.2f}',
+                    '# HELP process_resident_memory_bytes Resident set size',
+                    '# TYPE process_resident_memory_bytes gauge',
+                    f'process_resident_memory_bytes {stats["rss_bytes"]}',
+                    '# HELP process_threads OS threads',
+                    '# TYPE process_threads gauge',
+                    f'process_threads {stats["threads"]}',
+                    '# HELP process_open_fds Open file descriptors',
+                    '# TYPE process_open_fds gauge',
+                    f'process_open_fds {stats["open_fds"]}']
+        out += ['# HELP process_start_time_seconds Process start (unix time)',
+                '# TYPE process_start_time_seconds gauge',
+                f'process_start_time_seconds {self.started:.3f}']
+        for collect in self.collectors:
+            out += collect()
+        return '\n'.join(out) + '\n'
+
+
+def install_metrics(app, socketio, server, startup=None, ready=None):
+    """Add GET /metrics to this server and time its result emits; returns the ServerMetrics"""
+    metrics = ServerMetrics(server, socketio, startup, ready)
+    emit = socketio.emit
+
+    def timed_emit(event, *args, **kwargs):
+        timer = metrics.current()
+        if timer is None or event not in RESULT_EVENTS:
+            return emit(event, *args, **kwargs)
+        timer.lap('postprocess')
+        try:
+            return emit(event, *args, **kwargs)
+        finally:
+            timer.lap('emit')
+            if timer.outcome is None and args and isinstance(args[0], dict):
+                timer.outcome = classify(args[0])
+
+    @app.teardown_request
+    def finish_request(exc=None):
+        timer = g.pop('metrics_timer', None)
+        if timer is not None:
+            metrics.finish(timer, 'error' if exc else timer.outcome or 'success')
+
+    @app.route('/metrics', methods=['GET'])
+    def metrics_endpoint():
+        return Response(metrics.render(), content_type=CONTENT_TYPE)
+
+    socketio.emit = timed_emit
+    return metrics
@@ -0,0 +1,222 @@
+"""
+Registry of the models served by the recognizers.
+
+Offline tools (reports, evaluation, benchmarks) look models up here by name
+so they load the same artifacts, with the same input shapes and the same
+preprocessing ('preprocess', applied by prepare_batch), as the servers.
+"""
+
+import hashlib
+import json
+import os
+
+import numpy as np
+
+from motion_preprocessing import preprocess_batch_into
+from static_preprocessing import bbox_normalize, best_hand, fit_length, standardize
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+
+# Holistic frame layout: face(1404) + pose(99) + hands(126)
+HOLISTIC_FEATURES = 1629
+
+# Static (single frame) layout: two hands x 21 landmarks x (x, y, z)
+HAND_FEATURES = 126
+
+MODELS = {
+    'colours': {
+        'server': 'recognize_colours.py',
+        'port': 5006,
+        'kind': 'sequence',
+        'preprocess': 'sequence',
+        'model_path': './model_colour/models/isl_words_best_12_words.h5',
+        'labels_path': './model_colour/models/labels.json',
+        'seq_len': 30,
+        'feature_size': HOLISTIC_FEATURES,
+    },
+    'a_z_words': {
+        'server': 'recognize_a_z_words.py',
+        'port': 5009,
+        'kind': 'sequence',
+        'preprocess': 'sequence',
+        'model_path': './models_a-z/isl_words_best_26_words.h5',
+        'labels_path': './models_a-z/labels.json',
+        'seq_len': 30,
+        'feature_size': HOLISTIC_FEATURES,
+    },
+    'gen_1': {
+        'server': 'recognize_gen_1.py',
+        'port': 5007,
+        'kind': 'sequence',
+        'preprocess': 'sequence',
+        'model_path': './models_words/isl_words_best_24_words.h5',
+        'labels_path': './models_words/labels.json',
+        'seq_len': 30,
+        'feature_size': HOLISTIC_FEATURES,
+    },
+    'general_words': {
+        'server': 'recognize_general_words.py',
+        'port': 5007,
+        'kind': 'sequence',
+        'preprocess': 'sequence',
+        'model_path': './models_words/isl_words_best_24_words.h5',
+        'labels_path': './models_words/labels.json',
+        'seq_len': 30,
+        'feature_size': HOLISTIC_FEATURES,
+    },
+    'sentences': {
+        'server': 'recognize_sentences.py',
+        'port': 5010,
+        'kind': 'sequence',
+        'preprocess': 'sequence',
+        'model_path': './models_sentence/isl_sentences_best.h5',
+        'labels_path': './models_sentence/labels_sentences.json',
+        'seq_len': 60,
+        'feature_size': HOLISTIC_FEATURES,
+    },
+    'alphabet': {
+        'server': 'realtime_wrapper.py',
+        'port': 5001,
+        'kind': 'static',
+        'preprocess': 'raw',
+        'model_path': './models/static_isl_model.keras',
+        'labels_path': './models/static_label_encoder.npy',
+        'feature_size': HAND_FEATURES,
+    },
+    'numbers': {
+        'server': 'recognize_numbers.py',
+        'port': 5002,
+        'kind': 'static',
+        'preprocess': 'best_hand_standardize',
+        'model_path': './model_number/static_numbers_model.keras',
+        'labels_path': './model_number/numbers_labels.json',
+        'feature_size': HAND_FEATURES,
+        # Training-time standardization; export_folded_model.py folds it into
+        # the first Dense layer and writes folded_model_path, plus a sidecar
+        # with the hashes of the model and stats it was folded from
+        'stats_path': './model_number/numbers_feature_stats.npz',
+        'folded_model_path': './model_number/static_numbers_model_folded.keras',
+    },
+    'days': {
+        'server': 'recognize_days.py',
+        'port': 5005,
+        'kind': 'static',
+        'preprocess': 'fit_length',
+        'model_path': './models_days/isl_days_final_Friday_Monday_Saturday_Sunday_Thursday_Tuesday_Wednesday.keras',
+        'labels_path': './models_days/days_label_encoder.npy',
+        'feature_size': HAND_FEATURES,
+    },
+    'static_words': {
+        'server': 'recognize_gen_2.py',
+        'port': 5008,
+        'kind': 'static',
+        'preprocess': 'bbox',
+        'model_path': '../../../model_words2/models/static_words_best_16_words.h5',
+        'labels_path': '../../../model_words2/models/static_words_labels.json',
+        'feature_size': HAND_FEATURES,
+    },
+}
+
+
+def get_entry(name):
+    """Look up a registered model by name"""
+    if name not in MODELS:
+        raise KeyError(f"Unknown model '{name}'. Registered: {', '.join(sorted(MODELS))}")
+    return MODELS[name]
+
+
+def resolve_path(path):
+    """Resolve a server-relative artifact path against the backend directory"""
+    return path if os.path.isabs(path) else os.path.normpath(os.path.join(BASE_DIR, path))
+
+
+def load_labels(name):
+    """Load the label list of a registered model"""
+    path = resolve_path(get_entry(name)['labels_path'])
+    if path.endswith('.npy'):
+        labels = np.load(path, allow_pickle=True)
+    else:
+        with open(path, 'r', encoding='utf-8') as f:
+            labels = json.load(f)
+    return [str(label) for label in labels]
+
+
+# name -> (mean, std), read once per process (prepare_batch runs per batch)
+_STATS = {}
+
+
+def load_stats(name):
+    """Load (mean, std) standardization stats of a registered model, or (None, None)"""
+    if name not in _STATS:
+        path = get_entry(name).get('stats_path')
+        if not path:
+            _STATS[name] = None, None
+        else:
+            with np.load(resolve_path(path)) as stats:
+                _STATS[name] = stats['mean'], stats['std']
+    return _STATS[name]
+
+
+def file_sha256(path):
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(1 << 20), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def folded_source_path(folded_path):
+    """Sidecar recording what a folded artifact was built from"""
+    return folded_path + '.source.json'
+
+
+def write_folded_source(folded_path, model_path, stats_path):
+    with open(folded_source_path(folded_path), 'w', encoding='utf-8') as f:
+        json.dump({'model_sha256': file_sha256(model_path), 'stats_sha256': file_sha256(stats_path)}, f, indent=2)
+
+
+def folded_is_stale(folded_path, model_path, stats_path):
+    """Why a folded artifact does not match the current model + stats, or None if it does"""
+    try:
+        with open(folded_source_path(folded_path), 'r', encoding='utf-8') as f:
+            source = json.load(f)
+    except (OSError, ValueError):
+        return 'no source record (re-export it)'
+    if source.get('model_sha256') != file_sha256(model_path):
+        return 'the model changed since it was exported'
+    if source.get('stats_sha256') != file_sha256(stats_path):
+        return 'the stats changed since it was exported'
+    return None
+
+
+def load_model(name, path_key='model_path'):
+    """Load a registered model for inference (no optimizer state)"""
+    from tensorflow import keras
+
+    return keras.models.load_model(resolve_path(get_entry(name)[path_key]), compile=False)
+
+
+def prepare_batch(name, batch, path_key='model_path'):
+    """
+    Apply the serving preprocessing of a registered model to a raw batch:
+    (N, T, F) sequences for motion models, (N, F) landmark vectors for
+    static ones. The folded numbers artifact takes raw features, so its
+    stats are only applied for the original model.
+    """
+    entry = get_entry(name)
+    steps = entry['preprocess']
+    if steps == 'sequence':
+        out = np.empty((len(batch), entry['seq_len'], entry['feature_size']), dtype=np.float32)
+        return preprocess_batch_into(batch, out)
+
+    batch = np.asarray(batch, dtype=np.float32).reshape(len(batch), -1)
+    if steps == 'best_hand_standardize':
+        batch = best_hand(batch, entry['feature_size'])
+        if path_key != 'folded_model_path':
+            batch = standardize(batch, *load_stats(name))
+        return batch
+    if steps == 'fit_length':
+        return fit_length(batch, entry['feature_size'])
+    if steps == 'bbox':
+        return bbox_normalize(batch)
+    return batch
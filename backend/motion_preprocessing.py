@@ -0,0 +1,158 @@
+"""
+Shared preprocessing for the motion (sequence) recognizers.
+
+Mirrors the pad/trim + robust normalization used at training time so that
+every server, and every offline tool, feeds the models the same input.
+
+pad_or_trim/robust_normalize/prepare_sequence are the reference version.
+preprocess_into is the fused version used on the request path: it writes
+the padded/trimmed, centered, scaled and clipped window straight into a
+preallocated model input buffer (see InputBufferPool) without allocating
+intermediate arrays.
+"""
+
+import math
+from contextlib import contextmanager
+
+import numpy as np
+
+
+def pad_or_trim(seq, length):
+    """Pad (repeat last frame) or trim (from center) sequence to target length"""
+    seq = np.asarray(seq, np.float32)
+    t = seq.shape[0]
+
+    if t == length:
+        return seq
+
+    if t < length:
+        pad = np.tile(seq[-1:], (length - t, 1))
+        return np.vstack((seq, pad))
+
+    # Trim from center
+    start = max(0, (t - length) // 2)
+    return seq[start:start + length]
+
+
+def robust_normalize(seq):
+    """Normalize sequence with robust statistics"""
+    seq = np.asarray(seq, np.float32)
+
+    if seq.size == 0:
+        return seq
+
+    T, F = seq.shape
+    if T == 0:
+        return seq
+
+    # Reshape to (T, num_points, 3)
+    P = F // 3
+    pts = seq.reshape((T, P, 3))
+
+    # Center around temporal mean
+    center = np.nanmean(pts, axis=(0, 1))
+    center = np.nan_to_num(center, 0)
+    pts = pts - center
+
+    # Normalize by standard deviation
+    std = np.nanstd(pts)
+    std = max(std, 1e-6)
+    pts /= std
+
+    # Clip outliers
+    np.clip(pts, -5, 5, out=pts)
+
+    return pts.reshape((T, F))
+
+
+def prepare_sequence(seq, length):
+    """Pad/trim + normalize a (T, F) sequence into a (1, length, F) model batch"""
+    return np.expand_dims(robust_normalize(pad_or_trim(seq, length)), 0)
+
+
+def preprocess_into(seq, out):
+    """
+    Fused pad/trim + robust normalization of seq (T, F) into out (seq_len, F).
+
+    out must be a C-contiguous float32 array (e.g. one row of an
+    InputBufferPool buffer). Every step works in place on out; only a few
+    scalars and the (3,) coordinate means are created per call. Returns out.
+    """
+    length, F = out.shape
+    t = seq.shape[0]
+
+    # Pad (repeat last frame) or trim (from center) by copying into place
+    if t >= length:
+        start = (t - length) // 2
+        np.copyto(out, seq[start:start + length])
+    else:
+        np.copyto(out[:t], seq)
+        np.copyto(out[t:], seq[t - 1])
+
+    flat = out.reshape(-1)
+    points = flat.reshape((-1, 3))
+    n = points.shape[0]
+
+    # Coordinate sums as one matrix-vector product (broadcast reductions
+    # would allocate numpy iterator buffers)
+    center = np.dot(_ones(n), points)
+    if math.isnan(center[0] + center[1] + center[2]):
+        # Rare path: missing landmarks as NaN need the nan-aware statistics
+        out[...] = robust_normalize(out)
+        return out
+
+    # Center around temporal mean
+    center /= n
+    for axis in range(3):
+        column = flat[axis::3]
+        np.subtract(column, center[axis], out=column)
+
+    # Normalize by standard deviation (the centered data has zero mean)
+    std = math.sqrt(float(np.dot(flat, flat)) / flat.size)
+    np.multiply(flat, np.float32(1.0 / max(std, 1e-6)), out=flat)
+
+    # Clip outliers
+    np.clip(flat, _CLIP_LOW, _CLIP_HIGH, out=flat)
+    return out
+
+
+def preprocess_batch_into(sequences, out):
+    """Fused preprocessing of N sequences into an (N, seq_len, F) buffer"""
+    for i, seq in enumerate(sequences):
+        preprocess_into(seq, out[i])
+    return out
+
+
+_CLIP_LOW = np.float32(-5)
+_CLIP_HIGH = np.float32(5)
+_ones_cache = {}
+
+
+def _ones(n):
+    """Cached float32 ones vector used to sum the landmark coordinates"""
+    ones = _ones_cache.get(n)
+    if ones is None:
+        ones = _ones_cache[n] = np.ones(n, dtype=np.float32)
+    return ones
+
+
+class InputBufferPool:
+    """
+    Reusable float32 model input buffers of shape (batch, seq_len, F).
+
+    Each concurrent worker (green thread or OS thread) takes its own buffer
+    for the duration of a request, so steady-state traffic reuses the same
+    few buffers instead of allocating new arrays per prediction.
+    """
+
+    def __init__(self, seq_len, features, batch=1):
+        self.shape = (batch, seq_len, features)
+        self._free = []
+
+    @contextmanager
+    def acquire(self):
+        buf = self._free.pop() if self._free else np.empty(self.shape, dtype=np.float32)
+        try:
+            yield buf
+        finally:
+            self._free.append(buf)
@@ -0,0 +1,135 @@
+"""
+Process-local read-through cache of user profile documents.
+
+get_user_profile used to fetch users/{uid} from Firestore on every call,
+and the dashboard and lesson pages ask for the same profile again and
+again. A ProfileCache keeps the last read of each profile for
+EDUSIGN_PROFILE_CACHE_TTL seconds (default TTL), at most
+EDUSIGN_PROFILE_CACHE_SIZE profiles (default MAX_SIZE), evicting the least
+recently used.
+
+Invalidation:
+  - progress written by this process invalidates the user's entry once
+    the write is committed (ProgressWriter on_written); until then
+    get_user_profile overlays the queued updates on the cached document
+  - a read that started before an invalidation is not cached (put checks
+    the version taken before the read), so a slow read cannot store a
+    document older than a write this process already made. Versions are
+    kept for at most max_size uids; past that they are dropped together
+    with a new epoch, and reads in progress then simply are not cached
+  - cross-process: add_listener(fn) calls fn(uid) for every local
+    invalidation, e.g. to publish it on a message bus; the receiving
+    processes call invalidate(uid, propagate=False). Without a bus, other
+    processes see a change after at most the TTL
+
+stats() returns hits, misses, evictions, expirations, invalidations, size
+and hit_ratio.
+"""
+
+import logging
+import os
+import time
+from collections import OrderedDict
+
+from startup import real_threading
+
+logger = logging.getLogger(__name__)
+
+SIZE_ENV = 'EDUSIGN_PROFILE_CACHE_SIZE'
+TTL_ENV = 'EDUSIGN_PROFILE_CACHE_TTL'
+MAX_SIZE = 1024
+TTL = 60.0  # seconds
+
+
+def copy_profile(doc):
+    """Copy deep enough that callers can modify the lists/maps of a returned profile"""
+    return {k: list(v) if isinstance(v, list) else dict(v) if isinstance(v, dict) else v
+            for k, v in doc.items()}
+
+
+class ProfileCache:
+    """Bounded LRU of uid -> profile dict with a TTL"""
+
+    def __init__(self, max_size=None, ttl=None):
+        self.max_size = int(max_size if max_size is not None else os.environ.get(SIZE_ENV, MAX_SIZE))
+        self.ttl = float(ttl if ttl is not None else os.environ.get(TTL_ENV, TTL))
+        self.lock = real_threading().Lock()
+        self.entries = OrderedDict()  # uid -> (expires, doc)
+        self.versions = {}  # uid -> invalidation count, within epoch
+        self.epoch = 0  # bumped whenever versions are dropped
+        self.listeners = []
+        self.counts = {'hits': 0, 'misses': 0, 'evictions': 0, 'expirations': 0, 'invalidations': 0}
+
+    def get(self, uid):
+        """A copy of the cached profile, or None"""
+        with self.lock:
+            entry = self.entries.get(uid)
+            if entry is None:
+                self.counts['misses'] += 1
+                return None
+            expires, doc = entry
+            if time.monotonic() >= expires:
+                del self.entries[uid]
+                self.counts['expirations'] += 1
+                self.counts['misses'] += 1
+                return None
+            self.entries.move_to_end(uid)
+            self.counts['hits'] += 1
+            return copy_profile(doc)
+
+    def version(self, uid):
+        """Take before reading from Firestore; pass to put"""
+        with self.lock:
+            return self.epoch, self.versions.get(uid, 0)
+
+    def put(self, uid, doc, version=None):
+        """Cache a profile read from Firestore, unless it was invalidated since version"""
+        if self.max_size <= 0 or self.ttl <= 0:
+            return
+        with self.lock:
+            if version is not None and version != (self.epoch, self.versions.get(uid, 0)):
+                return
+            self.entries[uid] = (time.monotonic() + self.ttl, copy_profile(doc))
+            self.entries.move_to_end(uid)
+            while len(self.entries) > self.max_size:
+                self.entries.popitem(last=False)
+                self.counts['evictions'] += 1
+
+    def invalidate(self, uid, propagate=True):
+        with self.lock:
+            self.entries.pop(uid, None)
+            self.versions[uid] = self.versions.get(uid, 0) + 1
+            if len(self.versions) > max(self.max_size, 1):
+                self._drop_versions()
+            self.counts['invalidations'] += 1
+            listeners = list(self.listeners) if propagate else []
+        for listener in listeners:
+            try:
+                listener(uid)
+            except Exception as e:
+                logger.warning(f"⚠️ Profile invalidation listener failed for {uid}: {e}")
+
+    def invalidate_many(self, uids):
+        for uid in uids:
+            self.invalidate(uid)
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+            self._drop_versions()
+
+    def _drop_versions(self):
+        # Every version taken so far stops matching, so no read in progress is cached
+        self.versions.clear()
+        self.epoch += 1
+
+    def add_listener(self, listener):
+        """Call listener(uid) on every invalidation made by this process (cross-process hook)"""
+        self.listeners.append(listener)
+
+    def stats(self):
+        with self.lock:
+            stats = dict(self.counts, size=len(self.entries))
+        lookups = stats['hits'] + stats['misses']
+        stats['hit_ratio'] = stats['hits'] / lookups if lookups else 0.0
+        return stats
@@ -0,0 +1,259 @@
+"""
+On-demand profiling of a live recognizer (admin endpoints).
+
+Both endpoints are off unless EDUSIGN_ADMIN_TOKEN is set, and need
+"Authorization: Bearer <token>". Nothing is hooked while no profile is
+running, so the cost with profiling off is zero.
+
+GET /admin/profile?seconds=10&hz=100&greenlets=1
+    Sampling profile. A real OS thread samples the stacks of every thread
+    (sys._current_frames) hz times a second for the given seconds; the
+    running green thread shows up as the main thread's stack. greenlets=1
+    also samples suspended green threads (eventlet servers), tracked via
+    greenlet.settrace while the profile runs, under 'waiting'.
+    Returns collapsed stacks ("frame;frame;... count", one per line) for
+    flamegraph.pl / speedscope. Each stack starts with its attribution:
+
+        handler:<event> | route:<endpoint> | thread:<name>
+        model:<name>    (only while inside TensorFlow/Keras)
+
+GET /admin/profile/requests?fraction=0.05&seconds=30&top=40
+    Deterministic profile (cProfile) of a sampled fraction of 'predict'
+    calls for the given seconds, one call at a time. Returns pstats text
+    sorted by cumulative time. Under eventlet a profiled call that yields
+    (e.g. to tpool) also records what other green threads ran meanwhile.
+"""
+
+import cProfile
+import hmac
+import io
+import logging
+import os
+import pstats
+import random
+import sys
+import time
+import weakref
+from collections import Counter
+from functools import wraps
+
+from flask import Response, jsonify, request
+
+from startup import real_threading
+
+logger = logging.getLogger(__name__)
+
+ADMIN_TOKEN_ENV = 'EDUSIGN_ADMIN_TOKEN'
+MAX_SECONDS = 120.0
+MAX_HZ = 1000
+MODEL_PATH_MARKERS = (f'{os.sep}tensorflow{os.sep}', f'{os.sep}keras{os.sep}')
+PROFILED_EVENT = 'predict'
+
+
+def require_admin(f):
+    """Protect an admin route with the EDUSIGN_ADMIN_TOKEN bearer token (404 when unset)"""
+    @wraps(f)
+    def decorated_function(*args, **kwargs):
+        token = os.environ.get(ADMIN_TOKEN_ENV)
+        if not token:
+            return jsonify({'error': 'Not found'}), 404
+        auth_header = request.headers.get('Authorization', '')
+        if not auth_header.startswith('Bearer ') or not hmac.compare_digest(auth_header[7:], token):
+            return jsonify({'error': 'Invalid admin token'}), 401
+        return f(*args, **kwargs)
+
+    return decorated_function
+
+
+def frame_label(code):
+    return f'{os.path.basename(code.co_filename)}:{code.co_name}'
+
+
+def bounded(name, default, low, high, cast=float):
+    try:
+        return min(max(cast(request.args.get(name, default)), low), high)
+    except ValueError:
+        return default
+
+
+class StackSampler:
+    """Collapsed-stack sampling of all threads (and optionally green threads) of this process"""
+
+    def __init__(self, attributions, model_codes, default_model):
+        self.attributions = attributions  # code -> 'handler:..' / 'route:..'
+        self.model_codes = model_codes  # code -> model name
+        self.default_model = default_model
+        self.stacks = Counter()
+        self.samples = 0
+        self.greenlets = {}
+
+    def collapse(self, frame, root, state=None):
+        labels = []
+        tag = None
+        model = None
+        in_model = False
+        while frame is not None:
+            code = frame.f_code
+            labels.append(frame_label(code))
+            if code in self.attributions:
+                tag = self.attributions[code]
+            if code in self.model_codes:
+                model = self.model_codes[code]
+            if not in_model and code.co_filename and any(m in code.co_filename for m in MODEL_PATH_MARKERS):
+                in_model = True
+            frame = frame.f_back
+        labels.reverse()
+        head = ([state] if state else []) + [tag or root]
+        if in_model or model:
+            head.append(f'model:{model or self.default_model}')
+        return ';'.join(head + labels)
+
+    def sample(self, names, own_ident):
+        for ident, frame in sys._current_frames().items():
+            if ident != own_ident:
+                self.stacks[self.collapse(frame, f'thread:{names.get(ident, ident)}')] += 1
+        for ref in list(self.greenlets.values()):
+            glet = ref()
+            frame = getattr(glet, 'gr_frame', None) if glet is not None else None
+            if frame is not None:
+                self.stacks[self.collapse(frame, 'greenlet', state='waiting')] += 1
+        self.samples += 1
+
+    def run(self, seconds, hz):
+        threading = real_threading()
+        own_ident = threading.get_ident()
+        tick = threading.Event()  # unpatched wait (time.sleep may be eventlet's)
+        interval = 1.0 / hz
+        deadline = time.monotonic() + seconds
+        next_tick = time.monotonic()
+        while time.monotonic() < deadline:
+            names = {t.ident: t.name for t in threading.enumerate()}
+            self.sample(names, own_ident)
+            next_tick += interval
+            delay = next_tick - time.monotonic()
+            if delay > 0:
+                tick.wait(delay)
+            else:
+                next_tick = time.monotonic()
+
+    def track_greenlets(self):
+        """Remember every green thread that runs while profiling; returns an undo function"""
+        import greenlet
+
+        def trace(event, args):
+            if event in ('switch', 'throw'):
+                target = args[1]
+                self.greenlets[id(target)] = weakref.ref(target)
+            if previous is not None:
+                previous(event, args)
+
+        previous = greenlet.settrace(trace)
+        return lambda: greenlet.settrace(previous)
+
+    def collapsed(self):
+        return ''.join(f'{stack} {count}\n' for stack, count in self.stacks.most_common())
+
+
+class RequestProfiler:
+    """cProfile a sampled fraction of predict calls, one at a time"""
+
+    def __init__(self, fraction):
+        self.fraction = fraction
+        self.stats = None
+        self.calls = 0
+        self.busy = False
+
+    def wrap(self, handler):
+        @wraps(handler)
+        def profiled(*args, **kwargs):
+            if self.busy or random.random() >= self.fraction:
+                return handler(*args, **kwargs)
+            self.busy = True
+            profile = cProfile.Profile()
+            try:
+                return profile.runcall(handler, *args, **kwargs)
+            finally:
+                self.busy = False
+                self.calls += 1
+                if self.stats is None:
+                    self.stats = pstats.Stats(profile, stream=io.StringIO())
+                else:
+                    self.stats.add(profile)
+
+        return profiled
+
+    def report(self, top):
+        out = io.StringIO()
+        if self.stats is None:
+            return 'No predict calls were profiled\n'
+        self.stats.stream = out
+        self.stats.sort_stats('cumulative').print_stats(top)
+        return out.getvalue()
+
+
+def install_profiler(app, socketio, server, models=None):
+    """Add the admin profiling endpoints; models maps a name to a function that runs that model"""
+    model_codes = {getattr(fn, '__code__', None): name for name, fn in (models or {}).items()}
+    running = real_threading().Lock()
+
+    def attributions():
+        codes = {}
+        for namespace in getattr(socketio.server, 'handlers', {}).values():
+            for event, handler in namespace.items():
+                codes[getattr(handler, '__wrapped__', handler).__code__] = f'handler:{event}'
+        for endpoint, view in app.view_functions.items():
+            view = getattr(view, '__wrapped__', view)
+            if hasattr(view, '__code__'):
+                codes[view.__code__] = f'route:{endpoint}'
+        return codes
+
+    @app.route('/admin/profile', methods=['GET'])
+    @require_admin
+    def sampling_profile():
+        if not running.acquire(blocking=False):
+            return jsonify({'error': 'A profile is already running'}), 409
+        try:
+            seconds = bounded('seconds', 10.0, 0.1, MAX_SECONDS)
+            hz = bounded('hz', 100, 1, MAX_HZ, int)
+            sampler = StackSampler(attributions(), model_codes, server)
+            untrack = None
+            if request.args.get('greenlets') in ('1', 'true') and 'greenlet' in sys.modules:
+                untrack = sampler.track_greenlets()
+            logger.info(f"🔬 Sampling profile: {seconds:g}s at {hz}Hz")
+            thread = real_threading().Thread(target=sampler.run, args=(seconds, hz), daemon=True, name='profiler')
+            thread.start()
+            try:
+                while thread.is_alive():
+                    time.sleep(0.05)  # green sleep under eventlet, keeps the server serving
+            finally:
+                if untrack:
+                    untrack()
+            return Response(sampler.collapsed(), content_type='text/plain; charset=utf-8',
+                            headers={'X-Profile-Samples': str(sampler.samples), 'X-Profile-Seconds': f'{seconds:g}'})
+        finally:
+            running.release()
+
+    @app.route('/admin/profile/requests', methods=['GET'])
+    @require_admin
+    def request_profile():
+        handlers = getattr(socketio.server, 'handlers', {}).get('/', {})
+        if PROFILED_EVENT not in handlers:
+            return jsonify({'error': f"No '{PROFILED_EVENT}' handler"}), 404
+        if not running.acquire(blocking=False):
+            return jsonify({'error': 'A profile is already running'}), 409
+        original = handlers[PROFILED_EVENT]
+        try:
+            fraction = bounded('fraction', 0.05, 0.0, 1.0)
+            seconds = bounded('seconds', 30.0, 0.1, MAX_SECONDS)
+            top = bounded('top', 40, 1, 500, int)
+            profiler = RequestProfiler(fraction)
+            logger.info(f"🔬 Profiling {fraction:.0%} of {PROFILED_EVENT} calls for {seconds:g}s")
+            handlers[PROFILED_EVENT] = profiler.wrap(original)
+            try:
+                time.sleep(seconds)
+            finally:
+                handlers[PROFILED_EVENT] = original
+            return Response(f'# {profiler.calls} profiled {PROFILED_EVENT} calls in {seconds:g}s\n'
+                            + profiler.report(top), content_type='text/plain; charset=utf-8')
+        finally:
+            running.release()
@@ -0,0 +1,260 @@
+"""
+Write-behind batching of learner progress updates to Firestore.
+
+update_user_progress / complete_letter used to do one or two Firestore
+round trips each on the request path (complete_letter read the document,
+then wrote the whole completedLetters list back). A ProgressWriter queues
+the updates per uid and merges them:
+
+    set_fields(uid, fields)               last write wins per field
+    array_union(uid, field, values)       union, in first-seen order
+    increment(uid, field, amount)         summed
+
+A real OS thread flushes everything queued every FLUSH_INTERVAL seconds
+(and at exit) as WriteBatch commits of up to MAX_BATCH_WRITES documents,
+with set(merge=True), ArrayUnion and Increment, so 30 learners completing
+letters at once cost one commit instead of 60 serial round trips. A union
+with a count_field (completedLetters -> totalLessons) also needs the
+stored list; those documents are read together with one get_all per flush.
+
+Guarantees:
+  - at-least-once: a failed commit puts its updates back in the queue
+    (under anything queued since) and they are retried on the next flush.
+    Fields and unions are idempotent; an increment whose commit failed
+    with an unknown outcome may be applied twice
+  - read-your-writes within the process: overlay(uid, doc) applies
+    everything queued or being written to a document read from Firestore
+    (get_user_profile does this)
+
+on_written(uids) is called after each successful commit, while the uids
+are still in flight and without the writer's lock held (profile_cache.py
+invalidates those profiles).
+
+Set FIRESTORE_EMULATOR_HOST to run against the local Firestore emulator;
+db may be any object with Firestore's collection/batch/get_all API, or a
+function returning one (called on the first flush), instead of the
+default client, and transforms any object with firestore's ArrayUnion,
+Increment and SERVER_TIMESTAMP (tests/fake_firestore.py has both).
+"""
+
+import atexit
+import logging
+import time
+
+from startup import real_threading
+
+logger = logging.getLogger(__name__)
+
+FLUSH_INTERVAL = 0.5
+MAX_BATCH_WRITES = 500  # Firestore's limit per WriteBatch
+FLUSH_TIMEOUT = 10.0  # at exit
+COLLECTION = 'users'
+
+
+class PendingUpdate:
+    """Merged, not yet written changes to one user document"""
+
+    __slots__ = ('fields', 'unions', 'increments', 'counts')
+
+    def __init__(self):
+        self.fields = {}
+        self.unions = {}  # field -> list of values, first-seen order
+        self.increments = {}
+        self.counts = {}  # union field -> field holding its length
+
+    def merge(self, newer):
+        """Fold a newer update into this one"""
+        self.fields.update(newer.fields)
+        for field, values in newer.unions.items():
+            self.add_union(field, values)
+        for field, amount in newer.increments.items():
+            self.increments[field] = self.increments.get(field, 0) + amount
+        self.counts.update(newer.counts)
+
+    def add_union(self, field, values):
+        merged = self.unions.setdefault(field, [])
+        merged.extend(v for v in values if v not in merged)
+
+    def apply(self, doc):
+        """Apply to a document dict (read-your-writes)"""
+        doc.update(self.fields)
+        for field, values in self.unions.items():
+            current = list(doc.get(field) or [])
+            current.extend(v for v in values if v not in current)
+            doc[field] = current
+            if field in self.counts:
+                doc[self.counts[field]] = len(current)
+        for field, amount in self.increments.items():
+            doc[field] = (doc.get(field) or 0) + amount
+        return doc
+
+
+class ProgressWriter:
+    """Per-uid write-behind queue flushed in batched Firestore writes"""
+
+    def __init__(self, db=None, collection=COLLECTION, flush_interval=FLUSH_INTERVAL, on_written=None,
+                 transforms=None):
+        self._db = db
+        self._transforms = transforms
+        self.on_written = on_written
+        self.collection = collection
+        self.flush_interval = flush_interval
+        threading = real_threading()
+        self.lock = threading.Lock()
+        self.flush_lock = threading.Lock()
+        self.wake = threading.Event()
+        self.pending = {}  # uid -> PendingUpdate
+        self.in_flight = {}  # uid -> PendingUpdate being committed
+        self.thread = None
+        self.stats = {'queued': 0, 'flushes': 0, 'documents': 0, 'commits': 0, 'failures': 0}
+
+    @property
+    def db(self):
+        if self._db is None:
+            from firebase_admin import firestore
+            self._db = firestore.client()
+        elif callable(self._db):
+            self._db = self._db()
+        return self._db
+
+    @property
+    def transforms(self):
+        if self._transforms is None:
+            from firebase_admin import firestore
+            self._transforms = firestore
+        return self._transforms
+
+    # Queueing
+
+    def _update(self, uid):
+        update = self.pending.get(uid)
+        if update is None:
+            update = self.pending[uid] = PendingUpdate()
+        return update
+
+    def _queued(self):
+        self.stats['queued'] += 1
+        if self.thread is None:
+            self.start()
+
+    def set_fields(self, uid, fields):
+        with self.lock:
+            self._update(uid).fields.update(fields)
+            self._queued()
+
+    def array_union(self, uid, field, values, count_field=None):
+        """Add values to an array field; count_field also stores the array's new length"""
+        with self.lock:
+            update = self._update(uid)
+            update.add_union(field, values)
+            if count_field:
+                update.counts[field] = count_field
+            self._queued()
+
+    def increment(self, uid, field, amount=1):
+        with self.lock:
+            update = self._update(uid)
+            update.increments[field] = update.increments.get(field, 0) + amount
+            self._queued()
+
+    def overlay(self, uid, doc):
+        """A document read from Firestore with this process's unwritten updates applied"""
+        with self.lock:
+            for source in (self.in_flight, self.pending):
+                if uid in source:
+                    source[uid].apply(doc)
+        return doc
+
+    # Flushing
+
+    def start(self):
+        self.thread = real_threading().Thread(target=self.run, daemon=True, name='progress-writer')
+        self.thread.start()
+        atexit.register(self.close)
+
+    def run(self):
+        while True:
+            self.wake.wait(self.flush_interval)
+            self.wake.clear()
+            self.flush()
+
+    def flush(self):
+        """Write everything queued; returns the number of documents written"""
+        with self.flush_lock:
+            with self.lock:
+                if not self.pending:
+                    return 0
+                self.in_flight, self.pending = self.pending, {}
+            written = 0
+            uids = list(self.in_flight)
+            for start in range(0, len(uids), MAX_BATCH_WRITES):
+                chunk = uids[start:start + MAX_BATCH_WRITES]
+                try:
+                    self.commit(chunk)
+                except Exception as e:
+                    self.stats['failures'] += 1
+                    logger.error(f"❌ Progress flush failed for {len(chunk)} users, will retry: {e}")
+                    self.requeue(chunk)
+                    continue
+                written += len(chunk)
+                self.stats['commits'] += 1
+                # Before leaving in_flight, so a read between the two still
+                # overlays the write instead of caching a profile without it.
+                # Not under the lock: on_written may be slow or queue more updates
+                if self.on_written:
+                    self.on_written(chunk)
+                with self.lock:
+                    for uid in chunk:
+                        del self.in_flight[uid]
+            with self.lock:
+                self.in_flight = {}
+            self.stats['flushes'] += 1
+            self.stats['documents'] += written
+            return written
+
+    def commit(self, uids):
+        firestore = self.transforms
+        collection = self.db.collection(self.collection)
+        refs = {uid: collection.document(uid) for uid in uids}
+        counted = [uid for uid in uids if self.in_flight[uid].counts]
+        stored = {}
+        if counted:
+            # One round trip for every document whose array length is stored
+            for snapshot in self.db.get_all([refs[uid] for uid in counted]):
+                stored[snapshot.id] = (snapshot.to_dict() or {}) if snapshot.exists else {}
+
+        batch = self.db.batch()
+        for uid in uids:
+            update = self.in_flight[uid]
+            data = dict(update.fields)
+            for field, values in update.unions.items():
+                data[field] = firestore.ArrayUnion(values)
+                if field in update.counts:
+                    current = list(stored.get(uid, {}).get(field) or [])
+                    data[update.counts[field]] = len(current + [v for v in values if v not in current])
+            for field, amount in update.increments.items():
+                data[field] = firestore.Increment(amount)
+            data['lastActive'] = firestore.SERVER_TIMESTAMP
+            batch.set(refs[uid], data, merge=True)
+        batch.commit()
+
+    def requeue(self, uids):
+        """Put failed updates back under anything queued since (at-least-once)"""
+        with self.lock:
+            for uid in uids:
+                # Out of in_flight first, overlay must not apply it twice
+                failed = self.in_flight.pop(uid)
+                newer = self.pending.get(uid)
+                if newer is not None:
+                    failed.merge(newer)
+                self.pending[uid] = failed
+
+    def close(self, timeout=FLUSH_TIMEOUT):
+        """Flush at shutdown, retrying until the queue is empty or timeout"""
+        deadline = time.monotonic() + timeout
+        while self.pending and time.monotonic() < deadline:
+            self.flush()
+            if self.pending:
+                time.sleep(min(self.flush_interval, max(deadline - time.monotonic(), 0)))
+        if self.pending:
+            logger.error(f"❌ {len(self.pending)} users' progress not written at shutdown")
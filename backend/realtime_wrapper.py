@@ -8,58 +8,88 @@ import numpy as np
 import logging
 from firebase_admin_config import initialize_firebase
 from collections import deque
+from batch_api import batch_response, batch_results, parse_batch_request, predict_probs, static_batch
+from capture_log import install_capture
+from cpu_config import configure_cpu
+from metrics import install_metrics
+from profiler import install_profiler
+from response_modes import DEFAULT_OPTIONS, configure_client, label_table, prediction_fields, top_k_indices
+from socket_auth import install_socket_auth
+from startup import StartupTimeline, health_payload, import_tensorflow, not_ready_payload, start_background, warm_start
+from structured_logging import SOCKETIO_LOGGING, configure_logging, log_event, sampled
+from tracing import install_tracing
 
-logging.basicConfig(level=logging.INFO)
+# Queued JSON logging with per-event sampling (see structured_logging.py)
+configure_logging('alphabet')
 logger = logging.getLogger(__name__)
 
+# Per-server TensorFlow/oneDNN thread budget and optional CPU pinning (see cpu_config.py)
+configure_cpu('alphabet')
+
+# Per-phase startup timeline and readiness, reported by /health (see startup.py)
+startup = StartupTimeline()
+
 app = Flask(__name__)
 CORS(app, resources={r"/*": {"origins": "*"}})
-socketio = SocketIO(app, cors_allowed_origins="*", async_mode='eventlet', logger=True, engineio_logger=True)
+socketio = SocketIO(app, cors_allowed_origins="*", async_mode='eventlet', logger=SOCKETIO_LOGGING, engineio_logger=SOCKETIO_LOGGING)
+
+# Opt-in traffic capture (set EDUSIGN_CAPTURE_DIR, see capture_log.py)
+install_capture(app, socketio, 'alphabet')
+
+# Prometheus /metrics: outcomes, per-stage latency, sessions (see metrics.py)
+METRICS = install_metrics(app, socketio, 'alphabet', startup)
+
+# End-to-end tracing of frames sent with frame_id/capture_ts (see tracing.py)
+install_tracing(app, socketio, METRICS)
+
+# Admin-only sampling/cProfile endpoints, off unless EDUSIGN_ADMIN_TOKEN is set (see profiler.py)
+install_profiler(app, socketio, 'alphabet')
+
+# Optional Firebase token check at connect, off unless EDUSIGN_SOCKET_AUTH is set (see socket_auth.py)
+install_socket_auth(socketio, 'alphabet')
 
-# Load model with legacy format support
-logger.info("Loading ISL model...")
-try:
-    import tensorflow as tf
-    from tensorflow import keras
+MODEL_PATH = './models/static_isl_model.keras'
+
+# Labels load here; TensorFlow and the model load in the background once the
+# server is listening (see startup.py), /health answers 503 until then
+model = None
+
+label_encoder_classes = np.load('./models/static_label_encoder.npy', allow_pickle=True)
+logger.info(f"✅ Classes ({len(label_encoder_classes)}): {', '.join(map(str, label_encoder_classes))}")
+
+def load_alphabet_model():
+    """Import TensorFlow, load and compile the model (legacy format fallback), pre-warm it, then publish it"""
+    global model
+    logger.info("Loading ISL model...")
+    tf = import_tensorflow(startup)
+    keras = tf.keras
     
-    # Try loading with compile=False to avoid optimizer issues
-    model = keras.models.load_model('./models/static_isl_model.keras', compile=False)
+    with startup.phase('load'):
+        try:
+            # Try loading with compile=False to avoid optimizer issues
+            loaded = keras.models.load_model(MODEL_PATH, compile=False)
+            logger.info("✅ Model loaded successfully")
+        except Exception as e:
+            logger.error(f"❌ Model loading failed: {e}")
+            logger.info("Trying alternative loading method...")
+            try:
+                loaded = keras.models.load_model(MODEL_PATH, compile=False, safe_mode=False)
+                logger.info("✅ Model loaded with safe_mode=False")
+            except Exception as e2:
+                logger.error(f"❌ Alternative loading also failed: {e2}")
+                raise
     
     # Recompile manually
-    model.compile(
-        optimizer='adam',
-        loss='sparse_categorical_crossentropy',
-        metrics=['accuracy']
-    )
-    
-    logger.info("✅ Model loaded successfully")
-except Exception as e:
-    logger.error(f"❌ Model loading failed: {e}")
-    logger.info("Trying alternative loading method...")
-    
-    # Alternative: Load weights only
-    try:
-        from tensorflow.keras.models import model_from_json
-        
-        # Try loading with safe_mode
-        model = keras.models.load_model(
-            './models/static_isl_model.keras', 
-            compile=False,
-            safe_mode=False
-        )
-        model.compile(
+    with startup.phase('compile'):
+        loaded.compile(
             optimizer='adam',
             loss='sparse_categorical_crossentropy',
             metrics=['accuracy']
         )
-        logger.info("✅ Model loaded with safe_mode=False")
-    except Exception as e2:
-        logger.error(f"❌ Alternative loading also failed: {e2}")
-        raise
-
-label_encoder_classes = np.load('./models/static_label_encoder.npy', allow_pickle=True)
-logger.info(f"✅ Feature size: {model.input_shape[1]}")
-logger.info(f"✅ Classes ({len(label_encoder_classes)}): {', '.join(map(str, label_encoder_classes))}")
+    with startup.phase('warmup'):
+        loaded.predict(np.zeros((1, loaded.input_shape[1]), dtype=np.float32), verbose=0)
+    logger.info(f"✅ Feature size: {loaded.input_shape[1]}")
+    model = loaded
 
 # Normalize class names up-front
 def _norm(s):
@@ -68,22 +98,28 @@ def _norm(s):
     return str(s).strip().upper()
 
 label_encoder_classes = np.array([_norm(c) for c in label_encoder_classes])
+LABELS = label_encoder_classes.tolist()
 
 CONFIDENCE_THRESHOLD = 0.7
 SMOOTH_WINDOW = 3
 client_state = {}  # { sid: { 'buffer': deque, 'stableCount': int } }
+client_options = {}  # { sid: { 'response_mode': str, 'top_k': int } }
+
+# Imported by an offline tool (replay, benchmarks): load synchronously
+if __name__ != '__main__' and not warm_start(startup, load_alphabet_model):
+    raise RuntimeError(startup.error)
 
 @app.route('/health', methods=['GET'])
 def health():
-    return jsonify({
-        'status': 'healthy',
-        'model': 'loaded',
-        'classes': len(label_encoder_classes)
-    })
+    body, status = health_payload(startup, model='loaded' if model is not None else None,
+                                  classes=len(label_encoder_classes))
+    return jsonify(body), status
 
 @app.route('/predict', methods=['POST'])
 def predict_rest():
     """REST API endpoint for predictions"""
+    if not startup.ready:
+        return jsonify(not_ready_payload(startup)), 503
     try:
         data = request.get_json()
         landmarks = np.array(data['landmarks']).reshape(1, -1)
@@ -105,32 +141,66 @@ def predict_rest():
         logger.error(f"❌ REST Prediction error: {str(e)}")
         return jsonify({'error': str(e), 'success': False}), 500
 
+@app.route('/predict_batch', methods=['POST'])
+def predict_batch_rest():
+    """Score many landmark vectors in one batched forward pass (see batch_api.py)"""
+    if not startup.ready:
+        return jsonify(not_ready_payload(startup)), 503
+    try:
+        items, top_k, _ = parse_batch_request(request)
+        batch = static_batch(items, model.input_shape[1])
+        METRICS.observe_batch(len(batch))
+        probs = predict_probs(model, batch)
+        logger.info(f"📦 Batch prediction: {len(batch)} items")
+        return jsonify(batch_response(batch_results(probs, LABELS, top_k, valid=np.count_nonzero(batch, axis=1) > 0)))
+    except ValueError as e:
+        return jsonify({'success': False, 'error': str(e)}), 400
+    except Exception as e:
+        logger.error(f"❌ Batch prediction error: {e}")
+        return jsonify({'success': False, 'error': str(e)}), 500
+
 @socketio.on('connect')
 def handle_connect():
     logger.info(f"✅ Client connected: {request.sid}")
     client_state[request.sid] = {'buffer': deque(maxlen=SMOOTH_WINDOW), 'stableCount': 0}
+    configure_client(client_options, request.sid, request.args)
     emit('connection_response', {
         'status': 'connected',
-        'message': 'Successfully connected to ISL prediction server'
+        'message': 'Successfully connected to ISL prediction server',
+        **label_table(LABELS)
     })
 
 @socketio.on('disconnect')
 def handle_disconnect():
     logger.info(f"❌ Client disconnected: {request.sid}")
     client_state.pop(request.sid, None)
+    client_options.pop(request.sid, None)
+
+@socketio.on('configure')
+def handle_configure(data):
+    """Select the prediction payload mode (full/top1/topk/probs_f16) for this client"""
+    emit('configured', configure_client(client_options, request.sid, data))
 
 @socketio.on('predict')
 def handle_predict(data):
+    METRICS.start()
+    if not startup.ready:
+        emit('prediction', not_ready_payload(startup))
+        return
     try:
         landmarks = np.array(data.get('landmarks', []), dtype=np.float32).reshape(1, -1)
+        METRICS.lap('decode')
         expected_size = model.input_shape[1]
         if landmarks.shape[1] != expected_size or np.count_nonzero(landmarks) == 0:
+            METRICS.outcome('invalid')
             emit('prediction', {'success': False, 'error': f'Invalid landmarks: Expected {expected_size}, got {landmarks.shape[1]}'}); return
+        METRICS.lap('preprocess')
 
         preds = model.predict(landmarks, verbose=0)
+        METRICS.lap('forward')
         idx = int(np.argmax(preds[0]))
         confidence = float(preds[0][idx])
-        predicted_letter = _norm(label_encoder_classes[idx])
+        predicted_letter = LABELS[idx]
 
         # Stability
         state = client_state.setdefault(request.sid, {'buffer': deque(maxlen=SMOOTH_WINDOW), 'stableCount': 0})
@@ -152,14 +222,15 @@ def handle_predict(data):
         # - Else: confirm when stable
         confirmed = stable and (target_letter == '' or matches_target)
 
-        # Get top 5 predictions for debugging
-        top5_indices = np.argsort(preds[0])[-5:][::-1]
-        top5_predictions = [(label_encoder_classes[i], float(preds[0][i])) for i in top5_indices]
-        
-        logger.info(f"🎯 {predicted_letter} ({confidence:.2%}) target={target_letter or '-'} "
-                    f"stable={stable} stableCount={state['stableCount']}/{SMOOTH_WINDOW} confirmed={confirmed}")
-        logger.info(f"   📊 Top 5: {', '.join([f'{letter}({prob:.1%})' for letter, prob in top5_predictions])}")
-        logger.info(f"   🖐️ Landmarks non-zero: {np.count_nonzero(landmarks)}/{landmarks.size} ({np.count_nonzero(landmarks)/landmarks.size:.1%})")
+        log_event(logger, 'prediction', "🎯 %s (%.2f%%) target=%s stable=%s stableCount=%d/%d confirmed=%s",
+                  predicted_letter, confidence * 100, target_letter or '-', stable, state['stableCount'],
+                  SMOOTH_WINDOW, confirmed, label=predicted_letter, confidence=confidence, confirmed=confirmed)
+        if sampled('frame'):
+            # Top 5 predictions for debugging
+            top5_predictions = [(LABELS[i], float(preds[0][i])) for i in top_k_indices(preds[0], 5)]
+            nonzero = int(np.count_nonzero(landmarks))
+            logger.info("   📊 Top 5: %s", ', '.join([f'{letter}({prob:.1%})' for letter, prob in top5_predictions]))
+            logger.info("   🖐️ Landmarks non-zero: %d/%d (%.1f%%)", nonzero, landmarks.size, nonzero / landmarks.size * 100)
 
         emit('prediction', {
             'success': True,
@@ -169,10 +240,7 @@ def handle_predict(data):
             'stable': stable,
             'confirmed': confirmed,           # frontend: celebrate + advance on true
             'stableCount': state['stableCount'],
-            'all_predictions': {
-                _norm(label_encoder_classes[i]): float(preds[0][i])
-                for i in range(len(label_encoder_classes))
-            }
+            **prediction_fields(preds[0], LABELS, client_options.get(request.sid, DEFAULT_OPTIONS))
         })
     except Exception as e:
         logger.error(f"❌ Socket Prediction error: {e}")
@@ -182,11 +250,12 @@ if __name__ == '__main__':
     logger.info("\n" + "="*60)
     logger.info("🎓 EduSign ISL Real-time Detection Server")
     logger.info("="*60)
-    logger.info(f"📂 Model: ./models/static_isl_model.keras")
+    logger.info(f"📂 Model: {MODEL_PATH}")
     logger.info(f"📂 Encoder: ./models/static_label_encoder.npy")
-    logger.info(f"🔢 Feature size: {model.input_shape[1]}")
     logger.info(f"🔤 Classes: {len(label_encoder_classes)}")
     logger.info("="*60)
     logger.info("\n🚀 Starting server on http://localhost:5001\n")
     
+    # Load + warm up while the port is already bound
+    start_background(startup, load_alphabet_model)
     socketio.run(app, host='0.0.0.0', port=5001, debug=False, use_reloader=False)
\ No newline at end of file
@@ -8,47 +8,120 @@ import numpy as np
 import json
 import logging
 
-logging.basicConfig(level=logging.INFO)
+from batch_api import batch_response, batch_results, motion_batch, parse_batch_request, predict_probs
+from capture_log import install_capture
+from cpu_config import configure_cpu
+from early_exit import EarlyExitPolicy, assess, early_exit_fields, pending_response
+from gc_tuning import tune_after_load
+from metrics import install_metrics
+from motion_preprocessing import InputBufferPool, preprocess_into
+from profiler import install_profiler
+from socket_auth import install_socket_auth
+from startup import StartupTimeline, health_payload, import_tensorflow, not_ready_payload, start_background, warm_start
+from structured_logging import SOCKETIO_LOGGING, configure_logging, log_event, sampled
+from tracing import install_tracing
+
+# Queued JSON logging with per-event sampling (see structured_logging.py)
+configure_logging('a_z_words')
 logger = logging.getLogger(__name__)
 
+# Per-server TensorFlow/oneDNN thread budget and optional CPU pinning (see cpu_config.py)
+configure_cpu('a_z_words')
+
+# Per-phase startup timeline and readiness, reported by /health (see startup.py)
+startup = StartupTimeline()
+
 app = Flask(__name__)
 CORS(app, resources={r"/*": {"origins": "*"}})
-socketio = SocketIO(app, cors_allowed_origins="*", async_mode='eventlet', logger=True, engineio_logger=True)
+socketio = SocketIO(app, cors_allowed_origins="*", async_mode='eventlet', logger=SOCKETIO_LOGGING, engineio_logger=SOCKETIO_LOGGING)
+
+# Opt-in traffic capture (set EDUSIGN_CAPTURE_DIR, see capture_log.py)
+install_capture(app, socketio, 'a_z_words')
+
+# Prometheus /metrics: outcomes, per-stage latency, sessions (see metrics.py)
+METRICS = install_metrics(app, socketio, 'a_z_words', startup)
+
+# End-to-end tracing of frames sent with frame_id/capture_ts (see tracing.py)
+install_tracing(app, socketio, METRICS)
+
+# Admin-only sampling/cProfile endpoints, off unless EDUSIGN_ADMIN_TOKEN is set (see profiler.py)
+install_profiler(app, socketio, 'a_z_words')
+
+# Optional Firebase token check at connect, off unless EDUSIGN_SOCKET_AUTH is set (see socket_auth.py)
+install_socket_auth(socketio, 'a_z_words')
 
 # Load A-Z words model (26 words)
 MODEL_PATH = './models_a-z/isl_words_best_26_words.h5'
 LABELS_PATH = './models_a-z/labels.json'
+SEQ_LEN = 30
+
+# Early exit: clients sending {'early_exit': True} may stream growing prefixes
+# (10, 15, 20 frames) and get a provisional result once it is confident
+EARLY_EXIT = EarlyExitPolicy(SEQ_LEN, prefixes=(10, 15, 20), min_confidence=0.85, min_margin=0.50)
+
+# Reusable model input buffers, one per concurrent request
+INPUT_BUFFERS = InputBufferPool(SEQ_LEN, 1629)
+
+# Labels load here; TensorFlow and the model load in the background once the
+# server is listening (see startup.py), /health answers 503 until then
+model = None
 
-logger.info("Loading A-Z Words model...")
 try:
-    import tensorflow as tf
-    from tensorflow import keras
-    
-    model = keras.models.load_model(MODEL_PATH, compile=False)
-    model.compile(
-        optimizer='adam',
-        loss='sparse_categorical_crossentropy',
-        metrics=['accuracy']
-    )
-    
     with open(LABELS_PATH, 'r') as f:
         labels = json.load(f)
-    
-    logger.info(f"✅ A-Z Words model loaded: {len(labels)} words")
-    
 except Exception as e:
-    logger.error(f"❌ Model loading failed: {e}")
-    # Don't raise, just log, so server stays alive for debugging
-    model = None
+    logger.error(f"❌ Labels loading failed: {e}")
     labels = []
 
+def load_a_z_words_model():
+    """Import TensorFlow, load and compile the model, pre-warm it, then publish it"""
+    global model
+    logger.info("Loading A-Z Words model...")
+    tf = import_tensorflow(startup)
+    if not labels:
+        raise RuntimeError(f"No labels loaded from {LABELS_PATH}")
+    
+    with startup.phase('load'):
+        loaded = tf.keras.models.load_model(MODEL_PATH, compile=False)
+    with startup.phase('compile'):
+        loaded.compile(
+            optimizer='adam',
+            loss='sparse_categorical_crossentropy',
+            metrics=['accuracy']
+        )
+    with startup.phase('warmup'):
+        loaded.predict(np.zeros((1, SEQ_LEN, 1629), dtype=np.float32), verbose=0)
+    
+    logger.info(f"✅ A-Z Words model loaded: {len(labels)} words")
+    tune_after_load()  # instead of gc.collect() after every prediction (see gc_tuning.py)
+    model = loaded
+
+# Imported by an offline tool (replay, benchmarks): load synchronously
+if __name__ != '__main__' and not warm_start(startup, load_a_z_words_model):
+    raise RuntimeError(startup.error)
+
 @app.route('/health', methods=['GET'])
 def health():
-    return jsonify({
-        'status': 'healthy',
-        'model': 'a_z_words',
-        'words': len(labels)
-    })
+    body, status = health_payload(startup, model='a_z_words', words=len(labels))
+    return jsonify(body), status
+
+@app.route('/predict_batch', methods=['POST'])
+def predict_batch_rest():
+    """Score many recorded sequences in one batched forward pass (see batch_api.py)"""
+    if not startup.ready:
+        return jsonify(not_ready_payload(startup)), 503
+    try:
+        items, top_k, _ = parse_batch_request(request)
+        batch = motion_batch(items, SEQ_LEN, 1629)
+        METRICS.observe_batch(len(batch))
+        probs = predict_probs(model, batch)
+        logger.info(f"📦 Batch prediction: {len(batch)} sequences")
+        return jsonify(batch_response(batch_results(probs, labels, top_k)))
+    except ValueError as e:
+        return jsonify({'success': False, 'error': str(e)}), 400
+    except Exception as e:
+        logger.error(f"❌ Batch prediction error: {e}")
+        return jsonify({'success': False, 'error': str(e)}), 500
 
 @socketio.on('connect')
 def handle_connect():
@@ -65,22 +138,26 @@ def handle_disconnect():
 @socketio.on('predict')
 def handle_predict(data):
     """Socket.IO endpoint for A-Z words predictions - handles 30-frame sequences"""
-    logger.info("=" * 60)
-    logger.info("📥 PREDICT HANDLER CALLED (A-Z WORDS)")
+    METRICS.start()
+    if sampled('frame'):
+        logger.info("=" * 60)
+        logger.info("📥 PREDICT HANDLER CALLED (A-Z WORDS)")
     # logger.info(f"📦 Data keys: {list(data.keys())}")
     
+    if not startup.ready:
+        emit('prediction', not_ready_payload(startup))
+        return
+    
     try:
-        if model is None:
-             emit('prediction', {'success': False, 'error': 'Model not loaded'})
-             return
-
         if 'sequence' not in data:
             logger.error("❌ No 'sequence' key in data!")
+            METRICS.outcome('invalid')
             emit('prediction', {'success': False, 'error': 'No sequence data provided'})
             return
         
         sequence = np.array(data['sequence'], dtype=np.float32)
         target = data.get('target', '')
+        METRICS.lap('decode')
         
         # logger.info(f"📥 Received sequence: shape={sequence.shape}, target={target}")
         
@@ -88,46 +165,30 @@ def handle_predict(data):
         if sequence.ndim != 2:
             error_msg = f"Invalid sequence shape: {sequence.shape}, expected 2D array"
             logger.error(f"❌ {error_msg}")
+            METRICS.outcome('invalid')
             emit('prediction', {'success': False, 'error': error_msg})
             return
         
-        SEQ_LEN = 30
-        
-        # Pad or trim to target length
-        if sequence.shape[0] < SEQ_LEN:
-            pad_frames = SEQ_LEN - sequence.shape[0]
-            padding = np.tile(sequence[-1:], (pad_frames, 1))
-            sequence = np.vstack((sequence, padding))
-        elif sequence.shape[0] > SEQ_LEN:
-            start = max(0, (sequence.shape[0] - SEQ_LEN) // 2)
-            sequence = sequence[start:start + SEQ_LEN]
-        
-        # Robust normalization
-        T, F = sequence.shape
-        P = F // 3
-        pts = sequence.reshape((T, P, 3))
-        
-        center = np.nanmean(pts, axis=(0, 1))
-        center = np.nan_to_num(center, 0)
-        pts -= center
-        
-        std = np.nanstd(pts)
-        std = max(std, 1e-6)
-        pts /= std
-        
-        pts = np.clip(pts, -5, 5)
-        sequence = pts.reshape((T, F))
-        
-        # Predict
-        sequence_batch = np.expand_dims(sequence, 0)
+        frames = sequence.shape[0]
+        early_exit = bool(data.get('early_exit'))
+        if early_exit and frames < EARLY_EXIT.min_frames:
+            emit('prediction', pending_response(EARLY_EXIT, frames))
+            return
         
-        # logger.info("🤖 Running A-Z words model prediction...")
-        pred = model.predict(sequence_batch, verbose=0)
+        # Pad/trim to SEQ_LEN + robust normalization
+        with INPUT_BUFFERS.acquire() as sequence_batch:
+            preprocess_into(sequence, sequence_batch[0])
+            METRICS.lap('preprocess')
+            
+            # logger.info("🤖 Running A-Z words model prediction...")
+            pred = model.predict(sequence_batch, verbose=0)
+            METRICS.lap('forward')
         idx = np.argmax(pred[0])
         confidence = float(pred[0][idx])
         predicted_word = str(labels[idx])
         
-        logger.info(f"🎯 Prediction: {predicted_word} ({confidence:.2%})")
+        log_event(logger, 'prediction', "🎯 Prediction: %s (%.2f%%)", predicted_word, confidence * 100,
+                  label=predicted_word, confidence=confidence)
         
         # Emit prediction
         response = {
@@ -138,14 +199,19 @@ def handle_predict(data):
             'stable': confidence >= 0.60,
             'model_used': 'a-z-words'
         }
+        
+        # Early exit: only report a partial sequence once it is confident
+        if early_exit:
+            margin, exit_ok = assess(EARLY_EXIT, pred[0], frames)
+            if EARLY_EXIT.is_partial(frames) and not exit_ok:
+                emit('prediction', pending_response(EARLY_EXIT, frames, confidence, margin))
+                return
+            response.update(early_exit_fields(EARLY_EXIT, frames, margin, exit_ok, response['stable']))
+        
         # logger.info(f"📤 Emitting response: {response}")
         emit('prediction', response)
         # logger.info("✅ Response emitted successfully")
         
-        # Clear memory after prediction
-        import gc
-        gc.collect()
-        
     except Exception as e:
         logger.error(f"❌ Prediction error: {str(e)}")
         import traceback
@@ -169,4 +235,6 @@ if __name__ == '__main__':
     logger.info("="*60)
     logger.info("\n🚀 Starting server on http://localhost:5009\n")
     
+    # Load + warm up while the port is already bound
+    start_background(startup, load_a_z_words_model)
     socketio.run(app, host='0.0.0.0', port=5009, debug=False, use_reloader=False)
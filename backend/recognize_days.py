@@ -18,12 +18,47 @@ from flask import Flask, jsonify, request
 from flask_cors import CORS
 from flask_socketio import SocketIO, emit
 
-logging.basicConfig(level=logging.INFO)
+from capture_log import install_capture
+from cpu_config import configure_cpu
+from event_stream import EventStream, events_for
+from metrics import install_metrics
+from profiler import install_profiler
+from response_modes import DEFAULT_OPTIONS, configure_client, label_table, prediction_fields
+from batch_api import batch_response, batch_results, parse_batch_request, static_batch
+from socket_auth import install_socket_auth
+from startup import StartupTimeline, health_payload, import_tensorflow, not_ready_payload, start_background, warm_start
+from static_preprocessing import MIN_NONZERO_RATIO, fit_length, has_enough_data, nonzero_ratio
+from structured_logging import SOCKETIO_LOGGING, configure_logging, log_event, sampled
+from tracing import install_tracing
+
+# Queued JSON logging with per-event sampling (see structured_logging.py)
+configure_logging("days")
 logger = logging.getLogger(__name__)
 
+# Per-server TensorFlow/oneDNN thread budget and optional CPU pinning (see cpu_config.py)
+configure_cpu("days")
+
+# Per-phase startup timeline and readiness, reported by /health (see startup.py)
+startup = StartupTimeline()
+
 app = Flask(__name__)
 CORS(app, resources={r"/*": {"origins": "*"}})
-socketio = SocketIO(app, cors_allowed_origins="*", async_mode="eventlet", logger=True, engineio_logger=True)
+socketio = SocketIO(app, cors_allowed_origins="*", async_mode="eventlet", logger=SOCKETIO_LOGGING, engineio_logger=SOCKETIO_LOGGING)
+
+# Opt-in traffic capture (set EDUSIGN_CAPTURE_DIR, see capture_log.py)
+install_capture(app, socketio, "days")
+
+# Prometheus /metrics: outcomes, per-stage latency, sessions (see metrics.py)
+METRICS = install_metrics(app, socketio, "days", startup)
+
+# End-to-end tracing of frames sent with frame_id/capture_ts (see tracing.py)
+install_tracing(app, socketio, METRICS)
+
+# Admin-only sampling/cProfile endpoints, off unless EDUSIGN_ADMIN_TOKEN is set (see profiler.py)
+install_profiler(app, socketio, "days")
+
+# Optional Firebase token check at connect, off unless EDUSIGN_SOCKET_AUTH is set (see socket_auth.py)
+install_socket_auth(socketio, "days")
 
 
 # ---------------------------------------------------------------------------
@@ -157,10 +192,12 @@ def _infer_feature_size(model, infer_fn) -> int:
 	return 126
 
 
-def load_model_and_labels():
-	"""Load model and labels with robust error handling."""
+MODEL_DIR = os.path.join(os.path.dirname(__file__), "models_days")
+
+
+def find_model_path(model_dir: str = MODEL_DIR) -> str:
+	"""Locate the days model (.keras, .h5 or SavedModel directory)."""
 	model_path: Optional[str] = None
-	model_dir = os.path.join(os.path.dirname(__file__), "models_days")
 
 	# Search for any .keras file in models_days directory
 	if os.path.isdir(model_dir):
@@ -188,10 +225,11 @@ def load_model_and_labels():
 			"Expected files like isl_days*.keras or isl_days*.h5"
 		)
 
-	logger.info(f"Loading days model: {model_path}")
-	model, infer_fn = _load_model(model_path)
+	return model_path
 
-	# Load label encoder
+
+def load_labels(model_dir: str = MODEL_DIR) -> np.ndarray:
+	"""Load the label encoder classes, normalized to title case."""
 	label_path = None
 	for candidate in [
 		os.path.join(model_dir, "days_label_encoder.npy"),
@@ -216,18 +254,35 @@ def load_model_and_labels():
 
 	# Normalize labels to title case
 	labels = np.array([_norm(x) for x in labels])
-	
-	# Infer feature size
-	feature_size = _infer_feature_size(model, infer_fn)
-	
+	logger.info(f"✅ Days recognized ({len(labels)}): {', '.join(sorted(labels))}")
+	return labels
+
+
+def load_days_model():
+	"""Import TensorFlow, load the model, infer its feature size (the probe doubles as warm-up), then publish it."""
+	global model, infer_fn, FEATURE_SIZE
+	model_path = find_model_path()
+	import_tensorflow(startup)
+
+	with startup.phase("load"):
+		logger.info(f"Loading days model: {model_path}")
+		loaded, infer = _load_model(model_path)
+
+	with startup.phase("warmup"):
+		feature_size = _infer_feature_size(loaded, infer)
+		_forward(loaded, infer, np.zeros((1, feature_size), dtype=np.float32))
+
 	logger.info(f"✅ Model loaded successfully")
 	logger.info(f"✅ Feature size: {feature_size} ({'two hands' if feature_size == 126 else 'single hand'})")
-	logger.info(f"✅ Days recognized ({len(labels)}): {', '.join(sorted(labels))}")
-	
-	return model, infer_fn, labels, feature_size
+	infer_fn, FEATURE_SIZE = infer, feature_size
+	model = loaded
 
 
-model, infer_fn, label_encoder_classes, FEATURE_SIZE = load_model_and_labels()
+# Labels load here; TensorFlow and the model load in the background once the
+# server is listening (see startup.py), /health answers 503 until then
+model = infer_fn = FEATURE_SIZE = None
+label_encoder_classes = load_labels()
+LABELS = label_encoder_classes.tolist()  # normalized once, reused for every response
 
 
 # ---------------------------------------------------------------------------
@@ -243,13 +298,23 @@ COOLDOWN_FRAMES = 3  # Reduced from 10 to 3 for faster predictions
 # Per-client state for smoothing and stability
 client_state: Dict[str, Dict] = {}
 
+# Per-client response payload mode (see response_modes.py)
+client_options: Dict[str, Dict] = {}
+
+# Per-client change-only event streams (see event_stream.py)
+client_streams: Dict[str, EventStream] = {}
+
+# Imported by an offline tool (replay, benchmarks): load synchronously
+if __name__ != "__main__" and not warm_start(startup, load_days_model):
+	raise RuntimeError(startup.error)
+
 
 def predict_vector(vec: np.ndarray):
 	"""Run prediction on feature vector."""
 	preds = _forward(model, infer_fn, vec)
 	idx = int(np.argmax(preds[0]))
 	confidence = float(preds[0][idx])
-	predicted_day = _norm(label_encoder_classes[idx])
+	predicted_day = LABELS[idx]
 	return predicted_day, confidence, preds[0]
 
 
@@ -291,16 +356,14 @@ def get_smooth_prediction(prediction_history: deque, current_pred: str, current_
 
 @app.route("/health", methods=["GET"])
 def health():
-	return jsonify({
-		"status": "healthy",
-		"model": "days",
-		"classes": len(label_encoder_classes),
-		"feature_size": FEATURE_SIZE,
-	})
+	body, status = health_payload(startup, model="days", classes=len(label_encoder_classes), feature_size=FEATURE_SIZE)
+	return jsonify(body), status
 
 
 @app.route("/predict", methods=["POST"])
 def predict_rest():
+	if not startup.ready:
+		return jsonify(not_ready_payload(startup)), 503
 	try:
 		data = request.get_json(force=True)
 		landmarks = np.array(data.get("landmarks", []), dtype=np.float32).reshape(1, -1)
@@ -314,16 +377,32 @@ def predict_rest():
 			"day": predicted_day,
 			"label": predicted_day,
 			"confidence": confidence,
-			"all_predictions": {
-				_norm(label_encoder_classes[i]): float(preds[i])
-				for i in range(len(label_encoder_classes))
-			}
+			**prediction_fields(preds, LABELS)
 		})
 	except Exception as e:
 		logger.error(f"❌ REST prediction error: {e}")
 		return jsonify({"success": False, "error": str(e)}), 500
 
 
+@app.route("/predict_batch", methods=["POST"])
+def predict_batch_rest():
+	"""Score many landmark vectors in one batched forward pass (see batch_api.py)"""
+	if not startup.ready:
+		return jsonify(not_ready_payload(startup)), 503
+	try:
+		items, top_k, _ = parse_batch_request(request)
+		batch = fit_length(static_batch(items), FEATURE_SIZE)
+		METRICS.observe_batch(len(batch))
+		probs = _forward(model, infer_fn, batch)
+		logger.info(f"📦 Batch prediction: {len(batch)} items")
+		return jsonify(batch_response(batch_results(probs, LABELS, top_k, valid=has_enough_data(batch))))
+	except ValueError as e:
+		return jsonify({"success": False, "error": str(e)}), 400
+	except Exception as e:
+		logger.error(f"❌ Batch prediction error: {e}")
+		return jsonify({"success": False, "error": str(e)}), 500
+
+
 # ---------------------------------------------------------------------------
 # Socket.IO events
 # ---------------------------------------------------------------------------
@@ -339,45 +418,58 @@ def handle_connect():
 		"prediction_cooldown": 0,
 		"last_target": ""
 	}
-	emit("connection_response", {"status": "connected"})
+	configure_client(client_options, request.sid, request.args)
+	emit("connection_response", {"status": "connected", **label_table(LABELS)})
 
 
 @socketio.on("disconnect")
 def handle_disconnect():
 	logger.info(f"❌ Client disconnected: {request.sid}")
 	client_state.pop(request.sid, None)
+	client_options.pop(request.sid, None)
+	client_streams.pop(request.sid, None)
+
+
+@socketio.on("configure")
+def handle_configure(data):
+	"""Select the prediction payload mode (full/top1/topk/probs_f16) for this client."""
+	emit("configured", configure_client(client_options, request.sid, data))
+
+
+def send_prediction(payload: Dict, status: str):
+	"""Emit a prediction, or only its state transitions for clients in 'changes' event mode."""
+	METRICS.outcome(status)
+	options = client_options.get(request.sid, DEFAULT_OPTIONS)
+	for event, body in events_for(client_streams, request.sid, options, payload, status):
+		emit(event, body)
 
 
 @socketio.on("predict")
 def handle_predict(data):
 	"""Handle prediction request - EXACT logic from desktop version."""
+	METRICS.start()
+	if not startup.ready:
+		emit("prediction", not_ready_payload(startup))
+		return
 	try:
 		landmarks = np.array(data.get("landmarks", []), dtype=np.float32)
 		target = data.get("target", "")
 		if target:
 			target = _norm(target)
+		METRICS.lap("decode")
 
 		# Validate landmarks (frontend sends 126 features already normalized)
 		if landmarks.size == 0 or np.count_nonzero(landmarks) == 0:
-			emit("prediction", {"success": False, "error": "No landmarks provided"})
+			send_prediction({"success": False, "error": "No landmarks provided"}, "invalid")
 			return
 
-		# Reshape to (1, FEATURE_SIZE)
-		landmarks_flat = landmarks.flatten()
-		
-		# Handle feature size mismatch (pad or truncate if needed)
-		if landmarks_flat.size < FEATURE_SIZE:
-			padded = np.zeros(FEATURE_SIZE, dtype=np.float32)
-			padded[:landmarks_flat.size] = landmarks_flat
-			landmarks_flat = padded
-		elif landmarks_flat.size > FEATURE_SIZE:
-			landmarks_flat = landmarks_flat[:FEATURE_SIZE]
+		# Reshape to (1, FEATURE_SIZE), padding or truncating on a size mismatch
+		landmarks_batch = fit_length(landmarks.reshape(-1), FEATURE_SIZE)
+		landmarks_flat = landmarks_batch[0]
 		
 		# Check if sufficient non-zero features (same as desktop version: 30%)
-		non_zero_ratio = np.count_nonzero(landmarks_flat) / len(landmarks_flat)
-		
-		if non_zero_ratio < 0.3:
-			emit("prediction", {"success": False, "error": "Insufficient landmark data"})
+		if nonzero_ratio(landmarks_batch)[0] < MIN_NONZERO_RATIO:
+			send_prediction({"success": False, "error": "Insufficient landmark data"}, "invalid")
 			return
 
 		# Initialize state for this client if needed
@@ -402,7 +494,7 @@ def handle_predict(data):
 		# Check cooldown (same as desktop version)
 		if state["prediction_cooldown"] > 0:
 			state["prediction_cooldown"] -= 1
-			emit("prediction", {"success": False, "error": "Cooldown active"})
+			send_prediction({"success": False, "error": "Cooldown active"}, "cooldown")
 			return
 
 		# Check hand stability (EXACT desktop logic)
@@ -410,14 +502,16 @@ def handle_predict(data):
 
 		# Only predict when stable (EXACT desktop logic)
 		if not is_stable:
-			emit("prediction", {"success": False, "error": "Hand not stable"})
+			send_prediction({"success": False, "error": "Hand not stable"}, "unstable")
 			return
 
 		# Run prediction
-		landmarks_input = landmarks_flat.reshape(1, -1).astype(np.float32)
-		predicted_day, raw_confidence, preds = predict_vector(landmarks_input)
+		METRICS.lap("preprocess")
+		predicted_day, raw_confidence, preds = predict_vector(landmarks_batch)
+		METRICS.lap("forward")
 
-		logger.info(f"📊 Raw prediction: {predicted_day} ({raw_confidence:.2%})")
+		if sampled("frame"):
+			logger.info("📊 Raw prediction: %s (%.2f%%)", predicted_day, raw_confidence * 100)
 
 		# Apply smoothing with voting (EXACT desktop logic)
 		smooth_pred, smooth_conf = get_smooth_prediction(
@@ -440,7 +534,7 @@ def handle_predict(data):
 				logger.info(f"✅ DETECTED: {final_day} (confidence: {final_confidence:.0%})")
 		else:
 			# Not enough consistent predictions yet
-			emit("prediction", {"success": False, "error": "Building prediction history"})
+			send_prediction({"success": False, "error": "Building prediction history"}, "building")
 			return
 
 		# Update stability count
@@ -454,13 +548,15 @@ def handle_predict(data):
 		stable = state["stableCount"] >= 2
 		confirmed = stable and (not target or final_day == target)
 
-		logger.info(
-			f"🎯 {final_day} (raw:{raw_confidence:.2%} smooth:{final_confidence:.2%}) "
-			f"stable:{is_stable} stableCount:{state['stableCount']}/{SMOOTH_WINDOW} "
-			f"target:{target or '-'} confirmed:{confirmed}"
+		log_event(
+			logger, "prediction",
+			"🎯 %s (raw:%.2f%% smooth:%.2f%%) stable:%s stableCount:%d/%d target:%s confirmed:%s",
+			final_day, raw_confidence * 100, final_confidence * 100, is_stable, state["stableCount"],
+			SMOOTH_WINDOW, target or "-", confirmed,
+			label=final_day, confidence=final_confidence, confirmed=confirmed
 		)
 
-		emit("prediction", {
+		send_prediction({
 			"success": True,
 			"label": final_day,
 			"day": final_day,
@@ -468,24 +564,22 @@ def handle_predict(data):
 			"stable": stable,
 			"confirmed": confirmed,
 			"stableCount": state["stableCount"],
-			"all_predictions": {
-				_norm(label_encoder_classes[i]): float(preds[i])
-				for i in range(len(label_encoder_classes))
-			}
-		})
+			**prediction_fields(preds, LABELS, client_options.get(request.sid, DEFAULT_OPTIONS))
+		}, "prediction")
 	except Exception as e:
 		logger.error(f"❌ Socket prediction error: {e}", exc_info=True)
-		emit("prediction", {"success": False, "error": str(e)})
+		send_prediction({"success": False, "error": str(e)}, "error")
 
 
 if __name__ == "__main__":
 	logger.info("\n" + "=" * 60)
 	logger.info("🎓 ISL Days Real-time Detection Server")
 	logger.info("=" * 60)
-	logger.info(f"📂 Model: {model}")
-	logger.info(f"🔢 Feature size: {FEATURE_SIZE}")
+	logger.info(f"📂 Model: {find_model_path()}")
 	logger.info(f"🔤 Classes: {', '.join(map(str, label_encoder_classes))}")
 	logger.info("=" * 60)
 	logger.info("\n🚀 Starting server on http://localhost:5005\n")
 
+	# Load + warm up while the port is already bound
+	start_background(startup, load_days_model)
 	socketio.run(app, host="0.0.0.0", port=5005, debug=False, use_reloader=False)
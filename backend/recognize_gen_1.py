@@ -7,30 +7,81 @@ from flask_socketio import SocketIO, emit
 import numpy as np
 import json
 import logging
-import gc
+
+from batch_api import batch_response, batch_results, motion_batch, parse_batch_request, predict_probs
+from capture_log import install_capture
+from cpu_config import configure_cpu
+from early_exit import EarlyExitPolicy, assess, early_exit_fields, pending_response
+from gc_tuning import gc_stats, tune_after_load
+from metrics import install_metrics
+from motion_preprocessing import InputBufferPool, preprocess_into
+from profiler import install_profiler
+from socket_auth import install_socket_auth
+from startup import (StartupTimeline, health_payload, import_tensorflow, not_ready_payload, start_background,
+                     warm_start)
+from structured_logging import SOCKETIO_LOGGING, configure_logging, log_event, sampled
+from tracing import install_tracing
+from xla_cache import XlaCache
 
 # Production mode flag - set to True to reduce logging overhead
 PRODUCTION_MODE = False
 
-logging.basicConfig(level=logging.WARNING if PRODUCTION_MODE else logging.INFO)
+# Queued JSON logging with per-event sampling (see structured_logging.py)
+configure_logging('gen_1', level=logging.WARNING if PRODUCTION_MODE else logging.INFO)
 logger = logging.getLogger(__name__)
 
+# Per-server TensorFlow/oneDNN thread budget and optional CPU pinning (see cpu_config.py)
+configure_cpu('gen_1')
+
+# Per-phase startup timeline and readiness, reported by /health (see startup.py)
+startup = StartupTimeline()
+
 app = Flask(__name__)
 CORS(app, resources={r"/*": {"origins": "*"}})
-socketio = SocketIO(app, cors_allowed_origins="*", async_mode='threading', logger=not PRODUCTION_MODE, engineio_logger=not PRODUCTION_MODE)
+socketio = SocketIO(app, cors_allowed_origins="*", async_mode='threading', logger=SOCKETIO_LOGGING, engineio_logger=SOCKETIO_LOGGING)
+
+# Opt-in traffic capture (set EDUSIGN_CAPTURE_DIR, see capture_log.py)
+install_capture(app, socketio, 'gen_1')
+
+# Prometheus /metrics: outcomes, per-stage latency, sessions (see metrics.py)
+METRICS = install_metrics(app, socketio, 'gen_1', startup)
 
-# Prediction counter for garbage collection
-prediction_count = 0
+# End-to-end tracing of frames sent with frame_id/capture_ts (see tracing.py)
+install_tracing(app, socketio, METRICS)
+
+# Admin-only sampling/cProfile endpoints, off unless EDUSIGN_ADMIN_TOKEN is set (see profiler.py)
+install_profiler(app, socketio, 'gen_1')
+
+# Optional Firebase token check at connect, off unless EDUSIGN_SOCKET_AUTH is set (see socket_auth.py)
+install_socket_auth(socketio, 'gen_1')
 
 # Load motion words model (24 words)
 MODEL_PATH = './models_words/isl_words_best_24_words.h5'
 LABELS_PATH = './models_words/labels.json'
+SEQ_LEN = 30
+
+# Early exit: clients sending {'early_exit': True} may stream growing prefixes
+# (10, 15, 20 frames) and get a provisional result once it is confident
+EARLY_EXIT = EarlyExitPolicy(SEQ_LEN, prefixes=(10, 15, 20), min_confidence=0.85, min_margin=0.50)
+
+# Reusable model input buffers, one per concurrent request
+INPUT_BUFFERS = InputBufferPool(SEQ_LEN, 1629)
+
+# Labels load here; TensorFlow and the model load in the background once the
+# server is listening (see startup.py), /health answers 503 until then
+model = None
+
+with open(LABELS_PATH, 'r') as f:
+    labels = json.load(f)
+
+def load_motion_model():
+    """Import TensorFlow, load and compile the model, pre-warm it, then publish it"""
+    global model
+    logger.info("Loading Motion Words model...")
+    # Reuse XLA executables compiled by earlier starts (see xla_cache.py)
+    xla = XlaCache.configure([MODEL_PATH])
+    tf = import_tensorflow(startup)
 
-logger.info("Loading Motion Words model...")
-try:
-    import tensorflow as tf
-    from tensorflow import keras
-    
     # Configure TensorFlow for optimal performance
     gpus = tf.config.experimental.list_physical_devices('GPU')
     if gpus:
@@ -42,37 +93,57 @@ try:
             logger.error(f"❌ GPU memory growth setting failed: {e}")
 
     tf.config.optimizer.set_jit(True)  # Enable XLA JIT compilation
-    
-    model = keras.models.load_model(MODEL_PATH, compile=False)
-    model.compile(
-        optimizer='adam',
-        loss='sparse_categorical_crossentropy',
-        metrics=['accuracy'],
-        jit_compile=True  # Enable JIT compilation for this model
-    )
-    
-    with open(LABELS_PATH, 'r') as f:
-        labels = json.load(f)
-    
+
+    with startup.phase('load'):
+        loaded = tf.keras.models.load_model(MODEL_PATH, compile=False)
+    with startup.phase('compile'):
+        loaded.compile(
+            optimizer='adam',
+            loss='sparse_categorical_crossentropy',
+            metrics=['accuracy'],
+            jit_compile=True  # Enable JIT compilation for this model
+        )
     logger.info(f"✅ Motion model loaded: {len(labels)} words")
-    
+
     # Pre-warm model with dummy prediction for faster first inference
     logger.info("🔥 Pre-warming model...")
-    dummy_input = np.zeros((1, 30, 1629), dtype=np.float32)
-    _ = model.predict(dummy_input, verbose=0)
+    if xla:
+        xla.begin()
+    with startup.phase('warmup'):
+        loaded.predict(np.zeros((1, SEQ_LEN, 1629), dtype=np.float32), verbose=0)
+    if xla:
+        xla.finish(f'1x{SEQ_LEN}x1629:float32')
+        startup.details['xla_cache'] = xla.to_dict()
     logger.info("✅ Model pre-warmed and ready")
-    
-except Exception as e:
-    logger.error(f"❌ Model loading failed: {e}")
-    raise
+    tune_after_load()  # instead of periodic gc.collect() (see gc_tuning.py)
+    model = loaded
+
+# Imported by an offline tool (replay, benchmarks): load synchronously
+if __name__ != '__main__' and not warm_start(startup, load_motion_model):
+    raise RuntimeError(startup.error)
 
 @app.route('/health', methods=['GET'])
 def health():
-    return jsonify({
-        'status': 'healthy',
-        'model': 'general_words_stage1_motion',
-        'words': len(labels)
-    })
+    body, status = health_payload(startup, model='general_words_stage1_motion', words=len(labels), gc=gc_stats())
+    return jsonify(body), status
+
+@app.route('/predict_batch', methods=['POST'])
+def predict_batch_rest():
+    """Score many recorded sequences in one batched forward pass (see batch_api.py)"""
+    if not startup.ready:
+        return jsonify(not_ready_payload(startup)), 503
+    try:
+        items, top_k, _ = parse_batch_request(request)
+        batch = motion_batch(items, SEQ_LEN, 1629)
+        METRICS.observe_batch(len(batch))
+        probs = predict_probs(model, batch)
+        logger.info(f"📦 Batch prediction: {len(batch)} sequences")
+        return jsonify(batch_response(batch_results(probs, labels, top_k)))
+    except ValueError as e:
+        return jsonify({'success': False, 'error': str(e)}), 400
+    except Exception as e:
+        logger.error(f"❌ Batch prediction error: {e}")
+        return jsonify({'success': False, 'error': str(e)}), 500
 
 @socketio.on('connect')
 def handle_connect():
@@ -89,14 +160,20 @@ def handle_disconnect():
 @socketio.on('predict')
 def handle_predict(data):
     """Socket.IO endpoint for motion words predictions - handles 30-frame sequences"""
-    global prediction_count
-    
-    if not PRODUCTION_MODE:
+    METRICS.start()
+    # Per-frame diagnostics only for a sampled fraction of requests (EDUSIGN_LOG_SAMPLING frame=...)
+    diag = not PRODUCTION_MODE and sampled('frame')
+    if diag:
         logger.info("=" * 60)
         logger.info("📥 PREDICT HANDLER CALLED")
     
+    if not startup.ready:
+        emit('prediction', not_ready_payload(startup))
+        return
+    
     try:
         if 'sequence' not in data:
+            METRICS.outcome('invalid')
             emit('prediction', {
                 'success': False,
                 'error': 'No sequence data provided',
@@ -109,56 +186,39 @@ def handle_predict(data):
         
         sequence = np.array(data['sequence'], dtype=np.float32)
         target = data.get('target', '')
+        METRICS.lap('decode')
         
-        if not PRODUCTION_MODE:
-            logger.info(f"📥 Received sequence: shape={sequence.shape}, target={target}")
+        if diag:
+            logger.info("📥 Received sequence: shape=%s, target=%s", sequence.shape, target)
         
         # Validate sequence shape
         if sequence.ndim != 2:
             error_msg = f"Invalid sequence shape: {sequence.shape}, expected 2D array"
             logger.error(f"❌ {error_msg}")
+            METRICS.outcome('invalid')
             emit('prediction', {'success': False, 'error': error_msg})
             return
         
-        SEQ_LEN = 30
-        
-        # Pad or trim to target length
-        if sequence.shape[0] < SEQ_LEN:
-            pad_frames = SEQ_LEN - sequence.shape[0]
-            padding = np.tile(sequence[-1:], (pad_frames, 1))
-            sequence = np.vstack((sequence, padding))
-        elif sequence.shape[0] > SEQ_LEN:
-            start = max(0, (sequence.shape[0] - SEQ_LEN) // 2)
-            sequence = sequence[start:start + SEQ_LEN]
-        
-        # Robust normalization (optimized with in-place operations)
-        T, F = sequence.shape
-        P = F // 3
-        pts = sequence.reshape((T, P, 3))
-        
-        # Center around temporal mean (in-place)
-        center = np.nanmean(pts, axis=(0, 1))
-        center = np.nan_to_num(center, 0)
-        pts -= center
-        
-        # Normalize by standard deviation (in-place)
-        std = np.nanstd(pts)
-        std = max(std, 1e-6)
-        pts /= std
-        
-        # Clip outliers (in-place)
-        np.clip(pts, -5, 5, out=pts)
-        sequence = pts.reshape((T, F))
+        frames = sequence.shape[0]
+        early_exit = bool(data.get('early_exit'))
+        if early_exit and frames < EARLY_EXIT.min_frames:
+            emit('prediction', pending_response(EARLY_EXIT, frames))
+            return
         
-        # Predict
-        sequence_batch = np.expand_dims(sequence, 0)
-        pred = model.predict(sequence_batch, verbose=0)
+        # Pad/trim to SEQ_LEN + robust normalization
+        with INPUT_BUFFERS.acquire() as sequence_batch:
+            preprocess_into(sequence, sequence_batch[0])
+            METRICS.lap('preprocess')
+            
+            # Predict
+            pred = model.predict(sequence_batch, verbose=0)
+            METRICS.lap('forward')
         idx = np.argmax(pred[0])
         confidence = float(pred[0][idx])
         predicted_word = str(labels[idx])
         
-        if not PRODUCTION_MODE:
-            logger.info(f"🎯 Word Prediction: {predicted_word} ({confidence:.2%})")
+        log_event(logger, 'prediction', "🎯 Word Prediction: %s (%.2f%%)", predicted_word, confidence * 100,
+                  label=predicted_word, confidence=confidence)
         
         # Emit prediction
         response = {
@@ -169,14 +229,16 @@ def handle_predict(data):
             'stable': confidence >= 0.70,
             'model_used': 'motion'
         }
-        emit('prediction', response)
         
-        # Memory management - garbage collect every 5 predictions
-        prediction_count += 1
-        if prediction_count % 5 == 0:
-            gc.collect()
-            if not PRODUCTION_MODE:
-                logger.info(f"🧹 Garbage collection performed (prediction #{prediction_count})")
+        # Early exit: only report a partial sequence once it is confident
+        if early_exit:
+            margin, exit_ok = assess(EARLY_EXIT, pred[0], frames)
+            if EARLY_EXIT.is_partial(frames) and not exit_ok:
+                emit('prediction', pending_response(EARLY_EXIT, frames, confidence, margin))
+                return
+            response.update(early_exit_fields(EARLY_EXIT, frames, margin, exit_ok, response['stable']))
+        
+        emit('prediction', response)
         
     except Exception as e:
         logger.error(f"❌ Prediction error: {str(e)}")
@@ -193,7 +255,7 @@ def handle_predict(data):
             'stable': False
         })
     
-    if not PRODUCTION_MODE:
+    if diag:
         logger.info("=" * 60)
 
 if __name__ == '__main__':
@@ -206,4 +268,6 @@ if __name__ == '__main__':
     logger.info("="*60)
     logger.info("\n🚀 Starting server on http://localhost:5007\n")
     
+    # Load + warm up while the port is already bound
+    start_background(startup, load_motion_model)
     socketio.run(app, host='0.0.0.0', port=5007, debug=False, use_reloader=False)
@@ -10,21 +10,115 @@ import logging
 import os
 from collections import deque, Counter
 
-logging.basicConfig(level=logging.INFO)
+from capture_log import install_capture
+from cpu_config import configure_cpu
+from event_stream import events_for
+from metrics import install_metrics
+from profiler import install_profiler
+from response_modes import DEFAULT_OPTIONS, configure_client, label_table, prediction_fields
+from batch_api import batch_response, batch_results, parse_batch_request, static_batch
+from socket_auth import install_socket_auth
+from startup import StartupTimeline, health_payload, import_tensorflow, not_ready_payload, start_background, warm_start
+from static_preprocessing import bbox_normalize, has_enough_data, nonzero_ratio, MIN_NONZERO_RATIO
+from structured_logging import SOCKETIO_LOGGING, configure_logging
+from tracing import install_tracing
+
+# Queued JSON logging with per-event sampling (see structured_logging.py)
+configure_logging('static_words')
 logger = logging.getLogger(__name__)
 
+# Per-server TensorFlow/oneDNN thread budget and optional CPU pinning (see cpu_config.py)
+configure_cpu('static_words')
+
+# Per-phase startup timeline and readiness, reported by /health (see startup.py)
+startup = StartupTimeline()
+
 app = Flask(__name__)
 CORS(app, resources={r"/*": {"origins": "*"}})
-socketio = SocketIO(app, cors_allowed_origins="*", async_mode='threading', logger=True, engineio_logger=True)
+socketio = SocketIO(app, cors_allowed_origins="*", async_mode='threading', logger=SOCKETIO_LOGGING, engineio_logger=SOCKETIO_LOGGING)
+
+# Opt-in traffic capture (set EDUSIGN_CAPTURE_DIR, see capture_log.py)
+install_capture(app, socketio, 'static_words')
+
+# Prometheus /metrics: outcomes, per-stage latency, sessions (see metrics.py)
+METRICS = install_metrics(app, socketio, 'static_words', startup)
+
+# End-to-end tracing of frames sent with frame_id/capture_ts (see tracing.py)
+install_tracing(app, socketio, METRICS)
+
+# Admin-only sampling/cProfile endpoints, off unless EDUSIGN_ADMIN_TOKEN is set (see profiler.py)
+install_profiler(app, socketio, 'static_words')
+
+# Optional Firebase token check at connect, off unless EDUSIGN_SOCKET_AUTH is set (see socket_auth.py)
+install_socket_auth(socketio, 'static_words')
 
 # Load static words model (16 words)
 MODEL_PATH = '../../../model_words2/models/static_words_best_16_words.h5'
 LABELS_PATH = '../../../model_words2/models/static_words_labels.json'
 
-logger.info("Loading Static Words model...")
-try:
-    import tensorflow as tf
-    from tensorflow import keras
+# Robust model loading
+def load_model_robust(path):
+    """Load model robustly across TF/Keras versions."""
+    try:
+        if path.endswith(('.keras', '.h5')):
+            try:
+                return keras.models.load_model(path, compile=False)
+            except Exception:
+                return tf.keras.models.load_model(path, compile=False)
+        elif os.path.isdir(path):
+            logger.info(f"Loading SavedModel via tf.saved_model.load: {path}")
+            loaded = tf.saved_model.load(path)
+            signatures = getattr(loaded, 'signatures', {})
+            if not signatures:
+                raise RuntimeError("SavedModel has no signatures")
+            return loaded, signatures.get('serving_default', next(iter(signatures.values())))
+        raise ValueError(f"Unsupported model path: {path}")
+    except Exception as e:
+        raise RuntimeError(f"Failed to load model from {path}: {e}")
+
+# Infer feature size
+def infer_feature_size(model_obj, signature=None):
+    """Infer input feature size from model (the probe doubles as warm-up)."""
+    if signature is not None:
+        try:
+            _, input_dict = signature.structured_input_signature
+            spec = next(iter(input_dict.values()))
+            if hasattr(spec, 'shape') and len(spec.shape) == 2 and spec.shape[1] is not None:
+                return int(spec.shape[1])
+        except Exception:
+            pass
+    
+    # Try probing
+    for size in (126, 63):
+        try:
+            dummy = np.zeros((1, size), dtype=np.float32)
+            if signature is not None:
+                _, input_dict = signature.structured_input_signature
+                key = next(iter(input_dict.keys()))
+                signature(**{key: tf.convert_to_tensor(dummy)})
+            else:
+                model_obj.predict(dummy, verbose=0)
+            return size
+        except Exception:
+            continue
+    
+    # Fallback from model.input_shape
+    try:
+        shape = getattr(model_obj, 'input_shape', None)
+        if shape and len(shape) >= 2 and shape[1] is not None:
+            return int(shape[1])
+    except Exception:
+        pass
+    
+    logger.warning("Could not infer feature size, defaulting to 126")
+    return 126
+
+def load_static_words_model():
+    """Import TensorFlow, load and compile the model, infer its feature size, then publish it"""
+    global tf, keras, model, infer_signature, use_signature, feature_size, two_hands
+    logger.info("Loading Static Words model...")
+    tf = import_tensorflow(startup)
+    keras = tf.keras
     
     # Configure TensorFlow for memory growth (essential for running multiple models)
     gpus = tf.config.experimental.list_physical_devices('GPU')
@@ -36,92 +130,50 @@ try:
         except RuntimeError as e:
             logger.error(f"❌ GPU memory growth setting failed: {e}")
     
-    # Robust model loading
-    def load_model_robust(path):
-        """Load model robustly across TF/Keras versions."""
-        try:
-            if path.endswith(('.keras', '.h5')):
-                try:
-                    return keras.models.load_model(path, compile=False)
-                except Exception:
-                    return tf.keras.models.load_model(path, compile=False)
-            elif os.path.isdir(path):
-                logger.info(f"Loading SavedModel via tf.saved_model.load: {path}")
-                loaded = tf.saved_model.load(path)
-                signatures = getattr(loaded, 'signatures', {})
-                if not signatures:
-                    raise RuntimeError("SavedModel has no signatures")
-                return loaded, signatures.get('serving_default', next(iter(signatures.values())))
-            raise ValueError(f"Unsupported model path: {path}")
-        except Exception as e:
-            raise RuntimeError(f"Failed to load model from {path}: {e}")
-    
-    model_result = load_model_robust(MODEL_PATH)
+    with startup.phase('load'):
+        model_result = load_model_robust(MODEL_PATH)
+    signature = None
     if isinstance(model_result, tuple):
-        model, infer_signature = model_result
-        use_signature = True
+        loaded, signature = model_result
     else:
-        model = model_result
-        use_signature = False
-        model.compile(
-            optimizer='adam',
-            loss='sparse_categorical_crossentropy',
-            metrics=['accuracy']
-        )
+        loaded = model_result
+        with startup.phase('compile'):
+            loaded.compile(
+                optimizer='adam',
+                loss='sparse_categorical_crossentropy',
+                metrics=['accuracy']
+            )
     
-    with open(LABELS_PATH, 'r') as f:
-        labels = json.load(f)
-    
-    # Infer feature size
-    def infer_feature_size(model_obj):
-        """Infer input feature size from model."""
-        if use_signature:
-            try:
-                _, input_dict = infer_signature.structured_input_signature
-                spec = next(iter(input_dict.values()))
-                if hasattr(spec, 'shape') and len(spec.shape) == 2 and spec.shape[1] is not None:
-                    return int(spec.shape[1])
-            except Exception:
-                pass
-        
-        # Try probing
-        for size in (126, 63):
-            try:
-                dummy = np.zeros((1, size), dtype=np.float32)
-                if use_signature:
-                    _, input_dict = infer_signature.structured_input_signature
-                    key = next(iter(input_dict.keys()))
-                    infer_signature(**{key: tf.convert_to_tensor(dummy)})
-                else:
-                    model_obj.predict(dummy, verbose=0)
-                return size
-            except Exception:
-                continue
-        
-        # Fallback from model.input_shape
-        try:
-            shape = getattr(model_obj, 'input_shape', None)
-            if shape and len(shape) >= 2 and shape[1] is not None:
-                return int(shape[1])
-        except Exception:
-            pass
-        
-        logger.warning("Could not infer feature size, defaulting to 126")
-        return 126
-    
-    feature_size = infer_feature_size(model)
-    two_hands = (feature_size == 126)
+    with startup.phase('warmup'):
+        size = infer_feature_size(loaded, signature)
     
     logger.info(f"✅ Static model loaded: {len(labels)} words")
-    logger.info(f"✅ Feature size: {feature_size} ({'two hands' if two_hands else 'single hand'})")
+    logger.info(f"✅ Feature size: {size} ({'two hands' if size == 126 else 'single hand'})")
+    infer_signature, use_signature = signature, signature is not None
+    feature_size, two_hands = size, size == 126
+    model = loaded
+
+# Labels load here; TensorFlow and the model load in the background once the
+# server is listening (see startup.py), /health answers 503 until then
+tf = keras = model = infer_signature = feature_size = two_hands = None
+use_signature = False
+
+try:
+    with open(LABELS_PATH, 'r') as f:
+        labels = json.load(f)
     logger.info(f"✅ Words: {', '.join(labels)}")
-    
 except Exception as e:
-    logger.error(f"❌ Model loading failed: {e}")
+    logger.error(f"❌ Labels loading failed: {e}")
     raise
 
 # Client state management (per session)
 client_states = {}
+client_options = {}  # response/event mode per session (see response_modes.py)
+client_streams = {}  # change-only event streams per session (see event_stream.py)
+
+# Imported by an offline tool (replay, benchmarks): load synchronously
+if __name__ != '__main__' and not warm_start(startup, load_static_words_model):
+    raise RuntimeError(startup.error)
 
 def get_client_state(sid):
     """Get or create client state."""
@@ -139,31 +191,6 @@ def get_client_state(sid):
         }
     return client_states[sid]
 
-def normalize_landmarks(landmarks_array):
-    """Normalize landmarks relative to hand bounding box (per hand)."""
-    if len(landmarks_array) == 0:
-        return landmarks_array
-    
-    # Reshape to (21, 3) per hand
-    hands_count = len(landmarks_array) // 63
-    normalized = []
-    
-    for hand_idx in range(hands_count):
-        start_idx = hand_idx * 63
-        hand_data = landmarks_array[start_idx:start_idx + 63].reshape(21, 3)
-        
-        x_coords = hand_data[:, 0]
-        y_coords = hand_data[:, 1]
-        
-        if len(x_coords) > 0 and len(y_coords) > 0:
-            min_x, min_y = np.min(x_coords), np.min(y_coords)
-            hand_data[:, 0] -= min_x
-            hand_data[:, 1] -= min_y
-        
-        normalized.append(hand_data.flatten())
-    
-    return np.concatenate(normalized).astype(np.float32)
-
 def check_hand_stability(state, current_landmarks):
     """Check if hand is stable (not moving too much)."""
     if len(state['frame_buffer']) < state['frame_buffer'].maxlen:
@@ -194,6 +221,13 @@ def get_smooth_prediction(state, current_pred, current_conf):
     confidence = count / len(state['prediction_history'])
     return prediction, confidence
 
+def send_prediction(payload, status):
+    """Emit a prediction, or only its state transitions for clients in 'changes' event mode"""
+    METRICS.outcome(status)
+    options = client_options.get(request.sid, DEFAULT_OPTIONS)
+    for event, body in events_for(client_streams, request.sid, options, payload, status):
+        emit(event, body)
+
 def forward_predict(landmarks_input):
     """Forward pass for both Keras models and SavedModel signatures."""
     if use_signature:
@@ -229,23 +263,39 @@ def forward_predict(landmarks_input):
 
 @app.route('/health', methods=['GET'])
 def health():
-    return jsonify({
-        'status': 'healthy',
-        'model': 'general_words_stage2_static',
-        'words': len(labels),
-        'feature_size': feature_size,
-        'two_hands': two_hands
-    })
+    body, status = health_payload(startup, model='general_words_stage2_static', words=len(labels),
+                                  feature_size=feature_size, two_hands=two_hands, **label_table(labels))
+    return jsonify(body), status
+
+@app.route('/predict_batch', methods=['POST'])
+def predict_batch_rest():
+    """Score many landmark vectors in one batched forward pass (see batch_api.py)"""
+    if not startup.ready:
+        return jsonify(not_ready_payload(startup)), 503
+    try:
+        items, top_k, _ = parse_batch_request(request)
+        batch = bbox_normalize(static_batch(items, feature_size))
+        METRICS.observe_batch(len(batch))
+        probs = forward_predict(batch)
+        logger.info(f"📦 Batch prediction: {len(batch)} items")
+        return jsonify(batch_response(batch_results(probs, labels, top_k, valid=has_enough_data(batch))))
+    except ValueError as e:
+        return jsonify({'success': False, 'error': str(e)}), 400
+    except Exception as e:
+        logger.error(f"❌ Batch prediction error: {e}")
+        return jsonify({'success': False, 'error': str(e)}), 500
 
 @socketio.on('connect')
 def handle_connect():
     logger.info(f"✅ Client connected: {request.sid}")
     get_client_state(request.sid)  # Initialize state
+    configure_client(client_options, request.sid, request.args)
     emit('connection_response', {
         'status': 'connected',
         'message': 'Successfully connected to General Words Stage 2 (Static) server',
         'feature_size': feature_size,
-        'two_hands': two_hands
+        'two_hands': two_hands,
+        **label_table(labels)
     })
 
 @socketio.on('disconnect')
@@ -254,53 +304,66 @@ def handle_disconnect():
     # Cleanup client state
     if request.sid in client_states:
         del client_states[request.sid]
+    client_options.pop(request.sid, None)
+    client_streams.pop(request.sid, None)
+
+@socketio.on('configure')
+def handle_configure(data):
+    """Select the response mode (full/top1/topk/probs_f16) and event mode (all/changes) for this client"""
+    emit('configured', configure_client(client_options, request.sid, data))
 
 @socketio.on('predict')
 def handle_predict(data):
     """Socket.IO endpoint for static words predictions - handles hand landmarks (single frame)"""
+    METRICS.start()
+    if not startup.ready:
+        emit('prediction', not_ready_payload(startup))
+        return
     try:
         state = get_client_state(request.sid)
         
         # Static recognition uses landmarks directly (not sequences)
         if 'landmarks' not in data:
-            emit('prediction', {'success': False, 'error': 'No landmarks data provided'})
+            send_prediction({'success': False, 'error': 'No landmarks data provided'}, 'invalid')
             return
         
         landmarks = np.array(data['landmarks'], dtype=np.float32)
         target = data.get('target', '')
+        METRICS.lap('decode')
         
         # Validate landmarks shape (should match expected feature size)
         if landmarks.shape[0] != feature_size:
             error_msg = f"Invalid landmarks shape: {landmarks.shape}, expected ({feature_size},)"
-            emit('prediction', {'success': False, 'error': error_msg})
+            send_prediction({'success': False, 'error': error_msg}, 'invalid')
             return
         
-        # Normalize landmarks
-        landmarks_normalized = normalize_landmarks(landmarks)
+        # Normalize landmarks (per-hand bounding box), kept as a (1, F) batch
+        landmarks_batch = bbox_normalize(landmarks)
+        landmarks_normalized = landmarks_batch[0]
         
         # Check non-zero ratio
-        non_zero_ratio = np.count_nonzero(landmarks_normalized) / len(landmarks_normalized)
-        
-        if non_zero_ratio < 0.3:
-            emit('prediction', {
+        if nonzero_ratio(landmarks_batch)[0] < MIN_NONZERO_RATIO:
+            send_prediction({
                 'success': True,
                 'word': None,
                 'confidence': 0.0,
                 'stable': False,
                 'message': 'Insufficient hand data'
-            })
+            }, 'invalid')
             return
         
         # Check hand stability
         is_stable = check_hand_stability(state, landmarks_normalized)
+        METRICS.lap('preprocess')
         
         # Handle cooldown
         if state['prediction_cooldown'] > 0:
             state['prediction_cooldown'] -= 1
+            METRICS.outcome('cooldown')
             
             # Return current prediction during cooldown
             if state['current_prediction']:
-                emit('prediction', {
+                send_prediction({
                     'success': True,
                     'word': state['current_prediction'],
                     'label': state['current_prediction'],
@@ -308,23 +371,23 @@ def handle_predict(data):
                     'stable': is_stable,
                     'cooldown': True,
                     'model_used': 'static'
-                })
+                }, 'cooldown')
             return
         
         # Only predict when stable
         if not is_stable:
-            emit('prediction', {
+            send_prediction({
                 'success': True,
                 'word': None,
                 'confidence': 0.0,
                 'stable': False,
                 'message': 'Keep hand steady'
-            })
+            }, 'unstable')
             return
         
         # Predict
-        landmarks_batch = np.expand_dims(landmarks_normalized, 0)
         pred = forward_predict(landmarks_batch)
+        METRICS.lap('forward')
         idx = int(np.argmax(pred[0]))
         confidence = float(pred[0][idx])
         predicted_word = str(labels[idx])
@@ -339,6 +402,10 @@ def handle_predict(data):
                 state['current_confidence'] = smooth_conf
                 state['prediction_cooldown'] = state['cooldown_frames']
             
+            # Confirmed when the consensus matches the lesson target (if any)
+            target_word = str(target or '').strip().lower()
+            confirmed = not target_word or smooth_pred.lower() == target_word
+            
             # Emit prediction
             response = {
                 'success': True,
@@ -347,29 +414,32 @@ def handle_predict(data):
                 'confidence': smooth_conf,
                 'raw_confidence': confidence,
                 'stable': True,
-                'model_used': 'static'
+                'confirmed': confirmed,
+                'model_used': 'static',
+                **prediction_fields(pred[0], labels, client_options.get(request.sid, DEFAULT_OPTIONS))
             }
-            emit('prediction', response)
+            send_prediction(response, 'prediction')
         else:
-            emit('prediction', {
+            send_prediction({
                 'success': True,
                 'word': None,
                 'confidence': confidence,
                 'raw_word': predicted_word,
                 'stable': True,
                 'building_consensus': True,
-                'message': 'Building consensus...'
-            })
+                'message': 'Building consensus...',
+                **prediction_fields(pred[0], labels, client_options.get(request.sid, DEFAULT_OPTIONS))
+            }, 'building')
         
     except Exception as e:
         logger.error(f"❌ Prediction error: {str(e)}")
         import traceback
         logger.error("Full traceback:")
         logger.error(traceback.format_exc())
-        emit('prediction', {
+        send_prediction({
             'success': False,
             'error': str(e)
-        })
+        }, 'error')
 
 @socketio.on('reset')
 def handle_reset(data=None):
@@ -381,6 +451,7 @@ def handle_reset(data=None):
         state['current_prediction'] = None
         state['current_confidence'] = 0.0
         state['prediction_cooldown'] = 0
+        client_streams.pop(request.sid, None)
         
         logger.info(f"✅ State reset for client: {request.sid}")
         emit('reset_response', {'success': True, 'message': 'Prediction history reset'})
@@ -399,4 +470,6 @@ if __name__ == '__main__':
     logger.info("="*60)
     logger.info("\n🚀 Starting server on http://localhost:5008\n")
     
+    # Load + warm up while the port is already bound
+    start_background(startup, load_static_words_model)
     socketio.run(app, host='0.0.0.0', port=5008, debug=False, use_reloader=False)
@@ -1,5 +1,6 @@
 import eventlet
 eventlet.monkey_patch()
+from eventlet import tpool
 
 from flask import Flask, request, jsonify
 from flask_cors import CORS
@@ -8,65 +9,168 @@ import numpy as np
 import json
 import logging
 import os
+import time
 
-logging.basicConfig(level=logging.INFO)
+from batch_api import batch_response, item_result, motion_batch, parse_batch_request
+from capture_log import install_capture
+from cpu_config import configure_cpu
+from early_exit import EarlyExitPolicy, assess, early_exit_fields, pending_response
+from metrics import install_metrics
+from motion_preprocessing import InputBufferPool, preprocess_into
+from profiler import install_profiler
+from socket_auth import install_socket_auth
+from startup import (StartupTimeline, health_payload, import_tensorflow, load_parallel, not_ready_payload,
+                     start_background, warm_start)
+from structured_logging import SOCKETIO_LOGGING, configure_logging, log_event, sampled
+from tracing import install_tracing
+from word_router import MotionGate, WordRouter
+
+# Queued JSON logging with per-event sampling (see structured_logging.py)
+configure_logging('general_words')
 logger = logging.getLogger(__name__)
 
+# Per-server TensorFlow/oneDNN thread budget and optional CPU pinning (see cpu_config.py)
+configure_cpu('general_words')
+
+# Per-phase startup timeline and readiness, reported by /health (see startup.py)
+startup = StartupTimeline()
+
 app = Flask(__name__)
 CORS(app, resources={r"/*": {"origins": "*"}})
-socketio = SocketIO(app, cors_allowed_origins="*", async_mode='eventlet', logger=True, engineio_logger=True)
+socketio = SocketIO(app, cors_allowed_origins="*", async_mode='eventlet', logger=SOCKETIO_LOGGING, engineio_logger=SOCKETIO_LOGGING)
+
+# Opt-in traffic capture (set EDUSIGN_CAPTURE_DIR, see capture_log.py)
+install_capture(app, socketio, 'general_words')
+
+# Prometheus /metrics: outcomes, per-stage latency, sessions (see metrics.py)
+METRICS = install_metrics(app, socketio, 'general_words', startup)
+
+# End-to-end tracing of frames sent with frame_id/capture_ts (see tracing.py)
+install_tracing(app, socketio, METRICS)
+
+# Admin-only sampling/cProfile endpoints, off unless EDUSIGN_ADMIN_TOKEN is set (see profiler.py)
+install_profiler(app, socketio, 'general_words',
+                 models={'motion': WordRouter.predict_motion, 'static': WordRouter.predict_static})
+
+# Optional Firebase token check at connect, off unless EDUSIGN_SOCKET_AUTH is set (see socket_auth.py)
+install_socket_auth(socketio, 'general_words')
 
 # Load general words models (motion + static)
 MOTION_MODEL_PATH = './models_words/isl_words_best_24_words.h5'
 MOTION_LABELS_PATH = './models_words/labels.json'
 STATIC_MODEL_PATH = '../../../model_words2/models/static_words_best_16_words.h5'
 STATIC_LABELS_PATH = '../../../model_words2/models/static_words_labels.json'
+SEQ_LEN = 30
 
-logger.info("Loading General Words models...")
-try:
-    import tensorflow as tf
-    from tensorflow import keras
-    
-    # Load motion model (24 words)
-    motion_model = keras.models.load_model(MOTION_MODEL_PATH, compile=False)
-    motion_model.compile(
-        optimizer='adam',
-        loss='sparse_categorical_crossentropy',
-        metrics=['accuracy']
-    )
-    
-    with open(MOTION_LABELS_PATH, 'r') as f:
-        motion_labels = json.load(f)
-    
+# Early exit: clients sending {'early_exit': True} may stream growing prefixes
+# (10, 15, 20 frames) and get a provisional result once it is confident
+EARLY_EXIT = EarlyExitPolicy(SEQ_LEN, prefixes=(10, 15, 20), min_confidence=0.85, min_margin=0.50)
+
+# Reusable model input buffers, one per concurrent request
+INPUT_BUFFERS = InputBufferPool(SEQ_LEN, 1629)
+
+# Motion gate: clients sending {'motion_gate': True} with an unknown target
+# let still hands (mean hand displacement per frame below static_below)
+# skip the motion model and clearly moving hands skip the static model
+MOTION_GATE = MotionGate(static_below=0.004, motion_above=0.015)
+
+def run_in_tpool(calls):
+    """Run model calls concurrently on eventlet's native thread pool"""
+    dispatched = time.perf_counter()
+    started = []
+
+    def timed(call):
+        def run():
+            started.append(time.perf_counter())
+            return call()
+        return run
+
+    workers = [eventlet.spawn(tpool.execute, timed(call)) for call in calls]
+    results = [worker.wait() for worker in workers]
+    # Time until the last call got a pool thread, reported apart from the forward pass
+    METRICS.carve('queue_wait', max(started) - dispatched)
+    return results
+
+# Labels load here; TensorFlow and both models load in the background (in
+# parallel) once the server is listening (see startup.py), /health answers
+# 503 until then
+router = None
+
+with open(MOTION_LABELS_PATH, 'r') as f:
+    motion_labels = json.load(f)
+with open(STATIC_LABELS_PATH, 'r') as f:
+    static_labels = json.load(f)
+
+def load_word_models():
+    """Import TensorFlow, load the motion and static models concurrently, then build the router"""
+    global router
+    logger.info("Loading General Words models...")
+    tf = import_tensorflow(startup)
+
+    def load(path):
+        model = tf.keras.models.load_model(path, compile=False)
+        model.compile(
+            optimizer='adam',
+            loss='sparse_categorical_crossentropy',
+            metrics=['accuracy']
+        )
+        return model
+
+    models = load_parallel(startup, {
+        'motion': lambda: load(MOTION_MODEL_PATH),   # 24 words
+        'static': lambda: load(STATIC_MODEL_PATH),   # 16 words
+    })
     logger.info(f"✅ Motion model loaded: {len(motion_labels)} words")
-    
-    # Load static model (16 words)
-    static_model = keras.models.load_model(STATIC_MODEL_PATH, compile=False)
-    static_model.compile(
-        optimizer='adam',
-        loss='sparse_categorical_crossentropy',
-        metrics=['accuracy']
-    )
-    
-    with open(STATIC_LABELS_PATH, 'r') as f:
-        static_labels = json.load(f)
-    
     logger.info(f"✅ Static model loaded: {len(static_labels)} words")
     logger.info(f"✅ Total words: {len(motion_labels) + len(static_labels)}")
-    
-except Exception as e:
-    logger.error(f"❌ Model loading failed: {e}")
-    raise
+
+    # Build each predict function once here: the router calls both models
+    # from tpool threads at the same time
+    with startup.phase('warmup'):
+        for model in models.values():
+            model.predict(np.zeros((1,) + tuple(model.input_shape[1:]), dtype=np.float32), verbose=0)
+    logger.info("✅ Models pre-warmed and ready")
+
+    # Routing table comes from the two label files
+    router = WordRouter(models['motion'], motion_labels, models['static'], static_labels,
+                        gate=MOTION_GATE, run_parallel=run_in_tpool)
+
+# Imported by an offline tool (replay, benchmarks): load synchronously
+if __name__ != '__main__' and not warm_start(startup, load_word_models):
+    raise RuntimeError(startup.error)
 
 @app.route('/health', methods=['GET'])
 def health():
-    return jsonify({
-        'status': 'healthy',
-        'model': 'general_words',
-        'motion_words': len(motion_labels),
-        'static_words': len(static_labels),
-        'total': len(motion_labels) + len(static_labels)
-    })
+    body, status = health_payload(
+        startup,
+        model='general_words',
+        motion_words=len(motion_labels),
+        static_words=len(static_labels),
+        total=len(motion_labels) + len(static_labels),
+        motion_gate=MOTION_GATE.to_dict()
+    )
+    return jsonify(body), status
+
+@app.route('/predict_batch', methods=['POST'])
+def predict_batch_rest():
+    """Score many recorded sequences, routed per item by 'targets' (see batch_api.py)"""
+    if not startup.ready:
+        return jsonify(not_ready_payload(startup)), 503
+    try:
+        items, top_k, targets = parse_batch_request(request)
+        batch = motion_batch(items, SEQ_LEN, 1629)
+        METRICS.observe_batch(len(batch))
+        results = router.predict_batch(batch, targets)
+        logger.info(f"📦 Batch prediction: {len(batch)} sequences")
+        return jsonify(batch_response([
+            item_result(i, r.probs, router.labels_for(r.model_used), top_k, model_used=r.model_used, route=r.route)
+            for i, r in enumerate(results)
+        ]))
+    except ValueError as e:
+        return jsonify({'success': False, 'error': str(e)}), 400
+    except Exception as e:
+        logger.error(f"❌ Batch prediction error: {e}")
+        return jsonify({'success': False, 'error': str(e)}), 500
 
 @socketio.on('connect')
 def handle_connect():
@@ -83,167 +187,60 @@ def handle_disconnect():
 @socketio.on('predict')
 def handle_predict(data):
     """Socket.IO endpoint for general words predictions - handles motion sequences"""
-    logger.info("=" * 60)
-    logger.info("📥 PREDICT HANDLER CALLED")
-    logger.info(f"📦 Data keys: {list(data.keys())}")
+    METRICS.start()
+    # Per-frame diagnostics only for a sampled fraction of requests (EDUSIGN_LOG_SAMPLING frame=...)
+    diag = sampled('frame')
+    if diag:
+        logger.info("=" * 60)
+        logger.info("📥 PREDICT HANDLER CALLED")
+        logger.info("📦 Data keys: %s", list(data.keys()))
+    
+    if not startup.ready:
+        emit('prediction', not_ready_payload(startup))
+        return
     
     try:
         # Check if sequence data is provided
         if 'sequence' in data:
-            logger.info("✅ Sequence data found")
+            if diag:
+                logger.info("✅ Sequence data found")
             # Motion-based prediction (sequence of 30 frames)
             sequence = np.array(data['sequence'], dtype=np.float32)
             target = data.get('target', '')
+            METRICS.lap('decode')
             
-            logger.info(f"📥 Received sequence: shape={sequence.shape}, target={target}")
+            if diag:
+                logger.info("📥 Received sequence: shape=%s, target=%s", sequence.shape, target)
             
             # Validate sequence shape
             if sequence.ndim != 2:
                 error_msg = f"Invalid sequence shape: {sequence.shape}, expected 2D array"
                 logger.error(f"❌ {error_msg}")
+                METRICS.outcome('invalid')
                 emit('prediction', {'success': False, 'error': error_msg})
                 return
             
-            SEQ_LEN = 30
-            
-            # Pad or trim to target length
-            logger.info(f"🔧 Adjusting sequence length from {sequence.shape[0]} to {SEQ_LEN}")
-            if sequence.shape[0] < SEQ_LEN:
-                # Replicate last frame
-                pad_frames = SEQ_LEN - sequence.shape[0]
-                padding = np.tile(sequence[-1:], (pad_frames, 1))
-                sequence = np.vstack((sequence, padding))
-            elif sequence.shape[0] > SEQ_LEN:
-                # Trim from center
-                start = max(0, (sequence.shape[0] - SEQ_LEN) // 2)
-                sequence = sequence[start:start + SEQ_LEN]
-            
-            logger.info(f"✅ Sequence adjusted: shape={sequence.shape}")
-            
-            # Robust normalization (same as training)
-            logger.info("🔧 Starting normalization...")
-            T, F = sequence.shape
-            P = F // 3  # Number of landmarks
-            pts = sequence.reshape((T, P, 3))
-            
-            # Center around temporal mean
-            center = np.nanmean(pts, axis=(0, 1))
-            center = np.nan_to_num(center, 0)
-            pts -= center
-            
-            # Normalize by standard deviation
-            std = np.nanstd(pts)
-            std = max(std, 1e-6)
-            pts /= std
-            
-            # Clip outliers
-            pts = np.clip(pts, -5, 5)
-            
-            # Reshape back
-            sequence = pts.reshape((T, F))
-            
-            logger.info(f"✅ Normalized sequence: shape={sequence.shape}")
-            
-            # Expand dims for batch
-            sequence_batch = np.expand_dims(sequence, 0)            
-            logger.info(f"🔧 Batch shape: {sequence_batch.shape}")
-            
-            # Get target word to determine which model to use
-            target_word = target.strip()
-            
-            # Motion words (first 24) - match labels.json exactly (capitalized)
-            motion_words_list = [
-                'Afternoon', 'Born', 'Brush', 'Bye', 'Come', 'Cry', 'Go', 'Happy',
-                'Hearing', 'Hello', 'Man', 'Morning', 'Name', 'Nice', 'Night', 'Please',
-                'Sad', 'Separate', 'Sorry', 'Thankyou', 'Week', 'Welcome', 'Woman', 'Yes'
-            ]
-            
-            # Static words (last 16) - match static_words_labels.json exactly (lowercase)
-            static_words_list = [
-                'bad', 'drink', 'food', 'good', 'home', 'i,me', 'like', 'love',
-                'my', 'namaste', 'sleep', 'teacher', 'today', 'water', 'you', 'your'
-            ]
-            
-            # Also need to handle capitalized versions from frontend
-            static_words_capitalized = [w.capitalize() for w in static_words_list]
-            static_words_capitalized[5] = 'I,me'  # Special case
-            static_words_capitalized[9] = 'Namaste'
-            
-            # Determine which model to use based on target word
-            use_motion = target_word in motion_words_list
-            use_static = target_word in static_words_capitalized or target_word.lower() in static_words_list
-            
-            predicted_word = ""
-            confidence = 0.0
-            model_used = "unknown"
+            frames = sequence.shape[0]
+            early_exit = bool(data.get('early_exit'))
+            if early_exit and frames < EARLY_EXIT.min_frames:
+                emit('prediction', pending_response(EARLY_EXIT, frames))
+                return
             
-            if use_motion:
-                # USE MOTION MODEL ONLY
-                logger.info("🤖 Using MOTION model for word: " + target_word)
-                motion_pred = motion_model.predict(sequence_batch, verbose=0)
-                motion_idx = np.argmax(motion_pred[0])
-                confidence = float(motion_pred[0][motion_idx])
-                predicted_word = str(motion_labels[motion_idx])
-                model_used = "motion"
-                logger.info(f"  Motion: {predicted_word} ({confidence:.2%})")
-                
-            elif use_static:
-                # USE STATIC MODEL ONLY
-                logger.info("🤖 Using STATIC model for word: " + target_word)
-                # Extract static features from last frame (126 features = 2 hands)
-                last_frame = sequence[-1]
-                # Static model expects 126 features (hand landmarks only)
-                # Holistic = face(1404) + pose(99) + hands(126)
-                # hands start at index 1503
-                if len(last_frame) >= 1629:
-                    static_features = last_frame[1503:1629]  # Last 126 features
-                    static_batch = np.expand_dims(static_features, 0)
-                    
-                    static_pred = static_model.predict(static_batch, verbose=0)
-                    static_idx = np.argmax(static_pred[0])
-                    confidence = float(static_pred[0][static_idx])
-                    predicted_word = str(static_labels[static_idx])
-                    model_used = "static"
-                    logger.info(f"  Static: {predicted_word} ({confidence:.2%})")
-                else:
-                    logger.error("❌ Insufficient features for static prediction")
-                    predicted_word = "Unknown"
-                    confidence = 0.0
-                    
-            else:
-                # Unknown word - try both models
-                logger.info("⚠️ Unknown target word, trying both models...")
-                motion_pred = motion_model.predict(sequence_batch, verbose=0)
-                motion_idx = np.argmax(motion_pred[0])
-                motion_conf = float(motion_pred[0][motion_idx])
-                motion_word = str(motion_labels[motion_idx])
-                
-                # TRY STATIC MODEL (using last frame only)
-                static_conf = 0.0
-                static_word = ""
-                last_frame = sequence[-1]
-                if len(last_frame) >= 1629:
-                    static_features = last_frame[1503:1629]
-                    static_batch = np.expand_dims(static_features, 0)
-                    static_pred = static_model.predict(static_batch, verbose=0)
-                    static_idx = np.argmax(static_pred[0])
-                    static_conf = float(static_pred[0][static_idx])
-                    static_word = str(static_labels[static_idx])
-                
-                logger.info(f"  Motion: {motion_word} ({motion_conf:.2%})")
-                logger.info(f"  Static: {static_word} ({static_conf:.2%})")
-
-                # Choose best prediction
-                if motion_conf >= static_conf:
-                    predicted_word = motion_word
-                    confidence = motion_conf
-                    model_used = "motion"
-                else:
-                    predicted_word = static_word
-                    confidence = static_conf
-                    model_used = "static"
+            # Pad/trim to SEQ_LEN + robust normalization (same as training),
+            # written straight into a reusable model input buffer
+            if diag:
+                logger.info("🔧 Adjusting sequence length from %d to %d", frames, SEQ_LEN)
+            with INPUT_BUFFERS.acquire() as sequence_batch:
+                preprocess_into(sequence, sequence_batch[0])
+                METRICS.lap('preprocess')
+                result = router.predict(sequence_batch, target, raw_sequence=sequence,
+                                        use_gate=bool(data.get('motion_gate')))
+                METRICS.lap('forward')
+            predicted_word, confidence, model_used, probs = result.word, result.confidence, result.model_used, result.probs
             
-            logger.info(f"🎯 Final Prediction: {predicted_word} ({confidence:.2%}) [model: {model_used}]")
+            log_event(logger, 'prediction', "🎯 Final Prediction: %s (%.2f%%) [model: %s, route: %s]",
+                      predicted_word, confidence * 100, model_used, result.route,
+                      label=predicted_word, confidence=confidence, model_used=model_used, route=result.route)
             
             # Emit prediction
             response = {
@@ -252,15 +249,28 @@ def handle_predict(data):
                 'label': predicted_word,
                 'confidence': confidence,
                 'stable': confidence >= 0.70,  # 70% threshold
-                'model_used': model_used
+                'model_used': model_used,
+                'route': result.route
             }
-            logger.info(f"📤 Emitting response: {response}")
+            
+            # Early exit: only report a partial sequence once it is confident
+            if early_exit:
+                margin, exit_ok = assess(EARLY_EXIT, probs, frames) if probs is not None else (0.0, False)
+                if EARLY_EXIT.is_partial(frames) and not exit_ok:
+                    emit('prediction', pending_response(EARLY_EXIT, frames, confidence, margin))
+                    return
+                response.update(early_exit_fields(EARLY_EXIT, frames, margin, exit_ok, response['stable']))
+            
+            if diag:
+                logger.info("📤 Emitting response: %s", response)
             emit('prediction', response)
-            logger.info("✅ Response emitted successfully")
+            if diag:
+                logger.info("✅ Response emitted successfully")
             
         else:
             logger.error("❌ No 'sequence' key in data!")
-            logger.info(f"Available keys: {list(data.keys())}")
+            logger.info("Available keys: %s", list(data.keys()))
+            METRICS.outcome('invalid')
             emit('prediction', {'success': False, 'error': 'No sequence data provided'})
         
     except Exception as e:
@@ -274,7 +284,8 @@ def handle_predict(data):
             'error': str(e)
         })
     
-    logger.info("=" * 60)
+    if diag:
+        logger.info("=" * 60)
 
 if __name__ == '__main__':
     logger.info("\n" + "="*60)
@@ -288,4 +299,6 @@ if __name__ == '__main__':
     logger.info("="*60)
     logger.info("\n🚀 Starting server on http://localhost:5007\n")
     
+    # Load both models while the port is already bound
+    start_background(startup, load_word_models)
     socketio.run(app, host='0.0.0.0', port=5007, debug=False, use_reloader=False)
@@ -10,148 +10,183 @@ import logging
 import os
 from collections import deque, Counter
 
-logging.basicConfig(level=logging.INFO)
+from batch_api import batch_response, batch_results, parse_batch_request, predict_probs, static_batch
+from capture_log import install_capture
+from cpu_config import configure_cpu
+from metrics import install_metrics
+from model_registry import folded_is_stale
+from profiler import install_profiler
+from response_modes import DEFAULT_OPTIONS, configure_client, label_table, prediction_fields, top_k_indices
+from socket_auth import install_socket_auth
+from startup import StartupTimeline, health_payload, import_tensorflow, not_ready_payload, start_background, warm_start
+from static_preprocessing import best_hand, standardize
+from structured_logging import SOCKETIO_LOGGING, configure_logging, log_event, sampled
+from tracing import install_tracing
+
+# Queued JSON logging with per-event sampling (see structured_logging.py)
+configure_logging('numbers')
 logger = logging.getLogger(__name__)
 
+# Per-server TensorFlow/oneDNN thread budget and optional CPU pinning (see cpu_config.py)
+configure_cpu('numbers')
+
+# Per-phase startup timeline and readiness, reported by /health (see startup.py)
+startup = StartupTimeline()
+
 app = Flask(__name__)
 CORS(app, resources={r"/*": {"origins": "*"}})
-socketio = SocketIO(app, cors_allowed_origins="*", async_mode='eventlet', logger=True, engineio_logger=True)
+socketio = SocketIO(app, cors_allowed_origins="*", async_mode='eventlet', logger=SOCKETIO_LOGGING, engineio_logger=SOCKETIO_LOGGING)
+
+# Opt-in traffic capture (set EDUSIGN_CAPTURE_DIR, see capture_log.py)
+install_capture(app, socketio, 'numbers')
+
+# Prometheus /metrics: outcomes, per-stage latency, sessions (see metrics.py)
+METRICS = install_metrics(app, socketio, 'numbers', startup)
+
+# End-to-end tracing of frames sent with frame_id/capture_ts (see tracing.py)
+install_tracing(app, socketio, METRICS)
+
+# Admin-only sampling/cProfile endpoints, off unless EDUSIGN_ADMIN_TOKEN is set (see profiler.py)
+install_profiler(app, socketio, 'numbers')
+
+# Optional Firebase token check at connect, off unless EDUSIGN_SOCKET_AUTH is set (see socket_auth.py)
+install_socket_auth(socketio, 'numbers')
 
 # Configuration
 MODEL_PATH = './model_number/static_numbers_model.keras'
 LABELS_PATH = './model_number/numbers_labels.json'
 STATS_PATH = './model_number/numbers_feature_stats.npz'
+# Same model with STATS_PATH folded into its first Dense layer (written by
+# export_folded_model.py numbers); preferred when present and built from the
+# current MODEL_PATH + STATS_PATH, takes raw features
+FOLDED_MODEL_PATH = './model_number/static_numbers_model_folded.keras'
 CONFIDENCE_THRESHOLD = 0.6
 SMOOTH_WINDOW = 5
 
-logger.info("Loading Numbers model...")
+# Per-client response payload mode (see response_modes.py)
+client_options = {}
+
+# Labels load here; TensorFlow and the model load in the background once the
+# server is listening (see startup.py), /health answers 503 until then
 model = None
-labels = None
+model_path = MODEL_PATH
 expected_feature_size = None
 mean = None
 std = None
+standardization = None  # 'folded', 'python' or None (raw features)
 
 try:
-    import tensorflow as tf
-    from tensorflow import keras
-    
-    # Load model
+    with open(LABELS_PATH, 'r') as f:
+        labels = json.load(f)
+except:
+    labels = np.load('./model_number/numbers_labels.npy', allow_pickle=True)
+labels = [str(label) for label in labels]
+logger.info(f"✅ Classes ({len(labels)}): {', '.join(labels)}")
+
+# Serve the folded model only if it was built from the current model and stats
+if os.path.exists(FOLDED_MODEL_PATH):
     try:
-        model = keras.models.load_model(MODEL_PATH, compile=False)
-        logger.info("✅ Model loaded with compile=False")
-    except Exception as e1:
-        logger.warning(f"⚠️ First load attempt failed: {e1}")
+        stale = folded_is_stale(FOLDED_MODEL_PATH, MODEL_PATH, STATS_PATH)
+    except OSError as e:
+        stale = str(e)
+    if stale:
+        logger.warning(f"⚠️ Ignoring {FOLDED_MODEL_PATH}: {stale}; standardizing in Python")
+    else:
+        model_path = FOLDED_MODEL_PATH
+
+def load_numbers_model():
+    """Import TensorFlow, load and compile the model and its stats, pre-warm it, then publish it"""
+    global model, expected_feature_size, mean, std, standardization
+    logger.info("Loading Numbers model...")
+    tf = import_tensorflow(startup)
+    keras = tf.keras
+
+    with startup.phase('load'):
         try:
-            model = keras.models.load_model(MODEL_PATH, compile=False, safe_mode=False)
-            logger.info("✅ Model loaded with safe_mode=False")
-        except Exception as e2:
-            logger.error(f"❌ Alternative loading failed: {e2}")
-            raise e2
+            loaded = keras.models.load_model(model_path, compile=False)
+            logger.info("✅ Model loaded with compile=False")
+        except Exception as e1:
+            logger.warning(f"⚠️ First load attempt failed: {e1}")
+            try:
+                loaded = keras.models.load_model(model_path, compile=False, safe_mode=False)
+                logger.info("✅ Model loaded with safe_mode=False")
+            except Exception as e2:
+                logger.error(f"❌ Alternative loading failed: {e2}")
+                raise e2
     
     # Recompile
-    model.compile(
-        optimizer='adam',
-        loss='sparse_categorical_crossentropy',
-        metrics=['accuracy']
-    )
+    with startup.phase('compile'):
+        loaded.compile(
+            optimizer='adam',
+            loss='sparse_categorical_crossentropy',
+            metrics=['accuracy']
+        )
     
     # Get expected feature size
-    expected_feature_size = int(model.input_shape[1])
-    logger.info(f"✅ Model expects {expected_feature_size} features")
+    feature_size = int(loaded.input_shape[1])
+    logger.info(f"✅ Model expects {feature_size} features")
     
-    # Load labels
-    try:
-        with open(LABELS_PATH, 'r') as f:
-            labels = json.load(f)
-    except:
-        labels = np.load('./model_number/numbers_labels.npy', allow_pickle=True)
-    
-    labels = [str(label) for label in labels]
-    
-    # Load normalization stats
-    try:
-        if os.path.exists(STATS_PATH):
-            stats = np.load(STATS_PATH)
-            mean = stats["mean"]
-            std = stats["std"]
-            logger.info("✅ Normalization stats loaded (mean/std)")
-        else:
-            logger.warning("⚠️ Stats file not found, using raw features")
+    # Load normalization stats (already part of the graph for the folded model)
+    if model_path == FOLDED_MODEL_PATH:
+        standardization = 'folded'
+        logger.info("✅ Standardization folded into the model, no stats needed")
+    else:
+        try:
+            if os.path.exists(STATS_PATH):
+                stats = np.load(STATS_PATH)
+                mean = stats["mean"]
+                std = stats["std"]
+                standardization = 'python'
+                logger.info("✅ Normalization stats loaded (mean/std)")
+                logger.info("💡 Run 'python export_folded_model.py numbers' to fold them into the model")
+            else:
+                logger.error("❌ Stats file not found, using raw features - predictions will be unreliable")
+        except Exception as e:
+            logger.error(f"❌ Could not load stats: {e}, using raw features - predictions will be unreliable")
             mean = None
             std = None
-    except Exception as e:
-        logger.warning(f"⚠️ Could not load stats: {e}, using raw features")
-        mean = None
-        std = None
     
+    # Pre-warm so the first client does not pay for graph tracing
+    with startup.phase('warmup'):
+        loaded.predict(np.zeros((1, feature_size), dtype=np.float32), verbose=0)
+    
+    expected_feature_size = feature_size
+    model = loaded
     logger.info("✅ Numbers model loaded successfully")
-    logger.info(f"✅ Classes ({len(labels)}): {', '.join(labels)}")
     logger.info(f"✅ Feature size: {expected_feature_size}")
-    
-except Exception as e:
-    logger.error(f"❌ Model loading failed: {e}")
-    import traceback
-    logger.error(traceback.format_exc())
-    raise
 
-def extract_single_hand(features, target_size):
-    """Extract single hand features if model expects 63 (one hand)"""
-    feats = np.array(features, dtype=np.float32)
-    
-    if len(feats) == target_size:
-        return feats
-    
-    if len(feats) == 126 and target_size == 63:
-        # Split into left (0-62) and right (63-125)
-        left = feats[:63]
-        right = feats[63:126]
-        left_nz = np.count_nonzero(left)
-        right_nz = np.count_nonzero(right)
-        # Choose the hand with more non-zero values
-        return right if right_nz >= left_nz else left
-    
-    raise ValueError(f"Expected {target_size} features, got {len(feats)}")
-
-def normalize_features(features, mean, std):
-    """Normalize features using mean and std"""
-    if mean is not None and std is not None:
-        return (features - mean) / np.maximum(std, 1e-8)
-    return features
+# Imported by an offline tool (replay, benchmarks): load synchronously
+if __name__ != '__main__' and not warm_start(startup, load_numbers_model):
+    raise RuntimeError(startup.error)
 
 @app.route('/health', methods=['GET'])
 def health():
-    return jsonify({
-        'status': 'healthy' if model is not None else 'unhealthy',
-        'model': 'numbers',
-        'classes': len(labels) if labels else 0,
-        'feature_size': expected_feature_size,
-        'model_loaded': model is not None,
-        'confidence_threshold': CONFIDENCE_THRESHOLD
-    })
+    body, status = health_payload(startup, model='numbers', classes=len(labels), feature_size=expected_feature_size,
+                                  model_loaded=model is not None, standardization=standardization,
+                                  confidence_threshold=CONFIDENCE_THRESHOLD)
+    return jsonify(body), status
 
 @app.route('/predict', methods=['POST'])
 def predict_rest():
     """REST API endpoint for number predictions"""
+    if not startup.ready:
+        return jsonify(not_ready_payload(startup)), 503
     try:
-        if model is None or labels is None:
-            return jsonify({'error': 'Model not loaded', 'success': False}), 500
-        
         data = request.get_json()
         landmarks_array = data.get('landmarks', [])
         
         if not landmarks_array:
             return jsonify({'error': 'No landmarks provided', 'success': False}), 400
         
-        # Extract single hand if needed
-        landmarks = extract_single_hand(landmarks_array, expected_feature_size)
+        # Extract single hand if needed, as a (1, F) batch
+        landmarks = best_hand(landmarks_array, expected_feature_size)
         
         # Check if features are valid (not all zeros)
         if np.count_nonzero(landmarks) == 0:
             return jsonify({'error': 'All landmarks are zero', 'success': False}), 400
         
-        # Normalize features
-        landmarks = normalize_features(landmarks, mean, std)
-        landmarks = landmarks.reshape(1, -1)
+        # Normalize features (no-op for the folded model)
+        landmarks = standardize(landmarks, mean, std)
         
         # Predict
         prediction = model.predict(landmarks, verbose=0)
@@ -181,55 +216,95 @@ def predict_rest():
         logger.error(f"❌ REST Prediction error: {str(e)}")
         return jsonify({'error': str(e), 'success': False}), 500
 
+@app.route('/predict_batch', methods=['POST'])
+def predict_batch_rest():
+    """Score many landmark vectors in one batched forward pass (see batch_api.py)"""
+    if not startup.ready:
+        return jsonify(not_ready_payload(startup)), 503
+    try:
+        items, top_k, _ = parse_batch_request(request)
+        batch = best_hand(static_batch(items), expected_feature_size)
+        valid = np.count_nonzero(batch, axis=1) > 0
+        METRICS.observe_batch(len(batch))
+        probs = predict_probs(model, standardize(batch, mean, std))
+        logger.info(f"📦 Batch prediction: {len(batch)} items")
+        return jsonify(batch_response(batch_results(probs, labels, top_k, valid=valid, error='All landmarks are zero')))
+    except ValueError as e:
+        return jsonify({'success': False, 'error': str(e)}), 400
+    except Exception as e:
+        logger.error(f"❌ Batch prediction error: {e}")
+        return jsonify({'success': False, 'error': str(e)}), 500
+
 @socketio.on('connect')
 def handle_connect():
     logger.info(f"✅ Client connected: {request.sid}")
+    configure_client(client_options, request.sid, request.args)
     emit('connection_response', {
         'status': 'connected',
-        'message': 'Successfully connected to Numbers prediction server'
+        'message': 'Successfully connected to Numbers prediction server',
+        **label_table(labels)
     })
 
 @socketio.on('disconnect')
 def handle_disconnect():
     logger.info(f"❌ Client disconnected: {request.sid}")
+    client_options.pop(request.sid, None)
+
+@socketio.on('configure')
+def handle_configure(data):
+    """Select the prediction payload mode (full/top1/topk/probs_f16) for this client"""
+    emit('configured', configure_client(client_options, request.sid, data))
 
 @socketio.on('predict')
 def handle_predict(data):
     """Socket.IO endpoint for number predictions with smoothing"""
+    METRICS.start()
+    # Per-frame diagnostics only for a sampled fraction of requests (EDUSIGN_LOG_SAMPLING frame=...)
+    diag = sampled('frame')
+    if not startup.ready:
+        emit('prediction', not_ready_payload(startup))
+        return
     try:
-        if model is None or labels is None:
-            emit('prediction', {'success': False, 'error': 'Model not loaded'})
-            return
         
         feats = data.get('landmarks', [])
         if not feats:
+            METRICS.outcome('invalid')
             emit('prediction', {'success': False, 'error': 'No landmarks provided'})
             return
 
-        # Extract single hand if needed
-        landmarks = extract_single_hand(feats, expected_feature_size)
+        # Extract single hand if needed, as a (1, F) batch
+        landmarks = best_hand(feats, expected_feature_size)
+        METRICS.lap('decode')
         
-        # Log feature statistics
         nonzero_count = np.count_nonzero(landmarks)
-        logger.info(f"📊 Features: {len(landmarks)} total, {nonzero_count} non-zero, min={np.min(landmarks):.3f}, max={np.max(landmarks):.3f}, mean={np.mean(landmarks):.3f}")
+        if diag:
+            # Log feature statistics
+            logger.info("📊 Features: %d total, %d non-zero, min=%.3f, max=%.3f, mean=%.3f", landmarks.size,
+                        nonzero_count, np.min(landmarks), np.max(landmarks), np.mean(landmarks))
         
         if nonzero_count == 0:
+            METRICS.outcome('invalid')
             emit('prediction', {'success': False, 'error': 'All landmarks are zero'})
             return
 
-        # Normalize features
-        landmarks = normalize_features(landmarks, mean, std)
+        # Normalize features (no-op for the folded model)
+        landmarks = standardize(landmarks, mean, std)
+        METRICS.lap('preprocess')
         
         # Make prediction
-        preds = model.predict(landmarks.reshape(1, -1), verbose=0)
+        preds = model.predict(landmarks, verbose=0)
+        METRICS.lap('forward')
         idx = int(np.argmax(preds[0]))
         conf = float(preds[0][idx])
         
-        # Debug: Log top 3 predictions
-        top_indices = np.argsort(preds[0])[-3:][::-1]
-        top_preds = [(labels[i], float(preds[0][i])) for i in top_indices]
-        logger.info(f"🎯 Top 3: {top_preds}")
-        logger.info(f"🎯 Final Prediction: {labels[idx]} ({conf:.2%})")
+        if diag:
+            # Debug: Log top 3 predictions
+            top_preds = [(labels[i], float(preds[0][i])) for i in top_k_indices(preds[0], 3)]
+            logger.info("🎯 Top 3: %s", top_preds)
+        log_event(logger, 'prediction', "🎯 Final Prediction: %s (%.2f%%)", labels[idx], conf * 100,
+                  label=labels[idx], confidence=conf, stable=conf >= CONFIDENCE_THRESHOLD)
+        
+        probs_payload = prediction_fields(preds[0], labels, client_options.get(request.sid, DEFAULT_OPTIONS))
         
         # Only emit if confidence exceeds threshold
         if conf >= CONFIDENCE_THRESHOLD:
@@ -238,17 +313,19 @@ def handle_predict(data):
                 'label': str(labels[idx]),
                 'confidence': conf,
                 'stable': True,
-                'all_predictions': {str(labels[i]): float(preds[0][i]) for i in range(len(labels))}
+                **probs_payload
             })
         else:
-            logger.info(f"⚠️ Low confidence: {labels[idx]} ({conf:.2%}) < {CONFIDENCE_THRESHOLD}")
+            if diag:
+                logger.info("⚠️ Low confidence: %s (%.2f%%) < %s", labels[idx], conf * 100, CONFIDENCE_THRESHOLD)
+            METRICS.outcome('unstable')
             emit('prediction', {
                 'success': False,
                 'error': f'Confidence below threshold',
                 'label': str(labels[idx]),
                 'confidence': conf,
                 'stable': False,
-                'all_predictions': {str(labels[i]): float(preds[0][i]) for i in range(len(labels))}
+                **probs_payload
             })
             
     except Exception as e:
@@ -258,20 +335,17 @@ def handle_predict(data):
         emit('prediction', {'success': False, 'error': str(e)})
 
 if __name__ == '__main__':
-    if model is None or labels is None:
-        logger.error("❌ Cannot start server: Model or labels not loaded")
-        exit(1)
-    
     logger.info("\n" + "="*60)
     logger.info("🔢 EduSign Numbers Real-time Detection Server")
     logger.info("="*60)
-    logger.info(f"📂 Model: {MODEL_PATH}")
+    logger.info(f"📂 Model: {model_path}")
     logger.info(f"📂 Labels: {LABELS_PATH}")
-    logger.info(f"🔢 Feature size: {expected_feature_size}")
     logger.info(f"🔤 Classes ({len(labels)}): {', '.join(labels)}")
     logger.info(f"📊 Confidence threshold: {CONFIDENCE_THRESHOLD}")
     logger.info("="*60)
     logger.info("\n🚀 Starting server on http://localhost:5002\n")
     
+    # Load + warm up while the port is already bound
+    start_background(startup, load_numbers_model)
     socketio.run(app, host='0.0.0.0', port=5002, debug=False, use_reloader=False)
 
@@ -7,20 +7,40 @@ Model: models_sentence/isl_sentences_best.h5
 import eventlet
 eventlet.monkey_patch()
 
-from flask import Flask, request
+from flask import Flask, request, jsonify
 from flask_socketio import SocketIO, emit
 from flask_cors import CORS
 import numpy as np
-import tensorflow as tf
 import json
-import gc
 import logging
 from pathlib import Path
 
+from batch_api import batch_response, batch_results, motion_batch, parse_batch_request, predict_probs
+from capture_log import install_capture
+from cpu_config import configure_cpu
+from early_exit import EarlyExitPolicy, assess, early_exit_fields, pending_response
+from gc_tuning import gc_stats, tune_after_load
+from metrics import install_metrics
+from motion_preprocessing import InputBufferPool, preprocess_into
+from profiler import install_profiler
+from response_modes import DEFAULT_OPTIONS, configure_client, label_table, prediction_fields
+from socket_auth import install_socket_auth
+from startup import (StartupTimeline, health_payload, import_tensorflow, not_ready_payload, start_background,
+                     warm_start)
+from structured_logging import SOCKETIO_LOGGING, configure_logging, log_event
+from tracing import install_tracing
+
 # Configure logging
-logging.basicConfig(level=logging.INFO)
+# Queued JSON logging with per-event sampling (see structured_logging.py)
+configure_logging('sentences')
 logger = logging.getLogger(__name__)
 
+# Per-server TensorFlow/oneDNN thread budget and optional CPU pinning (see cpu_config.py)
+configure_cpu('sentences')
+
+# Per-phase startup timeline and readiness, reported by /health (see startup.py)
+startup = StartupTimeline()
+
 # ===========================
 # CONFIG
 # ===========================
@@ -29,12 +49,19 @@ MODEL_PATH = "models_sentence/isl_sentences_best.h5"
 LABEL_PATH = "models_sentence/labels_sentences.json"
 SEQ_LEN = 60
 
+# Early exit: clients sending {'early_exit': True} may stream growing prefixes
+# (20, 30, 40 frames) and get a provisional result once it is confident
+EARLY_EXIT = EarlyExitPolicy(SEQ_LEN, prefixes=(20, 30, 40), min_confidence=0.85, min_margin=0.50)
+
 # Landmark counts
 FACE_LM = 468
 POSE_LM = 33
 HAND_LM = 21
 FEATURE_LEN = (FACE_LM + POSE_LM + HAND_LM * 2) * 3
 
+# Reusable model input buffers, one per concurrent request
+INPUT_BUFFERS = InputBufferPool(SEQ_LEN, FEATURE_LEN)
+
 # ===========================
 # FLASK & SOCKETIO SETUP
 # ===========================
@@ -47,87 +74,91 @@ socketio = SocketIO(
     async_mode='eventlet',
     ping_timeout=60,
     ping_interval=25,
-    logger=True,
-    engineio_logger=True,
+    logger=SOCKETIO_LOGGING,
+    engineio_logger=SOCKETIO_LOGGING,
     max_http_buffer_size=10000000  # 10MB
 )
 
+# Opt-in traffic capture (set EDUSIGN_CAPTURE_DIR, see capture_log.py)
+install_capture(app, socketio, 'sentences')
+
+# Prometheus /metrics: outcomes, per-stage latency, sessions (see metrics.py)
+METRICS = install_metrics(app, socketio, 'sentences', startup)
+
+# End-to-end tracing of frames sent with frame_id/capture_ts (see tracing.py)
+install_tracing(app, socketio, METRICS)
+
+# Admin-only sampling/cProfile endpoints, off unless EDUSIGN_ADMIN_TOKEN is set (see profiler.py)
+install_profiler(app, socketio, 'sentences')
+
+# Optional Firebase token check at connect, off unless EDUSIGN_SOCKET_AUTH is set (see socket_auth.py)
+install_socket_auth(socketio, 'sentences')
+
 # ===========================
 # LOAD MODEL & LABELS
 # ===========================
-try:
-    model = tf.keras.models.load_model(MODEL_PATH, compile=False)
-    model.compile(optimizer='adam', loss='sparse_categorical_crossentropy')
-    logger.info(f"✓ Model loaded: {MODEL_PATH}")
-    
-    # JIT compilation warm-up
-    dummy = np.zeros((1, SEQ_LEN, FEATURE_LEN), dtype=np.float32)
-    _ = model.predict(dummy, verbose=0)
-    logger.info("✓ Model warmed up")
-except Exception as e:
-    logger.error(f"✗ Error loading model: {e}")
-    model = None
+# Labels load here; TensorFlow and the model load in the background once the
+# server is listening (see startup.py), /health answers 503 until then
+model = None
 
 try:
     with open(LABEL_PATH, "r") as f:
-        labels = np.array(json.load(f))
+        labels = [str(label) for label in json.load(f)]
     logger.info(f"✓ Labels loaded: {labels}")
 except Exception as e:
     logger.error(f"✗ Error loading labels: {e}")
     labels = []
 
-prediction_count = 0
+def load_sentence_model():
+    """Import TensorFlow, load and compile the model, warm it up, then publish it"""
+    global model
+    tf = import_tensorflow(startup)
+    with startup.phase('load'):
+        loaded = tf.keras.models.load_model(MODEL_PATH, compile=False)
+    with startup.phase('compile'):
+        loaded.compile(optimizer='adam', loss='sparse_categorical_crossentropy')
+    logger.info(f"✓ Model loaded: {MODEL_PATH}")
 
-# ===========================
-# NORMALIZATION
-# ===========================
-def robust_normalize(seq):
-    """Normalize sequence with robust statistics"""
-    seq = np.asarray(seq, np.float32)
-    
-    if seq.size == 0:
-        return seq
-    
-    T, F = seq.shape
-    if T == 0:
-        return seq
-    
-    # Reshape to (T, num_points, 3)
-    P = F // 3
-    pts = seq.reshape((T, P, 3))
-    
-    # Center around temporal mean
-    center = np.nanmean(pts, axis=(0, 1))
-    center = np.nan_to_num(center, 0)
-    pts -= center
-    
-    # Normalize by standard deviation
-    std = np.nanstd(pts)
-    std = max(std, 1e-6)
-    pts /= std
-    
-    # Clip outliers
-    pts = np.clip(pts, -5, 5)
-    
-    return pts.reshape((T, F))
+    # JIT compilation warm-up
+    with startup.phase('warmup'):
+        loaded.predict(np.zeros((1, SEQ_LEN, FEATURE_LEN), dtype=np.float32), verbose=0)
+    logger.info("✓ Model warmed up")
+    tune_after_load()  # instead of periodic gc.collect() (see gc_tuning.py)
+    model = loaded
 
+# Imported by an offline tool (replay, benchmarks): load synchronously. A
+# failed load keeps the server up (predictions report the error), as before
+if __name__ != '__main__':
+    warm_start(startup, load_sentence_model)
 
-def pad_or_trim(seq, length=SEQ_LEN):
-    """Pad or trim sequence to target length"""
-    seq = np.asarray(seq, np.float32)
-    t, f = seq.shape
-    
-    if t == length:
-        return seq
-    
-    if t < length:
-        pad = np.tile(seq[-1:], (length - t, 1))
-        return np.vstack((seq, pad))
-    
-    # Trim from center
-    start = max(0, (t - length) // 2)
-    return seq[start:start + length]
+# Per-client response payload mode (see response_modes.py)
+client_options = {}
+
+# ===========================
+# REST HANDLERS
+# ===========================
+@app.route('/health', methods=['GET'])
+def health():
+    body, status = health_payload(startup, model='sentences', sentences=len(labels), gc=gc_stats())
+    return jsonify(body), status
 
+@app.route('/predict_batch', methods=['POST'])
+def predict_batch_rest():
+    """Score many recorded sequences in one batched forward pass (see batch_api.py)"""
+    if not startup.ready:
+        return jsonify(not_ready_payload(startup)), 503
+    try:
+        items, top_k, _ = parse_batch_request(request)
+        batch = motion_batch(items, SEQ_LEN, FEATURE_LEN)
+        METRICS.observe_batch(len(batch))
+        probs = predict_probs(model, batch)
+        logger.info(f"📦 Batch prediction: {len(batch)} sequences")
+        return jsonify(batch_response(batch_results(probs, labels, top_k)))
+    except ValueError as e:
+        return jsonify({'success': False, 'error': str(e)}), 400
+    except Exception as e:
+        logger.error(f"❌ Batch prediction error: {e}")
+        return jsonify({'success': False, 'error': str(e)}), 500
 
 # ===========================
 # WEBSOCKET HANDLERS
@@ -135,31 +166,36 @@ def pad_or_trim(seq, length=SEQ_LEN):
 @socketio.on('connect')
 def handle_connect():
     logger.info(f"✅ [SENTENCES] Client connected: {request.sid}")
-    emit('connection_response', {'status': 'connected', 'port': PORT})
+    configure_client(client_options, request.sid, request.args)
+    emit('connection_response', {'status': 'connected', 'port': PORT, **label_table(labels)})
 
 
 @socketio.on('disconnect')
 def handle_disconnect():
     logger.info(f"❌ [SENTENCES] Client disconnected: {request.sid}")
+    client_options.pop(request.sid, None)
+
+
+@socketio.on('configure')
+def handle_configure(data):
+    """Select the prediction payload mode (full/top1/topk/probs_f16) for this client"""
+    emit('configured', configure_client(client_options, request.sid, data))
 
 
 @socketio.on('predict')
 def handle_prediction(data):
     """Handle incoming sequence prediction request"""
-    global prediction_count
-    
+    METRICS.start()
     try:
-        if model is None:
-            emit('prediction', {
-                'success': False,
-                'error': 'Model not loaded'
-            })
+        if not startup.ready:
+            emit('prediction', not_ready_payload(startup))
             return
         
         # Extract sequence from data
         sequence = data.get('sequence', [])
         
         if len(sequence) == 0:
+            METRICS.outcome('invalid')
             emit('prediction', {
                 'success': False,
                 'error': 'Empty sequence'
@@ -172,29 +208,40 @@ def handle_prediction(data):
         # Ensure correct shape
         if len(seq.shape) == 1:
             seq = seq.reshape(1, -1)
+        METRICS.lap('decode')
         
-        # Pad/trim to SEQ_LEN
-        seq = pad_or_trim(seq, SEQ_LEN)
-        
-        # Normalize
-        seq = robust_normalize(seq)
+        frames = seq.shape[0]
+        early_exit = bool(data.get('early_exit'))
+        if early_exit and frames < EARLY_EXIT.min_frames:
+            emit('prediction', pending_response(EARLY_EXIT, frames))
+            return
         
-        # Predict
-        probs = model.predict(np.expand_dims(seq, 0), verbose=0)[0]
+        # Pad/trim to SEQ_LEN + normalize
+        with INPUT_BUFFERS.acquire() as seq_batch:
+            preprocess_into(seq, seq_batch[0])
+            METRICS.lap('preprocess')
+            
+            # Predict
+            probs = model.predict(seq_batch, verbose=0)[0]
+            METRICS.lap('forward')
         idx = int(np.argmax(probs))
         confidence = float(probs[idx])
-        sentence = str(labels[idx])
+        sentence = labels[idx]
         
         # Determine stability based on confidence
         stable = confidence >= 0.30
         
-        prediction_count += 1
-        
-        # Garbage collection every 5 predictions
-        if prediction_count % 5 == 0:
-            gc.collect()
+        # Early exit: only report a partial sequence once it is confident
+        early_exit_response = {}
+        if early_exit:
+            margin, exit_ok = assess(EARLY_EXIT, probs, frames)
+            if EARLY_EXIT.is_partial(frames) and not exit_ok:
+                emit('prediction', pending_response(EARLY_EXIT, frames, confidence, margin))
+                return
+            early_exit_response = early_exit_fields(EARLY_EXIT, frames, margin, exit_ok, stable)
         
-        logger.info(f"📊 Predicted: {sentence} (conf: {confidence:.2f})")
+        log_event(logger, 'prediction', "📊 Predicted: %s (conf: %.2f)", sentence, confidence,
+                  label=sentence, confidence=confidence)
         
         emit('prediction', {
             'success': True,
@@ -202,10 +249,8 @@ def handle_prediction(data):
             'label': sentence,
             'confidence': confidence,
             'stable': stable,
-            'all_predictions': {
-                str(labels[i]): float(probs[i])
-                for i in range(len(labels))
-            }
+            **prediction_fields(probs, labels, client_options.get(request.sid, DEFAULT_OPTIONS)),
+            **early_exit_response
         })
         
     except Exception as e:
@@ -227,6 +272,8 @@ if __name__ == '__main__':
     logger.info(f"   Sequence Length: {SEQ_LEN} frames")
     logger.info(f"{'='*60}\n")
     
+    # Load + warm up while the port is already bound
+    start_background(startup, load_sentence_model)
     try:
         socketio.run(
             app,
@@ -0,0 +1,196 @@
+"""
+replay_capture.py - Stream a captured session back into a recognizer
+
+Replays the records of a capture (see capture_log.py) in their original
+order, one Socket.IO client per captured client so per-client smoothing and
+stability state behaves as it did live. Timing follows the capture
+timestamps scaled by --speed (0 = as fast as possible, each client still
+waits for its reply before sending the next event). Each replayed client is
+put in the response/event modes its captured client had, and a frame the
+live server did not answer in 'changes' event mode only waits
+SILENT_TIMEOUT for a reply.
+
+Targets:
+    --url http://localhost:5006   a running server, over Socket.IO
+    --in-process                  import the category's server module (from
+                                  model_registry.py, or CAPTURE_SERVERS) and
+                                  use Flask-SocketIO's test client, no network
+                                  involved
+
+Usage:
+    python replay_capture.py captures/colours --url http://localhost:5006 --speed 2
+    python replay_capture.py captures/days --in-process --speed 0 --json replay.json
+"""
+
+import argparse
+import importlib
+import json
+import logging
+import os
+import sys
+import threading
+import time
+
+import numpy as np
+
+from capture_log import RESULT_EVENTS, CaptureReader, result_fields
+from model_registry import get_entry
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+REPLY_TIMEOUT = 10.0
+SILENT_TIMEOUT = 0.5  # frames that got no reply live ('changes' event mode)
+# Capture categories of servers that are not a model_registry entry
+CAPTURE_SERVERS = {'alphabet_landmarks': 'app.py'}
+
+
+class SocketClient:
+    """python-socketio client that waits for the reply to each event"""
+
+    def __init__(self, url):
+        import socketio
+
+        self.client = socketio.Client(reconnection=False)
+        self.reply = None
+        self.received = threading.Event()
+        for event in RESULT_EVENTS:
+            self.client.on(event, self._handler(event))
+        self.client.connect(url)
+
+    def _handler(self, event):
+        def on_result(data):
+            if not self.received.is_set():
+                self.reply = (event, data)
+                self.received.set()
+        return on_result
+
+    def configure(self, options):
+        self.client.emit('configure', options)
+
+    def send(self, event, payload, timeout=REPLY_TIMEOUT):
+        self.reply = None
+        self.received.clear()
+        self.client.emit(event, payload)
+        self.received.wait(timeout)
+        return self.reply
+
+    def close(self):
+        self.client.disconnect()
+
+
+class InProcessClient:
+    """Flask-SocketIO test client against an imported server module"""
+
+    def __init__(self, server):
+        self.client = server.socketio.test_client(server.app)
+
+    def configure(self, options):
+        self.client.emit('configure', options)
+        self.client.get_received()
+
+    def send(self, event, payload, timeout=REPLY_TIMEOUT):
+        # Handlers run synchronously here, nothing to wait for
+        self.client.emit(event, payload)
+        for message in self.client.get_received():
+            if message['name'] in RESULT_EVENTS:
+                return message['name'], message['args'][0]
+        return None
+
+    def close(self):
+        self.client.disconnect()
+
+
+def replay(reader, make_client, speed, limit=None):
+    """Replay reader's records; returns per-record (latency_s, status, label, recorded label)"""
+    index = reader.index[:limit] if limit else reader.index
+    order = np.argsort(index['ts'], kind='stable')
+    clients = {}
+    options = {}  # sid -> modes last sent in a 'configure'
+    results = []
+    t0 = index['ts'][order[0]] if len(order) else 0.0
+    start = time.perf_counter()
+
+    try:
+        for i in order:
+            rec = index[i]
+            if speed > 0:
+                delay = (rec['ts'] - t0) / speed - (time.perf_counter() - start)
+                if delay > 0:
+                    time.sleep(delay)
+
+            sid = int(rec['sid_hash'])
+            if sid not in clients:
+                clients[sid] = make_client()
+            captured = reader.options(i)
+            if options.get(sid) != captured:
+                clients[sid].configure(captured)
+                options[sid] = captured
+            silent = captured['event_mode'] == 'changes' and rec['status'] == b'silent'
+
+            sent = time.perf_counter()
+            reply = clients[sid].send(rec['event'].decode(), reader.payload(i),
+                                      SILENT_TIMEOUT if silent else REPLY_TIMEOUT)
+            latency = time.perf_counter() - sent
+            label, _, status = result_fields(*reply) if reply else ('', 0.0, 'silent')
+            results.append((latency, status, label, rec['label'].decode(), rec['status'].decode()))
+    finally:
+        for client in clients.values():
+            client.close()
+    return results
+
+
+def summarize(results, category):
+    latencies = np.array([r[0] for r in results]) * 1000.0
+    statuses = [r[1] for r in results]
+    comparable = [r for r in results if r[1] == 'ok' and r[4] == 'ok']
+    return {
+        'category': category,
+        'events': len(results),
+        'statuses': {s: statuses.count(s) for s in sorted(set(statuses))},
+        'latency_ms': {
+            'p50': float(np.percentile(latencies, 50)) if len(latencies) else None,
+            'p95': float(np.percentile(latencies, 95)) if len(latencies) else None,
+            'p99': float(np.percentile(latencies, 99)) if len(latencies) else None,
+            'max': float(latencies.max()) if len(latencies) else None,
+        },
+        'label_agreement': (sum(r[2] == r[3] for r in comparable) / len(comparable)) if comparable else None,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Replay a captured session into a recognizer")
+    parser.add_argument('capture', help="Capture directory of one category (<EDUSIGN_CAPTURE_DIR>/<category>)")
+    target = parser.add_mutually_exclusive_group(required=True)
+    target.add_argument('--url', help="Socket.IO URL of a running recognizer")
+    target.add_argument('--in-process', action='store_true', help="Import the category's server and use its test client")
+    parser.add_argument('--speed', type=float, default=1.0, help="Time scale (1 = original pace, 0 = no waiting)")
+    parser.add_argument('--limit', type=int, help="Only replay the first N records")
+    parser.add_argument('--json', help="Write the summary to this file")
+    args = parser.parse_args()
+
+    reader = CaptureReader(args.capture)
+    if not len(reader):
+        logger.error(f"❌ No records in {args.capture}")
+        sys.exit(1)
+    logger.info(f"📼 {reader.category}: {len(reader)} records")
+
+    if args.in_process:
+        server_file = CAPTURE_SERVERS.get(reader.category) or get_entry(reader.category)['server']
+        sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+        server = importlib.import_module(server_file[:-3])
+        make_client = lambda: InProcessClient(server)
+    else:
+        make_client = lambda: SocketClient(args.url)
+
+    summary = summarize(replay(reader, make_client, args.speed, args.limit), reader.category)
+    print(json.dumps(summary, indent=2))
+
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump(summary, f, indent=2)
+        logger.info(f"✅ Summary written to {args.json}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,90 @@
+"""
+Client-selectable payload and event modes for prediction responses.
+
+    full       legacy 'all_predictions' {label: probability} dict (default)
+    top1       only label + confidence
+    topk       'top_k' list of the k best labels (argpartition, no full sort)
+    probs_f16  'probs' packed little-endian float16 vector (binary attachment),
+               indexed by the label table sent once in 'connection_response'
+
+event_mode 'changes' switches the client to the change-only event stream
+(see event_stream.py); the default 'all' emits a prediction per frame.
+
+Clients pick a mode with ?response_mode=topk&top_k=3 on the Socket.IO
+connect URL, or later with a 'configure' event carrying the same keys.
+Invalid options are logged and leave the client's previous options (the
+defaults at connect) in place; a 'configure' event gets the error back.
+"""
+
+import logging
+from collections.abc import Mapping
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+RESPONSE_MODES = ('full', 'top1', 'topk', 'probs_f16')
+DEFAULT_RESPONSE_MODE = 'full'
+DEFAULT_TOP_K = 3
+
+EVENT_MODES = ('all', 'changes')
+DEFAULT_EVENT_MODE = 'all'
+
+DEFAULT_OPTIONS = {'response_mode': DEFAULT_RESPONSE_MODE, 'top_k': DEFAULT_TOP_K, 'event_mode': DEFAULT_EVENT_MODE}
+
+PROBS_DTYPE = np.dtype('<f2')
+
+
+def parse_response_options(source):
+    """Read response_mode/top_k/event_mode from a 'configure' payload or connect query args"""
+    mode = source.get('response_mode') or DEFAULT_RESPONSE_MODE
+    if mode not in RESPONSE_MODES:
+        raise ValueError(f"Unknown response_mode '{mode}', expected one of {', '.join(RESPONSE_MODES)}")
+    try:
+        k = int(source.get('top_k', DEFAULT_TOP_K))
+    except (TypeError, ValueError):
+        raise ValueError(f"Invalid top_k: {source.get('top_k')}")
+    event_mode = source.get('event_mode') or DEFAULT_EVENT_MODE
+    if event_mode not in EVENT_MODES:
+        raise ValueError(f"Unknown event_mode '{event_mode}', expected one of {', '.join(EVENT_MODES)}")
+    return {'response_mode': mode, 'top_k': max(k, 1), 'event_mode': event_mode}
+
+
+def configure_client(client_options, sid, source):
+    """Store validated options for sid; returns the 'configured' event payload"""
+    try:
+        if source is not None and not isinstance(source, Mapping):
+            raise ValueError(f"Options must be an object, got {type(source).__name__}")
+        client_options[sid] = parse_response_options({**client_options.get(sid, {}), **(source or {})})
+    except ValueError as e:
+        logger.warning(f"⚠️ Rejected response options for {sid}: {e}")
+        return {'success': False, 'error': str(e)}
+    return {'success': True, **client_options[sid]}
+
+
+def label_table(labels):
+    """Label table sent once at connect so 'probs_f16' vectors can be decoded"""
+    return {'labels': list(labels), 'probs_dtype': 'float16', 'probs_byteorder': 'little'}
+
+
+def top_k_indices(probs, k):
+    """Indices of the k largest probabilities, best first"""
+    probs = np.asarray(probs)
+    k = min(k, probs.shape[0])
+    idx = np.argpartition(probs, -k)[-k:]
+    return idx[np.argsort(probs[idx])[::-1]]
+
+
+def prediction_fields(probs, labels, options=DEFAULT_OPTIONS):
+    """Probability payload for one prediction in the client's response mode"""
+    mode = options['response_mode']
+    if mode == 'top1':
+        return {}
+    if mode == 'topk':
+        return {'top_k': [
+            {'label': labels[i], 'confidence': float(probs[i])}
+            for i in top_k_indices(probs, options['top_k'])
+        ]}
+    if mode == 'probs_f16':
+        return {'probs': np.asarray(probs, dtype=PROBS_DTYPE).tobytes()}
+    return {'all_predictions': dict(zip(labels, np.asarray(probs, dtype=np.float64).tolist()))}
@@ -4,6 +4,7 @@ import numpy as np
 from tensorflow import keras
 import logging
 from firebase_admin_config import initialize_firebase
+from batch_api import batch_response, batch_results, parse_batch_request, predict_probs, static_batch
 
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
@@ -43,6 +44,22 @@ def predict():
         logger.error(f"❌ Prediction error: {str(e)}")
         return jsonify({'error': str(e)}), 500
 
+@app.route('/predict_batch', methods=['POST'])
+def predict_batch():
+    """Score many landmark vectors in one batched forward pass (see batch_api.py)"""
+    try:
+        items, top_k, _ = parse_batch_request(request)
+        batch = static_batch(items, model.input_shape[1])
+        probs = predict_probs(model, batch)
+        logger.info(f"📦 Batch prediction: {len(batch)} items")
+        labels = [str(c) for c in label_encoder_classes]
+        return jsonify(batch_response(batch_results(probs, labels, top_k, valid=np.count_nonzero(batch, axis=1) > 0)))
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    except Exception as e:
+        logger.error(f"❌ Batch prediction error: {str(e)}")
+        return jsonify({'error': str(e)}), 500
+
 @app.route('/health', methods=['GET'])
 def health():
     return jsonify({'status': 'healthy', 'model': 'loaded'})
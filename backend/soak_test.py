@@ -0,0 +1,261 @@
+"""
+soak_test.py - Long-running memory soak of one recognizer
+
+Imports a recognizer in-process (like replay_capture.py --in-process) and
+drives its handlers for hours through Flask-SocketIO test clients: --clients
+simulated learners sending replayed (--capture) or synthetic events at
+--fps, with one learner disconnecting and a new one connecting every
+--churn-interval seconds. Every --sample-interval it records
+
+    rss_mb          process resident set size
+    heap_mb         Python heap traced by tracemalloc
+    objects         objects tracked by the garbage collector
+    tf_memory       TensorFlow allocator stats per device, where available
+    client_state    sizes of the server's per-client dicts (client_*)
+    gc              collections and pauses per generation (gc_tuning.py)
+
+After --warmup-minutes it takes a baseline, fits a linear slope (MB/hour)
+to RSS and heap, and at the end reports the top growing allocation sites
+and object types. Exits 1 if a slope exceeds --max-rss-slope /
+--max-heap-slope, or if per-client state outlives its clients.
+
+Usage:
+    python soak_test.py colours --hours 4 --clients 8 --fps 10 --json colours_soak.json
+    python soak_test.py days --capture captures/days --hours 2 --churn-interval 10
+"""
+
+import argparse
+import gc
+import importlib
+import json
+import logging
+import os
+import sys
+import time
+import tracemalloc
+from collections import Counter
+
+import numpy as np
+
+from capture_log import RESULT_EVENTS, CaptureReader, result_fields
+from gc_tuning import gc_stats
+from model_registry import BASE_DIR, get_entry
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+TRACE_FRAMES = 10
+TOP_N = 15
+
+
+def rss_mb():
+    with open('/proc/self/status') as f:
+        for line in f:
+            if line.startswith('VmRSS:'):
+                return int(line.split()[1]) / 1024.0
+    return None
+
+
+def tf_memory():
+    """{device: {'current_mb', 'peak_mb'}} for devices whose allocator reports stats"""
+    tf = sys.modules.get('tensorflow')
+    if tf is None:
+        return {}
+    info = {}
+    for device in tf.config.list_logical_devices():
+        try:
+            stats = tf.config.experimental.get_memory_info(device.name)
+        except (ValueError, RuntimeError):
+            continue  # e.g. CPU allocators without stats
+        info[device.name] = {'current_mb': stats['current'] / 2 ** 20, 'peak_mb': stats['peak'] / 2 ** 20}
+    return info
+
+
+def client_state_sizes(server):
+    """Sizes of the server's module-level per-client dicts"""
+    return {name: len(value) for name, value in vars(server).items()
+            if name.startswith('client_') and isinstance(value, dict)}
+
+
+def type_counts():
+    return Counter(type(obj).__name__ for obj in gc.get_objects())
+
+
+def slope_per_hour(times_s, values):
+    """Least-squares slope in units per hour, None with fewer than 3 points"""
+    if len(times_s) < 3:
+        return None
+    return float(np.polyfit(np.asarray(times_s) / 3600.0, np.asarray(values), 1)[0])
+
+
+class Learner:
+    def __init__(self, server, payloads, offset):
+        self.client = server.socketio.test_client(server.app)
+        self.payloads = payloads
+        self.next = offset
+
+    def send(self):
+        event, payload = self.payloads[self.next % len(self.payloads)]
+        self.next += 1
+        self.client.emit(event, payload)
+        # Drain replies every time, the test client would otherwise keep them all
+        for message in self.client.get_received():
+            if message['name'] in RESULT_EVENTS:
+                return result_fields(message['name'], message['args'][0] if message['args'] else None)[2]
+        return 'silent'
+
+    def close(self):
+        self.client.disconnect()
+
+
+def load_payloads(args, entry):
+    if args.capture:
+        reader = CaptureReader(args.capture)
+        return [(reader.index['event'][i].decode(), reader.payload(i)) for i in range(len(reader))]
+    from load_test import synthetic_payloads
+
+    features = entry['feature_size']
+    return [('predict', payload) for learner in range(8) for payload in synthetic_payloads(entry, features, learner)]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Long-running memory soak of one recognizer")
+    parser.add_argument('model', help="Registered model name; its server is imported in-process")
+    parser.add_argument('--hours', type=float, default=1.0)
+    parser.add_argument('--clients', type=int, default=8)
+    parser.add_argument('--fps', type=float, default=10.0, help="Events per second per client")
+    parser.add_argument('--churn-interval', type=float, default=30.0, help="Seconds between client reconnects (0 = none)")
+    parser.add_argument('--capture', help="Replay payloads from this capture directory instead of synthetic ones")
+    parser.add_argument('--sample-interval', type=float, default=60.0)
+    parser.add_argument('--warmup-minutes', type=float, default=10.0, help="Excluded from the slope fit")
+    parser.add_argument('--max-rss-slope', type=float, default=20.0, help="Allowed RSS growth, MB/hour")
+    parser.add_argument('--max-heap-slope', type=float, default=10.0, help="Allowed Python heap growth, MB/hour")
+    parser.add_argument('--json', help="Write the report to this file")
+    args = parser.parse_args()
+
+    entry = get_entry(args.model)
+    os.chdir(BASE_DIR)  # servers use paths relative to the backend directory
+    sys.path.insert(0, BASE_DIR)
+    logger.info(f"📦 Importing {entry['server']}")
+    server = importlib.import_module(entry['server'][:-3])
+    payloads = load_payloads(args, entry)
+    logger.info(f"🔁 {len(payloads)} payloads, {args.clients} clients x {args.fps:g} fps for {args.hours:g}h")
+
+    tracemalloc.start(TRACE_FRAMES)
+    learners = [Learner(server, payloads, i * 7) for i in range(args.clients)]
+    interval = 1.0 / (args.clients * args.fps)
+    start = time.monotonic()
+    end = start + args.hours * 3600.0
+    warmup_end = start + args.warmup_minutes * 60.0
+    next_sample = start
+    next_churn = start + args.churn_interval if args.churn_interval else float('inf')
+    next_event = start
+    events = reconnects = 0
+    statuses = Counter()
+    samples = []
+    baseline = None
+    turn = 0
+
+    try:
+        while time.monotonic() < end:
+            now = time.monotonic()
+            if now >= next_sample:
+                sample = {
+                    't_s': round(now - start, 1),
+                    'events': events,
+                    'reconnects': reconnects,
+                    'rss_mb': rss_mb(),
+                    'heap_mb': tracemalloc.get_traced_memory()[0] / 2 ** 20,
+                    'objects': len(gc.get_objects()),
+                    'tf_memory': tf_memory(),
+                    'client_state': client_state_sizes(server),
+                    'gc': gc_stats(),
+                }
+                samples.append(sample)
+                logger.info(f"📈 {sample['t_s'] / 60:.0f}min: rss {sample['rss_mb']:.0f}MB, heap {sample['heap_mb']:.1f}MB, "
+                            f"{sample['objects']} objects, {events} events")
+                if baseline is None and now >= warmup_end:
+                    baseline = (tracemalloc.take_snapshot(), type_counts(), now - start)
+                    logger.info("📌 Warmup over, baseline taken")
+                next_sample += args.sample_interval
+
+            if now >= next_churn:
+                # Replace one learner: disconnect, then a fresh connection
+                index = reconnects % len(learners)
+                learners[index].close()
+                learners[index] = Learner(server, payloads, reconnects)
+                reconnects += 1
+                next_churn += args.churn_interval
+
+            statuses[learners[turn % len(learners)].send()] += 1
+            events += 1
+            turn += 1
+            next_event += interval
+            delay = next_event - time.monotonic()
+            if delay > 0:
+                time.sleep(delay)
+    except KeyboardInterrupt:
+        logger.info("⏹️ Interrupted, reporting what was collected")
+    finally:
+        for learner in learners:
+            learner.close()
+
+    # Per-client state must not outlive the clients (all are disconnected now)
+    leftover = {name: size for name, size in client_state_sizes(server).items() if size}
+
+    fit = [s for s in samples if baseline and s['t_s'] >= baseline[2]]
+    rss_slope = slope_per_hour([s['t_s'] for s in fit], [s['rss_mb'] for s in fit])
+    heap_slope = slope_per_hour([s['t_s'] for s in fit], [s['heap_mb'] for s in fit])
+
+    top_allocators, top_types = [], []
+    if baseline:
+        snapshot = tracemalloc.take_snapshot()
+        for stat in snapshot.compare_to(baseline[0], 'lineno')[:TOP_N]:
+            frame = stat.traceback[0]
+            top_allocators.append({'site': f"{frame.filename}:{frame.lineno}",
+                                   'size_diff_kb': stat.size_diff / 1024.0, 'count_diff': stat.count_diff})
+        growth = type_counts()
+        growth.subtract(baseline[1])
+        top_types = [{'type': name, 'count_diff': diff} for name, diff in growth.most_common(TOP_N) if diff > 0]
+    tracemalloc.stop()
+
+    failures = []
+    if rss_slope is not None and rss_slope > args.max_rss_slope:
+        failures.append(f"RSS grows {rss_slope:.1f} MB/hour > {args.max_rss_slope:g}")
+    if heap_slope is not None and heap_slope > args.max_heap_slope:
+        failures.append(f"Python heap grows {heap_slope:.1f} MB/hour > {args.max_heap_slope:g}")
+    if leftover:
+        failures.append(f"Per-client state left after all clients disconnected: {leftover}")
+
+    report = {
+        'model': args.model,
+        'server': entry['server'],
+        'duration_s': samples[-1]['t_s'] if samples else 0.0,
+        'events': events,
+        'reconnects': reconnects,
+        'statuses': dict(statuses),
+        'rss_slope_mb_per_hour': rss_slope,
+        'heap_slope_mb_per_hour': heap_slope,
+        'verdict': 'fail' if failures else 'pass' if rss_slope is not None else 'inconclusive',
+        'failures': failures,
+        'leftover_client_state': leftover,
+        'top_allocators': top_allocators,
+        'top_growing_types': top_types,
+        'samples': samples,
+    }
+    print(json.dumps({k: v for k, v in report.items() if k != 'samples'}, indent=2))
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump(report, f, indent=2)
+        logger.info(f"✅ Report written to {args.json}")
+
+    if failures:
+        for failure in failures:
+            logger.error(f"❌ {failure}")
+        sys.exit(1)
+    if rss_slope is None:
+        logger.warning("⚠️ Not enough samples after warmup to fit a slope")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,115 @@
+"""
+Connect-time authentication of Socket.IO clients.
+
+With EDUSIGN_SOCKET_AUTH set, a recognizer verifies the client's Firebase
+ID token once, when the connection is made, and remembers the uid for the
+session; prediction events are not checked again:
+
+    off        (default) no authentication, as before
+    optional   a token is verified if sent, anonymous clients are allowed
+    required   connections without a valid token are refused
+
+The token is read from the Socket.IO auth payload (io(url, {auth: {token}}))
+or, for older clients, the token query parameter. A refused connection
+gets a connect_error with {'message': 'unauthorized'}. session_uid() is
+the uid of the current client (None if anonymous).
+
+install_socket_auth wraps the connect and disconnect handlers registered
+after it, so it is called before the server's @socketio.on handlers.
+Verification goes through firebase_admin_config.verify_token (cached, see
+token_cache.py), which is imported only when authentication is on.
+"""
+
+import inspect
+import logging
+import os
+from functools import wraps
+
+from flask import request
+from flask_socketio import ConnectionRefusedError
+
+logger = logging.getLogger(__name__)
+
+SOCKET_AUTH_ENV = 'EDUSIGN_SOCKET_AUTH'
+MODES = ('off', 'optional', 'required')
+
+# sid -> uid of authenticated clients
+SESSION_UIDS = {}
+
+
+def session_uid(sid=None):
+    return SESSION_UIDS.get(sid or request.sid)
+
+
+def client_token(auth):
+    if isinstance(auth, dict) and auth.get('token'):
+        return auth['token']
+    return request.args.get('token')
+
+
+def call_connect(handler, auth):
+    # Flask-SocketIO passes auth only to connect handlers that take it
+    return handler(auth) if handler_takes_auth(handler) else handler()
+
+
+def handler_takes_auth(handler):
+    try:
+        return len(inspect.signature(handler).parameters) > 0
+    except (TypeError, ValueError):
+        return False
+
+
+def install_socket_auth(socketio, server, verify=None):
+    """Authenticate connections per EDUSIGN_SOCKET_AUTH; returns the mode"""
+    mode = os.environ.get(SOCKET_AUTH_ENV, 'off').lower()
+    if mode not in MODES:
+        logger.warning(f"⚠️ Invalid {SOCKET_AUTH_ENV}={mode!r}, expected one of {', '.join(MODES)}; auth off")
+        mode = 'off'
+    if mode == 'off':
+        return mode
+    if verify is None:
+        from firebase_admin_config import get_token_cache, verify_token as verify
+        get_token_cache()  # certificates are fetched at start, not on the first connect
+
+    def authenticate(auth):
+        token = client_token(auth)
+        if not token:
+            if mode == 'required':
+                logger.warning(f"🔒 {server}: refused {request.sid}, no token")
+                raise ConnectionRefusedError('unauthorized')
+            return
+        result = verify(token)
+        if not result['success']:
+            logger.warning(f"🔒 {server}: refused {request.sid}, invalid token")
+            raise ConnectionRefusedError('unauthorized')
+        SESSION_UIDS[request.sid] = result['uid']
+
+    on = socketio.on
+
+    def authenticated_on(message, namespace=None):
+        register = on(message, namespace)
+        if message == 'connect':
+            def decorator(handler):
+                @wraps(handler)
+                def connect(auth=None):
+                    authenticate(auth)
+                    return call_connect(handler, auth)
+                register(connect)
+                return handler
+            return decorator
+        if message == 'disconnect':
+            def decorator(handler):
+                @wraps(handler)
+                def disconnect(*args):
+                    try:
+                        return handler(*args)
+                    finally:
+                        SESSION_UIDS.pop(request.sid, None)
+                register(disconnect)
+                return handler
+            return decorator
+        return register
+
+    socketio.on = authenticated_on
+    logger.info(f"🔒 Socket.IO connect authentication: {mode}")
+    return mode
@@ -0,0 +1,176 @@
+"""
+Cold-start helpers shared by the recognizers.
+
+A recognizer used to import TensorFlow, load and compile its model(s) and
+run a warmup prediction before it even bound its port, so a restarted pod
+was invisible for tens of seconds. With these helpers a server:
+
+  - creates a StartupTimeline right after its light imports,
+  - keeps TensorFlow out of module scope (import_tensorflow is called from
+    the loader),
+  - loads several models at once with load_parallel,
+  - runs the whole load + compile + warmup with start_background while
+    socketio.run binds the port; /health answers 503 with the timeline
+    until the model is ready, and prediction events get a 'not ready'
+    reply instead of failing.
+
+Background work runs on a real OS thread: eventlet.tpool for eventlet
+servers (the hub keeps serving /health meanwhile), a daemon thread for
+threading-mode servers.
+"""
+
+import logging
+import os
+import threading
+import time
+from contextlib import contextmanager
+
+logger = logging.getLogger(__name__)
+
+NOT_READY_ERROR = 'Model is still loading, try again shortly'
+
+
+def process_start_time():
+    """Wall-clock time the current process was started (Linux), else now"""
+    try:
+        with open('/proc/self/stat') as f:
+            start_ticks = int(f.read().rsplit(')', 1)[1].split()[19])
+        with open('/proc/uptime') as f:
+            uptime = float(f.read().split()[0])
+        return time.time() - uptime + start_ticks / os.sysconf('SC_CLK_TCK')
+    except (OSError, ValueError, IndexError):
+        return time.time()
+
+
+def _eventlet_patched():
+    try:
+        from eventlet import patcher
+    except ImportError:
+        return False
+    return patcher.is_monkey_patched('thread')
+
+
+def real_threading():
+    """The unpatched threading module (eventlet turns the patched one into green threads)"""
+    if _eventlet_patched():
+        from eventlet import patcher
+        return patcher.original('threading')
+    return threading
+
+
+class StartupTimeline:
+    """Per-phase startup timings (seconds since process start) and readiness"""
+
+    def __init__(self):
+        self.started = process_start_time()
+        self.phases = []
+        self.ready = False
+        self.error = None
+        self.ready_after = None
+        self.details = {}  # extra startup facts for /health, e.g. 'xla_cache'
+        self.lock = real_threading().Lock()
+        self.record('imports', self.started, time.time())
+
+    def record(self, name, start, end):
+        with self.lock:
+            self.phases.append({
+                'phase': name,
+                'start_s': round(start - self.started, 3),
+                'duration_s': round(end - start, 3),
+            })
+        logger.info(f"⏱️ Startup {name}: {end - start:.2f}s")
+
+    @contextmanager
+    def phase(self, name):
+        start = time.time()
+        try:
+            yield
+        finally:
+            self.record(name, start, time.time())
+
+    def set_ready(self):
+        self.ready_after = time.time() - self.started
+        self.ready = True
+        logger.info(f"✅ Ready {self.ready_after:.2f}s after process start")
+
+    def set_failed(self, error):
+        self.error = str(error)
+        logger.error(f"❌ Startup failed: {error}")
+
+    @property
+    def status(self):
+        return 'healthy' if self.ready else 'failed' if self.error else 'starting'
+
+    def to_dict(self):
+        with self.lock:
+            phases = list(self.phases)
+        return {
+            'ready': self.ready,
+            'error': self.error,
+            'ready_after_s': round(self.ready_after, 3) if self.ready_after is not None else None,
+            'uptime_s': round(time.time() - self.started, 3),
+            'phases': phases,
+            **self.details,
+        }
+
+
+def import_tensorflow(timeline):
+    """Import TensorFlow (once) as a timed phase"""
+    with timeline.phase('import_tensorflow'):
+        import tensorflow as tf
+    return tf
+
+
+def load_parallel(timeline, loaders):
+    """Run {name: loader} concurrently on real threads; returns {name: result}"""
+    results, errors = {}, {}
+
+    def run(name, loader):
+        try:
+            with timeline.phase(f'load_{name}'):
+                results[name] = loader()
+        except Exception as e:
+            errors[name] = e
+
+    threads = [real_threading().Thread(target=run, args=item, daemon=True) for item in loaders.items()]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    if errors:
+        name, error = next(iter(errors.items()))
+        raise RuntimeError(f"Loading {name} failed: {error}") from error
+    return results
+
+
+def warm_start(timeline, load):
+    """Run load() (imports, model loads, warmup) and mark the server ready or failed"""
+    try:
+        load()
+    except Exception as e:
+        timeline.set_failed(e)
+        return False
+    timeline.set_ready()
+    return True
+
+
+def start_background(timeline, load):
+    """warm_start on a real OS thread so the server can bind its port meanwhile"""
+    if _eventlet_patched():
+        import eventlet
+        from eventlet import tpool
+        return eventlet.spawn(tpool.execute, warm_start, timeline, load)
+    thread = threading.Thread(target=warm_start, args=(timeline, load), daemon=True, name='warm-start')
+    thread.start()
+    return thread
+
+
+def health_payload(timeline, **fields):
+    """(/health body, status code): 503 until the model is ready"""
+    body = {'status': timeline.status, **fields, 'startup': timeline.to_dict()}
+    return body, 200 if timeline.ready else 503
+
+
+def not_ready_payload(timeline, **fields):
+    """Prediction reply for events that arrive before the model is ready"""
+    return {'success': False, 'ready': False, 'error': timeline.error or NOT_READY_ERROR, **fields}
@@ -0,0 +1,97 @@
+"""
+Shared preprocessing for the static (single frame) recognizers.
+
+Every function takes a batch of hand feature vectors, (N, 126) for two
+hands or (N, 63) for one hand (21 landmarks x (x, y, z) per hand), and works
+on the whole batch at once. A single 1-D vector is accepted too and treated
+as a batch of one, so the servers can call these per frame today and on
+batches of frames later.
+
+    fit_length        pad with zeros / truncate to the model feature size
+    bbox_normalize    per-hand bounding-box origin (x, y minus their minimum)
+    best_hand         pick the hand with more non-zero values (126 -> 63)
+    standardize       (x - mean) / std with training-time stats
+    nonzero_ratio     fraction of non-zero features, used to gate bad frames
+"""
+
+import numpy as np
+
+HAND_LANDMARKS = 21
+HAND_FEATURES = HAND_LANDMARKS * 3  # 63
+TWO_HAND_FEATURES = HAND_FEATURES * 2  # 126
+
+MIN_NONZERO_RATIO = 0.3
+
+
+def as_batch(features):
+    """Return features as a 2-D float32 (N, F) array"""
+    x = np.asarray(features, dtype=np.float32)
+    if x.ndim == 1:
+        return x.reshape(1, -1)
+    return x.reshape(x.shape[0], -1)
+
+
+def fit_length(features, size):
+    """Zero-pad or truncate every row to `size` features"""
+    x = as_batch(features)
+    n, f = x.shape
+    if f == size:
+        return x
+    if f > size:
+        return x[:, :size]
+    out = np.zeros((n, size), dtype=np.float32)
+    out[:, :f] = x
+    return out
+
+
+def bbox_normalize(features):
+    """
+    Shift every hand so its bounding box starts at x=0, y=0 (z untouched).
+
+    Works on all hands of all rows in one pass; returns a new array. Trailing
+    features that do not make up a whole hand are dropped, as before.
+    """
+    x = as_batch(features)
+    hands = x.shape[1] // HAND_FEATURES
+    pts = x[:, :hands * HAND_FEATURES].reshape(x.shape[0], hands, HAND_LANDMARKS, 3)
+    out = pts.copy()
+    out[..., :2] -= pts[..., :2].min(axis=2, keepdims=True)
+    return out.reshape(x.shape[0], hands * HAND_FEATURES)
+
+
+def best_hand(features, target_size):
+    """
+    Reduce two-hand rows to the hand with more non-zero values when the
+    model expects a single hand (ties go to the right hand).
+
+    Raises ValueError when the rows cannot be mapped to target_size.
+    """
+    x = as_batch(features)
+    f = x.shape[1]
+    if f == target_size:
+        return x
+    if f == TWO_HAND_FEATURES and target_size == HAND_FEATURES:
+        hands = x.reshape(x.shape[0], 2, HAND_FEATURES)
+        counts = np.count_nonzero(hands, axis=2)
+        pick = (counts[:, 1] >= counts[:, 0]).astype(np.intp)
+        return hands[np.arange(x.shape[0]), pick]
+    raise ValueError(f"Expected {target_size} features, got {f}")
+
+
+def standardize(features, mean, std):
+    """Standardize with training stats; a no-op when no stats were loaded"""
+    x = as_batch(features)
+    if mean is None or std is None:
+        return x
+    return ((x - mean) / np.maximum(std, 1e-8)).astype(np.float32, copy=False)
+
+
+def nonzero_ratio(features):
+    """Fraction of non-zero features per row, shape (N,)"""
+    x = as_batch(features)
+    return np.count_nonzero(x, axis=1) / max(x.shape[1], 1)
+
+
+def has_enough_data(features, min_ratio=MIN_NONZERO_RATIO):
+    """Boolean mask (N,) of rows with at least min_ratio non-zero features"""
+    return nonzero_ratio(features) >= min_ratio
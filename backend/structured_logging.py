@@ -0,0 +1,180 @@
+"""
+Structured, sampled, asynchronous logging for the recognizers.
+
+configure_logging(server) replaces logging.basicConfig in a server:
+
+  - records go to an in-memory queue; a real OS thread (not a green thread
+    under eventlet) formats and writes them in batches, so a prediction
+    handler never formats a message or blocks on stderr
+  - messages are formatted lazily: hot-path calls pass %-style args
+    (logger.info('%s (%.2f)', label, conf)) instead of f-strings, and the
+    writer thread builds the string. Pass immutable args (str, numbers),
+    not arrays or buffers that are reused after the call
+  - output is one JSON object per line (EDUSIGN_LOG_FORMAT=text for the
+    plain basicConfig format): ts, level, server, logger, msg, plus the
+    event type and fields of log_event() calls
+  - per-event-type sampling (EDUSIGN_LOG_SAMPLING, e.g.
+    "prediction=0.1,frame=0.01", defaults in DEFAULT_SAMPLING): a handler
+    checks sampled('frame') once per request and only then builds its
+    per-frame diagnostics (top-k lists, non-zero counts, whole responses)
+
+Socket.IO/Engine.IO packet logging, which writes several lines per frame,
+is off unless EDUSIGN_SOCKETIO_LOGS=1 (see SOCKETIO_LOGGING).
+
+If more than MAX_PENDING records are waiting, new ones are dropped and the
+writer reports how many.
+"""
+
+import atexit
+import json
+import logging
+import os
+import random
+import sys
+from collections import deque
+
+from startup import real_threading
+
+logger = logging.getLogger(__name__)
+
+FORMAT_ENV = 'EDUSIGN_LOG_FORMAT'
+SAMPLING_ENV = 'EDUSIGN_LOG_SAMPLING'
+SOCKETIO_LOGS_ENV = 'EDUSIGN_SOCKETIO_LOGS'
+TEXT_FORMAT = logging.BASIC_FORMAT
+# 'prediction': one summary line per result; 'frame': per-frame diagnostics
+DEFAULT_SAMPLING = {'prediction': 1.0, 'frame': 0.0}
+MAX_PENDING = 10000
+FLUSH_INTERVAL = 0.2  # seconds between writer batches
+
+SOCKETIO_LOGGING = os.environ.get(SOCKETIO_LOGS_ENV, '').lower() in ('1', 'true')
+
+
+def sampling_from_env():
+    rates = dict(DEFAULT_SAMPLING)
+    value = os.environ.get(SAMPLING_ENV, '')
+    for item in filter(None, (part.strip() for part in value.split(','))):
+        try:
+            event, rate = item.split('=')
+            rates[event.strip()] = min(max(float(rate), 0.0), 1.0)
+        except ValueError:
+            logger.warning(f"⚠️ Invalid {SAMPLING_ENV} entry {item!r}, expected event=rate")
+    return rates
+
+
+SAMPLING = sampling_from_env()
+
+
+def sampled(event):
+    """Whether to log this occurrence of an event type (rate from SAMPLING, default 1)"""
+    rate = SAMPLING.get(event, 1.0)
+    return rate >= 1.0 or (rate > 0.0 and random.random() < rate)
+
+
+def log_event(log, event, msg, *args, level=logging.INFO, **fields):
+    """Log msg % args with an event type and structured fields, if the event is sampled"""
+    if log.isEnabledFor(level) and sampled(event):
+        log.log(level, msg, *args, extra={'event': event, 'fields': fields})
+
+
+class JsonFormatter(logging.Formatter):
+    """One JSON object per record"""
+
+    def __init__(self, server):
+        super().__init__()
+        self.server = server
+
+    def format(self, record):
+        entry = {
+            'ts': round(record.created, 3),
+            'level': record.levelname,
+            'server': self.server,
+            'logger': record.name,
+            'msg': record.getMessage(),
+        }
+        event = getattr(record, 'event', None)
+        if event:
+            entry['event'] = event
+            entry.update(getattr(record, 'fields', None) or {})
+        if record.exc_info:
+            entry['exc'] = self.formatException(record.exc_info)
+        return json.dumps(entry, ensure_ascii=False, default=str)
+
+
+class BackgroundHandler(logging.Handler):
+    """Queue records; a real OS thread formats and writes them in batches"""
+
+    def __init__(self, stream=None):
+        super().__init__()
+        self.stream = stream or sys.stderr
+        self.pending = deque()
+        self.dropped = 0
+        threading = real_threading()
+        self.write_lock = threading.Lock()
+        self.wake = threading.Event()
+        self.closed = False
+        self.thread = threading.Thread(target=self.run, daemon=True, name='log-writer')
+        self.thread.start()
+
+    def handle(self, record):
+        # No handler lock: deque appends are atomic, and callers may be green
+        # threads or tpool workers
+        if self.filter(record):
+            self.emit(record)
+        return record
+
+    def emit(self, record):
+        if len(self.pending) >= MAX_PENDING:
+            self.dropped += 1
+            return
+        self.pending.append(record)
+
+    def drain(self):
+        with self.write_lock:
+            lines = []
+            while self.pending:
+                record = self.pending.popleft()
+                try:
+                    lines.append(self.format(record))
+                except Exception:
+                    self.handleError(record)
+            if self.dropped:
+                dropped, self.dropped = self.dropped, 0
+                lines.append(self.format(logging.makeLogRecord({
+                    'name': __name__, 'levelno': logging.WARNING, 'levelname': 'WARNING',
+                    'msg': '⚠️ Log queue full, dropped %d records', 'args': (dropped,)})))
+            if lines:
+                try:
+                    self.stream.write('\n'.join(lines) + '\n')
+                    self.stream.flush()
+                except (OSError, ValueError):
+                    pass
+
+    def run(self):
+        while not self.closed:
+            self.wake.wait(FLUSH_INTERVAL)
+            self.drain()
+
+    def flush(self):
+        self.drain()
+
+    def close(self):
+        self.closed = True
+        self.wake.set()
+        self.drain()
+        super().close()
+
+
+def configure_logging(server, level=logging.INFO):
+    """Route all logging through a BackgroundHandler (JSON unless EDUSIGN_LOG_FORMAT=text)"""
+    handler = BackgroundHandler()
+    if os.environ.get(FORMAT_ENV, 'json').lower() == 'text':
+        handler.setFormatter(logging.Formatter(TEXT_FORMAT))
+    else:
+        handler.setFormatter(JsonFormatter(server))
+    root = logging.getLogger()
+    for existing in list(root.handlers):
+        root.removeHandler(existing)
+    root.addHandler(handler)
+    root.setLevel(level)
+    atexit.register(handler.close)
+    return handler
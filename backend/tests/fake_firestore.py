@@ -0,0 +1,114 @@
+"""
+In-memory stand-in for the Firestore client used by progress_writer.py:
+collection/document refs, get_all, WriteBatch set(merge=True) with the
+ArrayUnion / Increment / SERVER_TIMESTAMP transforms of `transforms`.
+
+fail_commits makes the next commits raise; before_commit(batch) runs just
+before a batch is applied, e.g. to look at a writer mid-flush.
+"""
+
+import time
+
+
+class ArrayUnion:
+    def __init__(self, values):
+        self.values = list(values)
+
+
+class Increment:
+    def __init__(self, value):
+        self.value = value
+
+
+class transforms:
+    """Drop-in for firebase_admin.firestore's write transforms"""
+    ArrayUnion = ArrayUnion
+    Increment = Increment
+    SERVER_TIMESTAMP = object()
+
+
+class Snapshot:
+    def __init__(self, id, data):
+        self.id = id
+        self.exists = data is not None
+        self._data = data
+
+    def to_dict(self):
+        return None if self._data is None else dict(self._data)
+
+
+class DocumentRef:
+    def __init__(self, collection, id):
+        self.collection = collection
+        self.id = id
+
+    def get(self):
+        return Snapshot(self.id, self.collection.documents.get(self.id))
+
+
+class CollectionRef:
+    def __init__(self):
+        self.documents = {}
+
+    def document(self, id):
+        return DocumentRef(self, id)
+
+
+class Batch:
+    def __init__(self, client):
+        self.client = client
+        self.writes = []
+
+    def set(self, ref, data, merge=False):
+        self.writes.append((ref, dict(data), merge))
+
+    def commit(self):
+        self.client.commit(self)
+
+
+def apply(doc, data):
+    for field, value in data.items():
+        if isinstance(value, ArrayUnion):
+            current = list(doc.get(field) or [])
+            doc[field] = current + [v for v in value.values if v not in current]
+        elif isinstance(value, Increment):
+            doc[field] = (doc.get(field) or 0) + value.value
+        elif value is transforms.SERVER_TIMESTAMP:
+            doc[field] = time.time()
+        else:
+            doc[field] = value
+
+
+class FakeFirestore:
+    def __init__(self):
+        self.collections = {}
+        self.fail_commits = 0
+        self.before_commit = None
+        self.commits = []  # uids of every applied batch
+        self.reads = 0
+
+    def collection(self, name):
+        return self.collections.setdefault(name, CollectionRef())
+
+    def document(self, collection, id):
+        return self.collection(collection).documents.get(id)
+
+    def get_all(self, refs):
+        self.reads += 1
+        return [ref.get() for ref in refs]
+
+    def batch(self):
+        return Batch(self)
+
+    def commit(self, batch):
+        if self.before_commit:
+            self.before_commit(batch)
+        if self.fail_commits:
+            self.fail_commits -= 1
+            raise ConnectionError('commit failed')
+        for ref, data, merge in batch.writes:
+            doc = ref.collection.documents.get(ref.id) if merge else None
+            doc = dict(doc or {})
+            apply(doc, data)
+            ref.collection.documents[ref.id] = doc
+        self.commits.append([ref.id for ref, _, _ in batch.writes])
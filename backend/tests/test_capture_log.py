@@ -0,0 +1,73 @@
+import numpy as np
+from flask import Flask, request
+from flask_socketio import SocketIO, emit
+
+from capture_log import CaptureLog, CaptureReader, install_capture
+from response_modes import configure_client
+
+
+def make_server(root):
+    app = Flask(__name__)
+    socketio = SocketIO(app, async_mode='threading')
+    log = install_capture(app, socketio, 'days', root=str(root))
+    client_options = {}
+
+    @socketio.on('connect')
+    def handle_connect():
+        configure_client(client_options, request.sid, request.args)
+
+    @socketio.on('configure')
+    def handle_configure(data):
+        emit('configured', configure_client(client_options, request.sid, data))
+
+    @socketio.on('predict')
+    def handle_predict(data):
+        if data.get('target') != 'silent':
+            emit('prediction', {'success': True, 'label': 'Monday', 'confidence': 0.9})
+
+    return app, socketio, log
+
+
+def test_records_are_written_by_the_background_writer(tmp_path):
+    log = CaptureLog(str(tmp_path), 'days')
+    vector = np.arange(126, dtype=np.float32)
+    sequence = np.ones((30, 1629), dtype=np.float32)
+    log.append('predict', 'landmarks', vector.tolist(), 'sid-1', target='Monday')
+    log.append('predict', 'sequence', sequence, 'sid-2')
+    log.close()
+
+    reader = CaptureReader(log.path)
+    assert len(reader) == 2
+    np.testing.assert_array_equal(reader.landmarks(0), vector)
+    np.testing.assert_array_equal(reader.landmarks(1), sequence)
+    assert reader.payload(0)['target'] == 'Monday'
+    assert reader.options(0) == {'response_mode': 'full', 'top_k': 3, 'event_mode': 'all'}
+
+
+def test_full_queue_drops_records(tmp_path, monkeypatch):
+    monkeypatch.setattr('capture_log.MAX_PENDING', 1)
+    log = CaptureLog(str(tmp_path), 'days')
+    with log.lock:  # keep the writer from draining
+        log.append('predict', 'landmarks', [1.0], 'a')
+        log.append('predict', 'landmarks', [2.0], 'a')
+    log.close()
+    assert len(CaptureReader(log.path)) == 1
+
+
+def test_captures_client_modes(tmp_path):
+    app, socketio, log = make_server(tmp_path)
+    client = socketio.test_client(app, query_string='response_mode=topk&top_k=2')
+    client.emit('predict', {'landmarks': [0.5] * 126, 'target': 'Monday'})
+    client.emit('configure', {'event_mode': 'changes'})
+    client.emit('predict', {'landmarks': [0.5] * 126, 'target': 'silent'})
+    client.disconnect()
+    log.close()
+
+    reader = CaptureReader(log.path)
+    assert len(reader) == 2
+    assert reader.options(0)['response_mode'] == 'topk'
+    assert reader.options(0)['event_mode'] == 'all'
+    assert reader.options(1)['response_mode'] == 'topk'
+    assert reader.options(1)['event_mode'] == 'changes'
+    assert reader.index['status'].tolist() == [b'ok', b'silent']
+    assert reader.index['label'][0] == b'Monday'
@@ -0,0 +1,76 @@
+import tracemalloc
+
+import numpy as np
+import pytest
+
+from motion_preprocessing import (InputBufferPool, pad_or_trim, preprocess_batch_into, preprocess_into,
+                                  robust_normalize)
+
+FEATURES = 1629
+SEQ_LEN = 30
+
+
+def reference(seq, length=SEQ_LEN):
+    return robust_normalize(pad_or_trim(seq, length))
+
+
+def frames(t, seed=0):
+    return np.random.default_rng(seed).normal(size=(t, FEATURES)).astype(np.float32)
+
+
+@pytest.mark.parametrize('t', [1, 10, SEQ_LEN, 45])
+def test_matches_reference(t):
+    seq = frames(t)
+    out = np.empty((SEQ_LEN, FEATURES), dtype=np.float32)
+    assert preprocess_into(seq, out) is out
+    np.testing.assert_allclose(out, reference(seq), atol=1e-5)
+
+
+def test_nan_falls_back_to_nan_aware_statistics():
+    seq = frames(20)
+    seq[3, :63] = np.nan
+    out = np.empty((SEQ_LEN, FEATURES), dtype=np.float32)
+    preprocess_into(seq, out)
+    np.testing.assert_allclose(out, reference(seq), atol=1e-5, equal_nan=True)
+
+
+def test_batch_buffer():
+    sequences = [frames(t, seed=t) for t in (10, SEQ_LEN, 45)]
+    out = np.empty((len(sequences), SEQ_LEN, FEATURES), dtype=np.float32)
+    preprocess_batch_into(sequences, out)
+    np.testing.assert_allclose(out, np.stack([reference(seq) for seq in sequences]), atol=1e-5)
+
+
+def test_pool_reuses_buffers():
+    pool = InputBufferPool(SEQ_LEN, FEATURES)
+    with pool.acquire() as first:
+        with pool.acquire() as second:
+            assert second is not first
+    with pool.acquire() as again:
+        assert again is second or again is first
+
+
+@pytest.mark.parametrize('t', [10, SEQ_LEN, 45])
+def test_no_allocations_after_warmup(t):
+    seq = frames(t)
+    pool = InputBufferPool(SEQ_LEN, FEATURES)
+
+    def call():
+        with pool.acquire() as batch:
+            preprocess_into(seq, batch[0])
+
+    for _ in range(10):
+        call()
+    calls = 1000
+    tracemalloc.start()
+    try:
+        before, _ = tracemalloc.get_traced_memory()
+        tracemalloc.reset_peak()
+        for _ in range(calls):
+            call()
+        after, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    # Nothing retained per call, and no window-sized temporaries (one would be 195 KB)
+    assert after - before < calls
+    assert peak - before < 16 * 1024
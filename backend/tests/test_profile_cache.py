@@ -0,0 +1,97 @@
+import profile_cache
+from profile_cache import ProfileCache
+
+
+class Clock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+def test_evicts_least_recently_used():
+    cache = ProfileCache(max_size=2, ttl=60)
+    cache.put('a', {'n': 1})
+    cache.put('b', {'n': 2})
+    assert cache.get('a') == {'n': 1}  # b is now the least recently used
+    cache.put('c', {'n': 3})
+
+    assert cache.get('b') is None
+    assert cache.get('a') == {'n': 1}
+    assert cache.get('c') == {'n': 3}
+    assert cache.stats()['evictions'] == 1
+    assert cache.stats()['size'] == 2
+
+
+def test_entries_expire_after_ttl(monkeypatch):
+    clock = Clock()
+    monkeypatch.setattr(profile_cache.time, 'monotonic', clock)
+    cache = ProfileCache(max_size=8, ttl=10)
+    cache.put('a', {'n': 1})
+
+    clock.now += 9.9
+    assert cache.get('a') == {'n': 1}
+    clock.now += 0.1
+    assert cache.get('a') is None
+
+    stats = cache.stats()
+    assert stats['expirations'] == 1
+    assert (stats['hits'], stats['misses']) == (1, 1)
+    assert stats['hit_ratio'] == 0.5
+
+
+def test_put_refused_after_invalidation():
+    cache = ProfileCache(max_size=8, ttl=60)
+    version = cache.version('a')
+    cache.invalidate('a')  # a write landed while the read was in progress
+    cache.put('a', {'n': 'stale'}, version)
+    assert cache.get('a') is None
+
+    cache.put('a', {'n': 'fresh'}, cache.version('a'))
+    assert cache.get('a') == {'n': 'fresh'}
+    cache.invalidate('a')
+    assert cache.get('a') is None
+
+
+def test_version_epoch_rolls_over():
+    cache = ProfileCache(max_size=2, ttl=60)
+    version = cache.version('a')
+    cache.invalidate('x')
+    cache.invalidate('y')
+    assert cache.version('a') == version  # other uids do not affect a
+    cache.invalidate('z')  # more versions than max_size: all dropped
+
+    assert len(cache.versions) == 0
+    assert cache.version('a') != version
+    cache.put('a', {'n': 1}, version)  # read in progress across the rollover
+    assert cache.get('a') is None
+
+    version = cache.version('a')
+    cache.clear()
+    cache.put('a', {'n': 1}, version)
+    assert cache.get('a') is None
+
+
+def test_copies_are_isolated_from_the_cache():
+    cache = ProfileCache(max_size=8, ttl=60)
+    doc = {'completedLetters': ['A'], 'settings': {'sound': True}, 'level': 1}
+    cache.put('a', doc)
+    doc['completedLetters'].append('B')
+    doc['settings']['sound'] = False
+
+    got = cache.get('a')
+    assert got == {'completedLetters': ['A'], 'settings': {'sound': True}, 'level': 1}
+    got['completedLetters'].append('C')
+    got['settings']['theme'] = 'dark'
+    got['level'] = 2
+    assert cache.get('a') == {'completedLetters': ['A'], 'settings': {'sound': True}, 'level': 1}
+
+
+def test_listeners_get_local_invalidations_only():
+    cache = ProfileCache(max_size=8, ttl=60)
+    seen = []
+    cache.add_listener(seen.append)
+    cache.invalidate_many(['a', 'b'])
+    cache.invalidate('c', propagate=False)
+    assert seen == ['a', 'b']
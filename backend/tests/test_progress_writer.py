@@ -0,0 +1,127 @@
+import progress_writer
+from fake_firestore import FakeFirestore, transforms
+from progress_writer import ProgressWriter
+
+IDLE = 3600  # keep the background flush thread out of the way
+
+
+def make_writer(db, **kwargs):
+    kwargs.setdefault('flush_interval', IDLE)
+    return ProgressWriter(db=db, transforms=transforms, **kwargs)
+
+
+def test_merges_fields_unions_and_increments():
+    db = FakeFirestore()
+    db.collection('users').documents['u1'] = {'completedLetters': ['A'], 'xp': 5, 'level': 1}
+    writer = make_writer(db)
+    writer.set_fields('u1', {'level': 2, 'name': 'x'})
+    writer.set_fields('u1', {'level': 3})
+    writer.array_union('u1', 'completedLetters', ['B', 'A'])
+    writer.array_union('u1', 'completedLetters', ['C', 'B'])
+    writer.increment('u1', 'xp', 10)
+    writer.increment('u1', 'xp', 2)
+
+    assert writer.pending['u1'].unions == {'completedLetters': ['B', 'A', 'C']}
+    assert writer.flush() == 1
+    assert len(db.commits) == 1
+
+    doc = db.document('users', 'u1')
+    assert doc['level'] == 3
+    assert doc['name'] == 'x'
+    assert doc['completedLetters'] == ['A', 'B', 'C']
+    assert doc['xp'] == 17
+    assert 'lastActive' in doc
+
+
+def test_count_field_is_the_stored_list_length():
+    db = FakeFirestore()
+    db.collection('users').documents['u1'] = {'completedLetters': ['A', 'B']}
+    writer = make_writer(db)
+    writer.array_union('u1', 'completedLetters', ['B', 'C'], count_field='totalLessons')
+    writer.array_union('u2', 'completedLetters', ['A'], count_field='totalLessons')
+    writer.set_fields('u3', {'level': 1})
+    writer.flush()
+
+    assert db.reads == 1  # one get_all for both counted documents
+    assert db.document('users', 'u1')['totalLessons'] == 3
+    assert db.document('users', 'u2')['totalLessons'] == 1
+    assert 'totalLessons' not in db.document('users', 'u3')
+
+
+def test_failed_commit_is_requeued_and_retried():
+    db = FakeFirestore()
+    writer = make_writer(db)
+    writer.array_union('u1', 'completedLetters', ['A'])
+    writer.increment('u1', 'xp', 1)
+    db.fail_commits = 1
+
+    assert writer.flush() == 0
+    assert writer.stats['failures'] == 1
+    assert writer.in_flight == {}
+    assert db.document('users', 'u1') is None
+
+    # Queued since the failure: merged on top of the failed update
+    writer.array_union('u1', 'completedLetters', ['B'])
+    writer.increment('u1', 'xp', 2)
+    assert writer.pending['u1'].unions == {'completedLetters': ['A', 'B']}
+
+    assert writer.flush() == 1
+    doc = db.document('users', 'u1')
+    assert doc['completedLetters'] == ['A', 'B']
+    assert doc['xp'] == 3
+    assert writer.pending == {}
+
+
+def test_overlay_does_not_apply_a_requeued_update_twice(monkeypatch):
+    monkeypatch.setattr(progress_writer, 'MAX_BATCH_WRITES', 1)
+    db = FakeFirestore()
+    writer = make_writer(db)
+    writer.increment('u1', 'xp', 5)
+    writer.increment('u2', 'xp', 1)
+    db.fail_commits = 1  # u1's batch fails, u2's is committed next in the same flush
+    seen = []
+
+    def before_commit(batch):
+        if [ref.id for ref, _, _ in batch.writes] == ['u2']:
+            # u1 is back in pending and must no longer count as in flight
+            seen.append(writer.overlay('u1', {'xp': 0}))
+
+    db.before_commit = before_commit
+    writer.flush()
+    assert seen == [{'xp': 5}]
+    assert writer.overlay('u1', {'xp': 0}) == {'xp': 5}
+
+
+def test_overlay_applies_queued_and_in_flight_updates():
+    db = FakeFirestore()
+    writer = make_writer(db)
+    writer.array_union('u1', 'completedLetters', ['A'], count_field='totalLessons')
+    seen = []
+    db.before_commit = lambda batch: seen.append(writer.overlay('u1', {'completedLetters': ['Z']}))
+    writer.flush()
+    assert seen == [{'completedLetters': ['Z', 'A'], 'totalLessons': 2}]
+    assert writer.overlay('u1', {'xp': 1}) == {'xp': 1}
+
+
+def test_close_drains_the_queue():
+    db = FakeFirestore()
+    writer = make_writer(db, flush_interval=0.01)
+    writer.set_fields('u1', {'level': 2})
+    writer.increment('u2', 'xp', 1)
+    db.fail_commits = 1
+
+    writer.close(timeout=5)
+    assert writer.pending == {}
+    assert db.document('users', 'u1')['level'] == 2
+    assert db.document('users', 'u2')['xp'] == 1
+
+
+def test_on_written_runs_while_the_write_is_still_in_flight():
+    db = FakeFirestore()
+    seen = []
+    writer = make_writer(db, on_written=lambda uids: seen.append(writer.overlay('u1', {'xp': 0})))
+    writer.increment('u1', 'xp', 4)
+    writer.flush()
+    # A read racing the invalidation still sees the committed update
+    assert seen == [{'xp': 4}]
+    assert writer.in_flight == {}
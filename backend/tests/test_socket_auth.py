@@ -0,0 +1,93 @@
+import pytest
+from flask import Flask, request
+from flask_socketio import SocketIO, emit
+
+import socket_auth
+from socket_auth import SESSION_UIDS, install_socket_auth, session_uid
+from token_cache import FakeTokens, InvalidToken
+
+TOKENS = FakeTokens()
+
+
+def verify(token):
+    # Same result shape as firebase_admin_config.verify_token
+    try:
+        return {'success': True, 'uid': TOKENS.verify(token)['uid']}
+    except InvalidToken as e:
+        return {'success': False, 'error': str(e)}
+
+
+def make_server(monkeypatch, mode):
+    monkeypatch.setenv(socket_auth.SOCKET_AUTH_ENV, mode)
+    app = Flask(__name__)
+    socketio = SocketIO(app, async_mode='threading')
+    assert install_socket_auth(socketio, 'test', verify=verify) == mode
+    disconnected = []
+
+    @socketio.on('connect')
+    def handle_connect():
+        emit('connection_response', {'uid': session_uid()})
+
+    @socketio.on('disconnect')
+    def handle_disconnect():
+        disconnected.append(request.sid)
+
+    return app, socketio, disconnected
+
+
+def connect_uid(client):
+    return next(m['args'][0]['uid'] for m in client.get_received() if m['name'] == 'connection_response')
+
+
+@pytest.fixture(autouse=True)
+def no_sessions():
+    SESSION_UIDS.clear()
+    yield
+    SESSION_UIDS.clear()
+
+
+def test_required_refuses_anonymous_and_invalid_clients(monkeypatch):
+    app, socketio, _ = make_server(monkeypatch, 'required')
+    assert not socketio.test_client(app).is_connected()
+    assert not socketio.test_client(app, auth={'token': FakeTokens().sign('mallory')}).is_connected()
+    assert SESSION_UIDS == {}
+
+
+def test_required_accepts_auth_payload_token(monkeypatch):
+    app, socketio, disconnected = make_server(monkeypatch, 'required')
+    client = socketio.test_client(app, auth={'token': TOKENS.sign('learner-1')})
+    assert client.is_connected()
+    assert connect_uid(client) == 'learner-1'
+    assert list(SESSION_UIDS.values()) == ['learner-1']
+    client.disconnect()
+    assert len(disconnected) == 1
+    assert SESSION_UIDS == {}
+
+
+def test_query_string_token(monkeypatch):
+    app, socketio, _ = make_server(monkeypatch, 'required')
+    client = socketio.test_client(app, query_string=f'token={TOKENS.sign("learner-2")}')
+    assert client.is_connected()
+    assert connect_uid(client) == 'learner-2'
+    client.disconnect()
+    assert SESSION_UIDS == {}
+
+
+def test_optional_allows_anonymous_but_not_invalid(monkeypatch):
+    app, socketio, _ = make_server(monkeypatch, 'optional')
+    anonymous = socketio.test_client(app)
+    assert anonymous.is_connected()
+    assert connect_uid(anonymous) is None
+    assert not socketio.test_client(app, auth={'token': 'not-a-token'}).is_connected()
+    signed = socketio.test_client(app, auth={'token': TOKENS.sign('learner-3')})
+    assert connect_uid(signed) == 'learner-3'
+
+
+def test_off_leaves_handlers_alone(monkeypatch):
+    app, socketio, _ = make_server(monkeypatch, 'off')
+    assert socketio.test_client(app).is_connected()
+
+
+def test_invalid_mode_means_off(monkeypatch):
+    monkeypatch.setenv(socket_auth.SOCKET_AUTH_ENV, 'sometimes')
+    assert install_socket_auth(SocketIO(Flask(__name__), async_mode='threading'), 'test', verify=verify) == 'off'
@@ -0,0 +1,74 @@
+import numpy as np
+import pytest
+
+from bench_static_preprocessing import (legacy_enough_data, legacy_extract_single_hand, legacy_normalize_features,
+                                        legacy_normalize_landmarks, legacy_pad_or_truncate)
+from static_preprocessing import (HAND_FEATURES, TWO_HAND_FEATURES, bbox_normalize, best_hand, fit_length,
+                                  has_enough_data, standardize)
+
+KINDS = ('left_hand', 'right_hand', 'two_hands', 'zeros')
+
+
+def rows(kind, n, seed=0):
+    x = np.random.default_rng(seed).uniform(0.0, 1.0, size=(n, TWO_HAND_FEATURES)).astype(np.float32)
+    if kind == 'left_hand':
+        x[:, HAND_FEATURES:] = 0.0
+    elif kind == 'right_hand':
+        x[:, :HAND_FEATURES] = 0.0
+    elif kind == 'zeros':
+        x[:] = 0.0
+    return x
+
+
+def per_sample(fn, x):
+    return np.stack([fn(row) for row in x])
+
+
+cases = pytest.mark.parametrize('kind,n', [(kind, n) for kind in KINDS for n in (1, 64)])
+
+
+@cases
+def test_bbox_normalize(kind, n):
+    x = rows(kind, n)
+    np.testing.assert_allclose(bbox_normalize(x), per_sample(legacy_normalize_landmarks, x), atol=1e-6)
+
+
+@cases
+def test_best_hand(kind, n):
+    x = rows(kind, n)
+    expected = per_sample(lambda row: legacy_extract_single_hand(row, HAND_FEATURES), x)
+    np.testing.assert_array_equal(best_hand(x, HAND_FEATURES), expected)
+
+
+@cases
+def test_standardize(kind, n):
+    rng = np.random.default_rng(1)
+    mean, std = rng.normal(size=HAND_FEATURES), rng.uniform(0.0, 2.0, size=HAND_FEATURES)
+    x = rows(kind, n)[:, :HAND_FEATURES]
+    expected = per_sample(lambda row: legacy_normalize_features(row, mean, std), x)
+    np.testing.assert_allclose(standardize(x, mean, std), expected, rtol=1e-5, atol=1e-5)
+
+
+@cases
+@pytest.mark.parametrize('features', [100, TWO_HAND_FEATURES, 140])
+def test_fit_length(kind, n, features):
+    x = fit_length(rows(kind, n), 140)[:, :features]
+    expected = per_sample(lambda row: legacy_pad_or_truncate(row, TWO_HAND_FEATURES), x)
+    np.testing.assert_array_equal(fit_length(x, TWO_HAND_FEATURES), expected)
+
+
+@cases
+def test_has_enough_data(kind, n):
+    x = rows(kind, n)
+    np.testing.assert_array_equal(has_enough_data(x), per_sample(legacy_enough_data, x))
+
+
+def test_single_vector_is_a_batch_of_one():
+    row = rows('two_hands', 1)[0]
+    np.testing.assert_array_equal(bbox_normalize(row), bbox_normalize(row[None]))
+    assert best_hand(row, HAND_FEATURES).shape == (1, HAND_FEATURES)
+
+
+def test_best_hand_rejects_other_sizes():
+    with pytest.raises(ValueError):
+        best_hand(np.zeros((2, 100), dtype=np.float32), HAND_FEATURES)
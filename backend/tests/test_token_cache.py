@@ -0,0 +1,108 @@
+import time
+
+import pytest
+
+import token_cache
+from token_cache import CERT_FIRST_LOAD_RETRY, CERT_REFRESH_MARGIN, CertificateStore, FakeTokens, InvalidToken, TokenCache
+
+
+class CountingVerifier:
+    def __init__(self, tokens):
+        self.tokens = tokens
+        self.calls = 0
+
+    def verify(self, token):
+        self.calls += 1
+        return self.tokens.verify(token)
+
+
+@pytest.fixture
+def tokens():
+    return FakeTokens()
+
+
+def test_repeat_verification_is_a_hit(tokens):
+    verifier = CountingVerifier(tokens)
+    cache = TokenCache(verifier)
+    token = tokens.sign('learner-1')
+    assert cache.verify(token)['uid'] == 'learner-1'
+    assert cache.verify(token)['uid'] == 'learner-1'
+    assert verifier.calls == 1
+    assert cache.stats() == {'hits': 1, 'misses': 1, 'failures': 0, 'evictions': 0, 'size': 1}
+
+
+def test_expired_entries_are_verified_again(tokens, monkeypatch):
+    verifier = CountingVerifier(tokens)
+    cache = TokenCache(verifier)
+    token = tokens.sign('learner-1', ttl=60)
+    cache.verify(token)
+    later = time.time() + 120
+    monkeypatch.setattr(token_cache.time, 'time', lambda: later)
+    with pytest.raises(InvalidToken, match='expired'):
+        cache.verify(token)
+    assert verifier.calls == 2
+    assert cache.stats()['size'] == 0
+
+
+def test_failures_are_not_cached(tokens):
+    verifier = CountingVerifier(FakeTokens())  # other secret: every signature is wrong
+    cache = TokenCache(verifier)
+    token = tokens.sign('learner-1')
+    for _ in range(2):
+        with pytest.raises(InvalidToken):
+            cache.verify(token)
+    assert verifier.calls == 2
+    assert cache.stats()['failures'] == 2
+    assert cache.stats()['size'] == 0
+
+
+def test_missing_token_is_rejected_without_verifying(tokens):
+    verifier = CountingVerifier(tokens)
+    with pytest.raises(InvalidToken):
+        TokenCache(verifier).verify('')
+    assert verifier.calls == 0
+
+
+def test_least_recently_used_is_evicted(tokens):
+    verifier = CountingVerifier(tokens)
+    cache = TokenCache(verifier, max_size=2)
+    first, second, third = (tokens.sign(f'learner-{i}') for i in range(3))
+    cache.verify(first)
+    cache.verify(second)
+    cache.verify(first)  # second is now the least recently used
+    cache.verify(third)
+    assert cache.stats()['evictions'] == 1
+    calls = verifier.calls
+    cache.verify(first)
+    assert verifier.calls == calls
+    cache.verify(second)
+    assert verifier.calls == calls + 1
+
+
+def test_certificate_store_fetches_before_first_use():
+    fetches = []
+
+    def fetch():
+        fetches.append(time.monotonic())
+        return {'key-1': 'PEM'}, 3600.0
+
+    store = CertificateStore(fetch)
+    assert store.get('key-1') == 'PEM'
+    assert len(fetches) == 1
+    assert store.refresh() == 3600.0 - CERT_REFRESH_MARGIN
+
+
+def test_certificate_store_unknown_key_wakes_refresher():
+    store = CertificateStore(lambda: ({'key-1': 'PEM'}, 3600.0))
+    store.wake.clear()
+    assert store.get('key-2') is None
+    assert store.wake.is_set()
+
+
+def test_certificate_store_retries_a_failed_first_fetch_soon():
+    def fetch():
+        raise OSError('offline')
+
+    store = CertificateStore(fetch)
+    assert store.certs == {}
+    assert store.retry_interval() == CERT_FIRST_LOAD_RETRY
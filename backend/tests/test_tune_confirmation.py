@@ -0,0 +1,77 @@
+import itertools
+
+import numpy as np
+import pytest
+
+from tune_confirmation import PARAMS, SERVER_DEFAULTS, attempt_metrics, reference_mismatches, simulate
+
+LABELS = 4
+
+
+def synthetic_recording(seed=0, sessions=3, attempts=4, frames=40, features=12):
+    """Attempts of a held sign: a still hand after some movement, noisy probabilities, a few invalid frames"""
+    rng = np.random.default_rng(seed)
+    probs, landmarks, session, target, valid = [], [], [], [], []
+    for sid in range(sessions):
+        for _ in range(attempts):
+            sign = int(rng.integers(LABELS))
+            p = rng.dirichlet(np.ones(LABELS), size=frames)
+            held = rng.random(frames) < 0.7
+            p[held] = 0.2 * p[held]
+            p[held, sign] += 0.8
+            # Wrong but confident frames now and then
+            wrong = rng.random(frames) < 0.1
+            p[wrong] = np.eye(LABELS)[(sign + 1) % LABELS] * 0.9 + 0.025
+            base = rng.uniform(size=features)
+            moving = np.arange(frames) < frames // 4
+            x = base + rng.normal(scale=0.01, size=(frames, features))
+            x[moving] += rng.normal(scale=0.5, size=(int(moving.sum()), features))
+            probs.append(p)
+            landmarks.append(x)
+            session += [sid] * frames
+            target += [sign if rng.random() < 0.8 else -1] * frames
+            valid.append(rng.random(frames) > 0.05)
+    target = np.array(target)
+    return {
+        'probs': np.concatenate(probs).astype(np.float32),
+        'landmarks': np.concatenate(landmarks).astype(np.float32),
+        'session': np.array(session),
+        'target': target,
+        'truth': target.copy(),
+        'valid': np.concatenate(valid),
+    }
+
+
+def small_grid(variant):
+    values = {
+        'confidence': [0.5, 0.7],
+        'history': [3, 10],
+        'min_consistent': [2, 4],
+        'stability': [0.001, 0.05],
+        'cooldown': [0, 3],
+        'smooth_window': [2, 3],
+    }
+    combos = list(itertools.product(*(values[n] for n in PARAMS)))
+    combos.append(tuple(SERVER_DEFAULTS[variant][n] for n in PARAMS))
+    grid = {n: np.array([c[i] for c in combos]) for i, n in enumerate(PARAMS)}
+    for n in ('history', 'min_consistent', 'cooldown', 'smooth_window'):
+        grid[n] = grid[n].astype(np.int64)
+    return grid
+
+
+@pytest.mark.parametrize('variant,free_practice', [('days', False), ('days', True), ('static_words', False),
+                                                   ('static_words', True)])
+def test_simulator_matches_reference(variant, free_practice):
+    rec = synthetic_recording()
+    assert reference_mismatches(rec, small_grid(variant), variant, free_practice) == []
+
+
+def test_recording_exercises_the_state_machine():
+    rec = synthetic_recording()
+    grid = small_grid('days')
+    emitted, confirmed = simulate(rec, grid, 'days')
+    # Parity on a recording where nothing confirms would prove little
+    assert confirmed.any() and (~confirmed).any()
+    metrics = attempt_metrics(rec, emitted, confirmed, fps=15.0)
+    assert metrics['confirm_rate'].max() > 0
+    assert metrics['confirm_rate'].min() < metrics['confirm_rate'].max()
@@ -0,0 +1,250 @@
+"""
+thread_sweep.py - Find throughput-optimal CPU thread budgets for a model mix
+
+Runs the models of a mix side by side on a fixed set of cores, the way the
+recognizers share a box, once per candidate setting, and reports total and
+per-model throughput and latency percentiles. Every model copy is its own
+process running back-to-back batch-1 forward passes (the serving pattern)
+for --seconds; all copies start together once every model is loaded.
+
+Candidates:
+    tf_default    no budget, no pinning (what the servers did before
+                  cpu_config.py)
+    budgets       cpu_config.THREAD_BUDGETS per model, unpinned
+    grid          every --intra x --inter, the same for every copy, with
+                  pinning off and/or on (--pin); pinned copies get
+                  disjoint slices of the cores while they fit
+
+The best candidate by total throughput is printed; --write-config saves it
+as a JSON file for EDUSIGN_CPU_CONFIG (see cpu_config.py).
+
+Usage:
+    python thread_sweep.py --mix colours,alphabet,numbers,days --cores 8
+    python thread_sweep.py --mix colours=2,gen_1,alphabet --intra 1,2,4 --inter 1,2 --pin both \
+        --seconds 20 --json sweep.json --write-config cpu_config.json
+"""
+
+import argparse
+import json
+import logging
+import os
+import subprocess
+import sys
+import time
+
+import numpy as np
+
+from cpu_config import THREAD_BUDGETS, available_cpus, cpu_slices, format_cpus, parse_cpus, pin_process, thread_env
+from model_registry import BASE_DIR, MODELS, get_entry
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+SEED = 1234
+READY_TIMEOUT = 300.0  # loading TensorFlow and a model
+WARMUP_CALLS = 10
+PERCENTILES = (50, 95, 99)
+
+
+# ---------------------------------------------------------------------------
+# Worker: one model copy
+# ---------------------------------------------------------------------------
+
+def run_worker(args):
+    if args.cpus:
+        pin_process(parse_cpus(args.cpus))
+    from model_registry import load_model, prepare_batch
+
+    entry = get_entry(args.worker)
+    rng = np.random.default_rng(SEED)
+    shape = (1, entry['seq_len'], entry['feature_size']) if entry['kind'] == 'sequence' else (1, entry['feature_size'])
+    x = prepare_batch(args.worker, rng.normal(size=shape).astype(np.float32))
+    model = load_model(args.worker)
+    for _ in range(WARMUP_CALLS):
+        model(x, training=False)
+    print('ready', flush=True)
+    sys.stdin.readline()  # start signal
+
+    latencies = []
+    deadline = time.perf_counter() + args.seconds
+    while True:
+        start = time.perf_counter()
+        if start >= deadline:
+            break
+        model(x, training=False)
+        latencies.append(time.perf_counter() - start)
+    print(json.dumps({'calls': len(latencies), 'latencies_ms': (np.array(latencies) * 1000.0).round(3).tolist()}))
+
+
+# ---------------------------------------------------------------------------
+# Sweep
+# ---------------------------------------------------------------------------
+
+def parse_mix(text):
+    """'colours=2,alphabet' -> ['colours', 'colours', 'alphabet']"""
+    copies = []
+    for item in filter(None, (p.strip() for p in text.split(','))):
+        name, _, count = item.partition('=')
+        get_entry(name)
+        copies.extend([name] * int(count or 1))
+    return copies
+
+
+def candidates(copies, cores, args):
+    """[(label, [(intra, inter, cpus) per copy])]"""
+    budgets = [THREAD_BUDGETS.get(name, (0, 0)) for name in copies]
+    points = [('tf_default', [(0, 0, cores)] * len(copies)),
+              ('budgets', [(min(intra, len(cores)), min(inter, len(cores)), cores) for intra, inter in budgets])]
+    pins = {'off': (False,), 'on': (True,), 'both': (False, True)}[args.pin]
+    for intra in (n for n in args.intra if n <= len(cores)):
+        for inter in args.inter:
+            for pin in pins:
+                slices = cpu_slices(cores, [intra] * len(copies)) if pin else [cores] * len(copies)
+                label = f"intra={intra} inter={inter}{' pinned' if pin else ''}"
+                points.append((label, [(intra, inter, cpus) for cpus in slices]))
+    return points
+
+
+def run_point(copies, settings, args):
+    """Run every copy with its (intra, inter, cpus); returns per-copy results or raises RuntimeError"""
+    procs = []
+    try:
+        for name, (intra, inter, cpus) in zip(copies, settings):
+            env = {k: v for k, v in os.environ.items()
+                   if k not in ('TF_NUM_INTRAOP_THREADS', 'TF_NUM_INTEROP_THREADS', 'OMP_NUM_THREADS')}
+            env.update(thread_env(intra, inter))
+            env['TF_CPP_MIN_LOG_LEVEL'] = '2'
+            cmd = [sys.executable, os.path.abspath(__file__), '--worker', name, '--cpus', format_cpus(cpus),
+                   '--seconds', str(args.seconds)]
+            procs.append(subprocess.Popen(cmd, cwd=BASE_DIR, env=env, stdin=subprocess.PIPE,
+                                          stdout=subprocess.PIPE, stderr=subprocess.PIPE, text=True))
+        for proc in procs:
+            line = proc.stdout.readline().strip()
+            if line != 'ready':
+                error = (proc.stderr.read().strip().splitlines() or ['no output'])[-1]
+                raise RuntimeError(error)
+        for proc in procs:
+            proc.stdin.write('go\n')
+            proc.stdin.flush()
+        results = []
+        for proc in procs:
+            out, err = proc.communicate(timeout=args.seconds + READY_TIMEOUT)
+            try:
+                results.append(json.loads(out.strip().splitlines()[-1]))
+            except (IndexError, ValueError):
+                raise RuntimeError((err.strip().splitlines() or ['no output'])[-1])
+        return results
+    finally:
+        for proc in procs:
+            if proc.poll() is None:
+                proc.kill()
+
+
+def summarize(copies, settings, results, seconds):
+    per_model = {}
+    for name, (intra, inter, cpus), result in zip(copies, settings, results):
+        model = per_model.setdefault(name, {'copies': 0, 'calls': 0, 'latencies': [], 'intra_op': intra,
+                                            'inter_op': inter, 'cpus': format_cpus(cpus)})
+        model['copies'] += 1
+        model['calls'] += result['calls']
+        model['latencies'].extend(result['latencies_ms'])
+    summary = {'throughput': sum(m['calls'] for m in per_model.values()) / seconds, 'models': {}}
+    all_latencies = []
+    for name, model in per_model.items():
+        latencies = np.array(model.pop('latencies'))
+        all_latencies.append(latencies)
+        model['throughput'] = model['calls'] / seconds
+        for p in PERCENTILES:
+            model[f'p{p}_ms'] = float(np.percentile(latencies, p)) if latencies.size else None
+        summary['models'][name] = model
+    merged = np.concatenate(all_latencies) if all_latencies else np.array([])
+    for p in PERCENTILES:
+        summary[f'p{p}_ms'] = float(np.percentile(merged, p)) if merged.size else None
+    return summary
+
+
+def write_config(path, summary):
+    """EDUSIGN_CPU_CONFIG file from the models of a sweep point (first copy's CPUs when pinned)"""
+    config = {}
+    for name, model in summary['models'].items():
+        config[name] = {'intra_op': model['intra_op'], 'inter_op': model['inter_op']}
+        if model.get('pinned'):
+            config[name]['cpus'] = model['cpus']
+    with open(path, 'w') as f:
+        json.dump(config, f, indent=2)
+
+
+def parse_ints(text):
+    return tuple(int(v) for v in text.split(','))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Find throughput-optimal CPU thread budgets for a model mix")
+    parser.add_argument('--mix', default=','.join(n for n in MODELS if n != 'general_words'),
+                        help="Comma separated model[=copies] from model_registry (default: every model once)")
+    parser.add_argument('--cores', type=int, help="Number of CPUs to run on (default: all available)")
+    parser.add_argument('--intra', type=parse_ints, default=(1, 2, 4))
+    parser.add_argument('--inter', type=parse_ints, default=(1,))
+    parser.add_argument('--pin', choices=('off', 'on', 'both'), default='both')
+    parser.add_argument('--seconds', type=float, default=10.0, help="Measured run time per candidate")
+    parser.add_argument('--json', help="Write every candidate's results to this file")
+    parser.add_argument('--write-config', help="Write the best candidate as an EDUSIGN_CPU_CONFIG file")
+    parser.add_argument('--worker', help=argparse.SUPPRESS)
+    parser.add_argument('--cpus', help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.worker:
+        logging.disable(logging.CRITICAL)
+        run_worker(args)
+        return
+
+    try:
+        copies = parse_mix(args.mix)
+    except (KeyError, ValueError) as e:
+        parser.error(str(e))
+    cores = available_cpus()[:args.cores] if args.cores else available_cpus()
+    logger.info(f"🧵 {len(copies)} model processes on CPUs {format_cpus(cores)}")
+
+    points = []
+    for label, settings in candidates(copies, cores, args):
+        logger.info(f"⏱️ {label}")
+        try:
+            summary = summarize(copies, settings, run_point(copies, settings, args), args.seconds)
+        except (RuntimeError, subprocess.TimeoutExpired) as e:
+            logger.error(f"❌ {label}: {e}")
+            points.append({'candidate': label, 'error': str(e)})
+            continue
+        for model in summary['models'].values():
+            model['pinned'] = 'pinned' in label
+        points.append({'candidate': label, **summary})
+
+    ok = [p for p in points if 'error' not in p]
+    width = max((len(p['candidate']) for p in points), default=10) + 2
+    print(f"\n{'candidate':<{width}}{'req/s':>9}{'p50 ms':>9}{'p95 ms':>9}{'p99 ms':>9}")
+    for p in points:
+        if 'error' in p:
+            print(f"{p['candidate']:<{width}}  failed: {p['error']}")
+        else:
+            print(f"{p['candidate']:<{width}}{p['throughput']:>9.1f}{p['p50_ms']:>9.2f}{p['p95_ms']:>9.2f}{p['p99_ms']:>9.2f}")
+
+    best = max(ok, key=lambda p: p['throughput']) if ok else None
+    if best:
+        print(f"\nBest: {best['candidate']} ({best['throughput']:.1f} req/s, p99 {best['p99_ms']:.2f} ms)")
+        for name, model in best['models'].items():
+            print(f"  {name:<16}{model['throughput']:>9.1f} req/s  p99 {model['p99_ms']:.2f} ms  "
+                  f"intra_op={model['intra_op']} inter_op={model['inter_op']} cpus={model['cpus']}")
+        if args.write_config:
+            write_config(args.write_config, best)
+            logger.info(f"✅ Wrote {args.write_config} (use with EDUSIGN_CPU_CONFIG)")
+
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump({'cores': format_cpus(cores), 'mix': copies, 'seconds': args.seconds, 'points': points,
+                       'best': best['candidate'] if best else None}, f, indent=2)
+        logger.info(f"✅ Results written to {args.json}")
+    if not best:
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
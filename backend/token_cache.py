@@ -0,0 +1,246 @@
+"""
+Cached Firebase ID token verification with background certificate refresh.
+
+verify_token used to call auth.verify_id_token on every protected request:
+an RS256 signature check, plus a blocking fetch of Google's signing
+certificates whenever the cached copy expired. Now:
+
+  - TokenCache keeps verified claims by SHA-256 of the token until the
+    token's exp, at most MAX_TOKENS entries (least recently used first
+    out), so a repeat request costs a hash and a dict lookup. Failures are
+    not cached
+  - FirebaseVerifier checks tokens offline (signature, aud, iss, sub, exp,
+    iat, as auth.verify_id_token does without check_revoked) against a
+    CertificateStore. The store fetches the certificates once when it is
+    created (build it at server start, firebase_admin_config does this in
+    initialize_firebase), then a real OS thread refreshes them
+    CERT_REFRESH_MARGIN before their Cache-Control max-age runs out. A
+    request never fetches certificates: a token signed with a key id the
+    store does not know yet is rejected and wakes the refresher (at most
+    once per CERT_RETRY_INTERVAL, every CERT_FIRST_LOAD_RETRY until the
+    first fetch succeeded)
+  - FakeTokens signs and verifies HS256 tokens with the same claims, for
+    tests and benchmarks without Google (never use it in production)
+
+Verifiers raise InvalidToken; claims carry 'uid' (= sub) like
+auth.verify_id_token's result. Returned claims are shared, do not modify
+them.
+"""
+
+import base64
+import hashlib
+import hmac
+import json
+import logging
+import os
+import re
+import time
+import urllib.request
+from collections import OrderedDict
+
+from startup import real_threading
+
+logger = logging.getLogger(__name__)
+
+CERT_URL = 'https://www.googleapis.com/robot/v1/metadata/x509/securetoken@system.gserviceaccount.com'
+ISSUER_PREFIX = 'https://securetoken.google.com/'
+MAX_TOKENS = 10000
+CERT_REFRESH_MARGIN = 300.0  # seconds before max-age runs out
+CERT_RETRY_INTERVAL = 30.0
+CERT_FIRST_LOAD_RETRY = 2.0  # while no certificates were ever fetched
+CERT_DEFAULT_MAX_AGE = 3600.0
+CERT_TIMEOUT = 10.0
+CLOCK_SKEW = 5  # seconds of iat/exp tolerance
+
+
+class InvalidToken(ValueError):
+    pass
+
+
+def b64decode(segment):
+    return base64.urlsafe_b64decode(segment + '=' * (-len(segment) % 4))
+
+
+def b64encode(data):
+    return base64.urlsafe_b64encode(data).rstrip(b'=').decode('ascii')
+
+
+def unverified_header(token):
+    try:
+        return json.loads(b64decode(token.split('.')[0]))
+    except (ValueError, IndexError, AttributeError) as e:
+        raise InvalidToken(f'Malformed token: {e}')
+
+
+def check_claims(claims, project_id, now=None):
+    """The Firebase ID token claim checks; returns claims with 'uid' set"""
+    now = time.time() if now is None else now
+    if claims.get('aud') != project_id:
+        raise InvalidToken(f"Token has incorrect audience {claims.get('aud')!r}")
+    if claims.get('iss') != ISSUER_PREFIX + project_id:
+        raise InvalidToken(f"Token has incorrect issuer {claims.get('iss')!r}")
+    sub = claims.get('sub')
+    if not isinstance(sub, str) or not sub or len(sub) > 128:
+        raise InvalidToken('Token has an invalid subject')
+    if not isinstance(claims.get('exp'), (int, float)) or claims['exp'] + CLOCK_SKEW <= now:
+        raise InvalidToken('Token expired')
+    if not isinstance(claims.get('iat'), (int, float)) or claims['iat'] - CLOCK_SKEW > now:
+        raise InvalidToken('Token issued in the future')
+    claims['uid'] = sub
+    return claims
+
+
+# ---------------------------------------------------------------------------
+# Certificates
+# ---------------------------------------------------------------------------
+
+def fetch_certificates(url=CERT_URL, timeout=CERT_TIMEOUT):
+    """(kid -> PEM certificate, max-age seconds)"""
+    with urllib.request.urlopen(url, timeout=timeout) as response:
+        certs = json.loads(response.read().decode('utf-8'))
+        match = re.search(r'max-age=(\d+)', response.headers.get('Cache-Control', ''))
+    return certs, float(match.group(1)) if match else CERT_DEFAULT_MAX_AGE
+
+
+class CertificateStore:
+    """Google's token signing certificates, kept fresh by a real OS thread"""
+
+    def __init__(self, fetch=fetch_certificates):
+        self.fetch = fetch
+        self.certs = {}
+        self.wake = real_threading().Event()
+        self.refreshes = 0
+        # First fetch before any request can need it
+        delay = self.refresh()
+        self.thread = real_threading().Thread(target=self.run, args=(delay,), daemon=True, name='cert-refresh')
+        self.thread.start()
+
+    def refresh(self):
+        """Fetch now; returns seconds until the next refresh"""
+        try:
+            certs, max_age = self.fetch()
+        except Exception as e:
+            logger.warning(f"⚠️ Could not refresh token certificates: {e}")
+            return self.retry_interval()
+        self.certs = certs  # replaced whole, readers never see a partial dict
+        self.refreshes += 1
+        return max(max_age - CERT_REFRESH_MARGIN, CERT_RETRY_INTERVAL)
+
+    def retry_interval(self):
+        return CERT_RETRY_INTERVAL if self.refreshes else CERT_FIRST_LOAD_RETRY
+
+    def run(self, delay):
+        while True:
+            started = time.monotonic()
+            self.wake.wait(delay)
+            self.wake.clear()
+            # Unknown key ids wake the refresher early, at most once per retry interval
+            time.sleep(max(0.0, started + self.retry_interval() - time.monotonic()))
+            delay = self.refresh()
+
+    def get(self, kid):
+        cert = self.certs.get(kid)
+        if cert is None:
+            self.wake.set()
+        return cert
+
+
+class FirebaseVerifier:
+    """Offline verification of Firebase ID tokens against a CertificateStore"""
+
+    def __init__(self, project_id, store=None):
+        if not project_id:
+            raise ValueError('A Firebase project id is required to verify ID tokens')
+        self.project_id = project_id
+        self.store = store or CertificateStore()
+
+    def verify(self, token):
+        from google.auth import jwt
+
+        header = unverified_header(token)
+        if header.get('alg') != 'RS256':
+            raise InvalidToken(f"Token has incorrect algorithm {header.get('alg')!r}")
+        cert = self.store.get(header.get('kid'))
+        if cert is None:
+            raise InvalidToken(f"Unknown token key id {header.get('kid')!r}, certificates are being refreshed")
+        try:
+            claims = jwt.decode(token, certs=cert, audience=self.project_id, clock_skew_in_seconds=CLOCK_SKEW)
+        except ValueError as e:
+            raise InvalidToken(str(e))
+        return check_claims(claims, self.project_id)
+
+
+class FakeTokens:
+    """HS256 signer/verifier with Firebase ID token claims, for tests and benchmarks"""
+
+    def __init__(self, project_id='edusign-test', secret=None):
+        self.project_id = project_id
+        self.secret = secret or os.urandom(32)
+
+    def sign(self, uid, ttl=3600, **claims):
+        now = int(time.time())
+        payload = {'iss': ISSUER_PREFIX + self.project_id, 'aud': self.project_id, 'sub': uid,
+                   'iat': now, 'exp': now + ttl, 'auth_time': now, **claims}
+        signing_input = '.'.join([b64encode(json.dumps({'alg': 'HS256', 'kid': 'fake', 'typ': 'JWT'}).encode()),
+                                  b64encode(json.dumps(payload).encode())])
+        signature = hmac.new(self.secret, signing_input.encode('ascii'), hashlib.sha256).digest()
+        return f'{signing_input}.{b64encode(signature)}'
+
+    def verify(self, token):
+        if unverified_header(token).get('alg') != 'HS256':
+            raise InvalidToken('Token has incorrect algorithm')
+        signing_input, _, signature = token.rpartition('.')
+        expected = hmac.new(self.secret, signing_input.encode('ascii'), hashlib.sha256).digest()
+        try:
+            valid = hmac.compare_digest(expected, b64decode(signature))
+        except ValueError:
+            valid = False
+        if not valid:
+            raise InvalidToken('Invalid token signature')
+        return check_claims(json.loads(b64decode(signing_input.split('.')[1])), self.project_id)
+
+
+# ---------------------------------------------------------------------------
+# Cache
+# ---------------------------------------------------------------------------
+
+class TokenCache:
+    """Verified claims by token hash until the token expires (bounded LRU)"""
+
+    def __init__(self, verifier, max_size=MAX_TOKENS):
+        self.verifier = verifier
+        self.max_size = max_size
+        self.lock = real_threading().Lock()
+        self.entries = OrderedDict()  # sha256 digest -> (exp, claims)
+        self.counts = {'hits': 0, 'misses': 0, 'failures': 0, 'evictions': 0}
+
+    def verify(self, token):
+        """Claims of a valid token; raises InvalidToken"""
+        if not isinstance(token, str) or not token:
+            raise InvalidToken('No token')
+        key = hashlib.sha256(token.encode('utf-8')).digest()
+        now = time.time()
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is not None:
+                if entry[0] > now:
+                    self.entries.move_to_end(key)
+                    self.counts['hits'] += 1
+                    return entry[1]
+                del self.entries[key]
+            self.counts['misses'] += 1
+        try:
+            claims = self.verifier.verify(token)
+        except InvalidToken:
+            self.counts['failures'] += 1
+            raise
+        with self.lock:
+            self.entries[key] = (claims['exp'], claims)
+            while len(self.entries) > self.max_size:
+                self.entries.popitem(last=False)
+                self.counts['evictions'] += 1
+        return claims
+
+    def stats(self):
+        with self.lock:
+            return dict(self.counts, size=len(self.entries))
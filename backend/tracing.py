@@ -0,0 +1,257 @@
+"""
+End-to-end latency tracing for the recognizers.
+
+A client that wants to know where a frame's latency goes adds, to its
+'predict' payload,
+
+    frame_id     any id of its own (echoed back)
+    capture_ts   camera capture time, ms since epoch on the client clock
+    sent_ts      (optional) time the payload was emitted, client clock
+
+and gets a 'trace' object in the result:
+
+    frame_id, capture_ts, sent_ts      echoed
+    receive_ts      packet arrived at the server (server clock, ms)
+    dequeue_ts      prediction handler started
+    forward_start_ts, forward_end_ts   model forward pass
+    emit_ts         result handed to Socket.IO
+    clock_offset_ms estimated client clock minus server clock (None until
+                    the first clock ping has been answered)
+
+Clock offset: the server emits 'clock_ping' {server_ts} with an ack
+callback; the client acks with its Date.now(). Per session the sample
+with the smallest round trip of the last CLOCK_SAMPLES wins (NTP-style),
+and a new ping goes out every CLOCK_PING_INTERVAL seconds while the
+session sends traced frames. With the offset, the client can compute its
+downlink delay on receipt (now - offset - emit_ts) and the server
+aggregates these segments into /metrics (edusign_trace_segment_seconds):
+
+    client          capture -> sent (camera + in-browser MediaPipe)
+    uplink          sent -> receive (one-way network delay)
+    capture_to_receive   capture -> receive (when sent_ts is missing)
+    queue           receive -> dequeue (waiting for a handler)
+    forward         model forward pass
+    server          receive -> emit
+
+receive_ts comes from a hook on the Socket.IO server's inbound messages
+and falls back to the dequeue time if the hook cannot be installed. A
+server whose prediction event is not 'predict' (app.py's
+'predict_landmarks') names it in install_tracing(..., event=).
+"""
+
+import logging
+import threading
+import time
+from collections import OrderedDict, deque
+
+from flask import g, has_request_context, request
+
+from capture_log import RESULT_EVENTS
+from metrics import LATENCY_BUCKETS, Histogram
+
+logger = logging.getLogger(__name__)
+
+TRACE_EVENT = 'predict'
+CLOCK_PING_EVENT = 'clock_ping'
+CLOCK_PING_INTERVAL = 10.0
+CLOCK_SAMPLES = 8
+MAX_SESSIONS = 4096
+SEGMENTS = ('client', 'uplink', 'capture_to_receive', 'queue', 'forward', 'server')
+
+
+def now_ms():
+    return time.time() * 1000.0
+
+
+class ClockEstimator:
+    """Client-minus-server clock offset of one session from ping round trips"""
+
+    def __init__(self):
+        self.samples = deque(maxlen=CLOCK_SAMPLES)  # (rtt_ms, offset_ms)
+        self.last_ping = 0.0
+        self.in_flight = False
+
+    def add(self, sent_ms, client_ms, received_ms):
+        rtt = received_ms - sent_ms
+        self.samples.append((rtt, client_ms - (sent_ms + received_ms) / 2.0))
+        self.in_flight = False
+
+    @property
+    def offset_ms(self):
+        return min(self.samples)[1] if self.samples else None
+
+    @property
+    def rtt_ms(self):
+        return min(self.samples)[0] if self.samples else None
+
+    def due(self):
+        return not self.in_flight and time.monotonic() - self.last_ping >= CLOCK_PING_INTERVAL
+
+
+class Tracer:
+    """Per-frame trace echo, clock pings and segment histograms for one server"""
+
+    def __init__(self, socketio, metrics, event=TRACE_EVENT):
+        self.socketio = socketio
+        self.metrics = metrics
+        self.event = event
+        self.lock = threading.Lock()
+        self.clocks = OrderedDict()  # sid -> ClockEstimator
+        self.received = {}  # eio sid -> arrival times (ms) of predict packets not yet handled
+        self.segments = {segment: Histogram(LATENCY_BUCKETS) for segment in SEGMENTS}
+
+    # Inbound packets
+
+    def hook_receive(self):
+        """Timestamp predict packets as they arrive, before a handler picks them up"""
+        server = self.socketio.server
+        handle = getattr(server, '_handle_eio_message', None)
+        if handle is None:
+            logger.warning("⚠️ Socket.IO server has no message hook, trace receive_ts = dequeue_ts")
+            return False
+        marker = f'["{self.event}"'
+
+        def receiving(eio_sid, data):
+            if isinstance(data, str) and marker in data[:32]:
+                with self.lock:
+                    self.received.setdefault(eio_sid, deque(maxlen=64)).append(now_ms())
+            return handle(eio_sid, data)
+
+        server.eio.on('message', receiving)
+        return True
+
+    def pop_received(self):
+        """Arrival time of the packet this predict handler is serving (FIFO per session)"""
+        if g.get('trace_received', False) is not False:
+            return g.trace_received
+        g.trace_received = None
+        try:
+            eio_sid = self.socketio.server.manager.eio_sid_from_sid(request.sid, '/')
+        except (AttributeError, KeyError):
+            return None
+        with self.lock:
+            arrivals = self.received.get(eio_sid)
+            if arrivals:
+                g.trace_received = arrivals.popleft()
+                if not arrivals:
+                    del self.received[eio_sid]
+        return g.trace_received
+
+    # Clock sync
+
+    def clock(self, sid):
+        clock = self.clocks.get(sid)
+        if clock is None:
+            with self.lock:
+                if len(self.clocks) >= MAX_SESSIONS:
+                    self.clocks.popitem(last=False)
+                clock = self.clocks[sid] = ClockEstimator()
+        return clock
+
+    def ping(self, sid, clock):
+        clock.in_flight = True
+        clock.last_ping = time.monotonic()
+        sent = now_ms()
+
+        def on_ack(reply=None):
+            received = now_ms()
+            client_ms = reply.get('client_ts') if isinstance(reply, dict) else reply
+            if isinstance(client_ms, (int, float)):
+                clock.add(sent, float(client_ms), received)
+            else:
+                clock.in_flight = False
+
+        self.socketio.emit(CLOCK_PING_EVENT, {'server_ts': sent}, to=sid, callback=on_ack)
+
+    # Result echo
+
+    def trace_fields(self, data):
+        """The 'trace' object for a result of this request, or None if the client did not ask"""
+        timer = self.metrics.current()
+        if timer is None or not isinstance(data, dict) or ('frame_id' not in data and 'capture_ts' not in data):
+            return None
+        emit_ms = now_ms()
+        to_epoch = emit_ms - time.perf_counter() * 1000.0
+        dequeue_ms = to_epoch + timer.start * 1000.0
+        received = self.pop_received()
+        receive_ms = received if received is not None else dequeue_ms
+        forward = timer.marks.get('forward')
+
+        clock = self.clock(request.sid)
+        offset = clock.offset_ms
+        fields = {
+            'frame_id': data.get('frame_id'),
+            'capture_ts': data.get('capture_ts'),
+            'sent_ts': data.get('sent_ts'),
+            'receive_ts': round(receive_ms, 3),
+            'dequeue_ts': round(dequeue_ms, 3),
+            'forward_start_ts': round(to_epoch + forward[0] * 1000.0, 3) if forward else None,
+            'forward_end_ts': round(to_epoch + forward[1] * 1000.0, 3) if forward else None,
+            'emit_ts': round(emit_ms, 3),
+            'clock_offset_ms': round(offset, 3) if offset is not None else None,
+        }
+        self.observe(fields, offset)
+        if clock.due():
+            self.ping(request.sid, clock)
+        return fields
+
+    def observe(self, fields, offset):
+        segments = {'queue': fields['dequeue_ts'] - fields['receive_ts'],
+                    'server': fields['emit_ts'] - fields['receive_ts']}
+        if fields['forward_start_ts'] is not None:
+            segments['forward'] = fields['forward_end_ts'] - fields['forward_start_ts']
+        capture, sent = fields['capture_ts'], fields['sent_ts']
+        if isinstance(capture, (int, float)) and isinstance(sent, (int, float)):
+            segments['client'] = sent - capture
+        if offset is not None:
+            if isinstance(sent, (int, float)):
+                segments['uplink'] = fields['receive_ts'] - (sent - offset)
+            elif isinstance(capture, (int, float)):
+                segments['capture_to_receive'] = fields['receive_ts'] - (capture - offset)
+        with self.lock:
+            for segment, ms in segments.items():
+                self.segments[segment].observe(max(ms, 0.0) / 1000.0)
+
+    def collect(self):
+        labels = f'server="{self.metrics.server}"'
+        with self.lock:
+            snapshots = {segment: hist.snapshot() for segment, hist in self.segments.items()}
+            sessions = [clock for clock in self.clocks.values() if clock.samples]
+        out = ['# HELP edusign_trace_segment_seconds End-to-end latency of traced frames by segment',
+               '# TYPE edusign_trace_segment_seconds histogram']
+        for segment, snapshot in snapshots.items():
+            out += Histogram.lines('edusign_trace_segment_seconds', f'{labels},segment="{segment}"',
+                                   LATENCY_BUCKETS, snapshot)
+        out += ['# HELP edusign_clock_synced_sessions Sessions with a clock offset estimate',
+                '# TYPE edusign_clock_synced_sessions gauge',
+                f'edusign_clock_synced_sessions{{{labels}}} {len(sessions)}']
+        return out
+
+
+def install_tracing(app, socketio, metrics, event=TRACE_EVENT):
+    """Echo traces in results of traced frames and export segment latencies; returns the Tracer"""
+    tracer = Tracer(socketio, metrics, event)
+    tracer.hook_receive()
+    metrics.collectors.append(tracer.collect)
+    emit = socketio.emit
+
+    def tracing_emit(event, *args, **kwargs):
+        if event in RESULT_EVENTS and args and isinstance(args[0], dict) and has_request_context() \
+                and 'trace_sent' not in g:
+            inbound = getattr(request, 'event', None)
+            if inbound and inbound['message'] == tracer.event and inbound['args']:
+                fields = tracer.trace_fields(inbound['args'][0])
+                if fields is not None:
+                    g.trace_sent = True
+                    args = ({**args[0], 'trace': fields},) + args[1:]
+        return emit(event, *args, **kwargs)
+
+    @app.teardown_request
+    def drop_arrival(exc=None):
+        # Consume the arrival of predict requests that emitted nothing traced
+        inbound = getattr(request, 'event', None)
+        if inbound and inbound['message'] == tracer.event:
+            tracer.pop_received()
+
+    socketio.emit = tracing_emit
+    return tracer
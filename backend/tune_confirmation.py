@@ -0,0 +1,541 @@
+"""
+tune_confirmation.py - Replay recorded frames through the confirmation state
+machine of the static recognizers for many parameter combinations at once
+
+The days server (recognize_days.py) and the static words server
+(recognize_gen_2.py get_client_state) decide when a sign is "confirmed"
+with a stability check, a voting history, a cooldown and (days only) a
+stable counter. This tool replays the exact same state machine over a
+recording, vectorized over every combination of
+
+    --confidence        CONFIDENCE_THRESHOLD / confidence_threshold
+    --history           prediction_history length (days 10, gen_2 5)
+    --min-consistent    MIN_CONSISTENT_PREDICTIONS / min_consistent_predictions
+    --stability         STABILITY_THRESHOLD / stability_threshold
+    --cooldown          COOLDOWN_FRAMES / cooldown_frames
+    --smooth-window     SMOOTH_WINDOW (days stableCount cap)
+
+and reports per combination
+    confirm rate        attempts whose sign got confirmed
+    time to confirm     frames (and ms at --fps) from attempt start to the
+                        first correct confirmation, median and p90
+    false confirms      attempts with a confirmation of the wrong sign
+    flicker             label switches of the emitted prediction per attempt
+plus the Pareto front over (time to confirm, false confirms, flicker,
+missed attempts).
+
+Recording (.npz):
+    probs (T, C)        model probabilities per frame
+    landmarks (T, F)    the features the server feeds the stability check
+    session (T,)        client id; state resets when it changes
+    target (T,)         lesson target class index per frame (-1 = none)
+    truth (T,)          optional: the sign actually performed (default
+                        target, -1 = no sign); needed for false confirms
+                        unless --free-practice is used
+    valid (T,)          optional: frames that pass the non-zero gate
+    labels (C,)
+Build one from a capture (see capture_log.py) with --from-capture.
+
+Usage:
+    python tune_confirmation.py --from-capture captures/days --model days --save days_rec.npz
+    python tune_confirmation.py days_rec.npz --variant days --fps 15 --json days_tuning.json
+    python tune_confirmation.py days_rec.npz --variant days --check 50
+"""
+
+import argparse
+import itertools
+import json
+import logging
+import sys
+import warnings
+from collections import Counter, deque
+
+import numpy as np
+
+from static_preprocessing import has_enough_data
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+STABILITY_FRAMES = 5  # frame_buffer maxlen in both servers
+MIN_SMOOTH_CONFIDENCE = 0.5
+MIN_STABLE_COUNT = 2  # days: "stable" needs stableCount >= 2
+
+PARAMS = ('confidence', 'history', 'min_consistent', 'stability', 'cooldown', 'smooth_window')
+
+# Values currently hard-coded in the servers
+SERVER_DEFAULTS = {
+    'days': {'confidence': 0.60, 'history': 10, 'min_consistent': 2, 'stability': 0.05,
+             'cooldown': 3, 'smooth_window': 3},
+    'static_words': {'confidence': 0.70, 'history': 5, 'min_consistent': 5, 'stability': 0.05,
+                     'cooldown': 8, 'smooth_window': 3},
+}
+
+
+# ---------------------------------------------------------------------------
+# Recordings
+# ---------------------------------------------------------------------------
+
+def load_recording(path):
+    data = np.load(path, allow_pickle=True)
+    rec = {key: data[key] for key in data.files}
+    rec.setdefault('truth', rec['target'])
+    if 'valid' not in rec:
+        rec['valid'] = has_enough_data(rec['landmarks'])
+    return rec
+
+
+def build_from_capture(capture_dir, model_name, batch_size=512):
+    """Run a registered static model over a capture to get a recording"""
+    from capture_log import CaptureReader
+    from model_registry import load_labels, load_model, prepare_batch
+
+    reader = CaptureReader(capture_dir)
+    index = reader.index
+    order = np.lexsort((index['ts'], index['sid_hash']))
+    raw = np.stack([np.asarray(reader.landmarks(i), dtype=np.float32).reshape(-1) for i in order])
+    landmarks = prepare_batch(model_name, raw)
+
+    model = load_model(model_name)
+    probs = np.concatenate([model.predict(landmarks[i:i + batch_size], verbose=0)
+                            for i in range(0, len(landmarks), batch_size)])
+
+    labels = load_labels(model_name)
+    lookup = {label.lower(): i for i, label in enumerate(labels)}
+    target = np.array([lookup.get(t.decode().strip().lower(), -1) for t in index['target'][order]], dtype=np.int64)
+    _, session = np.unique(index['sid_hash'][order], return_inverse=True)
+    valid = (np.count_nonzero(raw, axis=1) > 0) & has_enough_data(landmarks)
+    return {
+        'probs': probs.astype(np.float32),
+        'landmarks': landmarks.astype(np.float32),
+        'session': session.astype(np.int64),
+        'target': target,
+        'truth': target.copy(),
+        'valid': valid,
+        'labels': np.array(labels),
+    }
+
+
+def param_grid(args):
+    values = [args.confidence, args.history, args.min_consistent, args.stability, args.cooldown, args.smooth_window]
+    combos = list(itertools.product(*values))
+    grid = {name: np.array([c[i] for c in combos]) for i, name in enumerate(PARAMS)}
+    for name in ('history', 'min_consistent', 'cooldown', 'smooth_window'):
+        grid[name] = grid[name].astype(np.int64)
+    return grid
+
+
+def attempt_ids(rec):
+    """Attempt index per frame: a new attempt starts when session or truth changes"""
+    key_change = np.ones(len(rec['truth']), dtype=bool)
+    key_change[1:] = (np.diff(rec['session']) != 0) | (np.diff(rec['truth']) != 0)
+    return np.cumsum(key_change) - 1, np.flatnonzero(key_change)
+
+
+# ---------------------------------------------------------------------------
+# Vectorized state machine
+# ---------------------------------------------------------------------------
+
+def simulate(rec, grid, variant, free_practice=False):
+    """
+    Replay the recording for every parameter combination.
+
+    Returns (emitted, confirmed): (T, K) arrays of the label each frame emits
+    as a prediction (-1 when it emits cooldown/unstable/building/invalid)
+    and whether that emission is confirmed.
+    """
+    days = variant == 'days'
+    probs, landmarks = rec['probs'], rec['landmarks'].astype(np.float64)
+    targets = np.full(len(probs), -1) if free_practice else rec['target']
+    T, F = landmarks.shape
+    K = len(grid['confidence'])
+    hist_max = int(grid['history'].max())
+    C = probs.shape[1]
+    rows = np.arange(K)
+
+    conf_thr, hist_len_max = grid['confidence'], grid['history']
+    min_consistent, stab_thr = grid['min_consistent'], grid['stability']
+    cooldown_frames, smooth_window = grid['cooldown'], grid['smooth_window']
+
+    emitted = np.full((T, K), -1, dtype=np.int16)
+    confirmed = np.zeros((T, K), dtype=bool)
+
+    def reset():
+        return {
+            'hist': np.zeros((K, hist_max), dtype=np.int64),
+            'hist_pos': np.zeros(K, dtype=np.int64),
+            'hist_len': np.zeros(K, dtype=np.int64),
+            'fb': np.zeros((K, STABILITY_FRAMES), dtype=np.int64),
+            'fb_pos': np.zeros(K, dtype=np.int64),
+            'fb_len': np.zeros(K, dtype=np.int64),
+            'fb_sum': np.zeros((K, F)),
+            'fb_sq': np.zeros(K),
+            'cooldown': np.zeros(K, dtype=np.int64),
+            'current': np.full(K, -1, dtype=np.int64),
+            'current_conf': np.zeros(K),
+            'stable_count': np.zeros(K, dtype=np.int64),
+            'last_target': np.full(K, -1, dtype=np.int64),
+        }
+
+    def stability(s, t, mask):
+        """check_stability for the combos in mask; appends frame t to their buffers"""
+        x = landmarks[t]
+        full = mask & (s['fb_len'] >= STABILITY_FRAMES)
+        # var(buffer, axis=0).mean() from running sums (buffer before appending t)
+        mean_sq = s['fb_sq'] / STABILITY_FRAMES
+        sq_mean = np.einsum('kf,kf->k', s['fb_sum'], s['fb_sum']) / STABILITY_FRAMES ** 2
+        variance = (mean_sq - sq_mean) / F
+        is_stable = full & (variance < stab_thr)
+
+        slot = s['fb_pos'] % STABILITY_FRAMES
+        old = landmarks[s['fb'][rows, slot]]
+        drop = full[:, None] * old
+        s['fb_sum'][mask] += x - drop[mask]
+        s['fb_sq'][mask] += x @ x - np.einsum('kf,kf->k', drop, drop)[mask]
+        s['fb'][mask, slot[mask]] = t
+        s['fb_pos'][mask] += 1
+        s['fb_len'][mask] = np.minimum(s['fb_len'][mask] + 1, STABILITY_FRAMES)
+        return is_stable
+
+    s = reset()
+    session = None
+    for t in range(T):
+        if rec['session'][t] != session:
+            session = rec['session'][t]
+            s = reset()
+        if not rec['valid'][t]:
+            continue
+        target = int(targets[t])
+
+        if days and target >= 0:
+            changed = s['last_target'] != target
+            s['hist_len'][changed] = 0
+            s['hist_pos'][changed] = 0
+            s['stable_count'][changed] = 0
+            s['cooldown'][changed] = 0
+            s['last_target'][changed] = target
+
+        in_cooldown = s['cooldown'] > 0
+        if not days:
+            # gen_2 checks stability before the cooldown
+            is_stable = stability(s, t, np.ones(K, dtype=bool))
+        s['cooldown'][in_cooldown] -= 1
+        active = ~in_cooldown
+        if days:
+            is_stable = stability(s, t, active)
+        go = active & is_stable
+        if not go.any():
+            continue
+
+        pred = int(np.argmax(probs[t]))
+        conf = float(probs[t, pred])
+
+        # Vote (deque append with per-combo maxlen)
+        vote = go & (conf > conf_thr)
+        slot = s['hist_pos'] % hist_len_max
+        s['hist'][vote, slot[vote]] = pred
+        s['hist_pos'][vote] += 1
+        s['hist_len'][vote] = np.minimum(s['hist_len'][vote] + 1, hist_len_max[vote])
+
+        # Counter(history).most_common(1): ties go to the label seen first (oldest)
+        age = (s['hist_pos'][:, None] - 1 - np.arange(hist_max)[None, :]) % hist_len_max[:, None]
+        filled = (np.arange(hist_max)[None, :] < hist_len_max[:, None]) & (age < s['hist_len'][:, None])
+        onehot = (s['hist'][:, :, None] == np.arange(C)[None, None, :]) & filled[:, :, None]
+        counts = onehot.sum(axis=1)
+        first_seen = np.where(onehot, age[:, :, None], -1).max(axis=1)
+        best_count = counts.max(axis=1)
+        candidates = counts == best_count[:, None]
+        smooth = np.argmax(np.where(candidates, first_seen, -2), axis=1)
+        has_smooth = go & (s['hist_len'] >= min_consistent) & (best_count >= min_consistent)
+        smooth_conf = np.where(s['hist_len'] > 0, best_count / np.maximum(s['hist_len'], 1), 0.0)
+
+        ok = has_smooth & (smooth_conf > MIN_SMOOTH_CONFIDENCE)
+        update = ok & ((smooth != s['current']) | (smooth_conf > s['current_conf']))
+        s['current'][update] = smooth[update]
+        s['current_conf'][update] = smooth_conf[update]
+        s['cooldown'][update] = cooldown_frames[update]
+
+        matches = (target < 0) | (smooth == target)
+        if days:
+            up = ok & (smooth_conf >= conf_thr)
+            down = ok & ~up
+            s['stable_count'][up] = np.minimum(s['stable_count'][up] + 1, smooth_window[up])
+            s['stable_count'][down] = np.maximum(s['stable_count'][down] - 1, 0)
+            confirmed[t] = ok & (s['stable_count'] >= MIN_STABLE_COUNT) & matches
+        else:
+            confirmed[t] = ok & matches
+        emitted[t] = np.where(ok, smooth, -1)
+
+    return emitted, confirmed
+
+
+# ---------------------------------------------------------------------------
+# Scalar reference (straight port of the server code) used by --check and
+# tests/test_tune_confirmation.py
+# ---------------------------------------------------------------------------
+
+def simulate_reference(rec, params, variant, free_practice=False):
+    days = variant == 'days'
+    T = len(rec['probs'])
+    targets = np.full(T, -1) if free_practice else rec['target']
+    emitted = np.full(T, -1)
+    confirmed = np.zeros(T, dtype=bool)
+    state = None
+    session = None
+
+    def check_stability(landmarks, frame_buffer):
+        if len(frame_buffer) < frame_buffer.maxlen:
+            frame_buffer.append(landmarks)
+            return False
+        variance = np.var(np.array(frame_buffer), axis=0).mean()
+        frame_buffer.append(landmarks)
+        return variance < params['stability']
+
+    for t in range(T):
+        if rec['session'][t] != session:
+            session = rec['session'][t]
+            state = {'history': deque(maxlen=int(params['history'])), 'frames': deque(maxlen=STABILITY_FRAMES),
+                     'cooldown': 0, 'current': None, 'current_conf': 0.0, 'stable_count': 0, 'last_target': -1}
+        if not rec['valid'][t]:
+            continue
+        target = int(targets[t])
+        landmarks = rec['landmarks'][t].astype(np.float64)
+
+        if days and target >= 0 and target != state['last_target']:
+            state['history'].clear()
+            state['stable_count'] = 0
+            state['cooldown'] = 0
+            state['last_target'] = target
+
+        if not days:
+            is_stable = check_stability(landmarks, state['frames'])
+        if state['cooldown'] > 0:
+            state['cooldown'] -= 1
+            continue
+        if days:
+            is_stable = check_stability(landmarks, state['frames'])
+        if not is_stable:
+            continue
+
+        pred = int(np.argmax(rec['probs'][t]))
+        conf = float(rec['probs'][t][pred])
+        if conf > params['confidence']:
+            state['history'].append(pred)
+        if len(state['history']) < params['min_consistent']:
+            continue
+        smooth, count = Counter(state['history']).most_common(1)[0]
+        if count < params['min_consistent']:
+            continue
+        smooth_conf = count / len(state['history'])
+        if smooth_conf <= MIN_SMOOTH_CONFIDENCE:
+            continue
+
+        if smooth != state['current'] or smooth_conf > state['current_conf']:
+            state['current'] = smooth
+            state['current_conf'] = smooth_conf
+            state['cooldown'] = int(params['cooldown'])
+
+        matches = target < 0 or smooth == target
+        if days:
+            if smooth_conf >= params['confidence']:
+                state['stable_count'] = min(state['stable_count'] + 1, int(params['smooth_window']))
+            else:
+                state['stable_count'] = max(state['stable_count'] - 1, 0)
+            confirmed[t] = state['stable_count'] >= MIN_STABLE_COUNT and matches
+        else:
+            confirmed[t] = matches
+        emitted[t] = smooth
+
+    return emitted, confirmed
+
+
+def reference_mismatches(rec, grid, variant, free_practice=False):
+    """Parameter combinations of grid where simulate and simulate_reference disagree"""
+    emitted, confirmed = simulate(rec, grid, variant, free_practice)
+    mismatches = []
+    for k in range(len(grid['confidence'])):
+        params = {n: grid[n][k] for n in PARAMS}
+        ref_emitted, ref_confirmed = simulate_reference(rec, params, variant, free_practice)
+        if not (np.array_equal(ref_emitted, emitted[:, k]) and np.array_equal(ref_confirmed, confirmed[:, k])):
+            mismatches.append({n: v.item() for n, v in params.items()})
+    return mismatches
+
+
+# ---------------------------------------------------------------------------
+# Metrics
+# ---------------------------------------------------------------------------
+
+def attempt_metrics(rec, emitted, confirmed, fps):
+    """Per-combination metrics over the attempts of the recording"""
+    attempt, starts = attempt_ids(rec)
+    truth = rec['truth']
+    n_attempts = len(starts)
+    K = emitted.shape[1]
+    frame_in_attempt = np.arange(len(truth)) - starts[attempt]
+
+    correct = confirmed & (emitted == truth[:, None]) & (truth[:, None] >= 0)
+    wrong = confirmed & ~correct
+
+    # First correct confirmation per attempt (frames since attempt start)
+    ttc = np.full((n_attempts, K), np.inf)
+    np.minimum.at(ttc, attempt, np.where(correct, frame_in_attempt[:, None], np.inf))
+    false_confirm = np.zeros((n_attempts, K), dtype=bool)
+    np.logical_or.at(false_confirm, attempt, wrong)
+
+    # Flicker: label switches between consecutive emitted predictions within an attempt
+    flicker = np.zeros(K)
+    for k in range(K):
+        shown = emitted[:, k] >= 0
+        labels, ids = emitted[shown, k], attempt[shown]
+        flicker[k] = np.count_nonzero((labels[1:] != labels[:-1]) & (ids[1:] == ids[:-1]))
+    flicker /= max(n_attempts, 1)
+
+    scored = np.array([truth[s] >= 0 for s in starts])
+    confirmed_attempts = np.isfinite(ttc) & scored[:, None]
+    confirm_rate = confirmed_attempts.sum(axis=0) / max(scored.sum(), 1)
+    ttc_masked = np.where(confirmed_attempts, ttc, np.nan)
+    with warnings.catch_warnings():
+        warnings.simplefilter('ignore', RuntimeWarning)  # combinations that never confirm
+        median = np.nanmedian(ttc_masked, axis=0)
+        p90 = np.nanpercentile(ttc_masked, 90, axis=0)
+    return {
+        'confirm_rate': confirm_rate,
+        'ttc_median_frames': median,
+        'ttc_p90_frames': p90,
+        'ttc_median_ms': median / fps * 1000.0,
+        'false_confirm_rate': false_confirm.mean(axis=0),
+        'flicker_per_attempt': flicker,
+        'attempts': n_attempts,
+    }
+
+
+def pareto_front(objectives):
+    """Indices of non-dominated rows of an (K, M) array (all objectives minimized)"""
+    obj = np.nan_to_num(objectives, nan=np.inf)
+    keep = np.ones(len(obj), dtype=bool)
+    for i in range(len(obj)):
+        if not keep[i]:
+            continue
+        dominated = np.all(obj[i] <= obj, axis=1) & np.any(obj[i] < obj, axis=1)
+        keep &= ~dominated
+    return np.flatnonzero(keep)
+
+
+def float_list(text):
+    return [float(v) for v in text.split(',')]
+
+
+def int_list(text):
+    return [int(v) for v in text.split(',')]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Tune confirmation parameters on recorded frames")
+    parser.add_argument('recording', nargs='?', help="Recording .npz (see module docstring)")
+    parser.add_argument('--from-capture', help="Build the recording from a capture directory instead")
+    parser.add_argument('--model', help="Registered model for --from-capture (days or static_words)")
+    parser.add_argument('--save', help="Save the built recording to this .npz")
+    parser.add_argument('--variant', choices=sorted(SERVER_DEFAULTS), default='days')
+    parser.add_argument('--free-practice', action='store_true', help="Ignore lesson targets (confirm on stability alone)")
+    parser.add_argument('--fps', type=float, default=15.0, help="Client frame rate used to convert frames to ms")
+    parser.add_argument('--confidence', type=float_list, default=[0.5, 0.6, 0.7, 0.8])
+    parser.add_argument('--history', type=int_list, default=[3, 5, 10])
+    parser.add_argument('--min-consistent', type=int_list, default=[2, 3, 4, 5])
+    parser.add_argument('--stability', type=float_list, default=[0.01, 0.02, 0.05, 0.1])
+    parser.add_argument('--cooldown', type=int_list, default=[0, 3, 5, 8])
+    parser.add_argument('--smooth-window', type=int_list, default=[2, 3, 5])
+    parser.add_argument('--top', type=int, default=15, help="Rows of the Pareto front to print")
+    parser.add_argument('--check', type=int, metavar='N', help="Compare N random combinations against the scalar reference and exit")
+    parser.add_argument('--json', help="Write all combinations and the Pareto front to this file")
+    args = parser.parse_args()
+
+    if args.from_capture:
+        if not args.model:
+            parser.error("--from-capture needs --model")
+        rec = build_from_capture(args.from_capture, args.model)
+        if args.save:
+            np.savez_compressed(args.save, **rec)
+            logger.info(f"✅ Recording written to {args.save}")
+    elif args.recording:
+        rec = load_recording(args.recording)
+    else:
+        parser.error("Give a recording or --from-capture")
+
+    # Always include the server's current values so they show up in the comparison
+    for name, value in SERVER_DEFAULTS[args.variant].items():
+        values = getattr(args, name)
+        if value not in values:
+            values.append(value)
+    if args.variant != 'days':
+        args.smooth_window = [SERVER_DEFAULTS[args.variant]['smooth_window']]  # unused by gen_2
+    grid = param_grid(args)
+    K = len(grid['confidence'])
+    logger.info(f"🎛️ {K} combinations over {len(rec['probs'])} frames ({args.variant})")
+
+    if args.check:
+        rng = np.random.default_rng(0)
+        picks = rng.choice(K, size=min(args.check, K), replace=False)
+        sub = {name: values[picks] for name, values in grid.items()}
+        mismatches = reference_mismatches(rec, sub, args.variant, args.free_practice)
+        for params in mismatches:
+            logger.error(f"❌ Mismatch for {params}")
+        if mismatches:
+            sys.exit(1)
+        logger.info(f"✅ Vectorized simulator matches the reference on {len(picks)} combinations")
+        return
+
+    emitted, confirmed = simulate(rec, grid, args.variant, args.free_practice)
+    metrics = attempt_metrics(rec, emitted, confirmed, args.fps)
+
+    objectives = np.stack([
+        metrics['ttc_median_frames'],
+        metrics['false_confirm_rate'],
+        metrics['flicker_per_attempt'],
+        1.0 - metrics['confirm_rate'],
+    ], axis=1)
+    front = pareto_front(objectives)
+    front = front[np.lexsort((metrics['false_confirm_rate'][front], metrics['ttc_median_frames'][front]))]
+
+    defaults = SERVER_DEFAULTS[args.variant]
+    is_default = np.all([grid[n] == defaults[n] for n in PARAMS], axis=0)
+
+    header = f"{'conf':>5}{'hist':>5}{'minc':>5}{'stab':>6}{'cool':>5}{'win':>4}" \
+             f"{'confirm':>9}{'ttc ms':>8}{'p90 ms':>8}{'false':>7}{'flicker':>8}"
+    def row(k):
+        return (f"{grid['confidence'][k]:>5.2f}{grid['history'][k]:>5}{grid['min_consistent'][k]:>5}"
+                f"{grid['stability'][k]:>6.2f}{grid['cooldown'][k]:>5}{grid['smooth_window'][k]:>4}"
+                f"{metrics['confirm_rate'][k]:>9.1%}{metrics['ttc_median_ms'][k]:>8.0f}"
+                f"{metrics['ttc_p90_frames'][k] / args.fps * 1000.0:>8.0f}"
+                f"{metrics['false_confirm_rate'][k]:>7.1%}{metrics['flicker_per_attempt'][k]:>8.2f}")
+
+    print(f"\n{metrics['attempts']} attempts, Pareto front: {len(front)} of {K} combinations\n")
+    print(header)
+    for k in front[:args.top]:
+        print(row(k))
+    print("\nCurrent server values:")
+    print(header)
+    for k in np.flatnonzero(is_default):
+        print(row(k) + ("  (on front)" if k in front else ""))
+
+    if args.json:
+        def record(k):
+            return {
+                'params': {n: grid[n][k].item() for n in PARAMS},
+                **{m: (None if not np.isfinite(v) else float(v)) for m, v in
+                   ((m, metrics[m][k]) for m in ('confirm_rate', 'ttc_median_frames', 'ttc_p90_frames',
+                                                  'ttc_median_ms', 'false_confirm_rate', 'flicker_per_attempt'))},
+                'server_default': bool(is_default[k]),
+            }
+        with open(args.json, 'w') as f:
+            json.dump({
+                'variant': args.variant,
+                'attempts': metrics['attempts'],
+                'fps': args.fps,
+                'pareto_front': [record(k) for k in front],
+                'combinations': [record(k) for k in range(K)],
+            }, f, indent=2)
+        logger.info(f"✅ Results written to {args.json}")
+
+
+if __name__ == '__main__':
+    main()
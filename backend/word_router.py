@@ -0,0 +1,184 @@
+"""
+Routing between the motion and static models of the general words server.
+
+    routing table  built from the two label files: a target word is sent to
+                   the model that knows it (motion wins if both do)
+    both models    unknown targets (free practice) run the motion and static
+                   model concurrently and keep the more confident answer
+    motion gate    optional, cheap check of how much the hands move across
+                   the window; clearly still hands skip the motion model,
+                   clearly moving hands skip the static model, anything in
+                   between still runs both
+
+Model calls go through a run_parallel(calls) function so each server can
+use its own kind of native threads (eventlet.tpool for the eventlet
+servers, a thread pool otherwise). TensorFlow releases the GIL while
+predicting, so the two models really overlap.
+"""
+
+from collections import namedtuple
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+
+# Holistic frame layout: face(1404) + pose(99) + hands(126)
+HAND_START = 1503
+HAND_END = 1629
+HAND_FEATURES = (HAND_END - HAND_START) // 2  # 21 landmarks x (x, y, z) per hand
+
+RoutedPrediction = namedtuple('RoutedPrediction', 'word confidence model_used probs route')
+
+
+def route_key(word):
+    """Routing table key: labels differ in case between the two label files"""
+    return str(word).strip().lower()
+
+
+def build_routes(motion_labels, static_labels):
+    """Map every known word to 'motion' or 'static'"""
+    routes = {route_key(word): 'static' for word in static_labels}
+    routes.update({route_key(word): 'motion' for word in motion_labels})
+    return routes
+
+
+def hand_motion_energy(sequence):
+    """
+    Mean per-frame landmark displacement of the hands over a raw (T, 1629)
+    window, in the client's coordinate units.
+
+    Only frames where a hand is present in both consecutive frames count, so
+    a hand entering or leaving the view does not look like fast motion.
+    Returns None when there is not enough hand data to decide.
+    """
+    hands = np.asarray(sequence, dtype=np.float32)[:, HAND_START:HAND_END]
+    if hands.shape[0] < 2 or hands.shape[1] != HAND_END - HAND_START:
+        return None
+    hands = hands.reshape(hands.shape[0], 2, HAND_FEATURES)
+    present = np.any(hands != 0, axis=2)
+    both = present[1:] & present[:-1]
+    if not both.any():
+        return None
+    step = np.abs(np.diff(hands, axis=0)).mean(axis=2)
+    return float(step[both].mean())
+
+
+class MotionGate:
+    """Skip the unlikely model when hand motion energy is clearly low or high"""
+
+    def __init__(self, static_below=0.004, motion_above=0.015):
+        self.static_below = static_below
+        self.motion_above = motion_above
+
+    def decide(self, energy):
+        """Return 'static', 'motion' or None (run both)"""
+        if energy is None:
+            return None
+        if energy < self.static_below:
+            return 'static'
+        if energy > self.motion_above:
+            return 'motion'
+        return None
+
+    def to_dict(self):
+        return {'static_below': self.static_below, 'motion_above': self.motion_above}
+
+
+_pool = ThreadPoolExecutor(max_workers=2, thread_name_prefix='word-router')
+
+
+def run_in_threads(calls):
+    """Default run_parallel: run the calls on native threads and wait for all"""
+    futures = [_pool.submit(call) for call in calls]
+    return [future.result() for future in futures]
+
+
+class WordRouter:
+    """Route a preprocessed (1, SEQ_LEN, 1629) batch to the motion and/or static model"""
+
+    def __init__(self, motion_model, motion_labels, static_model, static_labels,
+                 gate=None, run_parallel=run_in_threads):
+        self.motion_model = motion_model
+        self.motion_labels = [str(label) for label in motion_labels]
+        self.static_model = static_model
+        self.static_labels = [str(label) for label in static_labels]
+        self.routes = build_routes(self.motion_labels, self.static_labels)
+        self.gate = gate or MotionGate()
+        self.run_parallel = run_parallel
+
+    def predict_motion(self, sequence_batch):
+        return self.motion_model.predict(sequence_batch, verbose=0)[0]
+
+    def predict_static(self, sequence_batch):
+        # Static model takes the hand features (126) of the last frame
+        return self.static_model.predict(sequence_batch[:, -1, HAND_START:HAND_END], verbose=0)[0]
+
+    def labels_for(self, model_used):
+        return self.motion_labels if model_used == 'motion' else self.static_labels
+
+    def _result(self, model_used, probs, route):
+        labels = self.labels_for(model_used)
+        idx = int(np.argmax(probs))
+        return RoutedPrediction(labels[idx], float(probs[idx]), model_used, probs, route)
+
+    def predict(self, sequence_batch, target='', raw_sequence=None, use_gate=False):
+        """
+        Predict a word for sequence_batch.
+
+        Known targets go to their model ('target' route). Otherwise, with
+        use_gate and a raw_sequence, the motion gate may pick one model
+        ('gate' route); failing that both models run concurrently ('both').
+        """
+        model_used = self.routes.get(route_key(target)) if target else None
+        route = 'target'
+
+        if model_used is None and use_gate and raw_sequence is not None:
+            model_used = self.gate.decide(hand_motion_energy(raw_sequence))
+            route = 'gate'
+
+        if model_used == 'motion':
+            return self._result('motion', self.predict_motion(sequence_batch), route)
+        if model_used == 'static':
+            return self._result('static', self.predict_static(sequence_batch), route)
+
+        motion_probs, static_probs = self.run_parallel([
+            lambda: self.predict_motion(sequence_batch),
+            lambda: self.predict_static(sequence_batch),
+        ])
+        motion = self._result('motion', motion_probs, 'both')
+        static = self._result('static', static_probs, 'both')
+        return motion if motion.confidence >= static.confidence else static
+
+    def predict_batch(self, sequence_batch, targets=None):
+        """
+        Predict every row of an (N, SEQ_LEN, 1629) batch.
+
+        Rows are routed by their target like predict(); each model then runs
+        once over all the rows it needs (both calls concurrently), so a whole
+        batch costs at most two forward passes. Returns one RoutedPrediction
+        per row.
+        """
+        n = len(sequence_batch)
+        routes = [self.routes.get(route_key(t)) if t else None for t in (targets or [''] * n)]
+        motion_rows = [i for i, r in enumerate(routes) if r != 'static']
+        static_rows = [i for i, r in enumerate(routes) if r != 'motion']
+
+        calls = []
+        if motion_rows:
+            calls.append(lambda: self.motion_model.predict(sequence_batch[motion_rows], verbose=0))
+        if static_rows:
+            calls.append(lambda: self.static_model.predict(
+                sequence_batch[static_rows, -1, HAND_START:HAND_END], verbose=0))
+        outputs = self.run_parallel(calls) if len(calls) > 1 else [calls[0]()]
+        motion_probs = dict(zip(motion_rows, outputs[0])) if motion_rows else {}
+        static_probs = dict(zip(static_rows, outputs[-1])) if static_rows else {}
+
+        results = []
+        for i, model_used in enumerate(routes):
+            if model_used is not None:
+                probs = motion_probs[i] if model_used == 'motion' else static_probs[i]
+                results.append(self._result(model_used, probs, 'target'))
+                continue
+            motion = self._result('motion', motion_probs[i], 'both')
+            static = self._result('static', static_probs[i], 'both')
+            results.append(motion if motion.confidence >= static.confidence else static)
+        return results
@@ -0,0 +1,144 @@
+"""
+Persistent XLA compilation cache for the jit-compiled recognizers.
+
+recognize_colours.py and recognize_gen_1.py compile their models with XLA
+(set_jit + jit_compile=True), which costs seconds at warmup on every start
+and again for every new input shape (e.g. /predict_batch sizes). TensorFlow
+can persist those executables (--tf_xla_persistent_cache_directory in
+TF_XLA_FLAGS); this module points it at
+
+    <EDUSIGN_XLA_CACHE_DIR>/tf-<version>/<model sha256>/
+
+so a cache is only ever reused by the same TensorFlow build and the same
+model weights (XLA itself keys each entry by the compiled graph, i.e. by the
+input signature). manifest.json in that directory lists the signatures
+compiled so far.
+
+configure() must run before TensorFlow is imported (the flags are read
+once, at import). Hit/miss is decided by whether the warmup added entries
+to the directory and is logged and reported under /health 'startup'.
+
+EDUSIGN_XLA_CACHE_DIR=off disables the cache.
+"""
+
+import hashlib
+import json
+import logging
+import os
+import sys
+import time
+
+logger = logging.getLogger(__name__)
+
+CACHE_DIR_ENV = 'EDUSIGN_XLA_CACHE_DIR'
+DEFAULT_CACHE_DIR = os.path.join(os.path.expanduser('~'), '.cache', 'edusign', 'xla')
+MANIFEST = 'manifest.json'
+HASH_BLOCK = 1 << 20
+
+
+def tensorflow_version():
+    """Installed TensorFlow version, without importing it"""
+    from importlib import metadata
+
+    for dist in ('tensorflow', 'tensorflow-cpu', 'tensorflow-macos', 'tf-nightly'):
+        try:
+            return metadata.version(dist)
+        except metadata.PackageNotFoundError:
+            continue
+    return 'unknown'
+
+
+def model_fingerprint(paths):
+    """sha256 over the model files (or SavedModel directories), first 16 hex digits"""
+    digest = hashlib.sha256()
+    for path in paths:
+        files = [path]
+        if os.path.isdir(path):
+            files = sorted(os.path.join(root, name) for root, _, names in os.walk(path) for name in names)
+        for name in files:
+            with open(name, 'rb') as f:
+                for block in iter(lambda: f.read(HASH_BLOCK), b''):
+                    digest.update(block)
+    return digest.hexdigest()[:16]
+
+
+class XlaCache:
+    """One process's persistent XLA cache directory and its hit/miss record"""
+
+    def __init__(self, directory, fingerprint, tf_version):
+        self.directory = directory
+        self.fingerprint = fingerprint
+        self.tf_version = tf_version
+        self.result = None
+        self.compiled = 0
+        self._before = None
+
+    @classmethod
+    def configure(cls, model_paths):
+        """Point TF_XLA_FLAGS at the cache for these models; None if disabled or unavailable"""
+        root = os.environ.get(CACHE_DIR_ENV, DEFAULT_CACHE_DIR)
+        if root.lower() in ('', 'off', '0', 'false'):
+            return None
+        if 'tensorflow' in sys.modules:
+            logger.warning("⚠️ TensorFlow already imported, the XLA cache flags would be ignored")
+            return None
+        try:
+            fingerprint = model_fingerprint(model_paths)
+        except OSError as e:
+            logger.warning(f"⚠️ XLA cache disabled, cannot hash model: {e}")
+            return None
+
+        tf_version = tensorflow_version()
+        directory = os.path.join(root, f'tf-{tf_version}', fingerprint)
+        os.makedirs(directory, exist_ok=True)
+        flags = os.environ.get('TF_XLA_FLAGS', '')
+        if '--tf_xla_persistent_cache_directory' not in flags:
+            os.environ['TF_XLA_FLAGS'] = f'{flags} --tf_xla_persistent_cache_directory={directory}'.strip()
+        return cls(directory, fingerprint, tf_version)
+
+    def entries(self):
+        return {name for name in os.listdir(self.directory) if name != MANIFEST}
+
+    def begin(self):
+        """Snapshot the cache before compiling (call right before the warmup)"""
+        self._before = self.entries()
+
+    def finish(self, signature):
+        """Record hit/miss for the compile(s) since begin() under signature, e.g. '1x30x1629:float32'"""
+        added = self.entries() - self._before
+        self.compiled = len(added)
+        self.result = 'miss' if added else 'hit' if self._before else 'empty'
+        self._update_manifest(signature)
+        if self.result == 'hit':
+            logger.info(f"⚡ XLA cache hit ({len(self._before)} entries) for {signature} in {self.directory}")
+        elif self.result == 'miss':
+            logger.info(f"🧊 XLA cache miss for {signature}: compiled and stored {len(added)} entries in {self.directory}")
+        else:
+            logger.info(f"🧊 XLA cache empty and nothing was stored for {signature} (XLA not used?)")
+        return self.result
+
+    def _update_manifest(self, signature):
+        path = os.path.join(self.directory, MANIFEST)
+        try:
+            with open(path) as f:
+                manifest = json.load(f)
+        except (OSError, ValueError):
+            manifest = {'tf_version': self.tf_version, 'model': self.fingerprint, 'signatures': {}}
+        record = manifest['signatures'].setdefault(signature, {'first_compiled': None, 'hits': 0})
+        if self.result == 'miss' and record['first_compiled'] is None:
+            record['first_compiled'] = time.strftime('%Y-%m-%dT%H:%M:%S')
+        elif self.result == 'hit':
+            record['hits'] += 1
+        tmp = f'{path}.{os.getpid()}.tmp'
+        with open(tmp, 'w') as f:
+            json.dump(manifest, f, indent=2)
+        os.replace(tmp, path)  # replicas may share the directory
+
+    def to_dict(self):
+        return {
+            'directory': self.directory,
+            'tf_version': self.tf_version,
+            'model': self.fingerprint,
+            'result': self.result,
+            'entries_added': self.compiled,
+        }